@@ -198,8 +198,12 @@ class AllocationCollection(collection.Collection):
             Allocation.convert_with_links(p, fields=fields, sanitize=False)
             for p in rpc_allocations
         ]
+        marker = None
+        if rpc_allocations:
+            marker = api_utils.make_marker(rpc_allocations[-1],
+                                           kwargs.get('sort_key'))
         collection.next = collection.get_next(limit, url=url, fields=fields,
-                                              **kwargs)
+                                              marker=marker, **kwargs)
 
         for item in collection.allocations:
             item.sanitize(fields=fields)
@@ -258,10 +262,8 @@ class AllocationsController(pecan.rest.RestController):
                 _("The sort_key value %(key)s is an invalid field for "
                   "sorting") % {'key': sort_key})
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Allocation.get_by_uuid(api.request.context,
-                                                        marker)
+        marker_obj = api_utils.get_marker_obj(objects.Allocation, marker,
+                                              sort_key)
 
         if node_ident:
             try:
@@ -312,8 +314,8 @@ class AllocationsController(pecan.rest.RestController):
 
     @METRICS.timer('AllocationsController.get_all')
     @expose.expose(AllocationCollection, types.uuid_or_name, str,
-                   str, types.uuid, int, str, str,
-                   types.listtype, str)
+                   str, types.marker, int, str, str,
+                   types.listtype, str, stream=True)
     def get_all(self, node=None, resource_class=None, state=None, marker=None,
                 limit=None, sort_key='id', sort_dir='asc', fields=None,
                 owner=None):
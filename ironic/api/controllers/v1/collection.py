@@ -37,8 +37,14 @@ class Collection(base.Base):
         """Return whether collection has more items."""
         return len(self.collection) and len(self.collection) == limit
 
-    def get_next(self, limit, url=None, **kwargs):
-        """Return a link to the next subset of the collection."""
+    def get_next(self, limit, url=None, marker=None, **kwargs):
+        """Return a link to the next subset of the collection.
+
+        :param limit: the maximum number of items of the collection.
+        :param url: the URL of the collection resource.
+        :param marker: the marker of the next subset, by default the key
+            field of the last item.
+        """
         if not self.has_next(limit):
             return wtypes.Unset
 
@@ -51,7 +57,8 @@ class Collection(base.Base):
         q_args = ''.join(['%s=%s&' % (key, kwargs[key]) for key in kwargs])
         next_args = '?%(args)slimit=%(limit)d&marker=%(marker)s' % {
             'args': q_args, 'limit': limit,
-            'marker': getattr(self.collection[-1], self.get_key_field())}
+            'marker': marker or getattr(self.collection[-1],
+                                        self.get_key_field())}
 
         return link.Link.make_link('next', api.request.public_url,
                                    resource_url, next_args).href
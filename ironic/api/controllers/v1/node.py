@@ -13,9 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import datetime
 from http import client as http_client
 
+from futurist import waiters
 from ironic_lib import metrics_utils
 import jsonschema
 from oslo_log import log
@@ -98,12 +100,36 @@ _VENDOR_METHODS = {}
 _DEFAULT_RETURN_FIELDS = ('instance_uuid', 'maintenance', 'power_state',
                           'provision_state', 'uuid', 'name')
 
+# Node object fields needed to compute the API-only fields
+_DB_FIELD_DEPENDENCIES = {
+    'chassis_uuid': ('chassis_id',),
+    'allocation_uuid': ('allocation_id',),
+    'conductor': ('driver', 'conductor_group'),
+}
+
+# Node object fields needed to compute the states of a node
+_STATES_DB_FIELDS = ('console_enabled', 'last_error', 'power_state',
+                     'provision_state', 'target_power_state',
+                     'target_provision_state', 'provision_updated_at',
+                     'raid_config', 'target_raid_config')
+
+_ETAG_DB_FIELDS = ('uuid', 'created_at', 'updated_at', 'traits')
+
 # States where calling do_provisioning_action makes sense
 PROVISION_ACTION_STATES = (ir_states.VERBS['manage'],
                            ir_states.VERBS['provide'],
                            ir_states.VERBS['abort'],
                            ir_states.VERBS['adopt'])
 
+# Provision state targets that can be requested for several nodes at once
+BULK_PROVISION_TARGETS = ((ir_states.ACTIVE, ir_states.DELETED,
+                           ir_states.VERBS['inspect'])
+                          + PROVISION_ACTION_STATES)
+
+# Node object fields needed to validate and route bulk state changes
+_BULK_DB_FIELDS = ('owner', 'driver', 'conductor_group', 'maintenance',
+                   'reservation', 'power_state', 'provision_state')
+
 _NODES_CONTROLLER_RESERVED_WORDS = None
 
 ALLOWED_TARGET_POWER_STATES = (ir_states.POWER_ON,
@@ -179,6 +205,39 @@ def update_state_in_older_versions(obj):
         obj.provision_state = ir_states.INSPECTING
 
 
+def _get_conductor(rpc_node):
+    """Get the hostname of the conductor serving a node, if any."""
+    # NOTE(kaifeng) It is possible a node gets orphaned in certain
+    # circumstances, return None in such case.
+    try:
+        return api.request.rpcapi.get_conductor_for(rpc_node)
+    except (exception.NoValidHost, exception.TemporaryFailure):
+        LOG.debug('Currently there is no conductor servicing '
+                  'node %(node)s.', {'node': rpc_node.uuid})
+        return None
+
+
+def _node_etag(rpc_node):
+    """Compute the entity tag of the API representation of a node.
+
+    Any update of a node changes its update time, so the tag is computed
+    from the columns in _ETAG_DB_FIELDS and the traits, which are stored
+    separately, instead of from the whole representation. It also depends on
+    the API and object versions and on the policies hiding secrets, but not
+    on the fields requested.
+
+    :param rpc_node: a node object with at least the _ETAG_DB_FIELDS fields.
+    :returns: The entity tag, without quotes.
+    """
+    traits = rpc_node.traits.get_trait_names() if rpc_node.traits else []
+    return api_utils.make_etag(
+        str(api.request.version), rpc_node.VERSION,
+        api_utils.check_policy_bool('show_password'),
+        api_utils.check_policy_bool('show_instance_secrets'),
+        [rpc_node[field] for field in _ETAG_DB_FIELDS if field != 'traits'],
+        sorted(traits))
+
+
 class BootDeviceController(rest.RestController):
 
     _custom_actions = {
@@ -449,11 +508,20 @@ class NodeStatesController(rest.RestController):
         :param node_ident: the UUID or logical_name of a node.
         """
         rpc_node = api_utils.check_node_policy_and_retrieve(
-            'baremetal:node:get_states', node_ident)
+            'baremetal:node:get_states', node_ident,
+            fields=_STATES_DB_FIELDS)
 
         # NOTE(lucasagomes): All these state values come from the
         # DB. Ironic counts with a periodic task that verify the current
         # power states of the nodes and update the DB accordingly.
+        etag = api_utils.make_etag(
+            str(api.request.version),
+            [rpc_node[field] for field in _STATES_DB_FIELDS])
+        api.response.etag = etag
+        if etag in api.request.if_none_match:
+            return wsme.api.Response(None,
+                                     status_code=http_client.NOT_MODIFIED,
+                                     return_type=None)
         return NodeStates.convert(rpc_node)
 
     @METRICS.timer('NodeStatesController.raid')
@@ -650,28 +718,7 @@ class NodeStatesController(rest.RestController):
 
         api_utils.check_allow_management_verbs(target)
 
-        if (target in (ir_states.ACTIVE, ir_states.REBUILD)
-                and rpc_node.maintenance):
-            raise exception.NodeInMaintenance(op=_('provisioning'),
-                                              node=rpc_node.uuid)
-
-        m = ir_states.machine.copy()
-        m.initialize(rpc_node.provision_state)
-        if not m.is_actionable_event(ir_states.VERBS.get(target, target)):
-            # Normally, we let the task manager recognize and deal with
-            # NodeLocked exceptions. However, that isn't done until the RPC
-            # calls below.
-            # In order to main backward compatibility with our API HTTP
-            # response codes, we have this check here to deal with cases where
-            # a node is already being operated on (DEPLOYING or such) and we
-            # want to continue returning 409. Without it, we'd return 400.
-            if rpc_node.reservation:
-                raise exception.NodeLocked(node=rpc_node.uuid,
-                                           host=rpc_node.reservation)
-
-            raise exception.InvalidStateRequested(
-                action=target, node=rpc_node.uuid,
-                state=rpc_node.provision_state)
+        _check_provision_action(rpc_node, target)
 
         api_utils.check_allow_configdrive(target, configdrive)
 
@@ -701,6 +748,42 @@ class NodeStatesController(rest.RestController):
         api.response.location = link.build_url('nodes', url_args)
 
 
+def _check_provision_action(rpc_node, target):
+    """Check that a provision state target is possible for a node.
+
+    :param rpc_node: a node object.
+    :param target: The desired provision state of the node or verb.
+    :raises: NodeInMaintenance if the node is in maintenance and the target
+        needs it not to be.
+    :raises: NodeLocked if the target is not possible because the node is
+        being operated on.
+    :raises: InvalidStateRequested if the target is not possible from the
+        current provision state of the node.
+    """
+    if (target in (ir_states.ACTIVE, ir_states.REBUILD)
+            and rpc_node.maintenance):
+        raise exception.NodeInMaintenance(op=_('provisioning'),
+                                          node=rpc_node.uuid)
+
+    m = ir_states.machine.cursor()
+    m.initialize(rpc_node.provision_state)
+    if not m.is_actionable_event(ir_states.VERBS.get(target, target)):
+        # Normally, we let the task manager recognize and deal with
+        # NodeLocked exceptions. However, that isn't done until the RPC
+        # calls below.
+        # In order to main backward compatibility with our API HTTP
+        # response codes, we have this check here to deal with cases where
+        # a node is already being operated on (DEPLOYING or such) and we
+        # want to continue returning 409. Without it, we'd return 400.
+        if rpc_node.reservation:
+            raise exception.NodeLocked(node=rpc_node.uuid,
+                                       host=rpc_node.reservation)
+
+        raise exception.InvalidStateRequested(
+            action=target, node=rpc_node.uuid,
+            state=rpc_node.provision_state)
+
+
 def _check_clean_steps(clean_steps):
     """Ensure all necessary keys are present and correct in clean steps.
 
@@ -1157,25 +1240,33 @@ class Node(base.APIBase):
         return node
 
     @classmethod
-    def convert_with_links(cls, rpc_node, fields=None, sanitize=True):
+    def convert_with_links(cls, rpc_node, fields=None, sanitize=True,
+                           conductors=None, allocations=None):
+        """Convert a node object to its API representation.
+
+        :param rpc_node: a node object.
+        :param fields: the fields to include, or None for all fields.
+        :param sanitize: whether to sanitize the result.
+        :param conductors: a dictionary mapping node UUIDs to conductor
+            hostnames. If None, the conductor is looked up.
+        :param allocations: a dictionary mapping allocation IDs to allocation
+            UUIDs. If None, the allocation is looked up.
+        """
         node = Node(**rpc_node.as_dict())
 
         if (api_utils.allow_expose_conductors() and
                 (fields is None or 'conductor' in fields)):
-            # NOTE(kaifeng) It is possible a node gets orphaned in certain
-            # circumstances, set conductor to None in such case.
-            try:
-                host = api.request.rpcapi.get_conductor_for(rpc_node)
-                node.conductor = host
-            except (exception.NoValidHost, exception.TemporaryFailure):
-                LOG.debug('Currently there is no conductor servicing node '
-                          '%(node)s.', {'node': rpc_node.uuid})
-                node.conductor = None
+            if conductors is not None:
+                node.conductor = conductors.get(rpc_node.uuid)
+            else:
+                node.conductor = _get_conductor(rpc_node)
 
         if (api_utils.allow_allocations()
                 and (fields is None or 'allocation_uuid' in fields)):
             node.allocation_uuid = None
-            if rpc_node.allocation_id:
+            if rpc_node.allocation_id and allocations is not None:
+                node.allocation_uuid = allocations.get(rpc_node.allocation_id)
+            elif rpc_node.allocation_id:
                 try:
                     allocation = objects.Allocation.get_by_id(
                         api.request.context,
@@ -1214,14 +1305,13 @@ class Node(base.APIBase):
             list of fields to preserve, or ``None`` to preserve them all
         :type fields: list of str
         """
-        cdict = api.request.context.to_policy_values()
         # NOTE(deva): the 'show_password' policy setting name exists for legacy
         #             purposes and can not be changed. Changing it will cause
         #             upgrade problems for any operators who have customized
         #             the value of this field
-        show_driver_secrets = policy.check("show_password", cdict, cdict)
-        show_instance_secrets = policy.check("show_instance_secrets",
-                                             cdict, cdict)
+        show_driver_secrets = api_utils.check_policy_bool("show_password")
+        show_instance_secrets = api_utils.check_policy_bool(
+            "show_instance_secrets")
 
         if not show_driver_secrets and self.driver_info != wtypes.Unset:
             self.driver_info = strutils.mask_dict_password(
@@ -1245,7 +1335,8 @@ class Node(base.APIBase):
             if self.instance_info.get('image_url'):
                 self.instance_info['image_url'] = "******"
 
-        if self.driver_internal_info.get('agent_secret_token'):
+        if (self.driver_internal_info != wtypes.Unset
+                and self.driver_internal_info.get('agent_secret_token')):
             self.driver_internal_info['agent_secret_token'] = "******"
 
         update_state_in_older_versions(self)
@@ -1340,13 +1431,32 @@ class NodeCollection(collection.Collection):
         self._type = 'nodes'
 
     @staticmethod
-    def convert_with_links(nodes, limit, url=None, fields=None, **kwargs):
+    def convert_with_links(nodes, limit, url=None, fields=None,
+                           conductors=None, **kwargs):
+        # NOTE(yrobla): conductors and allocations are resolved for the whole
+        # page at once instead of with a query or a ring lookup per node.
+        if (conductors is None and api_utils.allow_expose_conductors()
+                and (fields is None or 'conductor' in fields)):
+            conductors = api.request.rpcapi.get_conductors_for(nodes)
+
+        allocations = None
+        if (api_utils.allow_allocations()
+                and (fields is None or 'allocation_uuid' in fields)):
+            allocations = objects.Allocation.get_uuids_by_ids(
+                api.request.context,
+                [n.allocation_id for n in nodes if n.allocation_id])
+
         collection = NodeCollection()
         collection.nodes = [Node.convert_with_links(n, fields=fields,
-                                                    sanitize=False)
+                                                    sanitize=False,
+                                                    conductors=conductors,
+                                                    allocations=allocations)
                             for n in nodes]
+        marker = None
+        if nodes:
+            marker = api_utils.make_marker(nodes[-1], kwargs.get('sort_key'))
         collection.next = collection.get_next(limit, url=url, fields=fields,
-                                              **kwargs)
+                                              marker=marker, **kwargs)
 
         for node in collection.nodes:
             node.sanitize(fields)
@@ -1527,6 +1637,204 @@ class NodeVIFController(rest.RestController):
                                       vif_id=vif_id, topic=topic)
 
 
+class NodeBulkResult(base.Base):
+    """API representation of the result of a bulk action on one node."""
+
+    node = str
+    """The UUID or logical name of the node, as given in the request"""
+
+    uuid = types.uuid
+    """The UUID of the node"""
+
+    code = int
+    """The HTTP status code of the action on this node"""
+
+    error = str
+    """The error message, if the action could not be started"""
+
+
+class NodeBulkResults(base.Base):
+    """API representation of the results of a bulk action."""
+
+    nodes = [NodeBulkResult]
+    """The results of the action on each node, in the requested order"""
+
+
+class NodeBulkController(rest.RestController):
+    """REST controller to change the states of several nodes at once."""
+
+    _custom_actions = {
+        'power': ['PUT'],
+        'provision': ['PUT'],
+    }
+
+    def _do_bulk_action(self, policy_name, node_idents, check, send):
+        """Start an action on several nodes.
+
+        The nodes are resolved with a fixed number of queries, and one RPC
+        call is made for each conductor serving some of them.
+
+        :param policy_name: Name of the policy to check for each node.
+        :param node_idents: a list of UUIDs or logical names of nodes.
+        :param check: a function called with each node object, raising an
+            IronicException if the action cannot be done on the node.
+        :param send: a function called with the request context, an RPC
+            topic and a list of the UUIDs of nodes mapped to it, starting the
+            action on them and returning the results as the conductor RPC
+            API does. It is called concurrently for several topics, outside
+            of the thread of the request.
+        :returns: a NodeBulkResults object.
+        """
+        if not api_utils.allow_bulk_states():
+            raise exception.NotFound()
+
+        if not node_idents:
+            raise exception.ClientSideError(_("No nodes specified."))
+        if len(node_idents) > CONF.api.max_limit:
+            raise exception.ClientSideError(
+                _("Too many nodes specified, the maximum is %d.") %
+                CONF.api.max_limit)
+
+        try:
+            nodes = api_utils.get_rpc_nodes(node_idents,
+                                            fields=_BULK_DB_FIELDS)
+        except exception.NodeNotFound:
+            # don't expose non-existence of nodes unless requester
+            # has generic access to policy
+            cdict = api.request.context.to_policy_values()
+            policy.authorize(policy_name, cdict, cdict)
+            raise
+
+        results = {}
+        valid_nodes = {}
+        for rpc_node in nodes.values():
+            try:
+                api_utils.check_owner_policy('node', policy_name,
+                                             rpc_node.owner)
+                check(rpc_node)
+            except exception.IronicException as e:
+                results[rpc_node.uuid] = {'code': e.code, 'message': str(e)}
+            else:
+                valid_nodes[rpc_node.uuid] = rpc_node
+
+        topics = api.request.rpcapi.get_topics_for(list(valid_nodes.values()))
+        uuids_by_topic = collections.defaultdict(list)
+        for uuid, topic in topics.items():
+            if topic is None:
+                e = exception.NoValidHost(
+                    reason=_('No conductor service is servicing the node.'))
+                results[uuid] = {'code': e.code, 'message': str(e)}
+            else:
+                uuids_by_topic[topic].append(uuid)
+
+        context = api.request.context
+        if len(uuids_by_topic) == 1:
+            [(topic, uuids)] = uuids_by_topic.items()
+            results.update(send(context, topic, uuids))
+        elif uuids_by_topic:
+            # NOTE(yrobla): the conductors do not depend on each other, call
+            # them concurrently instead of waiting for each in turn.
+            rpcapi = api.request.rpcapi
+            futures = [rpcapi.spawn(context, send, topic, uuids)
+                       for topic, uuids in uuids_by_topic.items()]
+            waiters.wait_for_all(futures)
+            for future in futures:
+                results.update(future.result())
+
+        bulk_results = []
+        for ident in node_idents:
+            uuid = nodes[ident].uuid
+            result = NodeBulkResult(node=ident, uuid=uuid,
+                                    code=http_client.ACCEPTED)
+            if results[uuid] is not None:
+                result.code = results[uuid]['code']
+                result.error = results[uuid]['message']
+            bulk_results.append(result)
+        return NodeBulkResults(nodes=bulk_results)
+
+    @METRICS.timer('NodeBulkController.power')
+    @expose.expose(NodeBulkResults, [types.uuid_or_name], str,
+                   wtypes.IntegerType(minimum=1),
+                   status_code=http_client.ACCEPTED)
+    def power(self, nodes, target, timeout=None):
+        """Set the power state of several nodes.
+
+        :param nodes: a list of UUIDs or logical names of nodes.
+        :param target: The desired power state of the nodes.
+        :param timeout: timeout (in seconds) positive integer (> 0) for any
+          power state. ``None`` indicates to use default timeout.
+        :raises: InvalidStateRequested (HTTP 400) if the requested target
+                 state is not valid.
+        :raises: Invalid (HTTP 400) if timeout value is less than 1.
+        :raises: NodeNotFound (HTTP 404) if any of the nodes is not found.
+        :returns: the result for each node. Its ``code`` is 202 if the
+            power action was started; otherwise it is the HTTP status code
+            of the error, and ``error`` describes it.
+        """
+        # FIXME(naohirot): This check is workaround because
+        #                  wtypes.IntegerType(minimum=1) is not effective
+        if timeout is not None and timeout < 1:
+            raise exception.Invalid(
+                _("timeout has to be positive integer"))
+
+        if target not in ALLOWED_TARGET_POWER_STATES:
+            raise exception.InvalidStateRequested(
+                message=_('The requested power state "%s" is not '
+                          'valid.') % target)
+
+        def check(rpc_node):
+            # Don't change power state for nodes being cleaned
+            if rpc_node.provision_state in (ir_states.CLEANWAIT,
+                                            ir_states.CLEANING):
+                raise exception.InvalidStateRequested(
+                    action=target, node=rpc_node.uuid,
+                    state=rpc_node.provision_state)
+
+        rpcapi = api.request.rpcapi
+
+        def send(context, topic, uuids):
+            return rpcapi.change_nodes_power_state(
+                context, uuids, target, topic=topic, timeout=timeout)
+
+        return self._do_bulk_action('baremetal:node:set_power_state', nodes,
+                                    check, send)
+
+    @METRICS.timer('NodeBulkController.provision')
+    @expose.expose(NodeBulkResults, [types.uuid_or_name], str,
+                   status_code=http_client.ACCEPTED)
+    def provision(self, nodes, target):
+        """Asynchronous trigger the provisioning of several nodes.
+
+        Only the targets that need no other argument are supported, see
+        BULK_PROVISION_TARGETS.
+
+        :param nodes: a list of UUIDs or logical names of nodes.
+        :param target: The desired provision state of the nodes or verb.
+        :raises: InvalidStateRequested (HTTP 400) if the requested target
+                 is not supported.
+        :raises: NodeNotFound (HTTP 404) if any of the nodes is not found.
+        :returns: the result for each node. Its ``code`` is 202 if the
+            action was started; otherwise it is the HTTP status code of the
+            error, and ``error`` describes it.
+        """
+        if target not in BULK_PROVISION_TARGETS:
+            msg = (_('The requested action "%(action)s" is not supported '
+                     'for several nodes at once.') % {'action': target})
+            raise exception.InvalidStateRequested(message=msg)
+
+        def check(rpc_node):
+            _check_provision_action(rpc_node, target)
+
+        rpcapi = api.request.rpcapi
+
+        def send(context, topic, uuids):
+            return rpcapi.do_nodes_provisioning_action(
+                context, uuids, target, topic=topic)
+
+        return self._do_bulk_action('baremetal:node:set_provision_state',
+                                    nodes, check, send)
+
+
 class NodesController(rest.RestController):
     """REST controller for Nodes."""
 
@@ -1549,6 +1857,9 @@ class NodesController(rest.RestController):
     maintenance = NodeMaintenanceController()
     """Expose maintenance as a sub-element of nodes"""
 
+    bulk = NodeBulkController()
+    """Expose the state changes of several nodes at once"""
+
     from_chassis = False
     """A flag to indicate if the requests to this controller are coming
     from the top-level resource Chassis"""
@@ -1600,27 +1911,13 @@ class NodesController(rest.RestController):
         if subcontroller:
             return subcontroller(node_ident=ident), remainder[1:]
 
-    def _filter_by_conductor(self, nodes, conductor):
-        filtered_nodes = []
-        for n in nodes:
-            try:
-                host = api.request.rpcapi.get_conductor_for(n)
-                if host == conductor:
-                    filtered_nodes.append(n)
-            except (exception.NoValidHost, exception.TemporaryFailure):
-                # NOTE(kaifeng) Node gets orphaned in case some conductor
-                # offline or all conductors are offline.
-                pass
-
-        return filtered_nodes
-
     def _get_nodes_collection(self, chassis_uuid, instance_uuid, associated,
                               maintenance, retired, provision_state, marker,
                               limit, sort_key, sort_dir, driver=None,
                               resource_class=None, resource_url=None,
                               fields=None, fault=None, conductor_group=None,
                               detail=None, conductor=None, owner=None,
-                              description_contains=None):
+                              description_contains=None, traits=None):
         if self.from_chassis and not chassis_uuid:
             raise exception.MissingParameterValue(
                 _("Chassis id not specified."))
@@ -1633,13 +1930,11 @@ class NodesController(rest.RestController):
                 _("The sort_key value %(key)s is an invalid field for "
                   "sorting") % {'key': sort_key})
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Node.get_by_uuid(api.request.context,
-                                                  marker)
+        marker_obj = api_utils.get_marker_obj(objects.Node, marker, sort_key)
 
         # The query parameters for the 'next' URL
         parameters = {}
+        conductors = None
 
         if instance_uuid:
             # NOTE(rloo) if instance_uuid is specified, the other query
@@ -1670,14 +1965,29 @@ class NodesController(rest.RestController):
             for key, value in possible_filters.items():
                 if value is not None:
                     filters[key] = value
+            if traits is not None:
+                # NOTE(yrobla): trait names are case sensitive, so they are
+                # not parsed with types.listtype, which lower-cases values.
+                filters['traits'] = sorted(
+                    {t.strip() for t in traits.split(',') if t.strip()})
+
+            db_fields = api_utils.get_db_fields(fields,
+                                                _DB_FIELD_DEPENDENCIES)
+            if db_fields is not None:
+                # NOTE(yrobla): the sort key is needed for the next marker.
+                db_fields.add(sort_key)
+                if conductor:
+                    db_fields.update(_DB_FIELD_DEPENDENCIES['conductor'])
 
-            nodes = objects.Node.list(api.request.context, limit, marker_obj,
-                                      sort_key=sort_key, sort_dir=sort_dir,
-                                      filters=filters)
-
-            # Special filtering on results based on conductor field
             if conductor:
-                nodes = self._filter_by_conductor(nodes, conductor)
+                nodes, conductors = self._get_nodes_by_conductor(
+                    conductor, limit, marker_obj, sort_key, sort_dir,
+                    filters, db_fields)
+            else:
+                nodes = objects.Node.list(api.request.context, limit,
+                                          marker_obj, sort_key=sort_key,
+                                          sort_dir=sort_dir, filters=filters,
+                                          fields=db_fields)
 
             parameters = {'sort_key': sort_key, 'sort_dir': sort_dir}
             if associated:
@@ -1686,6 +1996,10 @@ class NodesController(rest.RestController):
                 parameters['maintenance'] = maintenance
             if retired:
                 parameters['retired'] = retired
+            if conductor:
+                parameters['conductor'] = conductor
+            if traits is not None:
+                parameters['traits'] = ','.join(filters['traits'])
 
         if detail is not None:
             parameters['detail'] = detail
@@ -1693,8 +2007,45 @@ class NodesController(rest.RestController):
         return NodeCollection.convert_with_links(nodes, limit,
                                                  url=resource_url,
                                                  fields=fields,
+                                                 conductors=conductors,
                                                  **parameters)
 
+    def _get_nodes_by_conductor(self, conductor, limit, marker_obj, sort_key,
+                                sort_dir, filters, fields):
+        """Retrieve a page of the nodes mapped to a conductor.
+
+        Only the nodes in the hash ring buckets of the conductor are
+        requested from the database. Since the buckets at the boundaries of
+        its partitions are shared with other conductors, the exact mapping of
+        each node is checked and more nodes are requested until the page is
+        full.
+
+        :returns: a tuple with the list of nodes and a dictionary mapping
+            their UUIDs to the conductor hostname.
+        """
+        hash_buckets = api.request.rpcapi.ring_manager.get_hash_buckets(
+            conductor)
+        if hash_buckets is not None:
+            filters = dict(filters, hash_buckets=hash_buckets)
+        nodes = []
+        while True:
+            page = objects.Node.list(api.request.context, limit, marker_obj,
+                                     sort_key=sort_key, sort_dir=sort_dir,
+                                     filters=filters, fields=fields)
+            if not page:
+                break
+            # NOTE(kaifeng) Node gets orphaned in case some conductor
+            # offline or all conductors are offline.
+            page_conductors = api.request.rpcapi.get_conductors_for(page)
+            nodes.extend(n for n in page
+                         if page_conductors[n.uuid] == conductor)
+            if len(nodes) >= limit or len(page) < limit:
+                break
+            marker_obj = page[-1]
+
+        nodes = nodes[:limit]
+        return nodes, {n.uuid: conductor for n in nodes}
+
     def _get_nodes_by_instance(self, instance_uuid):
         """Retrieve a node by its instance uuid.
 
@@ -1786,16 +2137,16 @@ class NodesController(rest.RestController):
 
     @METRICS.timer('NodesController.get_all')
     @expose.expose(NodeCollection, types.uuid, types.uuid, types.boolean,
-                   types.boolean, types.boolean, str, types.uuid, int, str,
+                   types.boolean, types.boolean, str, types.marker, int, str,
                    str, str, types.listtype, str,
                    str, str, types.boolean, str,
-                   str, str)
+                   str, str, str, stream=True)
     def get_all(self, chassis_uuid=None, instance_uuid=None, associated=None,
                 maintenance=None, retired=None, provision_state=None,
                 marker=None, limit=None, sort_key='id', sort_dir='asc',
                 driver=None, fields=None, resource_class=None, fault=None,
                 conductor_group=None, detail=None, conductor=None,
-                owner=None, description_contains=None):
+                owner=None, description_contains=None, traits=None):
         """Retrieve a list of nodes.
 
         :param chassis_uuid: Optional UUID of a chassis, to get only nodes for
@@ -1835,6 +2186,8 @@ class NodesController(rest.RestController):
         :param description_contains: Optional string value to get only nodes
                                      with description field contains matching
                                      value.
+        :param traits: Optional comma-separated list of traits to get only
+                       nodes having all of them.
         """
         owner = api_utils.check_list_policy('node', owner)
 
@@ -1848,11 +2201,13 @@ class NodesController(rest.RestController):
         api_utils.check_allow_filter_by_conductor_group(conductor_group)
         api_utils.check_allow_filter_by_conductor(conductor)
         api_utils.check_allow_filter_by_owner(owner)
+        api_utils.check_allow_filter_by_traits(traits)
 
         fields = api_utils.get_request_return_fields(fields, detail,
                                                      _DEFAULT_RETURN_FIELDS)
 
-        extra_args = {'description_contains': description_contains}
+        extra_args = {'description_contains': description_contains,
+                      'traits': traits}
         return self._get_nodes_collection(chassis_uuid, instance_uuid,
                                           associated, maintenance, retired,
                                           provision_state, marker,
@@ -1868,15 +2223,15 @@ class NodesController(rest.RestController):
 
     @METRICS.timer('NodesController.detail')
     @expose.expose(NodeCollection, types.uuid, types.uuid, types.boolean,
-                   types.boolean, types.boolean, str, types.uuid, int, str,
+                   types.boolean, types.boolean, str, types.marker, int, str,
                    str, str, str, str,
-                   str, str, str, str)
+                   str, str, str, str, str, stream=True)
     def detail(self, chassis_uuid=None, instance_uuid=None, associated=None,
                maintenance=None, retired=None, provision_state=None,
                marker=None, limit=None, sort_key='id', sort_dir='asc',
                driver=None, resource_class=None, fault=None,
                conductor_group=None, conductor=None, owner=None,
-               description_contains=None):
+               description_contains=None, traits=None):
         """Retrieve a list of nodes with detail.
 
         :param chassis_uuid: Optional UUID of a chassis, to get only nodes for
@@ -1912,6 +2267,8 @@ class NodesController(rest.RestController):
         :param description_contains: Optional string value to get only nodes
                                      with description field contains matching
                                      value.
+        :param traits: Optional comma-separated list of traits to get only
+                       nodes having all of them.
         """
         owner = api_utils.check_list_policy('node', owner)
 
@@ -1921,6 +2278,7 @@ class NodesController(rest.RestController):
         api_utils.check_allow_filter_by_fault(fault)
         api_utils.check_allow_filter_by_conductor_group(conductor_group)
         api_utils.check_allow_filter_by_owner(owner)
+        api_utils.check_allow_filter_by_traits(traits)
         api_utils.check_allowed_fields([sort_key])
         # /detail should only work against collections
         parent = api.request.path.split('/')[:-1][-1]
@@ -1930,7 +2288,8 @@ class NodesController(rest.RestController):
         api_utils.check_allow_filter_by_conductor(conductor)
 
         resource_url = '/'.join(['nodes', 'detail'])
-        extra_args = {'description_contains': description_contains}
+        extra_args = {'description_contains': description_contains,
+                      'traits': traits}
         return self._get_nodes_collection(chassis_uuid, instance_uuid,
                                           associated, maintenance, retired,
                                           provision_state, marker,
@@ -1981,12 +2340,25 @@ class NodesController(rest.RestController):
         if self.from_chassis:
             raise exception.OperationNotPermitted()
 
+        # NOTE(yrobla): only load the columns of the entity tag until it is
+        # known that the representation of the node has to be sent.
         rpc_node = api_utils.check_node_policy_and_retrieve(
-            'baremetal:node:get', node_ident, with_suffix=True)
+            'baremetal:node:get', node_ident, with_suffix=True,
+            fields=_ETAG_DB_FIELDS)
 
         api_utils.check_allow_specify_fields(fields)
         api_utils.check_allowed_fields(fields)
 
+        etag = _node_etag(rpc_node)
+        if etag in api.request.if_none_match:
+            api.response.etag = etag
+            return wsme.api.Response(None,
+                                     status_code=http_client.NOT_MODIFIED,
+                                     return_type=None)
+
+        rpc_node = objects.Node.get_by_uuid(api.request.context,
+                                            rpc_node.uuid)
+        api.response.etag = _node_etag(rpc_node)
         return Node.convert_with_links(rpc_node, fields=fields)
 
     @METRICS.timer('NodesController.post')
@@ -2114,6 +2486,14 @@ class NodesController(rest.RestController):
         rpc_node = api_utils.check_node_policy_and_retrieve(
             'baremetal:node:update', node_ident, with_suffix=True)
 
+        expected_digest = None
+        if 'If-Match' in api.request.headers:
+            if _node_etag(rpc_node) not in api.request.if_match:
+                raise exception.NodeModified(node=node_ident)
+            # NOTE(yrobla): the conductor checks again that the node has not
+            # been modified once it holds the node lock.
+            expected_digest = rpc_node.content_digest()
+
         remove_inst_uuid_patch = [{'op': 'remove', 'path': '/instance_uuid'}]
         if rpc_node.maintenance and patch == remove_inst_uuid_patch:
             LOG.debug('Removing instance uuid %(instance)s from node %(node)s',
@@ -2199,14 +2579,15 @@ class NodesController(rest.RestController):
                                        chassis_uuid=node.chassis_uuid)
         with notify.handle_error_notification(context, rpc_node, 'update',
                                               chassis_uuid=node.chassis_uuid):
-            new_node = api.request.rpcapi.update_node(context,
-                                                      rpc_node, topic,
-                                                      reset_interfaces)
+            new_node = api.request.rpcapi.update_node(
+                context, rpc_node, topic, reset_interfaces,
+                expected_digest=expected_digest)
 
         api_node = Node.convert_with_links(new_node)
         notify.emit_end_notification(context, new_node, 'update',
                                      chassis_uuid=api_node.chassis_uuid)
 
+        api.response.etag = _node_etag(new_node)
         return api_node
 
     @METRICS.timer('NodesController.delete')
@@ -43,6 +43,12 @@ LOG = log.getLogger(__name__)
 
 _DEFAULT_RETURN_FIELDS = ('uuid', 'address')
 
+# Port object fields needed to compute the API-only fields
+_DB_FIELD_DEPENDENCIES = {
+    'node_uuid': ('node_id',),
+    'portgroup_uuid': ('portgroup_id', 'node_id'),
+}
+
 
 def hide_fields_in_newer_versions(obj):
     # if requested version is < 1.18, hide internal_info field
@@ -306,8 +312,12 @@ class PortCollection(collection.Collection):
 
             collection.ports.append(port)
 
+        marker = None
+        if rpc_ports:
+            marker = api_utils.make_marker(rpc_ports[-1],
+                                           kwargs.get('sort_key'))
         collection.next = collection.get_next(limit, url=url, fields=fields,
-                                              **kwargs)
+                                              marker=marker, **kwargs)
 
         for item in collection.ports:
             item.sanitize(fields=fields)
@@ -345,22 +355,24 @@ class PortsController(rest.RestController):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Port.get_by_uuid(api.request.context,
-                                                  marker)
-
         if sort_key in self.invalid_sort_key_list:
             raise exception.InvalidParameterValue(
                 _("The sort_key value %(key)s is an invalid field for "
                   "sorting") % {'key': sort_key})
 
+        marker_obj = api_utils.get_marker_obj(objects.Port, marker, sort_key)
+
         node_ident = self.parent_node_ident or node_ident
         portgroup_ident = self.parent_portgroup_ident or portgroup_ident
 
         if node_ident and portgroup_ident:
             raise exception.OperationNotPermitted()
 
+        db_fields = api_utils.get_db_fields(fields, _DB_FIELD_DEPENDENCIES)
+        if db_fields is not None:
+            # NOTE(yrobla): the sort key is needed for the next marker.
+            db_fields.add(sort_key)
+
         if portgroup_ident:
             # FIXME: Since all we need is the portgroup ID, we can
             #                 make this more efficient by only querying
@@ -372,7 +384,8 @@ class PortsController(rest.RestController):
                                                       marker_obj,
                                                       sort_key=sort_key,
                                                       sort_dir=sort_dir,
-                                                      owner=owner)
+                                                      owner=owner,
+                                                      fields=db_fields)
         elif node_ident:
             # FIXME(comstud): Since all we need is the node ID, we can
             #                 make this more efficient by only querying
@@ -383,13 +396,15 @@ class PortsController(rest.RestController):
                                                  node.id, limit, marker_obj,
                                                  sort_key=sort_key,
                                                  sort_dir=sort_dir,
-                                                 owner=owner)
+                                                 owner=owner,
+                                                 fields=db_fields)
         elif address:
             ports = self._get_ports_by_address(address, owner=owner)
         else:
             ports = objects.Port.list(api.request.context, limit,
                                       marker_obj, sort_key=sort_key,
-                                      sort_dir=sort_dir, owner=owner)
+                                      sort_dir=sort_dir, owner=owner,
+                                      fields=db_fields)
         parameters = {}
 
         if detail is not None:
@@ -443,9 +458,9 @@ class PortsController(rest.RestController):
 
     @METRICS.timer('PortsController.get_all')
     @expose.expose(PortCollection, types.uuid_or_name, types.uuid,
-                   types.macaddress, types.uuid, int, str,
+                   types.macaddress, types.marker, int, str,
                    str, types.listtype, types.uuid_or_name,
-                   types.boolean)
+                   types.boolean, stream=True)
     def get_all(self, node=None, node_uuid=None, address=None, marker=None,
                 limit=None, sort_key='id', sort_dir='asc', fields=None,
                 portgroup=None, detail=None):
@@ -500,8 +515,8 @@ class PortsController(rest.RestController):
 
     @METRICS.timer('PortsController.detail')
     @expose.expose(PortCollection, types.uuid_or_name, types.uuid,
-                   types.macaddress, types.uuid, int, str,
-                   str, types.uuid_or_name)
+                   types.macaddress, types.marker, int, str,
+                   str, types.uuid_or_name, stream=True)
     def detail(self, node=None, node_uuid=None, address=None, marker=None,
                limit=None, sort_key='id', sort_dir='asc', portgroup=None):
         """Retrieve a list of ports with detail.
@@ -38,6 +38,11 @@ METRICS = metrics_utils.get_metrics_logger(__name__)
 
 _DEFAULT_RETURN_FIELDS = ('uuid', 'address', 'name')
 
+# Portgroup object fields needed to compute the API-only fields
+_DB_FIELD_DEPENDENCIES = {
+    'node_uuid': ('node_id',),
+}
+
 
 class Portgroup(base.APIBase):
     """API representation of a portgroup.
@@ -314,6 +319,7 @@ class PortgroupsController(pecan.rest.RestController):
                   "sorting") % {'key': sort_key})
 
         node_ident = self.parent_node_ident or node_ident
+        db_fields = api_utils.get_db_fields(fields, _DB_FIELD_DEPENDENCIES)
 
         if node_ident:
             # FIXME: Since all we need is the node ID, we can
@@ -323,13 +329,15 @@ class PortgroupsController(pecan.rest.RestController):
             node = api_utils.get_rpc_node(node_ident)
             portgroups = objects.Portgroup.list_by_node_id(
                 api.request.context, node.id, limit,
-                marker_obj, sort_key=sort_key, sort_dir=sort_dir)
+                marker_obj, sort_key=sort_key, sort_dir=sort_dir,
+                fields=db_fields)
         elif address:
             portgroups = self._get_portgroups_by_address(address)
         else:
             portgroups = objects.Portgroup.list(api.request.context, limit,
                                                 marker_obj, sort_key=sort_key,
-                                                sort_dir=sort_dir)
+                                                sort_dir=sort_dir,
+                                                fields=db_fields)
         parameters = {}
         if detail is not None:
             parameters['detail'] = detail
@@ -109,6 +109,27 @@ class UuidType(wtypes.UserType):
         return UuidType.validate(value)
 
 
+class MarkerType(wtypes.UserType):
+    """A pagination marker type: a UUID or a marker from a next link."""
+
+    basetype = str
+    name = 'marker'
+
+    @staticmethod
+    def validate(value):
+        if not v1_utils.is_valid_marker(value):
+            raise exception.InvalidParameterValue(
+                _("Expected a UUID or a marker from a next link but "
+                  "received %s.") % value)
+        return value
+
+    @staticmethod
+    def frombasetype(value):
+        if value is None:
+            return None
+        return MarkerType.validate(value)
+
+
 class BooleanType(wtypes.UserType):
     """A simple boolean type."""
 
@@ -187,6 +208,7 @@ macaddress = MacAddressType()
 uuid_or_name = UuidOrNameType()
 name = NameType()
 uuid = UuidType()
+marker = MarkerType()
 boolean = BooleanType()
 listtype = ListType()
 # Can't call it 'json' because that's the name of the stdlib module
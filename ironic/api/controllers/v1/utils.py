@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import binascii
+import hashlib
 from http import client as http_client
 import inspect
 import re
@@ -22,6 +25,7 @@ import jsonschema
 from jsonschema import exceptions as json_schema_exc
 import os_traits
 from oslo_config import cfg
+from oslo_serialization import jsonutils
 from oslo_utils import uuidutils
 from pecan import rest
 from webob import static
@@ -96,6 +100,104 @@ def validate_sort_dir(sort_dir):
     return sort_dir
 
 
+def make_marker(rpc_obj, sort_key):
+    """Build the marker for the page following an object.
+
+    Starting with API version 1.65, when the collection is sorted by one of
+    the fields of its objects, the marker holds the value of this field and
+    the UUID of the object, so that the next page can be requested without
+    looking up the marker object first. Otherwise the marker is the UUID of
+    the object.
+
+    :param rpc_obj: The last object of the page.
+    :param sort_key: The field the collection is sorted by.
+    :returns: The marker as a URL safe string.
+    """
+    if (not allow_keyset_marker() or not sort_key
+            or sort_key in ('id', 'uuid') or sort_key not in rpc_obj.fields):
+        return rpc_obj.uuid
+    value = rpc_obj.fields[sort_key].to_primitive(
+        rpc_obj, sort_key, getattr(rpc_obj, sort_key))
+    data = jsonutils.dump_as_bytes({'k': sort_key, 'v': value,
+                                    'u': rpc_obj.uuid})
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _parse_marker(marker):
+    """Decode a marker built by make_marker().
+
+    :returns: A tuple (sort key, value, UUID), or None if this is not such
+        a marker.
+    """
+    try:
+        padding = '=' * (-len(marker) % 4)
+        data = jsonutils.loads(base64.urlsafe_b64decode(marker + padding))
+        sort_key, value, uuid = data['k'], data['v'], data['u']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+    if (not isinstance(sort_key, str)
+            or not uuidutils.is_uuid_like(uuid)):
+        return None
+    return sort_key, value, uuid
+
+
+def is_valid_marker(marker):
+    """Check if a marker is a UUID or a marker built by make_marker()."""
+    if uuidutils.is_uuid_like(marker):
+        return True
+    return allow_keyset_marker() and _parse_marker(marker) is not None
+
+
+def get_marker_obj(obj_cls, marker, sort_key):
+    """Get the object to paginate a collection from.
+
+    :param obj_cls: The object class of the collection.
+    :param marker: The marker from the request: either the UUID of the last
+        object of the previous page, or a marker from a ``next`` link.
+    :param sort_key: The field the collection is sorted by.
+    :raises: InvalidParameterValue if the marker does not match the sort key.
+    :raises: a NotFound exception if there is no object with the given UUID.
+    :returns: An object with the UUID and the value of the sort key set, or
+        None if there is no marker.
+    """
+    if not marker:
+        return None
+
+    parsed = None if uuidutils.is_uuid_like(marker) else _parse_marker(marker)
+    if parsed is None:
+        return obj_cls.get_by_uuid(api.request.context, marker)
+
+    marker_sort_key, value, uuid = parsed
+    if marker_sort_key != sort_key:
+        raise exception.InvalidParameterValue(
+            _("The marker %(marker)s was not created for sort key "
+              "%(key)s") % {'marker': marker, 'key': sort_key})
+
+    # NOTE(yrobla): the ID of the marker object is not set, the database API
+    # finds it from the UUID in the pagination query.
+    marker_obj = obj_cls(api.request.context)
+    try:
+        if sort_key not in obj_cls.fields:
+            raise ValueError(sort_key)
+        setattr(marker_obj, sort_key, value)
+        marker_obj.uuid = uuid
+    except (ValueError, TypeError):
+        raise exception.InvalidParameterValue(
+            _("Invalid marker %s") % marker)
+    return marker_obj
+
+
+def make_etag(*parts):
+    """Build an entity tag from the values a representation depends on.
+
+    :param parts: values that change whenever the representation changes,
+        e.g. the representation itself or the API version.
+    :returns: The entity tag, without quotes.
+    """
+    return hashlib.sha256(
+        jsonutils.dump_as_bytes(parts, sort_keys=True)).hexdigest()
+
+
 def validate_trait(trait, error_prefix=_('Invalid trait')):
     error = exception.ClientSideError(
         _('%(error_prefix)s. A valid trait must be no longer than 255 '
@@ -195,10 +297,10 @@ def allow_node_logical_names():
     return api.request.version.minor >= versions.MINOR_5_NODE_NAME
 
 
-def _get_with_suffix(get_func, ident, exc_class):
+def _get_with_suffix(get_func, ident, exc_class, **kwargs):
     """Helper to get a resource taking into account API .json suffix."""
     try:
-        return get_func(ident)
+        return get_func(ident, **kwargs)
     except exc_class:
         if not api.request.environ['HAS_JSON_SUFFIX']:
             raise
@@ -206,13 +308,14 @@ def _get_with_suffix(get_func, ident, exc_class):
         # NOTE(dtantsur): strip .json prefix to maintain compatibility
         # with the guess_content_type_from_ext feature. Try to return it
         # back if the resulting resource was not found.
-        return get_func(ident + '.json')
+        return get_func(ident + '.json', **kwargs)
 
 
-def get_rpc_node(node_ident):
+def get_rpc_node(node_ident, fields=None):
     """Get the RPC node from the node uuid or logical name.
 
     :param node_ident: the UUID or logical name of a node.
+    :param fields: names of the fields to load, or None to load all fields.
 
     :returns: The RPC Node.
     :raises: InvalidUuidOrName if the name or uuid provided is not valid.
@@ -221,31 +324,62 @@ def get_rpc_node(node_ident):
     # Check to see if the node_ident is a valid UUID.  If it is, treat it
     # as a UUID.
     if uuidutils.is_uuid_like(node_ident):
-        return objects.Node.get_by_uuid(api.request.context, node_ident)
+        return objects.Node.get_by_uuid(api.request.context, node_ident,
+                                        fields=fields)
 
     # We can refer to nodes by their name, if the client supports it
     if allow_node_logical_names():
         if is_valid_logical_name(node_ident):
-            return objects.Node.get_by_name(api.request.context, node_ident)
+            return objects.Node.get_by_name(api.request.context, node_ident,
+                                            fields=fields)
         raise exception.InvalidUuidOrName(name=node_ident)
 
     # Ensure we raise the same exception as we did for the Juno release
     raise exception.NodeNotFound(node=node_ident)
 
 
-def get_rpc_node_with_suffix(node_ident):
+def get_rpc_node_with_suffix(node_ident, fields=None):
     """Get the RPC node from the node uuid or logical name.
 
     If HAS_JSON_SUFFIX flag is set in the pecan environment, try also looking
     for node_ident with '.json' suffix. Otherwise identical to get_rpc_node.
 
     :param node_ident: the UUID or logical name of a node.
+    :param fields: names of the fields to load, or None to load all fields.
 
     :returns: The RPC Node.
     :raises: InvalidUuidOrName if the name or uuid provided is not valid.
     :raises: NodeNotFound if the node is not found.
     """
-    return _get_with_suffix(get_rpc_node, node_ident, exception.NodeNotFound)
+    return _get_with_suffix(get_rpc_node, node_ident, exception.NodeNotFound,
+                            fields=fields)
+
+
+def get_rpc_nodes(node_idents, fields=None):
+    """Get the RPC nodes from a list of node UUIDs or logical names.
+
+    The identifiers are resolved with one query, the nodes are loaded with
+    another one.
+
+    :param node_idents: a list of UUIDs or logical names of nodes.
+    :param fields: names of the fields to load, or None to load all fields.
+
+    :returns: A dictionary mapping each identifier to its RPC Node.
+    :raises: NodeNotFound if any of the nodes is not found.
+    """
+    mapping = api.request.dbapi.check_node_list(node_idents)
+    if fields is not None:
+        fields = set(fields) | {'uuid'}
+    filters = {'uuid_in': sorted(set(mapping.values()))}
+    nodes = objects.Node.list(api.request.context, filters=filters,
+                              fields=fields)
+    nodes = {node.uuid: node for node in nodes}
+    missing = [ident for ident, uuid in mapping.items() if uuid not in nodes]
+    if missing:
+        # NOTE(yrobla): deleted after the identifiers were resolved.
+        raise exception.NodeNotFound(
+            _("Nodes cannot be found: %s") % ', '.join(sorted(missing)))
+    return {ident: nodes[uuid] for ident, uuid in mapping.items()}
 
 
 def get_rpc_portgroup(portgroup_ident):
@@ -717,6 +851,20 @@ def check_allow_filter_by_owner(owner):
              'opr': versions.MINOR_50_NODE_OWNER})
 
 
+def check_allow_filter_by_traits(traits):
+    """Check if filtering nodes by traits is allowed.
+
+    Version 1.64 of the API allows filtering nodes by traits.
+    """
+    if (traits is not None and api.request.version.minor
+            < versions.MINOR_64_TRAITS_FILTER):
+        raise exception.NotAcceptable(_(
+            "Request not acceptable. The minimal required API version "
+            "should be %(base)s.%(opr)s") %
+            {'base': versions.BASE_VERSION,
+             'opr': versions.MINOR_64_TRAITS_FILTER})
+
+
 def initial_node_provision_state():
     """Return node state to use by default when creating new nodes.
 
@@ -1100,6 +1248,26 @@ def get_request_return_fields(fields, detail, default_fields):
     return fields
 
 
+def get_db_fields(fields, dependencies=None):
+    """Calculate the object fields to load from the database for a request.
+
+    :param fields: The fields to return, as calculated by
+        get_request_return_fields(), or None for all fields.
+    :param dependencies: A dictionary mapping API fields to the object
+        fields they are computed from.
+    :returns: a set of object fields, or None if all fields are needed.
+    """
+    if fields is None:
+        return None
+
+    # NOTE(yrobla): the uuid is always needed to build links and markers.
+    db_fields = {'uuid'}
+    for field in fields:
+        db_fields.add(field)
+        db_fields.update((dependencies or {}).get(field, ()))
+    return db_fields
+
+
 def allow_expose_conductors():
     """Check if accessing conductor endpoints is allowed.
 
@@ -1157,6 +1325,23 @@ def allow_deploy_templates():
     return api.request.version.minor >= versions.MINOR_55_DEPLOY_TEMPLATES
 
 
+def _authorize(policy_name, cdict, target=None):
+    """Authorize a policy, memoizing the decision for the request.
+
+    :param policy_name: Name of the policy to check.
+    :param cdict: the credentials of the request.
+    :param target: a dictionary of values added to the credentials to build
+        the target, or None to use the credentials as the target.
+    :raises: HTTPForbidden if the policy forbids access.
+    """
+    cache = getattr(api.request, 'policy_cache', None)
+    if cache is None:
+        target_dict = dict(cdict, **target) if target else cdict
+        policy.authorize(policy_name, target_dict, cdict)
+    else:
+        cache.authorize(policy_name, cdict, target)
+
+
 def check_policy(policy_name):
     """Check if the specified policy is authorised for this request.
 
@@ -1164,7 +1349,23 @@ def check_policy(policy_name):
     :raises: HTTPForbidden if the policy forbids access.
     """
     cdict = api.request.context.to_policy_values()
-    policy.authorize(policy_name, cdict, cdict)
+    _authorize(policy_name, cdict)
+
+
+def check_policy_bool(policy_name):
+    """Check if the specified policy is authorised for this request.
+
+    The decision is memoized for the request, so that it can be checked for
+    each object of a collection.
+
+    :policy_name: Name of the policy to check.
+    :returns: True if the policy allows access, False otherwise.
+    """
+    cdict = api.request.context.to_policy_values()
+    cache = getattr(api.request, 'policy_cache', None)
+    if cache is None:
+        return policy.check(policy_name, cdict, cdict)
+    return cache.check(policy_name, cdict)
 
 
 def check_owner_policy(object_type, policy_name, owner):
@@ -1177,34 +1378,34 @@ def check_owner_policy(object_type, policy_name, owner):
     :raises: HTTPForbidden if the policy forbids access.
     """
     cdict = api.request.context.to_policy_values()
-
-    target_dict = dict(cdict)
-    target_dict[object_type + '.owner'] = owner
-    policy.authorize(policy_name, target_dict, cdict)
+    _authorize(policy_name, cdict, {object_type + '.owner': owner})
 
 
 def check_node_policy_and_retrieve(policy_name, node_ident,
-                                   with_suffix=False):
+                                   with_suffix=False, fields=None):
     """Check if the specified policy authorizes this request on a node.
 
     :param: policy_name: Name of the policy to check.
     :param: node_ident: the UUID or logical name of a node.
     :param: with_suffix: whether the RPC node should include the suffix
+    :param: fields: names of the fields to load, or None to load all fields.
+        The ``owner`` field is always loaded.
 
     :raises: HTTPForbidden if the policy forbids access.
     :raises: NodeNotFound if the node is not found.
     :return: RPC node identified by node_ident
     """
     try:
+        if fields is not None:
+            fields = set(fields) | {'owner'}
         if with_suffix:
-            rpc_node = get_rpc_node_with_suffix(node_ident)
+            rpc_node = get_rpc_node_with_suffix(node_ident, fields=fields)
         else:
-            rpc_node = get_rpc_node(node_ident)
+            rpc_node = get_rpc_node(node_ident, fields=fields)
     except exception.NodeNotFound:
         # don't expose non-existence of node unless requester
         # has generic access to policy
-        cdict = api.request.context.to_policy_values()
-        policy.authorize(policy_name, cdict, cdict)
+        check_policy(policy_name)
         raise
 
     check_owner_policy('node', policy_name, rpc_node['owner'])
@@ -1227,8 +1428,7 @@ def check_allocation_policy_and_retrieve(policy_name, allocation_ident):
     except exception.AllocationNotFound:
         # don't expose non-existence unless requester
         # has generic access to policy
-        cdict = api.request.context.to_policy_values()
-        policy.authorize(policy_name, cdict, cdict)
+        check_policy(policy_name)
         raise
 
     check_owner_policy('allocation', policy_name, rpc_allocation['owner'])
@@ -1246,13 +1446,12 @@ def check_list_policy(object_type, owner=None):
     """
     cdict = api.request.context.to_policy_values()
     try:
-        policy.authorize('baremetal:%s:list_all' % object_type,
-                         cdict, cdict)
+        _authorize('baremetal:%s:list_all' % object_type, cdict)
     except exception.HTTPForbidden:
         project_owner = cdict.get('project_id')
         if (not project_owner or (owner and owner != project_owner)):
             raise
-        policy.authorize('baremetal:%s:list' % object_type, cdict, cdict)
+        _authorize('baremetal:%s:list' % object_type, cdict)
         return project_owner
     return owner
 
@@ -1275,13 +1474,11 @@ def check_port_policy_and_retrieve(policy_name, port_uuid):
     except exception.PortNotFound:
         # don't expose non-existence of port unless requester
         # has generic access to policy
-        policy.authorize(policy_name, cdict, cdict)
+        _authorize(policy_name, cdict)
         raise
 
     rpc_node = objects.Node.get_by_id(context, rpc_port.node_id)
-    target_dict = dict(cdict)
-    target_dict['node.owner'] = rpc_node['owner']
-    policy.authorize(policy_name, target_dict, cdict)
+    _authorize(policy_name, cdict, {'node.owner': rpc_node['owner']})
 
     return rpc_port, rpc_node
 
@@ -1294,12 +1491,12 @@ def check_port_list_policy():
     """
     cdict = api.request.context.to_policy_values()
     try:
-        policy.authorize('baremetal:port:list_all', cdict, cdict)
+        _authorize('baremetal:port:list_all', cdict)
     except exception.HTTPForbidden:
         owner = cdict.get('project_id')
         if not owner:
             raise
-        policy.authorize('baremetal:port:list', cdict, cdict)
+        _authorize('baremetal:port:list', cdict)
         return owner
 
 
@@ -1347,3 +1544,20 @@ def allow_allocation_owner():
 def allow_agent_token():
     """Check if agent token is available."""
     return api.request.version.minor >= versions.MINOR_62_AGENT_TOKEN
+
+
+def allow_bulk_states():
+    """Check if changing the states of several nodes at once is allowed.
+
+    Version 1.63 of the API added the /v1/nodes/bulk endpoints.
+    """
+    return api.request.version.minor >= versions.MINOR_63_BULK_STATES
+
+
+def allow_keyset_marker():
+    """Check if next links may contain markers holding sort key values.
+
+    Version 1.65 of the API added such markers to the next links of nodes,
+    ports and allocations sorted by another field than the ID.
+    """
+    return api.request.version.minor >= versions.MINOR_65_KEYSET_MARKER
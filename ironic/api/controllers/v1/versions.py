@@ -100,6 +100,9 @@ BASE_VERSION = 1
 # v1.60: Add owner to the allocation object.
 # v1.61: Add retired and retired_reason to the node object.
 # v1.62: Add agent_token support for agent communication.
+# v1.63: Add bulk power and provision state changes of nodes.
+# v1.64: Add traits filter to the node list.
+# v1.65: Add sort key values to the pagination markers of next links.
 
 MINOR_0_JUNO = 0
 MINOR_1_INITIAL_VERSION = 1
@@ -164,6 +167,9 @@ MINOR_59_CONFIGDRIVE_VENDOR_DATA = 59
 MINOR_60_ALLOCATION_OWNER = 60
 MINOR_61_NODE_RETIRED = 61
 MINOR_62_AGENT_TOKEN = 62
+MINOR_63_BULK_STATES = 63
+MINOR_64_TRAITS_FILTER = 64
+MINOR_65_KEYSET_MARKER = 65
 
 # When adding another version, update:
 # - MINOR_MAX_VERSION
@@ -171,7 +177,7 @@ MINOR_62_AGENT_TOKEN = 62
 #   explanation of what changed in the new version
 # - common/release_mappings.py, RELEASE_MAPPING['master']['api']
 
-MINOR_MAX_VERSION = MINOR_62_AGENT_TOKEN
+MINOR_MAX_VERSION = MINOR_65_KEYSET_MARKER
 
 # String representations of the minor and maximum versions
 _MIN_VERSION_STRING = '{}.{}'.format(BASE_VERSION, MINOR_1_INITIAL_VERSION)
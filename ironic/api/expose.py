@@ -14,11 +14,98 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import json
+
+import pecan
+from wsme.rest import json as wsme_json
+from wsme import types as wtypes
 import wsmeext.pecan as wsme_pecan
 
 
+# Approximate size of the chunks of a streamed response body.
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_json(datatype, value):
+    """Encode a value of a complex type to JSON, piece by piece.
+
+    The output is the same as the one of wsme, but attributes holding a list
+    of complex objects are encoded one object at a time.
+    """
+    yield '{'
+    first = True
+    for attrdef in wtypes.list_attributes(datatype):
+        attrvalue = getattr(value, attrdef.key)
+        if attrvalue is wtypes.Unset:
+            continue
+        if not first:
+            yield ', '
+        first = False
+        yield '%s: ' % json.dumps(attrdef.name)
+
+        attrtype = attrdef.datatype
+        if (attrvalue is not None
+                and isinstance(attrtype, wtypes.ArrayType)
+                and wtypes.iscomplex(attrtype.item_type)):
+            yield '['
+            for index, item in enumerate(attrvalue):
+                if index:
+                    yield ', '
+                yield json.dumps(wsme_json.tojson(attrtype.item_type, item))
+            yield ']'
+        else:
+            yield json.dumps(wsme_json.tojson(attrtype, attrvalue))
+    yield '}'
+
+
+def _stream_json(datatype, value):
+    """Encode a value of a complex type to chunks of a JSON document."""
+    chunk = []
+    size = 0
+    for piece in _iter_json(datatype, value):
+        chunk.append(piece)
+        size += len(piece)
+        if size >= _STREAM_CHUNK_SIZE:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk).encode('utf-8')
+
+
 def expose(*args, **kwargs):
-    """Ensure that only JSON, and not XML, is supported."""
+    """Ensure that only JSON, and not XML, is supported.
+
+    If ``stream`` is True, a successful result is encoded and sent to the
+    client in chunks instead of being rendered to a single string first,
+    which is useful for large collections.
+    """
+    stream = kwargs.pop('stream', False)
     if 'rest_content_types' not in kwargs:
         kwargs['rest_content_types'] = ('json',)
-    return wsme_pecan.wsexpose(*args, **kwargs)
+    decorate = wsme_pecan.wsexpose(*args, **kwargs)
+    if not stream:
+        return decorate
+
+    def decorate_stream(f):
+        callfunction = decorate(f)
+
+        @functools.wraps(callfunction)
+        def stream_callfunction(self, *args, **kwargs):
+            result = callfunction(self, *args, **kwargs)
+            # NOTE(yrobla): errors and empty results are rendered by wsme.
+            if (not isinstance(result, dict) or 'datatype' not in result
+                    or not wtypes.iscomplex(result['datatype'])):
+                return result
+
+            response = pecan.response
+            response.content_type = 'application/json'
+            response.app_iter = _stream_json(result['datatype'],
+                                             result['result'])
+            response.content_length = None
+            return response
+
+        return stream_callfunction
+
+    return decorate_stream
@@ -17,6 +17,7 @@
 from http import client as http_client
 import re
 
+from ironic_lib import metrics_utils
 from oslo_config import cfg
 from oslo_log import log
 from pecan import hooks
@@ -27,6 +28,7 @@ from ironic.conductor import rpcapi
 from ironic.db import api as dbapi
 
 LOG = log.getLogger(__name__)
+METRICS = metrics_utils.get_metrics_logger(__name__)
 
 CHECKED_DEPRECATED_POLICY_ARGS = False
 INBOUND_HEADER = 'X-Openstack-Request-Id'
@@ -101,7 +103,7 @@ class ContextHook(hooks.PecanHook):
             ctx.auth_token = None
 
         creds = ctx.to_policy_values()
-        is_admin = policy.check('is_admin', creds, creds)
+        is_admin = state.request.policy_cache.check('is_admin', creds)
         ctx.is_admin = is_admin
         policy_deprecation_check()
 
@@ -117,6 +119,20 @@ class ContextHook(hooks.PecanHook):
         state.response.headers['Openstack-Request-Id'] = request_id
 
 
+class PolicyHook(hooks.PecanHook):
+    """Attach a cache of policy decisions to the request."""
+
+    def before(self, state):
+        state.request.policy_cache = policy.PolicyCache()
+
+    def after(self, state):
+        # NOTE(yrobla): before() is not called for incorrect url paths.
+        policy_cache = getattr(state.request, 'policy_cache', None)
+        if policy_cache is not None:
+            METRICS.send_timer('PolicyHook.policy_time',
+                               policy_cache.elapsed * 1000)
+
+
 class RPCHook(hooks.PecanHook):
     """Attach the rpcapi object to the request so controllers can get to it."""
 
@@ -137,17 +153,19 @@ class NoExceptionTracebackHook(hooks.PecanHook):
     # catches and handles all the errors, so 'on_error' dedicated for unhandled
     # exceptions never fired.
     def after(self, state):
-        # Omit empty body. Some errors may not have body at this level yet.
-        if not state.response.body:
-            return
-
         # Do nothing if there is no error.
         # Status codes in the range 200 (OK) to 399 (400 = BAD_REQUEST) are not
         # an error.
+        # NOTE(yrobla): this is checked first since reading the body of a
+        # streamed response would consume it.
         if (http_client.OK <= state.response.status_int
                 < http_client.BAD_REQUEST):
             return
 
+        # Omit empty body. Some errors may not have body at this level yet.
+        if not state.response.body:
+            return
+
         json_body = state.response.json
         # Do not remove traceback when traceback config is set
         if cfg.CONF.debug_tracebacks_in_api:
@@ -30,6 +30,12 @@ LOG = log.getLogger(__name__)
 
 EM_SEMAPHORE = 'extension_manager'
 
+# NOTE(yrobla): mapping of (hardware type, interface names) tuples to the
+# dictionaries of validated interface instances, used to avoid resolving and
+# validating the interfaces every time a task is acquired. It is cleared every
+# time a driver factory is (re)loaded, i.e. when enabled interfaces change.
+_interfaces_cache = {}
+
 
 def build_driver_for_task(task):
     """Builds a composable driver for a given task.
@@ -49,29 +55,49 @@ def build_driver_for_task(task):
     """
     node = task.node
 
-    hw_type = get_hardware_type(node.driver)
-    check_and_update_node_interfaces(node, hw_type=hw_type)
+    impls = _interfaces_cache.get(_interfaces_cache_key(node))
+    if impls is None:
+        hw_type = get_hardware_type(node.driver)
+        check_and_update_node_interfaces(node, hw_type=hw_type)
+        impls = _get_interfaces_for_node(node, hw_type)
+        _interfaces_cache[_interfaces_cache_key(node)] = impls
 
     bare_driver = driver_base.BareDriver()
-    _attach_interfaces_to_driver(bare_driver, node, hw_type)
+    for iface, impl in impls.items():
+        setattr(bare_driver, iface, impl)
 
     return bare_driver
 
 
-def _attach_interfaces_to_driver(bare_driver, node, hw_type):
-    """Attach interface implementations to a bare driver object.
+def _interfaces_cache_key(node):
+    """Get the key of the interfaces cache for a node.
+
+    :param node: Node object
+    :returns: a tuple of the hardware type and interface names, or None if
+              some interfaces are not set on the node.
+    """
+    key = [node.driver]
+    for iface in _INTERFACE_LOADERS:
+        field_name = '%s_interface' % iface
+        if field_name not in node or getattr(node, field_name) is None:
+            return None
+        key.append(getattr(node, field_name))
+    return tuple(key)
+
+
+def _get_interfaces_for_node(node, hw_type):
+    """Get interface implementations for a node.
 
-    :param bare_driver: BareDriver instance to attach interfaces to
     :param node: Node object
     :param hw_type: hardware type instance
+    :returns: a dictionary mapping interface types to implementations.
     :raises: InterfaceNotFoundInEntrypoint if the entry point was not found.
     :raises: IncompatibleInterface if driver is a hardware type and
              the requested implementation is not compatible with it.
     """
-    for iface in _INTERFACE_LOADERS:
-        impl_name = getattr(node, '%s_interface' % iface)
-        impl = get_interface(hw_type, iface, impl_name)
-        setattr(bare_driver, iface, impl)
+    return {iface: get_interface(hw_type, iface,
+                                 getattr(node, '%s_interface' % iface))
+            for iface in _INTERFACE_LOADERS}
 
 
 def get_interface(hw_type, interface_type, interface_name):
@@ -390,6 +416,9 @@ class BaseDriverFactory(object):
         if cls._enabled_driver_list:
             cls._extension_manager.map(_warn_if_unsupported)
 
+        # The cached interfaces may be no longer enabled
+        _interfaces_cache.clear()
+
         LOG.info(cls._logging_template, cls._extension_manager.names())
 
     @property
@@ -57,6 +57,12 @@ class NotAcceptable(IronicException):
     code = http_client.NOT_ACCEPTABLE
 
 
+class NodeModified(IronicException):
+    _msg_fmt = _("Node %(node)s does not match any of the entity tags "
+                 "given in the If-Match header.")
+    code = http_client.PRECONDITION_FAILED
+
+
 class InvalidState(Conflict):
     _msg_fmt = _("Invalid resource state.")
 
@@ -450,6 +456,11 @@ class NodeNotLocked(Invalid):
     _msg_fmt = _("Node %(node)s found not to be locked on release")
 
 
+class NodeConstraintsNotMet(Conflict):
+    _msg_fmt = _("Node %(node)s does not meet the constraints "
+                 "%(constraints)s required for this operation.")
+
+
 class NoFreeConductorWorker(TemporaryFailure):
     _msg_fmt = _('Requested action cannot be performed due to lack of free '
                  'conductor workers.')
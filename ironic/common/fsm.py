@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import functools
 
 from automaton import exceptions as automaton_exceptions
@@ -47,12 +48,51 @@ def _translate_excp(func):
     return wrapper
 
 
+# Precomputed, read-only view of a single state of a frozen FSM.
+_StateInfo = collections.namedtuple(
+    '_StateInfo', ['stable', 'target', 'terminal', 'on_exit', 'jumps'])
+
+
 class FSM(machines.FiniteMachine):
     """An ironic state-machine class with some ironic specific additions."""
 
     def __init__(self):
         super(FSM, self).__init__()
         self._target_state = None
+        self._lookup = None
+
+    def freeze(self):
+        """Freeze the state machine definition.
+
+        Once frozen, no states or transitions can be added and a lookup table
+        mapping every state to its attributes and outgoing transitions is
+        precomputed, so that :class:`FSMCursor` instances can share it.
+        """
+        lookup = {}
+        for name, state in self._states.items():
+            jumps = {event: (jump.name, jump.on_enter)
+                     for event, jump in self._transitions[name].items()}
+            lookup[name] = _StateInfo(stable=state['stable'],
+                                      target=state['target'],
+                                      terminal=state['terminal'],
+                                      on_exit=state['on_exit'],
+                                      jumps=jumps)
+        self._lookup = lookup
+        super(FSM, self).freeze()
+
+    def cursor(self):
+        """Create a lightweight cursor tracking a position in this machine.
+
+        Unlike :meth:`copy`, no state or transition tables are copied; the
+        cursor only holds the current and target states. The machine is
+        frozen on first use, since cursors rely on its definition not
+        changing.
+
+        :returns: a new, uninitialized :class:`FSMCursor`
+        """
+        if self._lookup is None:
+            self.freeze()
+        return FSMCursor(self._lookup)
 
     # For now make these raise ironic state machine exceptions until
     # a later period where these should(?) be using the raised automaton
@@ -156,3 +196,118 @@ class FSM(machines.FiniteMachine):
             #             we want to use the specified state instead.
             self._validate_target_state(target_state)
             self._target_state = target_state
+
+
+class FSMCursor(object):
+    """A position in a frozen :class:`FSM`.
+
+    Provides the same interface as :class:`FSM` for driving a single node
+    through the state machine, but only stores the current and target
+    states. The transition table is shared with the machine the cursor was
+    created from.
+    """
+
+    __slots__ = ('_lookup', '_current', '_target_state')
+
+    def __init__(self, lookup):
+        self._lookup = lookup
+        self._current = None
+        self._target_state = None
+
+    @property
+    def current_state(self):
+        return self._current
+
+    @property
+    def target_state(self):
+        return self._target_state
+
+    def is_stable(self, state):
+        """Is the state stable?
+
+        :param state: the state of interest
+        :raises: InvalidState if the state is invalid
+        :returns: True if it is a stable state; False otherwise
+        """
+        try:
+            return self._lookup[state].stable
+        except KeyError:
+            raise excp.InvalidState(_("State '%s' does not exist") % state)
+
+    def is_actionable_event(self, event):
+        """Check whether the event is actionable in the current state."""
+        if self._current is None:
+            return False
+        return event in self._lookup[self._current].jumps
+
+    def _validate_target_state(self, target):
+        if target is None:
+            return
+        info = self._lookup.get(target)
+        if info is None:
+            raise excp.InvalidState(
+                _("Target state '%s' does not exist") % target)
+        if not info.stable:
+            raise excp.InvalidState(
+                _("Target state '%s' is not a 'stable' state") % target)
+
+    def initialize(self, start_state=None, target_state=None):
+        """Initialize the cursor.
+
+        :param start_state: the cursor is initialized to this state
+        :param target_state: if specified, the cursor is initialized to this
+                             target state. Otherwise use the default target
+                             state
+        :raises: InvalidState if either state is invalid
+        """
+        info = self._lookup.get(start_state)
+        if info is None:
+            raise excp.InvalidState(
+                _("Can not start from an undefined state '%s'") % start_state)
+        if info.terminal:
+            raise excp.InvalidState(
+                _("Can not start from a terminal state '%s'") % start_state)
+        self._validate_target_state(target_state)
+        self._current = start_state
+        self._target_state = target_state or info.target
+
+    def process_event(self, event, target_state=None):
+        """Process the event.
+
+        :param event: the event to be processed
+        :param target_state: if specified, the 'final' target state for the
+                             event. Otherwise, use the default target state
+        :raises: InvalidState if the event can not be processed
+        """
+        current = self._current
+        if current is None:
+            raise excp.InvalidState(
+                _("Can not process event '%s'; the state machine hasn't "
+                  "been initialized") % event)
+        info = self._lookup[current]
+        if info.terminal:
+            raise excp.InvalidState(
+                _("Can not transition from terminal state '%(state)s' on "
+                  "event '%(event)s'") % {'state': current, 'event': event})
+        try:
+            new_state, on_enter = info.jumps[event]
+        except KeyError:
+            raise excp.InvalidState(
+                _("Can not transition from state '%(state)s' on event "
+                  "'%(event)s' (no defined transition)")
+                % {'state': current, 'event': event})
+
+        if info.on_exit is not None:
+            info.on_exit(current, event)
+        if on_enter is not None:
+            on_enter(new_state, event)
+        self._current = new_state
+
+        if self._target_state == new_state:
+            self._target_state = None
+        new_target = self._lookup[new_state].target
+        if new_target is not None:
+            self._target_state = new_target
+        if target_state:
+            self._validate_target_state(target_state)
+            self._target_state = target_state
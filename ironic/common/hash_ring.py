@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import bisect
+import copy
+import hashlib
 import threading
 import time
 
@@ -27,9 +30,137 @@ from ironic.db import api as dbapi
 
 LOG = log.getLogger(__name__)
 
+# NOTE(yrobla): number of leading bits of the node UUID hash that are
+# persisted in the nodes.hash_bucket column. Changing it requires
+# recalculating the column for all existing nodes.
+HASH_BUCKET_BITS = 16
+
+
+def get_hash_bucket(node_uuid):
+    """Calculate the hash bucket of a node.
+
+    The bucket is the top HASH_BUCKET_BITS bits of the same MD5 hash that
+    the hash ring uses to place the node, so that a range of buckets can be
+    matched against the partitions of a ring.
+
+    :param node_uuid: the node UUID.
+    :returns: an integer between 0 and 2 ** HASH_BUCKET_BITS - 1.
+    """
+    digest = hashlib.md5(node_uuid.encode('utf-8')).hexdigest()
+    return int(digest[:HASH_BUCKET_BITS // 4], 16)
+
+
+_TOOZ_INTERNALS = None
+
+
+def _check_tooz_internals():
+    """Check the private attributes of tooz hash rings used here.
+
+    tooz does not expose the partition boundaries of a ring, so the hash
+    buckets of a host are calculated from the private ``_partitions`` and
+    ``_ring`` attributes, and rings are updated by copying them. A sample
+    ring is checked to map keys the way these calculations expect.
+
+    :returns: True if the attributes can be used, False otherwise.
+    """
+    global _TOOZ_INTERNALS
+
+    if _TOOZ_INTERNALS is None:
+        try:
+            ring = hashring.HashRing(['host1', 'host2'], partitions=4)
+            boundaries = ring._partitions
+            supported = (
+                isinstance(ring._ring, dict)
+                and boundaries == sorted(ring._ring)
+                and all(_get_host(ring, key) in ring.get_nodes(key)
+                        for key in (b'key%d' % i for i in range(16))))
+        except Exception:
+            supported = False
+        if not supported:
+            LOG.warning('The installed version of tooz is not compatible '
+                        'with hash ring database filtering, falling back '
+                        'to hash_ring_db_filtering=False')
+        _TOOZ_INTERNALS = supported
+    return _TOOZ_INTERNALS
+
+
+def _get_host(ring, key):
+    """Get the host a key is mapped to from the partitions of a ring."""
+    value = int(hashlib.md5(key).hexdigest(), 16)
+    index = bisect.bisect(ring._partitions, value)
+    if index == len(ring._partitions):
+        index = 0
+    return ring._ring[ring._partitions[index]]
+
+
+def _get_bucket_ranges(ring, host):
+    """Get the ranges of hash buckets that may be mapped to a host.
+
+    A bucket is included if at least one hash value inside of it is mapped
+    to the host, so the result is a superset of the host's nodes. Callers
+    still have to check the exact mapping of each node.
+
+    :param ring: a tooz HashRing.
+    :param host: the host name.
+    :returns: a sorted list of (first, last) inclusive bucket ranges.
+    """
+    # NOTE(yrobla): tooz does not expose the partition boundaries. A hash
+    # value is mapped to the first boundary greater than it, wrapping
+    # around to the first boundary.
+    boundaries = ring._partitions
+    shift = 128 - HASH_BUCKET_BITS
+    last_bucket = 2 ** HASH_BUCKET_BITS - 1
+
+    ranges = []
+    for index, boundary in enumerate(boundaries):
+        if ring._ring[boundary] != host:
+            continue
+        if index == 0:
+            ranges.append((boundaries[-1] >> shift, last_bucket))
+            start = 0
+        else:
+            start = boundaries[index - 1] >> shift
+        ranges.append((start, max(boundary - 1, 0) >> shift))
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _update_ring(ring, hosts, partitions):
+    """Create a hash ring for a new set of hosts from an existing ring.
+
+    Only the added and removed hosts are hashed, the partitions of the
+    other hosts are copied. The existing ring is not modified, since it may
+    be in use by other threads.
+
+    :param ring: a tooz HashRing.
+    :param hosts: the set of host names of the new ring.
+    :param partitions: the number of partitions of each host.
+    :returns: a tooz HashRing with the same partitions as a new ring for
+        the hosts.
+    """
+    if not _check_tooz_internals():
+        return hashring.HashRing(hosts, partitions=partitions)
+
+    new_ring = copy.copy(ring)
+    new_ring.nodes = dict(ring.nodes)
+    new_ring._ring = dict(ring._ring)
+    for host in set(ring.nodes) - hosts:
+        new_ring.remove_node(host)
+    new_ring.add_nodes(hosts - set(ring.nodes))
+    return new_ring
+
 
 class HashRingManager(object):
     _hash_rings = None
+    # NOTE(yrobla): fingerprint of the conductors the cached rings were built
+    # for, see dbapi.get_active_hardware_type_fingerprint.
+    _fingerprint = None
     _lock = threading.Lock()
 
     def __init__(self, use_groups=True, cache=True):
@@ -54,22 +185,63 @@ class HashRingManager(object):
 
         with self._lock:
             if self.__class__._hash_rings is None or self.updated_at < limit:
-                LOG.debug('Rebuilding cached hash rings')
-                rings = self._load_hash_rings()
-                self.__class__._hash_rings = rings
-                self.updated_at = time.time()
-                LOG.debug('Finished rebuilding hash rings, available drivers '
-                          'are %s', ', '.join(rings))
+                self._update_hash_rings()
             return self.__class__._hash_rings
 
-    def _load_hash_rings(self):
+    def _update_hash_rings(self):
+        """Update the cached hash rings if the conductors have changed.
+
+        Must be called with the lock held.
+        """
+        cls = self.__class__
+        fingerprint = self.dbapi.get_active_hardware_type_fingerprint()
+        # NOTE(yrobla): the number of partitions is part of the fingerprint,
+        # the rings are built from scratch when it changes.
+        fingerprint = (fingerprint, CONF.hash_partition_exponent)
+        if cls._hash_rings is not None and fingerprint == cls._fingerprint:
+            LOG.debug('Conductors have not changed, keeping cached hash '
+                      'rings')
+        else:
+            LOG.debug('Rebuilding cached hash rings')
+            previous = cls._hash_rings
+            if cls._fingerprint and cls._fingerprint[1] != fingerprint[1]:
+                previous = None
+            rings = self._load_hash_rings(previous)
+            cls._hash_rings = rings
+            cls._fingerprint = fingerprint
+            LOG.debug('Finished rebuilding hash rings, available drivers '
+                      'are %s', ', '.join(rings))
+        self.updated_at = time.time()
+
+    def _load_hash_rings(self, previous=None):
+        """Load the hash rings from the database.
+
+        :param previous: the current hash rings, if any. Rings whose hosts
+            have not changed are reused, the others are updated from them.
+        :returns: a dictionary mapping ring keys to tooz HashRings.
+        """
         rings = {}
         d2c = self.dbapi.get_active_hardware_type_dict(
             use_groups=self.use_groups)
+        partitions = 2 ** CONF.hash_partition_exponent
+        previous = previous or {}
+        # NOTE(yrobla): a ring only depends on its hosts, so the keys served
+        # by the same conductors, e.g. the hardware types of a conductor
+        # group, share one ring.
+        by_hosts = {frozenset(ring.nodes): ring
+                    for ring in previous.values()}
 
         for driver_name, hosts in d2c.items():
-            rings[driver_name] = hashring.HashRing(
-                hosts, partitions=2 ** CONF.hash_partition_exponent)
+            hosts = frozenset(hosts)
+            ring = by_hosts.get(hosts)
+            if ring is None:
+                if driver_name in previous:
+                    ring = _update_ring(previous[driver_name], hosts,
+                                        partitions)
+                else:
+                    ring = hashring.HashRing(hosts, partitions=partitions)
+                by_hosts[hosts] = ring
+            rings[driver_name] = ring
 
         return rings
 
@@ -78,6 +250,7 @@ class HashRingManager(object):
         with cls._lock:
             LOG.debug('Resetting cached hash rings')
             cls._hash_rings = None
+            cls._fingerprint = None
 
     def get_ring(self, driver_name, conductor_group):
         try:
@@ -90,9 +263,39 @@ class HashRingManager(object):
                       {'driver': driver_name,
                        'group': conductor_group or '<none>'})
 
-        self.__class__.reset()
+        if self.cache:
+            # NOTE(yrobla): the rings are only rebuilt if the conductors have
+            # changed since they were built.
+            with self._lock:
+                self._update_hash_rings()
         return self._get_ring(driver_name, conductor_group)
 
+    def get_hash_buckets(self, host):
+        """Get the hash buckets that may be mapped to a host.
+
+        :param host: the host name.
+        :returns: a dictionary mapping (conductor_group, driver) tuples to
+            lists of (first, last) inclusive hash bucket ranges. The conductor
+            group is None if the rings do not use groups. Rings the host is
+            not a member of are not included. None if the installed tooz
+            version does not allow calculating the buckets, in which case
+            the nodes cannot be filtered by their buckets.
+        """
+        if not _check_tooz_internals():
+            return None
+
+        result = {}
+        for key, ring in self.ring.items():
+            if host not in ring.nodes:
+                continue
+            if self.use_groups:
+                conductor_group, driver_name = key.split(':', 1)
+            else:
+                conductor_group, driver_name = None, key
+            result[(conductor_group, driver_name)] = _get_bucket_ranges(
+                ring, host)
+        return result
+
     def _get_ring(self, driver_name, conductor_group):
         # There are no conductors, temporary failure - 503 Service Unavailable
         if not self.ring:
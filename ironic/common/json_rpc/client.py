@@ -15,11 +15,19 @@
 This client is compatible with any JSON RPC 2.0 implementation, including ours.
 """
 
+import socket
+import threading
+
+from ironic_lib import metrics_utils
 from oslo_config import cfg
 from oslo_log import log
+from oslo_serialization import msgpackutils
 from oslo_utils import importutils
 from oslo_utils import strutils
 from oslo_utils import uuidutils
+import requests
+from requests import adapters
+from urllib3 import connection as urllib3_connection
 
 from ironic.common import exception
 from ironic.common.i18n import _
@@ -29,26 +37,73 @@ from ironic.common import keystone
 
 CONF = cfg.CONF
 LOG = log.getLogger(__name__)
+METRICS = metrics_utils.get_metrics_logger(__name__)
 _SESSION = None
+_SESSION_LOCK = threading.Lock()
+_MSGPACK = 'application/msgpack'
+# Hosts which replied with MessagePack, and thus accept it in requests.
+_MSGPACK_HOSTS = set()
+# JSON RPC error code of requests which cannot be parsed.
+_PARSE_ERROR = -32700
+# JSON RPC error code of invalid requests, including batch requests sent to
+# servers not supporting them.
+_INVALID_REQUEST = -32600
 
 
 def _get_session():
     global _SESSION
 
-    if _SESSION is None:
-        if json_rpc.require_authentication():
-            auth = keystone.get_auth('json_rpc')
-        else:
-            auth = None
-
-        _SESSION = keystone.get_session('json_rpc', auth=auth)
-        _SESSION.headers = {
-            'Content-Type': 'application/json'
-        }
+    # NOTE(yrobla): calls may be sent concurrently from several threads,
+    # make sure they share one session and thus its connection pools.
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            if json_rpc.require_authentication():
+                auth = keystone.get_auth('json_rpc')
+            else:
+                auth = None
+
+            session = keystone.get_session('json_rpc', auth=auth,
+                                           session=_get_http_session())
+            session.headers = {
+                'Content-Type': 'application/json'
+            }
+            _SESSION = session
 
     return _SESSION
 
 
+class _PoolAdapter(adapters.HTTPAdapter):
+    """HTTP adapter enabling TCP keep-alive on the pooled connections."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = _socket_options()
+        super(_PoolAdapter, self).init_poolmanager(*args, **kwargs)
+
+
+def _socket_options():
+    options = list(urllib3_connection.HTTPConnection.default_socket_options)
+    if CONF.json_rpc.tcp_keepidle:
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        # NOTE(yrobla): TCP_KEEPIDLE is not available on all platforms, the
+        # system default is used there.
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE,
+                            CONF.json_rpc.tcp_keepidle))
+    return options
+
+
+def _get_http_session():
+    """Create an HTTP session with a connection pool for each conductor."""
+    adapter = _PoolAdapter(
+        pool_connections=CONF.json_rpc.connection_pool_max_hosts,
+        pool_maxsize=CONF.json_rpc.connection_pool_size,
+        pool_block=CONF.json_rpc.connection_pool_block)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 class Client(object):
     """JSON RPC client with ironic exception handling."""
 
@@ -122,6 +177,15 @@ class _CallContext(object):
         return self._request(context, method, cast=True, version=version,
                              **kwargs)
 
+    def batch(self):
+        """Start a batch of RPC calls and casts to the conductor.
+
+        :return: a batch object with ``call`` and ``cast`` methods accepting
+            the same arguments as the ones of this object. Its ``send``
+            method sends all of them in one request.
+        """
+        return _Batch(self)
+
     def _request(self, context, method, cast=False, version=None, **kwargs):
         """Call conductor RPC.
 
@@ -134,6 +198,23 @@ class _CallContext(object):
         :param kwargs: Keyword arguments to pass.
         :return: RPC result (if any).
         """
+        body = self._build_body(context, method, kwargs, cast=cast,
+                                version=version)
+        result = self._post(method, body)
+
+        if not cast:
+            return self._handle_result(context, _decode(result))
+
+    def _build_body(self, context, method, kwargs, cast=False, version=None):
+        """Build a JSON RPC request body.
+
+        :param context: Security context.
+        :param method: Method name.
+        :param kwargs: Keyword arguments to pass.
+        :param cast: If true, build a JSON RPC notification.
+        :param version: RPC API version to use.
+        :return: dict with request body.
+        """
         params = {key: self.serializer.serialize_entity(context, value)
                   for key, value in kwargs.items()}
         params['context'] = context.to_dict()
@@ -151,19 +232,205 @@ class _CallContext(object):
         }
         if not cast:
             body['id'] = context.request_id or uuidutils.generate_uuid()
+        return body
+
+    def _post(self, name, body):
+        """Send a JSON RPC request.
+
+        The request is encoded with MessagePack if it is enabled and the
+        conductor is known to support it, otherwise with JSON.
 
-        LOG.debug("RPC %s with %s", method, strutils.mask_dict_password(body))
+        :param name: RPC call name for logging and metrics.
+        :param body: request body, list of them for a batch request.
+        :return: ``requests.Response`` object.
+        """
+        # NOTE(yrobla): masking large payloads is expensive, only do it when
+        # the result is actually logged.
+        debug = LOG.isEnabledFor(log.DEBUG)
+        if debug:
+            LOG.debug("RPC %s with %s", name,
+                      strutils.mask_dict_password(body)
+                      if isinstance(body, dict)
+                      else [strutils.mask_dict_password(item)
+                            for item in body])
         url = 'http://%s:%d' % (self.host, CONF.json_rpc.port)
-        result = _get_session().post(url, json=body)
-        LOG.debug('RPC %s returned %s', method,
-                  strutils.mask_password(result.text or '<None>'))
+        json_kwargs = {'json': body}
+        if CONF.json_rpc.payload_encoding == 'msgpack':
+            # NOTE(yrobla): conductors of older releases only accept JSON,
+            # ask for a MessagePack response until the conductor proves it
+            # supports it.
+            json_kwargs['headers'] = {
+                'Accept': '%s, application/json' % _MSGPACK}
+        if (CONF.json_rpc.payload_encoding == 'msgpack'
+                and self.host in _MSGPACK_HOSTS):
+            result = _get_session().post(
+                url, data=msgpackutils.dumps(body),
+                headers={'Content-Type': _MSGPACK, 'Accept': _MSGPACK})
+            if _is_rejected(result):
+                # NOTE(yrobla): the conductor may have been replaced by one
+                # of an older release since it replied with MessagePack,
+                # forget about it and retry once with JSON.
+                LOG.warning('Conductor %s rejected a MessagePack request, '
+                            'retrying with JSON', self.host)
+                _MSGPACK_HOSTS.discard(self.host)
+                result = _get_session().post(url, **json_kwargs)
+        else:
+            result = _get_session().post(url, **json_kwargs)
+
+        msgpack = _is_msgpack(result)
+        if msgpack:
+            _MSGPACK_HOSTS.add(self.host)
+        METRICS.send_gauge('JsonRpcClient.%s.request_bytes' % name,
+                           len(result.request.body or b''))
+        METRICS.send_gauge('JsonRpcClient.%s.response_bytes' % name,
+                           len(result.content))
+        if debug:
+            text = (str(_decode(result)) if msgpack
+                    else result.text or '<None>')
+            LOG.debug('RPC %s returned %s', name,
+                      strutils.mask_password(text))
+        return result
+
+    def _handle_result(self, context, result):
+        """Deserialize the result of an RPC call.
+
+        :param context: Security context.
+        :param result: dict with response body.
+        :return: RPC result (if any).
+        """
+        self._handle_error(result.get('error'))
+        return self.serializer.deserialize_entity(context, result['result'])
+
+
+class _Batch(object):
+    """Batch of RPC calls and casts to one conductor sent in one request."""
+
+    def __init__(self, call_context):
+        self._call_context = call_context
+        self._requests = []
+
+    def __len__(self):
+        return len(self._requests)
+
+    def call(self, context, method, version=None, **kwargs):
+        """Add an RPC call to the batch.
+
+        :param context: Security context.
+        :param method: Method name.
+        :param version: RPC API version to use.
+        :param kwargs: Keyword arguments to pass.
+        """
+        self._add(context, method, kwargs, cast=False, version=version)
+
+    def cast(self, context, method, version=None, **kwargs):
+        """Add an asynchronous RPC call to the batch.
+
+        :param context: Security context.
+        :param method: Method name.
+        :param version: RPC API version to use.
+        :param kwargs: Keyword arguments to pass.
+        """
+        self._add(context, method, kwargs, cast=True, version=version)
 
+    def _add(self, context, method, kwargs, cast, version):
+        body = self._call_context._build_body(context, method, kwargs,
+                                              cast=cast, version=version)
         if not cast:
-            result = result.json()
-            self._handle_error(result.get('error'))
-            result = self.serializer.deserialize_entity(context,
-                                                        result['result'])
-            return result
+            # NOTE(yrobla): responses are matched to the calls by their IDs,
+            # which must be unique even for calls sharing a context.
+            body['id'] = uuidutils.generate_uuid()
+        self._requests.append((context, body))
+
+    def send(self):
+        """Send the batch.
+
+        Versioned objects are automatically serialized and deserialized.
+
+        :return: a list with the result of each call or cast of the batch
+            in the order they were added: the RPC result (None for casts)
+            or the IronicException raised by the call.
+        """
+        if not self._requests:
+            return []
+
+        response = self._call_context._post(
+            'batch', [body for _context, body in self._requests])
+        responses = _decode(response) or []
+        if isinstance(responses, dict):
+            error = responses.get('error') or {}
+            if error.get('code') != _INVALID_REQUEST:
+                self._call_context._handle_error(
+                    error or {'message': 'Invalid batch response'})
+            # NOTE(yrobla): conductors of older releases reject batch
+            # requests, fall back to one request for each call and cast.
+            LOG.debug('Conductor %(host)s does not support batch requests, '
+                      'sending the %(count)d requests separately',
+                      {'host': self._call_context.host,
+                       'count': len(self._requests)})
+            return [self._send_one(context, body)
+                    for context, body in self._requests]
+
+        by_id = {item.get('id'): item for item in responses}
+        results = []
+        for context, body in self._requests:
+            if 'id' not in body:
+                results.append(None)
+                continue
+            try:
+                try:
+                    result = by_id[body['id']]
+                except KeyError:
+                    raise exception.IronicException(
+                        _("No response to RPC %s in the batch response") %
+                        body['method'])
+                results.append(
+                    self._call_context._handle_result(context, result))
+            except exception.IronicException as exc:
+                results.append(exc)
+        return results
+
+    def _send_one(self, context, body):
+        response = self._call_context._post(body['method'], body)
+        if 'id' in body:
+            try:
+                return self._call_context._handle_result(context,
+                                                         _decode(response))
+            except exception.IronicException as exc:
+                return exc
+
+
+def _is_msgpack(response):
+    content_type = response.headers.get('Content-Type', '')
+    return content_type.split(';')[0].strip() == _MSGPACK
+
+
+def _is_rejected(response):
+    """Check if the conductor could not parse or rejected a whole request.
+
+    :param response: ``requests.Response`` object.
+    :return: True if the response is a parse error or an invalid request
+        error.
+    """
+    try:
+        body = _decode(response)
+    except ValueError:
+        return False
+    return (isinstance(body, dict)
+            and (body.get('error') or {}).get('code') in (_PARSE_ERROR,
+                                                          _INVALID_REQUEST))
+
+
+def _decode(response):
+    """Decode the body of a response.
+
+    :param response: ``requests.Response`` object.
+    :return: the decoded body or None if it is empty.
+    """
+    if not response.content:
+        return None
+    if _is_msgpack(response):
+        return msgpackutils.loads(response.content)
+    return response.json()
 
 
 def _can_send_version(requested, version_cap):
@@ -14,18 +14,21 @@
 
 This module implementa a subset of JSON RPC 2.0 as defined in
 https://www.jsonrpc.org/specification. Main differences:
-* No support for batched requests.
 * No support for positional arguments passing.
 * No JSON RPC 1.0 fallback.
+* Requests and responses can also be encoded with MessagePack, using the
+  ``application/msgpack`` content type.
 """
 
 import json
 
+import eventlet
 from keystonemiddleware import auth_token
 from oslo_config import cfg
 from oslo_log import log
 import oslo_messaging
 from oslo_service import service
+from oslo_serialization import msgpackutils
 from oslo_service import wsgi
 from oslo_utils import strutils
 import webob
@@ -39,6 +42,7 @@ from ironic.common import json_rpc
 CONF = cfg.CONF
 LOG = log.getLogger(__name__)
 _BLACK_LIST = {'init_host', 'del_host', 'target', 'iter_nodes'}
+_MSGPACK = 'application/msgpack'
 
 
 def _build_method_map(manager):
@@ -59,6 +63,17 @@ def _build_method_map(manager):
     return result
 
 
+def _accepts_msgpack(request):
+    """Whether the response to a request can be encoded with MessagePack.
+
+    :param request: ``webob.Request`` object.
+    :return: True if the request is encoded with MessagePack or accepts
+        responses encoded with it.
+    """
+    return (request.content_type == _MSGPACK
+            or _MSGPACK in request.headers.get('Accept', ''))
+
+
 class JsonRpcError(exception.IronicException):
     pass
 
@@ -90,6 +105,7 @@ class WSGIService(service.Service):
         self.manager = manager
         self.serializer = serializer
         self._method_map = _build_method_map(manager)
+        self._batch_pool = eventlet.GreenPool(CONF.json_rpc.batch_pool_size)
         if json_rpc.require_authentication():
             conf = dict(CONF.keystone_authtoken)
             app = auth_token.AuthProtocol(self._application, conf)
@@ -119,7 +135,10 @@ class WSGIService(service.Service):
                     environment, start_response)
 
         result = self._call(request)
-        if result is not None:
+        if result is not None and _accepts_msgpack(request):
+            response = webob.Response(content_type=_MSGPACK,
+                                      body=msgpackutils.dumps(result))
+        elif result is not None:
             response = webob.Response(content_type='application/json',
                                       charset='UTF-8',
                                       json_body=result)
@@ -163,19 +182,53 @@ class WSGIService(service.Service):
         """Process a JSON RPC request.
 
         :param request: ``webob.Request`` object.
-        :return: dict with response body.
+        :return: dict with response body, list of them for a batch request
+            or None if no response is expected.
         """
-        request_id = None
         try:
-            try:
+            if request.content_type == _MSGPACK:
+                body = msgpackutils.loads(request.body)
+            else:
                 body = json.loads(request.text)
-            except ValueError:
-                LOG.error('Cannot parse JSON RPC request as JSON')
-                raise ParseError()
+        except ValueError:
+            LOG.error('Cannot parse JSON RPC request as %s',
+                      request.content_type or 'JSON')
+            return self._handle_error(ParseError())
+
+        if isinstance(body, list):
+            return self._call_batch(body)
+        else:
+            return self._call_one(body)
+
+    def _call_batch(self, body):
+        """Process a JSON RPC batch request.
 
+        The requests of the batch are processed concurrently.
+
+        :param body: list of requests.
+        :return: list with response bodies or None if no response is expected.
+        """
+        if not body:
+            LOG.error('JSON RPC batch request is empty')
+            return self._handle_error(InvalidRequest())
+
+        pile = eventlet.GreenPile(self._batch_pool)
+        for item in body:
+            pile.spawn(self._call_one, item)
+        # Notifications have no response, and a batch of notifications only
+        # has no response at all.
+        return [result for result in pile if result is not None] or None
+
+    def _call_one(self, body):
+        """Process a single JSON RPC request.
+
+        :param body: request body.
+        :return: dict with response body or None if no response is expected.
+        """
+        request_id = None
+        try:
             if not isinstance(body, dict):
-                LOG.error('JSON RPC request %s is not an object (batched '
-                          'requests are not supported)', body)
+                LOG.error('JSON RPC request %s is not an object', body)
                 raise InvalidRequest()
 
             request_id = body.get('id')
@@ -223,7 +276,11 @@ class WSGIService(service.Service):
         """
         # TODO(dtantsur): server-side version check?
         params.pop('rpc.version', None)
-        logged_params = strutils.mask_dict_password(params)
+        # NOTE(yrobla): masking large payloads is expensive, only do it when
+        # the result is actually logged.
+        debug = LOG.isEnabledFor(log.DEBUG)
+        if debug:
+            logged_params = strutils.mask_dict_password(params)
 
         try:
             context = params.pop('context')
@@ -240,7 +297,8 @@ class WSGIService(service.Service):
                       for key, value in params.items()}
             params['context'] = context
 
-        LOG.debug('RPC %s with %s', name, logged_params)
+        if debug:
+            LOG.debug('RPC %s with %s', name, logged_params)
         try:
             result = func(**params)
         # FIXME(dtantsur): we could use the inspect module, but
@@ -253,9 +311,10 @@ class WSGIService(service.Service):
             # Currently it seems that we can serialize even with invalid
             # context, but I'm not sure it's guaranteed to be the case.
             result = self.serializer.serialize_entity(context, result)
-        LOG.debug('RPC %s returned %s', name,
-                  strutils.mask_dict_password(result)
-                  if isinstance(result, dict) else result)
+        if debug:
+            LOG.debug('RPC %s returned %s', name,
+                      strutils.mask_dict_password(result)
+                      if isinstance(result, dict) else result)
         return result
 
     def start(self):
@@ -17,6 +17,7 @@
 
 import itertools
 import sys
+import time
 
 from oslo_concurrency import lockutils
 from oslo_config import cfg
@@ -623,3 +624,62 @@ def check(rule, target, creds, *args, **kwargs):
     """
     enforcer = get_enforcer()
     return enforcer.enforce(rule, target, creds, *args, **kwargs)
+
+
+class PolicyCache(object):
+    """Memoizes the policy decisions taken for one API request.
+
+    The credentials do not change during a request, so a decision only
+    depends on the rule and on the values added to the credentials to build
+    the target, e.g. the owner of a node. List endpoints then evaluate a
+    rule once per distinct owner instead of once per object.
+    """
+
+    def __init__(self):
+        self._results = {}
+        self.elapsed = 0.0
+        """Time spent evaluating policies, in seconds."""
+
+    def _get(self, do_raise, rule, creds, target):
+        target = target or {}
+        key = (do_raise, rule, tuple(sorted(target.items())))
+        try:
+            return self._results[key]
+        except KeyError:
+            pass
+
+        func = authorize if do_raise else check
+        start = time.monotonic()
+        try:
+            result = func(rule, dict(creds, **target) if target else creds,
+                          creds)
+        except exception.HTTPForbidden:
+            result = False
+        finally:
+            self.elapsed += time.monotonic() - start
+        self._results[key] = bool(result)
+        return self._results[key]
+
+    def authorize(self, rule, creds, target=None):
+        """Memoized version of authorize().
+
+        :param rule: the name of the rule.
+        :param creds: the credentials of the request.
+        :param target: a dictionary of values added to the credentials to
+            build the target, or None to use the credentials as the target.
+        :raises: HTTPForbidden if the rule forbids access.
+        """
+        if not self._get(True, rule, creds, target):
+            raise exception.HTTPForbidden(resource=rule)
+        return True
+
+    def check(self, rule, creds, target=None):
+        """Memoized version of check().
+
+        :param rule: the name of the rule.
+        :param creds: the credentials of the request.
+        :param target: a dictionary of values added to the credentials to
+            build the target, or None to use the credentials as the target.
+        :returns: True if the rule allows access, False otherwise.
+        """
+        return self._get(False, rule, creds, target)
@@ -531,3 +531,7 @@ machine.add_transition(ADOPTFAIL, ADOPTING, 'adopt')
 
 # A node that failed adoption can be moved back to manageable
 machine.add_transition(ADOPTFAIL, MANAGEABLE, 'manage')
+
+# NOTE(yrobla): The machine definition is complete; freeze it so tasks can
+# share its precomputed transition table through lightweight cursors.
+machine.freeze()
@@ -12,13 +12,14 @@
 
 """Functionality related to allocations."""
 
+import collections
 import random
+import time
 
 from ironic_lib import metrics_utils
 from oslo_config import cfg
 from oslo_log import log
 from oslo_utils import excutils
-import retrying
 
 from ironic.common import exception
 from ironic.common.i18n import _
@@ -31,6 +32,11 @@ CONF = cfg.CONF
 LOG = log.getLogger(__name__)
 METRICS = metrics_utils.get_metrics_logger(__name__)
 
+# An allocation waiting for a node, with the context of the request that
+# created it and the number of the next attempt to reserve a node for it.
+PendingAllocation = collections.namedtuple(
+    'PendingAllocation', ['context', 'allocation', 'attempt'])
+
 
 def do_allocate(context, allocation):
     """Process the allocation.
@@ -44,17 +50,52 @@ def do_allocate(context, allocation):
     :param context: an admin context
     :param allocation: an allocation object
     """
-    try:
-        nodes = _candidate_nodes(context, allocation)
-        _allocate_node(context, allocation, nodes)
-    except exception.AllocationFailed as exc:
-        LOG.error(str(exc))
-        _allocation_failed(allocation, exc)
-    except Exception as exc:
-        LOG.exception("Unexpected exception during processing of "
-                      "allocation %s", allocation.uuid)
-        reason = _("Unexpected exception during allocation: %s") % exc
-        _allocation_failed(allocation, reason)
+    do_allocate_batch(context, [allocation])
+
+
+@METRICS.timer('do_allocate_batch')
+def do_allocate_batch(context, allocations):
+    """Process several allocations at once.
+
+    This call runs in a separate thread on a conductor. The allocations are
+    retried until they get a node or run out of attempts, see
+    allocate_nodes().
+
+    This call does not raise exceptions since it's designed to work
+    asynchronously.
+
+    :param context: an admin context
+    :param allocations: a list of allocation objects
+    """
+    pending = [PendingAllocation(context, allocation, 1)
+               for allocation in allocations]
+    while pending:
+        pending = allocate_nodes(pending)
+        if pending:
+            time.sleep(CONF.conductor.node_locked_retry_interval)
+
+
+@METRICS.timer('allocate_nodes')
+def allocate_nodes(pending):
+    """Try once to reserve a node for each of the pending allocations.
+
+    The candidate nodes are loaded once for all allocations with the same
+    requirements, and each allocation reserves one of them with a
+    conditional update of the node instead of locking it. The allocations
+    that could not reserve any node because of concurrent updates are
+    returned to be retried with a fresh list of candidates, unless they
+    used all of the [conductor]node_locked_retry_attempts attempts.
+
+    This call does not raise exceptions since it's designed to work
+    asynchronously.
+
+    :param pending: a list of PendingAllocation tuples.
+    :returns: a list of PendingAllocation tuples to retry, with their
+        attempt number incremented.
+    """
+    attempts = max(1, CONF.conductor.node_locked_retry_attempts)
+    return [item._replace(attempt=item.attempt + 1)
+            for item in _allocate_nodes(pending, attempts)]
 
 
 def verify_node_for_deallocation(node, allocation):
@@ -101,8 +142,8 @@ def _traits_match(traits, node):
     return {t.trait for t in node.traits.objects}.issuperset(traits)
 
 
-def _candidate_nodes(context, allocation):
-    """Get a list of candidate nodes for the allocation."""
+def _candidate_filters(allocation):
+    """Get the node filters matching the allocation."""
     filters = {'resource_class': allocation.resource_class,
                'provision_state': states.AVAILABLE,
                'associated': False,
@@ -114,26 +155,14 @@ def _candidate_nodes(context, allocation):
         filters['uuid_in'] = allocation.candidate_nodes
     if allocation.owner:
         filters['owner'] = allocation.owner
+    if allocation.traits:
+        filters['traits'] = list(allocation.traits)
+    return filters
 
-    nodes = objects.Node.list(context, filters=filters)
-
-    if not nodes:
-        if allocation.candidate_nodes:
-            error = _("none of the requested nodes are available and match "
-                      "the resource class %s") % allocation.resource_class
-        else:
-            error = _("no available nodes match the resource class %s") % (
-                allocation.resource_class)
-        raise exception.AllocationFailed(uuid=allocation.uuid, error=error)
 
-    # TODO(dtantsur): database-level filtering?
-    if allocation.traits:
-        traits = set(allocation.traits)
-        nodes = [n for n in nodes if _traits_match(traits, n)]
-        if not nodes:
-            error = (_("no suitable nodes have the requested traits %s") %
-                     ', '.join(traits))
-            raise exception.AllocationFailed(uuid=allocation.uuid, error=error)
+def _candidate_nodes(context, allocation):
+    """Get a list of candidate nodes for the allocation."""
+    nodes = objects.Node.list(context, filters=_candidate_filters(allocation))
 
     # NOTE(dtantsur): make sure that parallel allocations do not try the nodes
     # in the same order.
@@ -144,99 +173,108 @@ def _candidate_nodes(context, allocation):
     return nodes
 
 
-def _verify_node(node, allocation):
-    """Check that the node still satisfiest the request."""
-    if node.maintenance:
-        LOG.debug('Node %s is now in maintenance, skipping',
-                  node.uuid)
-        return False
-
-    if node.instance_uuid:
-        LOG.debug('Node %(node)s is already associated with instance '
-                  '%(inst)s, skipping',
-                  {'node': node.uuid, 'inst': node.instance_uuid})
-        return False
-
-    if node.provision_state != states.AVAILABLE:
-        LOG.debug('Node %s is no longer available, skipping',
-                  node.uuid)
-        return False
-
-    if node.resource_class != allocation.resource_class:
-        LOG.debug('Resource class of node %(node)s no longer '
-                  'matches requested resource class %(rsc)s for '
-                  'allocation %(uuid)s, skipping',
-                  {'node': node.uuid,
-                   'rsc': allocation.resource_class,
-                   'uuid': allocation.uuid})
-        return False
-
-    if allocation.traits and not _traits_match(set(allocation.traits), node):
-        LOG.debug('List of traits of node %(node)s no longer '
-                  'matches requested traits %(traits)s for '
-                  'allocation %(uuid)s, skipping',
-                  {'node': node.uuid,
-                   'traits': allocation.traits,
-                   'uuid': allocation.uuid})
-        return False
-
-    return True
-
-
-# NOTE(dtantsur): instead of trying to allocate each node
-# node_locked_retry_attempt times, we try to allocate *any* node the same
-# number of times. This avoids getting stuck on a node reserved e.g. for power
-# sync periodic task.
-@retrying.retry(
-    retry_on_exception=lambda e: isinstance(e, exception.AllocationFailed),
-    stop_max_attempt_number=CONF.conductor.node_locked_retry_attempts,
-    wait_fixed=CONF.conductor.node_locked_retry_interval * 1000)
-def _allocate_node(context, allocation, nodes):
-    """Go through the list of nodes and try to allocate one of them."""
-    retry_nodes = []
-    for node in nodes:
+def _no_candidates_error(context, allocation):
+    """Explain why there are no candidate nodes for the allocation."""
+    # NOTE(yrobla): traits are filtered in the database, so check once more
+    # without them to report the actual reason of the failure.
+    if allocation.traits:
+        filters = _candidate_filters(allocation)
+        del filters['traits']
+        if objects.Node.list(context, filters=filters, limit=1):
+            return (_("no suitable nodes have the requested traits %s") %
+                    ', '.join(allocation.traits))
+
+    if allocation.candidate_nodes:
+        return (_("none of the requested nodes are available and match "
+                  "the resource class %s") % allocation.resource_class)
+
+    return (_("no available nodes match the resource class %s") %
+            allocation.resource_class)
+
+
+def _requirements(allocation):
+    """Get a key identifying the allocations with the same candidates."""
+    return (allocation.resource_class, allocation.owner,
+            tuple(sorted(allocation.traits or ())),
+            tuple(sorted(allocation.candidate_nodes or ())))
+
+
+def _allocate_nodes(pending, attempts):
+    """Go through the allocations and try to reserve a node for each.
+
+    :returns: a list of PendingAllocation tuples for the allocations that
+        could not reserve any of the candidate nodes and are worth retrying.
+    """
+    candidates = {}
+    errors = {}
+    retry_allocations = []
+    for item in pending:
+        context, allocation = item.context, item.allocation
         try:
-            # NOTE(dtantsur): retries are done for all nodes above, so disable
-            # per-node retry. Also disable loading the driver, since the
-            # current conductor may not have the requried hardware type or
-            # interfaces (it's picked at random).
-            with task_manager.acquire(context, node.uuid, shared=False,
-                                      retry=False, load_driver=False,
-                                      purpose='allocating') as task:
-                # NOTE(dtantsur): double-check the node details, since they
-                # could have changed before we acquired the lock.
-                if not _verify_node(task.node, allocation):
-                    continue
-
-                allocation.node_id = task.node.id
-                allocation.state = states.ACTIVE
-                # NOTE(dtantsur): the node.instance_uuid and allocation_id are
-                # updated inside of the save() call within the same
-                # transaction to avoid races. NodeAssociated can be raised if
-                # another process allocates this node first.
-                allocation.save()
-                LOG.info('Node %(node)s has been successfully reserved for '
-                         'allocation %(uuid)s',
-                         {'node': node.uuid, 'uuid': allocation.uuid})
-                return allocation
-        except exception.NodeLocked:
-            LOG.debug('Node %s is currently locked, moving to the next one',
-                      node.uuid)
-            retry_nodes.append(node)
-        except exception.NodeAssociated:
-            LOG.debug('Node %s is already associated, moving to the next one',
-                      node.uuid)
-
-    # NOTE(dtantsur): rewrite the passed list to only contain the nodes that
-    # are worth retrying. Do not include nodes that are no longer suitable.
-    nodes[:] = retry_nodes
-
-    if nodes:
-        error = _('could not reserve any of %d suitable nodes') % len(nodes)
-    else:
-        error = _('all nodes were filtered out during reservation')
-
-    raise exception.AllocationFailed(uuid=allocation.uuid, error=error)
+            key = _requirements(allocation)
+            if key not in candidates:
+                candidates[key] = _candidate_nodes(context, allocation)
+                if not candidates[key]:
+                    errors[key] = _no_candidates_error(context, allocation)
+            if key in errors:
+                raise exception.AllocationFailed(uuid=allocation.uuid,
+                                                 error=errors[key])
+
+            nodes = candidates[key]
+            count = len(nodes)
+            if _claim_node(allocation, nodes):
+                continue
+
+            if item.attempt < attempts:
+                retry_allocations.append(item)
+                continue
+
+            if count:
+                error = (_('could not reserve any of %d suitable nodes')
+                         % count)
+            else:
+                error = _('all suitable nodes were reserved by other '
+                          'allocations')
+            raise exception.AllocationFailed(uuid=allocation.uuid,
+                                             error=error)
+        except exception.AllocationNotFound:
+            LOG.debug('Allocation %s was deleted before it was processed',
+                      allocation.uuid)
+        except (exception.AllocationFailed,
+                exception.InstanceAssociated) as exc:
+            LOG.error(str(exc))
+            _allocation_failed(allocation, exc)
+        except Exception as exc:
+            LOG.exception("Unexpected exception during processing of "
+                          "allocation %s", allocation.uuid)
+            reason = _("Unexpected exception during allocation: %s") % exc
+            _allocation_failed(allocation, reason)
+
+    return retry_allocations
+
+
+def _claim_node(allocation, nodes):
+    """Reserve the first node from the list that is still suitable.
+
+    The nodes that are tried are removed from the list, since they are either
+    reserved for this allocation or no longer available for the others.
+    """
+    while nodes:
+        node = nodes.pop()
+        # NOTE(yrobla): the node is checked and updated with one conditional
+        # UPDATE, so no node lock is needed and a node taken by another
+        # process is simply skipped rather than waited for.
+        if allocation.claim_node(node.id):
+            LOG.info('Node %(node)s has been successfully reserved for '
+                     'allocation %(uuid)s',
+                     {'node': node.uuid, 'uuid': allocation.uuid})
+            return True
+
+        LOG.debug('Node %(node)s is no longer suitable for allocation '
+                  '%(uuid)s, moving to the next one',
+                  {'node': node.uuid, 'uuid': allocation.uuid})
+
+    return False
 
 
 def backfill_allocation(context, allocation, node_id):
@@ -370,7 +370,9 @@ class BaseConductorManager(object):
         """Iterate over nodes mapped to this conductor.
 
         Requests node set from and filters out nodes that are not
-        mapped to this conductor.
+        mapped to this conductor. If hash_ring_db_filtering is enabled,
+        only nodes in the hash buckets of this conductor are requested.
+        Nodes are fetched from the database in chunks while iterating.
 
         Yields tuples (node_uuid, driver, conductor_group, ...) where ... is
         derived from fields argument, e.g.: fields=None means yielding ('uuid',
@@ -384,8 +386,17 @@ class BaseConductorManager(object):
         :return: generator yielding tuples of requested fields
         """
         columns = ['uuid', 'driver', 'conductor_group'] + list(fields or ())
-        node_list = self.dbapi.get_nodeinfo_list(columns=columns, **kwargs)
-        for result in node_list:
+        hash_buckets = None
+        if CONF.hash_ring_db_filtering:
+            hash_buckets = self.ring_manager.get_hash_buckets(self.host)
+        if hash_buckets is not None:
+            # NOTE(yrobla): only fetch nodes which may be mapped to this
+            # conductor, the exact mapping is still checked below.
+            filters = dict(kwargs.pop('filters', None) or {})
+            filters['hash_buckets'] = hash_buckets
+            kwargs['filters'] = filters
+        node_iter = self.dbapi.get_nodeinfo_iter(columns=columns, **kwargs)
+        for result in node_iter:
             if self._shutdown:
                 break
             if self._mapped_to_this_conductor(*result[:3]):
@@ -566,9 +577,11 @@ class BaseConductorManager(object):
         """Resume unfinished allocations on restart."""
         filters = {'state': states.ALLOCATING,
                    'conductor_affinity': self.conductor.id}
-        for allocation in objects.Allocation.list(context, filters=filters):
+        unfinished = objects.Allocation.list(context, filters=filters)
+        for allocation in unfinished:
             LOG.debug('Resuming unfinished allocation %s', allocation.uuid)
-            allocations.do_allocate(context, allocation)
+        if unfinished:
+            allocations.do_allocate_batch(context, unfinished)
 
     def _publish_endpoint(self):
         params = {}
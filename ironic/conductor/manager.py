@@ -41,8 +41,13 @@ notifying Neutron of a change, etc.
 """
 
 import collections
+import contextlib
 import datetime
+import heapq
+import itertools
 import queue
+import threading
+import time
 
 import eventlet
 from futurist import periodics
@@ -83,6 +88,129 @@ METRICS = metrics_utils.get_metrics_logger(__name__)
 
 SYNC_EXCLUDED_STATES = (states.DEPLOYWAIT, states.CLEANWAIT, states.ENROLL)
 
+# NOTE(deva): we should not acquire a lock on a node in DEPLOYWAIT/CLEANWAIT,
+# as this could cause an error within a deploy ramdisk POSTing back at the
+# same time.
+# NOTE(dtantsur): it's also pointless (and dangerous) to sync power state when
+# a power action is in progress.
+SYNC_CONSTRAINTS = {'provision_state_not_in': SYNC_EXCLUDED_STATES,
+                    'maintenance': False,
+                    'target_power_state': None,
+                    'reservation': None}
+
+
+class _IteratorQueue(object):
+    """A synchronized queue consuming items from an iterator on demand.
+
+    Only implements the subset of the queue.Queue interface used by the
+    power sync workers. Unlike a queue.Queue, the items are not loaded in
+    advance, so the memory usage does not depend on the number of items.
+    """
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self._lock = threading.Lock()
+
+    def get_nowait(self):
+        with self._lock:
+            try:
+                return next(self._iterator)
+            except StopIteration:
+                raise queue.Empty()
+
+
+class _PowerSyncScheduler(object):
+    """Decides which nodes are due a power state sync on each run.
+
+    By default all nodes are due on every run of the power sync periodic
+    task. When [conductor]sync_power_state_max_interval is larger than
+    [conductor]sync_power_state_interval, nodes in a stable provision state
+    whose power state was successfully synced without changes are skipped
+    for an exponentially increasing number of runs, up to the maximum
+    interval. Any failure or change, and any power action, brings a node
+    back to every run.
+
+    When the number of nodes synced per run is capped, the due nodes that
+    were not picked for the longest time are picked first, so that nodes
+    skipped because of the cap are synced on the next runs.
+    """
+
+    def __init__(self):
+        self._run = 0
+        # node UUID -> (number of the next run, number of runs between syncs)
+        self._nodes = {}
+        # node UUID -> number of the last run the node was picked in
+        self._picked = {}
+        self._seen = set()
+
+    @staticmethod
+    def _max_runs():
+        interval = max(1, CONF.conductor.sync_power_state_interval)
+        return max(1, CONF.conductor.sync_power_state_max_interval
+                   // interval)
+
+    def start_run(self):
+        """Start a new run of the periodic task."""
+        self._run += 1
+        self._seen = set()
+
+    def end_run(self):
+        """Finish a run, forgetting about the nodes that were not seen."""
+        for node_uuid in set(self._nodes) - self._seen:
+            del self._nodes[node_uuid]
+        for node_uuid in set(self._picked) - self._seen:
+            del self._picked[node_uuid]
+
+    def pick(self, nodes, limit=None, first=()):
+        """Pick the nodes to sync during the current run.
+
+        :param nodes: an iterable of node info tuples starting with the
+            node UUID.
+        :param limit: the maximum number of nodes to pick, None for no limit.
+            All nodes are consumed to find the ones synced the longest ago.
+        :param first: UUIDs of nodes to pick before any other.
+        :returns: an iterable of the due nodes to sync.
+        """
+        due = (node_info for node_info in nodes if self.is_due(node_info[0]))
+        if limit is not None:
+            # NOTE(yrobla): nodes never picked come first, ties keep the
+            # order of the nodes, as do the nodes to pick first.
+            due = heapq.nsmallest(
+                limit, due, key=lambda node_info: (
+                    (0,) if node_info[0] in first
+                    else (1, self._picked.get(node_info[0], 0))))
+        for node_info in due:
+            self._picked[node_info[0]] = self._run
+            yield node_info
+
+    def is_due(self, node_uuid):
+        """Whether the node should be synced during the current run."""
+        self._seen.add(node_uuid)
+        entry = self._nodes.get(node_uuid)
+        return entry is None or entry[0] <= self._run
+
+    def record(self, node_uuid, stable):
+        """Record the result of syncing a node's power state.
+
+        :param node_uuid: the node UUID.
+        :param stable: whether the node's power state was synced without
+            any change or failure while in a stable provision state.
+        """
+        max_runs = self._max_runs()
+        if max_runs == 1:
+            self._nodes.pop(node_uuid, None)
+            return
+
+        runs = 1
+        entry = self._nodes.get(node_uuid)
+        if stable and entry is not None:
+            runs = min(entry[1] * 2, max_runs)
+        self._nodes[node_uuid] = (self._run + runs, runs)
+
+    def reset(self, node_uuid):
+        """Bring a node back to every run, e.g. after a power action."""
+        self._nodes.pop(node_uuid, None)
+
 
 class ConductorManager(base_manager.BaseConductorManager):
     """Ironic Conductor manager main class."""
@@ -90,13 +218,20 @@ class ConductorManager(base_manager.BaseConductorManager):
     # NOTE(rloo): This must be in sync with rpcapi.ConductorAPI's.
     # NOTE(pas-ha): This also must be in sync with
     #               ironic.common.release_mappings.RELEASE_MAPPING['master']
-    RPC_API_VERSION = '1.49'
+    RPC_API_VERSION = '1.52'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
     def __init__(self, host, topic):
         super(ConductorManager, self).__init__(host, topic)
         self.power_state_sync_count = collections.defaultdict(int)
+        self._power_sync_scheduler = _PowerSyncScheduler()
+        # Allocations ready to be processed, and allocations to retry with
+        # the time they are ready at.
+        self._pending_allocations = collections.deque()
+        self._delayed_allocations = collections.deque()
+        self._allocations_event = threading.Event()
+        self._allocations_worker_running = False
 
     @METRICS.timer('ConductorManager.create_node')
     # No need to add these since they are subclasses of InvalidParameterValue:
@@ -167,8 +302,10 @@ class ConductorManager(base_manager.BaseConductorManager):
     @messaging.expected_exceptions(exception.InvalidParameterValue,
                                    exception.NodeLocked,
                                    exception.InvalidState,
-                                   exception.DriverNotFound)
-    def update_node(self, context, node_obj, reset_interfaces=False):
+                                   exception.DriverNotFound,
+                                   exception.NodeModified)
+    def update_node(self, context, node_obj, reset_interfaces=False,
+                    expected_digest=None):
         """Update a node with the supplied data.
 
         This method is the main "hub" for PUT and PATCH requests in the API.
@@ -176,15 +313,26 @@ class ConductorManager(base_manager.BaseConductorManager):
         validates the parameters with the node's driver, if necessary.
 
         :param context: an admin context
-        :param node_obj: a changed (but not saved) node object.
+        :param node_obj: a changed (but not saved) node object. Since RPC API
+                         1.51, it may only have its uuid and changed fields
+                         set.
         :param reset_interfaces: whether to reset hardware interfaces to their
                                  defaults.
+        :param expected_digest: if set, the update is only applied if the
+                                content digest of the node in the database
+                                is still this one. Since RPC API 1.52.
         :raises: NoValidDefaultForInterface if no default can be calculated
                  for some interfaces, and explicit values must be provided.
+        :raises: NodeModified if the node does not match expected_digest.
         """
         node_id = node_obj.uuid
         LOG.debug("RPC update_node called for node %s.", node_id)
 
+        if not all(node_obj.obj_attr_is_set(field)
+                   for field in node_obj.fields):
+            node_obj.obj_fill_unset(objects.Node.get_by_uuid(context,
+                                                             node_id))
+
         # NOTE(jroll) clear maintenance_reason if node.update sets
         # maintenance to False for backwards compatibility, for tools
         # not using the maintenance endpoint.
@@ -233,6 +381,12 @@ class ConductorManager(base_manager.BaseConductorManager):
         with task_manager.acquire(context, node_id, shared=False,
                                   load_driver=False,
                                   purpose='node update') as task:
+            # NOTE(yrobla): the check is done while holding the lock, so that
+            # the node cannot be modified before it is saved.
+            if (expected_digest is not None
+                    and task.node.content_digest() != expected_digest):
+                raise exception.NodeModified(node=node_id)
+
             # Prevent instance_uuid overwriting
             if ('instance_uuid' in delta and node_obj.instance_uuid
                 and task.node.instance_uuid):
@@ -340,6 +494,34 @@ class ConductorManager(base_manager.BaseConductorManager):
                                       task.node, task.node.power_state)
             task.spawn_after(self._spawn_worker, utils.node_power_action,
                              task, new_state, timeout=power_timeout)
+            # NOTE(yrobla): the node is locked until the power action ends,
+            # sync its power state on the first run after it.
+            self._power_sync_scheduler.reset(task.node.uuid)
+
+    @METRICS.timer('ConductorManager.change_nodes_power_state')
+    def change_nodes_power_state(self, context, node_ids, new_state,
+                                 timeout=None):
+        """RPC method to change the power state of several nodes.
+
+        Does what change_node_power_state does, for each node. An error for
+        one node does not prevent changing the power state of the others.
+
+        :param context: an admin context.
+        :param node_ids: a list of ids or uuids of nodes.
+        :param new_state: the desired power state of the nodes.
+        :param timeout: timeout (in seconds) positive integer (> 0) for any
+          power state. ``None`` indicates to use default timeout.
+        :returns: a dictionary mapping each node id to None if the power
+            action was started, or to a dictionary with the HTTP status
+            ``code`` and the ``message`` of the error.
+
+        """
+        LOG.debug("RPC change_nodes_power_state called for nodes %(nodes)s. "
+                  "The desired new state is %(state)s.",
+                  {'nodes': ', '.join(node_ids), 'state': new_state})
+        return utils.call_for_each_node(
+            node_ids, lambda node_id: self.change_node_power_state(
+                context, node_id, new_state, timeout=timeout))
 
     @METRICS.timer('ConductorManager.vendor_passthru')
     @messaging.expected_exceptions(exception.NoFreeConductorWorker,
@@ -1299,6 +1481,40 @@ class ConductorManager(base_manager.BaseConductorManager):
                     action=action, node=node.uuid,
                     state=node.provision_state)
 
+    @METRICS.timer('ConductorManager.do_nodes_provisioning_action')
+    def do_nodes_provisioning_action(self, context, node_ids, target):
+        """RPC method to change the provision state of several nodes.
+
+        An error for one node does not prevent changing the provision state
+        of the others.
+
+        :param context: an admin context.
+        :param node_ids: a list of ids or uuids of nodes.
+        :param target: the target provision state of the API: "active" to
+            deploy the nodes, "deleted" to tear them down, "inspect", or
+            an action accepted by do_provisioning_action.
+        :returns: a dictionary mapping each node id to None if the action
+            was started, or to a dictionary with the HTTP status ``code`` and
+            the ``message`` of the error.
+
+        """
+        LOG.debug("RPC do_nodes_provisioning_action called for nodes "
+                  "%(nodes)s. The target is %(target)s.",
+                  {'nodes': ', '.join(node_ids), 'target': target})
+        args = ()
+        if target == states.ACTIVE:
+            method = self.do_node_deploy
+        elif target == states.DELETED:
+            method = self.do_node_tear_down
+        elif target == states.VERBS['inspect']:
+            method = self.inspect_hardware
+        else:
+            method = self.do_provisioning_action
+            args = (target,)
+
+        return utils.call_for_each_node(
+            node_ids, lambda node_id: method(context, node_id, *args))
+
     def _do_abort(self, task):
         """Handle node abort for certain states."""
         node = task.node
@@ -1378,20 +1594,49 @@ class ConductorManager(base_manager.BaseConductorManager):
         """Periodic task to sync power states for the nodes."""
         filters = {'maintenance': False}
 
-        # NOTE(etingof): prioritize non-responding nodes to fail them fast
-        nodes = sorted(
-            self.iter_nodes(fields=['id'], filters=filters),
-            key=lambda n: -self.power_state_sync_count.get(n[0], 0)
-        )
-
-        nodes_queue = queue.Queue()
-
-        for node_info in nodes:
-            nodes_queue.put(node_info)
+        fields = ['id', 'power_interface', 'driver_info']
 
-        number_of_workers = min(CONF.conductor.sync_power_state_workers,
-                                CONF.conductor.periodic_max_workers,
-                                nodes_queue.qsize())
+        # NOTE(etingof): prioritize non-responding nodes to fail them fast
+        failing = {node_uuid: count for node_uuid, count
+                   in self.power_state_sync_count.items() if count}
+        if failing:
+            prioritized = sorted(
+                self.iter_nodes(fields=fields,
+                                filters=dict(filters, uuid_in=list(failing))),
+                key=lambda n: -failing[n[0]]
+            )
+        else:
+            prioritized = []
+
+        # NOTE(yrobla): the remaining nodes are fetched from the database
+        # in chunks.
+        nodes = itertools.chain(
+            prioritized,
+            (node_info for node_info
+             in self.iter_nodes(fields=fields, filters=filters)
+             if node_info[0] not in failing))
+
+        # NOTE(yrobla): nodes not due a sync are skipped, and the number of
+        # nodes synced per run is capped to honor the maximum rate. All nodes
+        # are still consumed, so that the scheduler sees the existing ones.
+        scheduler = self._power_sync_scheduler
+        scheduler.start_run()
+        max_rate = CONF.conductor.sync_power_state_max_rate
+        max_nodes = (max(1, int(max_rate
+                                * CONF.conductor.sync_power_state_interval))
+                     if max_rate else None)
+        nodes = scheduler.pick(nodes, limit=max_nodes, first=failing)
+
+        # NOTE(yrobla): nodes sharing a BMC are handed to a worker together,
+        # so that their power states are requested with one call. This needs
+        # the whole list of nodes, only their identifiers are kept.
+        groups = _group_nodes_by_bmc(nodes)
+
+        max_workers = min(CONF.conductor.sync_power_state_workers,
+                          CONF.conductor.periodic_max_workers)
+        nodes_queue = _IteratorQueue(groups)
+
+        number_of_workers = min(max_workers, len(groups))
         futures = []
 
         for worker_number in range(max(0, number_of_workers - 1)):
@@ -1411,6 +1656,7 @@ class ConductorManager(base_manager.BaseConductorManager):
 
         finally:
             waiters.wait_for_all(futures)
+            scheduler.end_run()
 
     def _sync_power_state_nodes_task(self, context, nodes):
         """Invokes power state sync on nodes from synchronized queue.
@@ -1430,59 +1676,95 @@ class ConductorManager(base_manager.BaseConductorManager):
         can do here to avoid failing a brand new deploy to a node that
         we've locked here, though.
         """
-        # FIXME(comstud): Since our initial state checks are outside
-        # of the lock (to try to avoid the lock), some checks are
-        # repeated after grabbing the lock so we can unlock quickly.
-        # The node mapping is not re-checked because it doesn't much
-        # matter if things happened to re-balance.
-        #
-        # This is inefficient and racey. We end up with calling DB API's
-        # get_node() twice (once here, and once in acquire(). Ideally we
-        # add a way to pass constraints to task_manager.acquire()
-        # (through to its DB API call) so that we can eliminate our call
-        # and first set of checks below.
+        # NOTE(yrobla): the conditions are passed as constraints to
+        # acquire(), so that nodes not meeting them are skipped before
+        # loading their resources and driver. The node mapping is not
+        # re-checked because it doesn't much matter if things happened
+        # to re-balance.
 
+        batch_size = CONF.conductor.sync_power_state_batch_size
         while not self._shutdown:
-            try:
-                (node_uuid, driver, conductor_group,
-                 node_id) = nodes.get_nowait()
-            except queue.Empty:
+            # NOTE(yrobla): groups of nodes sharing a BMC are never split,
+            # even if they are larger than the batch size.
+            batch = []
+            while len(batch) < batch_size:
+                try:
+                    batch.extend(nodes.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
                 break
 
-            try:
-                # NOTE(dtantsur): start with a shared lock, upgrade if needed
-                with task_manager.acquire(context, node_uuid,
-                                          purpose='power state sync',
-                                          shared=True) as task:
-                    # NOTE(deva): we should not acquire a lock on a node in
-                    #             DEPLOYWAIT/CLEANWAIT, as this could cause
-                    #             an error within a deploy ramdisk POSTing back
-                    #             at the same time.
-                    # NOTE(dtantsur): it's also pointless (and dangerous) to
-                    # sync power state when a power action is in progress
-                    if (task.node.provision_state in SYNC_EXCLUDED_STATES
-                            or task.node.maintenance
-                            or task.node.target_power_state
-                            or task.node.reservation):
+            with contextlib.ExitStack() as stack:
+                tasks = []
+                for (node_uuid, driver, conductor_group, node_id) in batch:
+                    try:
+                        # NOTE(dtantsur): start with a shared lock, upgrade
+                        # if needed
+                        tasks.append(stack.enter_context(
+                            task_manager.acquire(
+                                context, node_uuid,
+                                purpose='power state sync', shared=True,
+                                constraints=SYNC_CONSTRAINTS)))
+                    except exception.NodeNotFound:
+                        LOG.info("During sync_power_state, node %(node)s "
+                                 "was not found and presumed deleted by "
+                                 "another process.", {'node': node_uuid})
+                    except exception.NodeLocked:
+                        LOG.info("During sync_power_state, node %(node)s "
+                                 "was already locked by another process. "
+                                 "Skip.", {'node': node_uuid})
+                    except exception.NodeConstraintsNotMet:
                         continue
-                    count = do_sync_power_state(
-                        task, self.power_state_sync_count[node_uuid])
-                    if count:
-                        self.power_state_sync_count[node_uuid] = count
-                    else:
-                        # don't bloat the dict with non-failing nodes
-                        del self.power_state_sync_count[node_uuid]
-            except exception.NodeNotFound:
-                LOG.info("During sync_power_state, node %(node)s was not "
-                         "found and presumed deleted by another process.",
-                         {'node': node_uuid})
-            except exception.NodeLocked:
-                LOG.info("During sync_power_state, node %(node)s was "
-                         "already locked by another process. Skip.",
-                         {'node': node_uuid})
-            finally:
-                # Yield on every iteration
-                eventlet.sleep(0)
+                    finally:
+                        # Yield on every iteration
+                        eventlet.sleep(0)
+
+                for group in _group_tasks_by_bmc(tasks):
+                    results = _get_power_states(group)
+                    for task in group:
+                        self._sync_power_state_task(
+                            task, results.get(task.node.uuid))
+
+    def _sync_power_state_task(self, task, power_state_result=None):
+        """Invokes power state sync on a node and updates its failure count.
+
+        :param task: a TaskManager instance with a shared lock.
+        :param power_state_result: the power state of the node, or the
+            exception raised while getting it, if it was already requested
+            from the driver. None to request it from the driver.
+        """
+        node_uuid = task.node.uuid
+        old_power_state = task.node.power_state
+        try:
+            count = do_sync_power_state(
+                task, self.power_state_sync_count[node_uuid],
+                power_state_result=power_state_result)
+            # NOTE(yrobla): a power state recorded or corrected by the sync
+            # is not a failure, but keeps the node on the fast cadence.
+            self._power_sync_scheduler.record(
+                node_uuid, stable=(not count
+                                   and task.node.power_state
+                                   == old_power_state
+                                   and task.node.provision_state
+                                   in states.STABLE_STATES))
+            if count:
+                self.power_state_sync_count[node_uuid] = count
+            else:
+                # don't bloat the dict with non-failing nodes
+                del self.power_state_sync_count[node_uuid]
+        except exception.NodeNotFound:
+            LOG.info("During sync_power_state, node %(node)s was not "
+                     "found and presumed deleted by another process.",
+                     {'node': node_uuid})
+        except exception.NodeLocked:
+            LOG.info("During sync_power_state, node %(node)s was "
+                     "already locked by another process. Skip.",
+                     {'node': node_uuid})
+        finally:
+            # NOTE(yrobla): the lock may have been upgraded to an exclusive
+            # one, release it without waiting for the rest of the batch.
+            task.release_resources()
 
     @METRICS.timer('ConductorManager._power_failure_recovery')
     @periodics.periodic(spacing=CONF.conductor.power_failure_recovery_interval,
@@ -3275,14 +3557,54 @@ class ConductorManager(base_manager.BaseConductorManager):
             # This is a fast operation and should be done synchronously
             allocations.backfill_allocation(context, allocation, node_id)
         else:
-            # Spawn an asynchronous worker to process the allocation. Copy it
-            # to avoid data races.
-            self._spawn_worker(allocations.do_allocate,
-                               context, allocation.obj_clone())
+            # Queue the allocation for an asynchronous worker. Copy it to
+            # avoid data races.
+            self._pending_allocations.append(allocations.PendingAllocation(
+                context, allocation.obj_clone(), 1))
+            self._allocations_event.set()
+            if not self._allocations_worker_running:
+                self._spawn_worker(self._process_allocations)
+                self._allocations_worker_running = True
 
         # Return the current status of the allocation
         return allocation
 
+    def _process_allocations(self):
+        """Process the queued allocations in batches.
+
+        Allocations created while a batch is being processed are queued and
+        processed together in the next batch, sharing the candidate nodes.
+        Allocations that could not reserve a node are queued again after
+        [conductor]node_locked_retry_interval, new allocations are processed
+        in the meantime.
+        """
+        try:
+            while self._pending_allocations or self._delayed_allocations:
+                self._allocations_event.clear()
+                now = time.monotonic()
+                while (self._delayed_allocations
+                       and self._delayed_allocations[0][0] <= now):
+                    self._pending_allocations.append(
+                        self._delayed_allocations.popleft()[1])
+
+                if not self._pending_allocations:
+                    # NOTE(yrobla): woken up by new allocations.
+                    self._allocations_event.wait(
+                        self._delayed_allocations[0][0] - now)
+                    continue
+
+                batch = []
+                while (self._pending_allocations and len(batch)
+                       < CONF.conductor.allocation_batch_size):
+                    batch.append(self._pending_allocations.popleft())
+                LOG.debug('Processing a batch of %d allocations', len(batch))
+                retry_at = (time.monotonic()
+                            + CONF.conductor.node_locked_retry_interval)
+                for item in allocations.allocate_nodes(batch):
+                    self._delayed_allocations.append((retry_at, item))
+        finally:
+            self._allocations_worker_running = False
+
     @METRICS.timer('ConductorManager.destroy_allocation')
     @messaging.expected_exceptions(exception.InvalidState)
     def destroy_allocation(self, context, allocation):
@@ -3319,6 +3641,7 @@ class ConductorManager(base_manager.BaseConductorManager):
         :param context: request context.
         """
         offline_conductors = self.dbapi.get_offline_conductors(field='id')
+        taken_over = []
         for conductor_id in offline_conductors:
             filters = {'state': states.ALLOCATING,
                        'conductor_affinity': conductor_id}
@@ -3332,11 +3655,14 @@ class ConductorManager(base_manager.BaseConductorManager):
                         continue
 
                     LOG.debug('Taking over allocation %s', allocation.uuid)
-                    allocations.do_allocate(context, allocation)
+                    taken_over.append(allocation)
                 except Exception:
                     LOG.exception('Unexpected exception when taking over '
                                   'allocation %s', allocation.uuid)
 
+        if taken_over:
+            allocations.do_allocate_batch(context, taken_over)
+
     @METRICS.timer('ConductorManager.get_node_with_token')
     @messaging.expected_exceptions(exception.NodeLocked,
                                    exception.Invalid)
@@ -3426,8 +3752,91 @@ def handle_sync_power_state_max_retries_exceeded(task, actual_power_state,
     LOG.error(msg)
 
 
+def _get_bmc_address(driver_info):
+    """Return the BMC address of a node, if it can be found.
+
+    Power interfaces store the BMC address in driver_info fields named
+    ``<prefix>_address`` (e.g. ``ipmi_address``, ``snmp_address``).
+
+    :param driver_info: the driver_info field of a node
+    :returns: the BMC address or None
+    """
+    for key in sorted(driver_info or {}):
+        if key.endswith('_address') and driver_info[key]:
+            return str(driver_info[key])
+
+
+def _get_bmc_group(node_uuid, driver, power_interface, driver_info):
+    """Return the key of the nodes whose power states are requested at once.
+
+    :returns: a tuple of the driver, the power interface and the BMC address
+        of the node, or the node UUID if the BMC address is unknown.
+    """
+    address = _get_bmc_address(driver_info)
+    if address is None:
+        return node_uuid
+    return (driver, power_interface, address)
+
+
+def _group_nodes_by_bmc(nodes):
+    """Group the nodes to sync whose power states can be requested together.
+
+    :param nodes: an iterable of (uuid, driver, conductor_group, id,
+        power_interface, driver_info) tuples.
+    :returns: a list of lists of (uuid, driver, conductor_group, id) tuples
+        in the order of the first node of each group. Nodes in the same list
+        share the driver, the power interface and the BMC address.
+    """
+    groups = collections.OrderedDict()
+    for (node_uuid, driver, conductor_group, node_id, power_interface,
+         driver_info) in nodes:
+        key = _get_bmc_group(node_uuid, driver, power_interface, driver_info)
+        groups.setdefault(key, []).append(
+            (node_uuid, driver, conductor_group, node_id))
+    return list(groups.values())
+
+
+def _group_tasks_by_bmc(tasks):
+    """Group power sync tasks whose power states can be requested together.
+
+    :param tasks: a list of TaskManager instances
+    :returns: a list of lists of TaskManager instances, nodes in the same
+        list share the driver, the power interface and the BMC address.
+    """
+    groups = collections.OrderedDict()
+    for task in tasks:
+        node = task.node
+        key = _get_bmc_group(node.uuid, node.driver, node.power_interface,
+                             node.driver_info)
+        groups.setdefault(key, []).append(task)
+    return list(groups.values())
+
+
+def _get_power_states(tasks):
+    """Request the power states of a group of nodes with a single call.
+
+    :param tasks: a list of TaskManager instances, see _group_tasks_by_bmc.
+    :returns: a dictionary mapping node UUIDs to a power state or the
+        exception raised while getting it. Empty if there is only one
+        node, or if the call failed, in which case the power states are
+        requested separately by do_sync_power_state.
+    """
+    if len(tasks) < 2:
+        return {}
+
+    try:
+        return tasks[0].driver.power.get_power_states(tasks)
+    except Exception as e:
+        LOG.warning("During sync_power_state, could not get power states "
+                    "of nodes %(nodes)s at once, falling back to getting "
+                    "them one by one. Error: %(err)s",
+                    {'nodes': ', '.join(t.node.uuid for t in tasks),
+                     'err': e})
+        return {}
+
+
 @METRICS.timer('do_sync_power_state')
-def do_sync_power_state(task, count):
+def do_sync_power_state(task, count, power_state_result=None):
     """Sync the power state for this node, incrementing the counter on failure.
 
     When the limit of power_state_sync_max_retries is reached, the node is put
@@ -3435,6 +3844,9 @@ def do_sync_power_state(task, count):
 
     :param task: a TaskManager instance
     :param count: number of times this node has previously failed a sync
+    :param power_state_result: the power state of the node, or the exception
+        raised while getting it, if already requested from the driver (see
+        PowerInterface.get_power_states). None to request it.
     :raises: NodeLocked if unable to upgrade task lock to an exclusive one
     :returns: Count of failed attempts.
               On success, the counter is set to 0.
@@ -3457,7 +3869,12 @@ def do_sync_power_state(task, count):
     try:
         # The driver may raise an exception, or may return ERROR.
         # Handle both the same way.
-        power_state = task.driver.power.get_power_state(task)
+        if power_state_result is None:
+            power_state = task.driver.power.get_power_state(task)
+        elif isinstance(power_state_result, Exception):
+            raise power_state_result
+        else:
+            power_state = power_state_result
         if power_state == states.ERROR:
             raise exception.PowerStateFailure(
                 _("Power driver returned ERROR state "
@@ -19,7 +19,10 @@ Client side of the conductor RPC API.
 """
 
 import random
+import threading
 
+import eventlet
+import futurist
 import oslo_messaging as messaging
 
 from ironic.common import exception
@@ -28,11 +31,35 @@ from ironic.common.i18n import _
 from ironic.common.json_rpc import client as json_rpc
 from ironic.common import release_mappings as versions
 from ironic.common import rpc
+from ironic.common import states
 from ironic.conductor import manager
+from ironic.conductor import utils
 from ironic.conf import CONF
 from ironic.db import api as dbapi
 from ironic.objects import base as objects_base
 
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_executor():
+    """Get the executor running concurrent RPC calls.
+
+    Greenthreads are used when the service is monkey patched by eventlet,
+    native threads otherwise, e.g. when the API runs under a WSGI server.
+    """
+    global _EXECUTOR
+
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            if eventlet.patcher.is_monkey_patched('thread'):
+                _EXECUTOR = futurist.GreenThreadPoolExecutor(
+                    max_workers=CONF.rpc_concurrency)
+            else:
+                _EXECUTOR = futurist.ThreadPoolExecutor(
+                    max_workers=CONF.rpc_concurrency)
+    return _EXECUTOR
+
 
 class ConductorAPI(object):
     """Client side of the conductor RPC API.
@@ -101,13 +128,18 @@ class ConductorAPI(object):
     |    1.48 - Added allocation API
     |    1.49 - Added get_node_with_token and agent_token argument to
                 heartbeat
+    |    1.50 - Added change_nodes_power_state and
+                do_nodes_provisioning_action
+    |    1.51 - update_node accepts node objects with only the changed
+                fields set
+    |    1.52 - Added expected_digest to update_node
 
     """
 
     # NOTE(rloo): This must be in sync with manager.ConductorManager's.
     # NOTE(pas-ha): This also must be in sync with
     #               ironic.common.release_mappings.RELEASE_MAPPING['master']
-    RPC_API_VERSION = '1.49'
+    RPC_API_VERSION = '1.52'
 
     def __init__(self, topic=None):
         super(ConductorAPI, self).__init__()
@@ -152,6 +184,34 @@ class ConductorAPI(object):
                       {'driver': node.driver, 'group': node.conductor_group})
             raise exception.NoValidHost(reason=reason)
 
+    def get_conductors_for(self, nodes):
+        """Get the conductors which the nodes are mapped to.
+
+        All nodes are mapped using the same hash rings, each ring being
+        looked up once.
+
+        :param nodes: a list of node objects.
+        :returns: a dictionary mapping node UUIDs to conductor hostnames, or
+            to None for nodes no conductor is servicing.
+
+        """
+        rings = {}
+        result = {}
+        for node in nodes:
+            key = (node.driver, node.conductor_group)
+            if key not in rings:
+                try:
+                    rings[key] = self.ring_manager.get_ring(*key)
+                except (exception.DriverNotFound, exception.TemporaryFailure):
+                    rings[key] = None
+            ring = rings[key]
+            if ring is None:
+                result[node.uuid] = None
+            else:
+                result[node.uuid] = ring.get_nodes(
+                    node.uuid.encode('utf-8')).pop()
+        return result
+
     def get_topic_for(self, node):
         """Get the RPC topic for the conductor service the node is mapped to.
 
@@ -163,6 +223,18 @@ class ConductorAPI(object):
         hostname = self.get_conductor_for(node)
         return '%s.%s' % (self.topic, hostname)
 
+    def get_topics_for(self, nodes):
+        """Get the RPC topics for the conductor services nodes are mapped to.
+
+        :param nodes: a list of node objects.
+        :returns: a dictionary mapping node UUIDs to RPC topic strings, or
+            to None for nodes no conductor is servicing.
+
+        """
+        return {uuid: None if hostname is None
+                else '%s.%s' % (self.topic, hostname)
+                for uuid, hostname in self.get_conductors_for(nodes).items()}
+
     def get_random_topic(self):
         """Get an RPC topic for a random conductor service."""
         conductors = dbapi.get_instance().get_online_conductors()
@@ -199,6 +271,57 @@ class ConductorAPI(object):
         host = random.choice(list(ring.nodes))
         return self.topic + "." + host
 
+    def spawn(self, context, func, *args, **kwargs):
+        """Start an RPC call without waiting for its result.
+
+        Independent calls started this way run concurrently, bounded by
+        the [DEFAULT]rpc_concurrency option.
+
+        :param context: request context.
+        :param func: a method of this object, or any callable, called with
+            the context, args and kwargs.
+        :returns: a future; its result() method waits for the call and
+            returns its result or raises its exception.
+        """
+        def _call():
+            # NOTE(yrobla): make the context of the request available to
+            # the logging in the worker thread.
+            context.update_store()
+            return func(context, *args, **kwargs)
+
+        return _get_executor().submit(_call)
+
+    def _can_send_batch(self):
+        """Return whether calls can be sent in batch requests."""
+        return isinstance(self.client, json_rpc.Client)
+
+    def _batch_for_each_node(self, context, node_ids, topic, method, version,
+                             **kwargs):
+        """Call an RPC method for several nodes in one batch request.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids.
+        :param topic: RPC topic. Defaults to self.topic.
+        :param method: the RPC method, called with each node ID as
+            ``node_id``.
+        :param version: the version of the RPC method.
+        :param kwargs: the other arguments of the RPC method.
+        :returns: a dictionary mapping each node id to None if the call
+            succeeded, or to a dictionary with the HTTP status ``code`` and
+            the ``message`` of the error.
+        """
+        cctxt = self.client.prepare(topic=topic or self.topic, version=version)
+        batch = cctxt.batch()
+        for node_id in node_ids:
+            batch.call(context, method, node_id=node_id, **kwargs)
+        results = dict(zip(node_ids, batch.send()))
+
+        def _check_result(node_id):
+            if isinstance(results[node_id], Exception):
+                raise results[node_id]
+
+        return utils.call_for_each_node(node_ids, _check_result)
+
     def can_send_create_port(self):
         """Return whether the RPCAPI supports the create_port method."""
         return self.client.can_send_version("1.41")
@@ -225,7 +348,7 @@ class ConductorAPI(object):
         return cctxt.call(context, 'create_node', node_obj=node_obj)
 
     def update_node(self, context, node_obj, topic=None,
-                    reset_interfaces=False):
+                    reset_interfaces=False, expected_digest=None):
         """Synchronously, have a conductor update the node's information.
 
         Update the node's information in the database and return a node object.
@@ -237,19 +360,37 @@ class ConductorAPI(object):
         Note that power_state should not be passed via this method.
         Use change_node_power_state for initiating driver actions.
 
+        If the rpc_send_changes_only option is enabled and the conductor
+        supports it, only the changed fields of the node are sent.
+
         :param context: request context.
         :param node_obj: a changed (but not saved) node object.
         :param topic: RPC topic. Defaults to self.topic.
         :param reset_interfaces: whether to reset hardware interfaces to their
                                  defaults.
+        :param expected_digest: if set, the conductor only updates the node if
+                                its content digest is still this one. It is
+                                ignored by conductors older than RPC API 1.52.
         :returns: updated node object, including all fields.
         :raises: NoValidDefaultForInterface if no default can be calculated
                  for some interfaces, and explicit values must be provided.
+        :raises: NodeModified if the node does not match expected_digest.
 
         """
-        cctxt = self.client.prepare(topic=topic or self.topic, version='1.1')
+        version = '1.1'
+        kwargs = {}
+        if (CONF.rpc_send_changes_only
+                and self.client.can_send_version('1.51')):
+            version = '1.51'
+            node_obj = node_obj.obj_changes_only()
+        if (expected_digest is not None
+                and self.client.can_send_version('1.52')):
+            version = '1.52'
+            kwargs['expected_digest'] = expected_digest
+        cctxt = self.client.prepare(topic=topic or self.topic,
+                                    version=version)
         return cctxt.call(context, 'update_node', node_obj=node_obj,
-                          reset_interfaces=reset_interfaces)
+                          reset_interfaces=reset_interfaces, **kwargs)
 
     def change_node_power_state(self, context, node_id, new_state,
                                 topic=None, timeout=None):
@@ -272,6 +413,42 @@ class ConductorAPI(object):
         return cctxt.call(context, 'change_node_power_state', node_id=node_id,
                           new_state=new_state, timeout=timeout)
 
+    def change_nodes_power_state(self, context, node_ids, new_state,
+                                 topic=None, timeout=None):
+        """Change the power state of several nodes.
+
+        Synchronously, acquire locks and start the conductor background tasks
+        to change the power state of the nodes. The nodes must all be mapped
+        to the conductor of the topic. If that conductor does not support
+        this call yet, the nodes are sent one call each, in one batch request
+        with JSON RPC.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids.
+        :param new_state: one of ironic.common.states power state values
+        :param timeout: timeout (in seconds) positive integer (> 0) for any
+           power state. ``None`` indicates to use default timeout.
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a dictionary mapping each node id to None if the power
+            action was started, or to a dictionary with the HTTP status
+            ``code`` and the ``message`` of the error.
+
+        """
+        if not self.client.can_send_version('1.50'):
+            if self._can_send_batch():
+                return self._batch_for_each_node(
+                    context, node_ids, topic, 'change_node_power_state',
+                    '1.39', new_state=new_state, timeout=timeout)
+            return utils.call_for_each_node(
+                node_ids, lambda node_id: self.change_node_power_state(
+                    context, node_id, new_state, topic=topic,
+                    timeout=timeout))
+
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.50')
+        return cctxt.call(context, 'change_nodes_power_state',
+                          node_ids=node_ids, new_state=new_state,
+                          timeout=timeout)
+
     def vendor_passthru(self, context, node_id, driver_method, http_method,
                         info, topic=None):
         """Receive requests for vendor-specific actions.
@@ -434,6 +611,66 @@ class ConductorAPI(object):
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.6')
         return cctxt.call(context, 'do_node_tear_down', node_id=node_id)
 
+    def do_nodes_provisioning_action(self, context, node_ids, target,
+                                     topic=None):
+        """Signal to conductor service to change the state of several nodes.
+
+        The nodes must all be mapped to the conductor of the topic. If that
+        conductor does not support this call yet, the nodes are sent one
+        call each, in one batch request with JSON RPC.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids.
+        :param target: "active" to deploy the nodes, "deleted" to tear them
+            down, "inspect", or an action for do_provisioning_action.
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a dictionary mapping each node id to None if the action
+            was started, or to a dictionary with the HTTP status ``code`` and
+            the ``message`` of the error.
+
+        """
+        if not self.client.can_send_version('1.50'):
+            if self._can_send_batch():
+                method, version, kwargs = self._provisioning_action_call(
+                    target)
+                return self._batch_for_each_node(
+                    context, node_ids, topic, method, version, **kwargs)
+            return utils.call_for_each_node(
+                node_ids, self._do_node_provisioning_action, context, target,
+                topic)
+
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.50')
+        return cctxt.call(context, 'do_nodes_provisioning_action',
+                          node_ids=node_ids, target=target)
+
+    def _provisioning_action_call(self, target):
+        """Get the RPC call starting a provisioning action on one node.
+
+        :param target: the target of do_nodes_provisioning_action.
+        :returns: a tuple with the RPC method, its version and its arguments
+            other than the context and the node ID.
+        """
+        if target == states.ACTIVE:
+            return ('do_node_deploy', '1.22',
+                    {'rebuild': False, 'configdrive': None})
+        elif target == states.DELETED:
+            return 'do_node_tear_down', '1.6', {}
+        elif target == states.VERBS['inspect']:
+            return 'inspect_hardware', '1.24', {}
+        else:
+            return 'do_provisioning_action', '1.23', {'action': target}
+
+    def _do_node_provisioning_action(self, node_id, context, target, topic):
+        if target == states.ACTIVE:
+            self.do_node_deploy(context, node_id, False, None, topic=topic)
+        elif target == states.DELETED:
+            self.do_node_tear_down(context, node_id, topic=topic)
+        elif target == states.VERBS['inspect']:
+            self.inspect_hardware(context, node_id, topic=topic)
+        else:
+            self.do_provisioning_action(context, node_id, target,
+                                        topic=topic)
+
     def do_provisioning_action(self, context, node_id, action, topic=None):
         """Signal to conductor service to perform the given action on a node.
 
@@ -60,6 +60,21 @@ attributes that you may access:
         The Driver for the Node, or the Driver based on the
         'driver_name' kwarg of TaskManager().
 
+The ports, portgroups, volume connectors and volume targets are loaded from
+the database on first access and cached for the lifetime of the task.
+
+Constraints on the node fields can be passed when acquiring or upgrading a
+lock, in which case NodeConstraintsNotMet is raised without loading the
+driver if the node does not meet them. For exclusive locks the
+constraints are checked in the same database statement that reserves the
+node:
+
+::
+
+    with task_manager.acquire(context, node_id, purpose='sync',
+                              constraints={'maintenance': False}) as task:
+        ...
+
 Example usage:
 
 ::
@@ -104,6 +119,7 @@ import copy
 import functools
 
 import futurist
+from ironic_lib import metrics_utils
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import excutils
@@ -120,6 +136,8 @@ from ironic.objects import fields
 
 LOG = logging.getLogger(__name__)
 
+METRICS = metrics_utils.get_metrics_logger(__name__)
+
 CONF = cfg.CONF
 
 
@@ -149,6 +167,26 @@ def require_exclusive_lock(f):
     return wrapper
 
 
+def _check_constraints(node, constraints):
+    """Check that a node meets the constraints.
+
+    :param node: a Node object.
+    :param constraints: constraints in the format accepted by
+        :meth:`ironic.objects.node.Node.reserve`, may be None.
+    :raises: NodeConstraintsNotMet if the node does not meet them.
+    """
+    for key, value in (constraints or {}).items():
+        if key.endswith('_not_in'):
+            met = getattr(node, key[:-len('_not_in')]) not in value
+        elif key.endswith('_in'):
+            met = getattr(node, key[:-len('_in')]) in value
+        else:
+            met = getattr(node, key) == value
+        if not met:
+            raise exception.NodeConstraintsNotMet(node=node.uuid,
+                                                  constraints=constraints)
+
+
 def acquire(context, *args, **kwargs):
     """Shortcut for acquiring a lock on a Node.
 
@@ -171,7 +209,7 @@ class TaskManager(object):
 
     def __init__(self, context, node_id, shared=False,
                  purpose='unspecified action', retry=True,
-                 load_driver=True):
+                 load_driver=True, constraints=None):
         """Create a new TaskManager.
 
         Acquire a lock on a node. The lock can be either shared or
@@ -188,10 +226,14 @@ class TaskManager(object):
         :param load_driver: whether to load the ``driver`` object. Set this to
                             False if loading the driver is undesired or
                             impossible.
+        :param constraints: optional dictionary of constraints the node has
+                            to meet, see
+                            :meth:`ironic.objects.node.Node.reserve`.
         :raises: DriverNotFound
         :raises: InterfaceNotFoundInEntrypoint
         :raises: NodeNotFound
         :raises: NodeLocked
+        :raises: NodeConstraintsNotMet
 
         """
 
@@ -200,11 +242,12 @@ class TaskManager(object):
 
         self.context = context
         self._node = None
+        self._resources = {}
         self.node_id = node_id
         self.shared = shared
         self._retry = retry
 
-        self.fsm = states.machine.copy()
+        self.fsm = states.machine.cursor()
         self._purpose = purpose
         self._debug_timer = timeutils.StopWatch()
 
@@ -215,24 +258,27 @@ class TaskManager(object):
         self._saved_node = None
 
         try:
-            node = objects.Node.get(context, node_id)
-            LOG.debug("Attempting to get %(type)s lock on node %(node)s (for "
-                      "%(purpose)s)",
-                      {'type': 'shared' if shared else 'exclusive',
-                       'node': node.uuid, 'purpose': purpose})
-            if not self.shared:
-                self._lock()
+            if not self.shared and constraints:
+                # NOTE(yrobla): the constraints are checked in the statement
+                # reserving the node, which also returns it, so the node is
+                # not fetched beforehand.
+                LOG.debug("Attempting to get exclusive lock on node "
+                          "%(node)s (for %(purpose)s)",
+                          {'node': node_id, 'purpose': purpose})
+                self._lock(constraints)
             else:
-                self._debug_timer.restart()
-                self.node = node
-
-            self.ports = objects.Port.list_by_node_id(context, self.node.id)
-            self.portgroups = objects.Portgroup.list_by_node_id(context,
-                                                                self.node.id)
-            self.volume_connectors = objects.VolumeConnector.list_by_node_id(
-                context, self.node.id)
-            self.volume_targets = objects.VolumeTarget.list_by_node_id(
-                context, self.node.id)
+                node = objects.Node.get(context, node_id)
+                LOG.debug("Attempting to get %(type)s lock on node %(node)s "
+                          "(for %(purpose)s)",
+                          {'type': 'shared' if shared else 'exclusive',
+                           'node': node.uuid, 'purpose': purpose})
+                if not self.shared:
+                    self._lock()
+                else:
+                    _check_constraints(node, constraints)
+                    self._debug_timer.restart()
+                    self.node = node
+
             if load_driver:
                 self.driver = driver_factory.build_driver_for_task(self)
             else:
@@ -253,7 +299,55 @@ class TaskManager(object):
             self.fsm.initialize(start_state=self.node.provision_state,
                                 target_state=self.node.target_provision_state)
 
-    def _lock(self):
+    def _get_resource(self, name, object_class):
+        """Get the node resources, loading them on first access.
+
+        :param name: name of the task attribute.
+        :param object_class: object class with a list_by_node_id method.
+        :returns: a list of objects, or None if the task was released.
+        """
+        if name not in self._resources:
+            if self.node is None:
+                return None
+            METRICS.send_counter('TaskManager.%s.loaded' % name, 1)
+            self._resources[name] = object_class.list_by_node_id(
+                self.context, self.node.id)
+        return self._resources[name]
+
+    @property
+    def ports(self):
+        return self._get_resource('ports', objects.Port)
+
+    @ports.setter
+    def ports(self, ports):
+        self._resources['ports'] = ports
+
+    @property
+    def portgroups(self):
+        return self._get_resource('portgroups', objects.Portgroup)
+
+    @portgroups.setter
+    def portgroups(self, portgroups):
+        self._resources['portgroups'] = portgroups
+
+    @property
+    def volume_connectors(self):
+        return self._get_resource('volume_connectors',
+                                  objects.VolumeConnector)
+
+    @volume_connectors.setter
+    def volume_connectors(self, volume_connectors):
+        self._resources['volume_connectors'] = volume_connectors
+
+    @property
+    def volume_targets(self):
+        return self._get_resource('volume_targets', objects.VolumeTarget)
+
+    @volume_targets.setter
+    def volume_targets(self, volume_targets):
+        self._resources['volume_targets'] = volume_targets
+
+    def _lock(self, constraints=None):
         self._debug_timer.restart()
 
         if self._retry:
@@ -270,7 +364,8 @@ class TaskManager(object):
             wait_fixed=CONF.conductor.node_locked_retry_interval * 1000)
         def reserve_node():
             self.node = objects.Node.reserve(self.context, CONF.host,
-                                             self.node_id)
+                                             self.node_id,
+                                             constraints=constraints)
             LOG.debug("Node %(node)s successfully reserved for %(purpose)s "
                       "(took %(time).2f seconds)",
                       {'node': self.node.uuid, 'purpose': self._purpose,
@@ -279,7 +374,7 @@ class TaskManager(object):
 
         reserve_node()
 
-    def upgrade_lock(self, purpose=None):
+    def upgrade_lock(self, purpose=None, constraints=None):
         """Upgrade a shared lock to an exclusive lock.
 
         Also reloads node object from the database.
@@ -287,8 +382,14 @@ class TaskManager(object):
         when provided with one.
 
         :param purpose: optionally change the purpose of the lock
+        :param constraints: optional dictionary of constraints the node has
+                            to meet to be locked, see
+                            :meth:`ironic.objects.node.Node.reserve`. Only
+                            checked if the lock is actually upgraded.
         :raises: NodeLocked if an exclusive lock remains on the node after
                             "node_locked_retry_attempts"
+        :raises: NodeConstraintsNotMet if the node does not meet the
+                 constraints, the lock stays shared in this case.
         """
         if purpose is not None:
             self._purpose = purpose
@@ -298,7 +399,7 @@ class TaskManager(object):
                       'seconds)',
                       {'uuid': self.node.uuid, 'purpose': self._purpose,
                        'time': self._debug_timer.elapsed()})
-            self._lock()
+            self._lock(constraints)
             self.shared = False
 
     def spawn_after(self, _spawn_method, *args, **kwargs):
@@ -393,7 +494,7 @@ class TaskManager(object):
         if self.node is None:
             # Rare case if resource released before notification
             task = copy.copy(self)
-            task.fsm = states.machine.copy()
+            task.fsm = states.machine.cursor()
             task.node = self._saved_node
         else:
             task = self
@@ -22,6 +22,7 @@ import time
 from openstack.baremetal import configdrive as os_configdrive
 from oslo_config import cfg
 from oslo_log import log
+import oslo_messaging as messaging
 from oslo_serialization import jsonutils
 from oslo_service import loopingcall
 from oslo_utils import excutils
@@ -1099,3 +1100,30 @@ def is_agent_token_pregenerated(node):
     """
     return node.driver_internal_info.get(
         'agent_secret_token_pregenerated', False)
+
+
+def call_for_each_node(node_ids, func, *args, **kwargs):
+    """Call a function for several nodes, collecting the errors.
+
+    :param node_ids: a list of node IDs or UUIDs.
+    :param func: the function to call with each node ID, followed by args
+        and kwargs.
+    :returns: a dictionary mapping each node ID to None if the call
+        succeeded, or to a dictionary with the HTTP status ``code`` and the
+        ``message`` of the IronicException it raised. Other exceptions are
+        not caught.
+    """
+    results = {}
+    for node_id in node_ids:
+        try:
+            try:
+                func(node_id, *args, **kwargs)
+            except messaging.ExpectedException as e:
+                # NOTE(yrobla): raised by RPC methods for the exceptions they
+                # are expected to raise, unwrap it.
+                raise e.exc_info[1]
+        except exception.IronicException as e:
+            results[node_id] = {'code': e.code, 'message': str(e)}
+        else:
+            results[node_id] = None
+    return results
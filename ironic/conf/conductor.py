@@ -53,6 +53,29 @@ opts = [
                default=60,
                help=_('Interval between syncing the node power state to the '
                       'database, in seconds. Set to 0 to disable syncing.')),
+    cfg.IntOpt('sync_power_state_max_interval',
+               default=0, min=0,
+               help=_('Maximum interval between syncing the power state of '
+                      'a node whose power state is stable, in seconds. '
+                      'When set to a value larger than '
+                      '`sync_power_state_interval`, nodes in a stable '
+                      'provision state whose power state is found unchanged '
+                      'are synced less and less often, the interval doubling '
+                      'on every successful sync up to this value. Nodes '
+                      'whose power state changes or can not be synced, and '
+                      'nodes whose power state is changed through the API, '
+                      'are synced every `sync_power_state_interval` again. '
+                      'Set to 0 to sync all nodes every '
+                      '`sync_power_state_interval`.')),
+    cfg.FloatOpt('sync_power_state_max_rate',
+                 default=0, min=0,
+                 help=_('Maximum average number of nodes per second whose '
+                        'power state is synced by this conductor, to limit '
+                        'the load on the BMCs and the database. The nodes '
+                        'not synced for the longest time are synced first, '
+                        'so that nodes skipped because of this limit are '
+                        'synced on the next runs of the periodic task. Set '
+                        'to 0 for no limit.')),
     cfg.IntOpt('check_provision_state_interval',
                default=60,
                min=0,
@@ -68,6 +91,13 @@ opts = [
                min=0,
                help=_('Interval between checks of orphaned allocations, '
                       'in seconds. Set to 0 to disable checks.')),
+    cfg.IntOpt('allocation_batch_size',
+               default=50,
+               min=1,
+               help=_('Maximum number of pending allocations processed '
+                      'together by one worker. The allocations of a batch '
+                      'with the same requirements share one list of '
+                      'candidate nodes.')),
     cfg.IntOpt('deploy_callback_timeout',
                default=1800,
                help=_('Timeout (seconds) to wait for a callback from '
@@ -89,6 +119,15 @@ opts = [
                help=_('The maximum number of worker threads that can be '
                       'started simultaneously to sync nodes power states from '
                       'the periodic task.')),
+    cfg.IntOpt('sync_power_state_batch_size',
+               default=10, min=1,
+               help=_('The number of nodes each power state sync worker '
+                      'handles at once. Nodes sharing the same driver, '
+                      'power interface and BMC address are always handled '
+                      'in the same batch, even if there are more of them, '
+                      'and have their power states requested with a single '
+                      'call to the power interface, which some drivers can '
+                      'answer with a single request to the BMC.')),
     cfg.IntOpt('periodic_max_workers',
                default=8,
                help=_('Maximum number of worker threads that can be started '
@@ -20,7 +20,13 @@ from ironic.common.i18n import _
 opts = [
     cfg.StrOpt('mysql_engine',
                default='InnoDB',
-               help=_('MySQL engine to use.'))
+               help=_('MySQL engine to use.')),
+    cfg.IntOpt('node_chunk_size',
+               default=1000,
+               min=1,
+               help=_('Number of nodes to fetch from the database in one '
+                      'query when iterating over nodes, for example in '
+                      'conductor periodic tasks.')),
 ]
 
 
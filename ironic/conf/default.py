@@ -186,6 +186,15 @@ hash_opts = [
                help=_('Time (in seconds) after which the hash ring is '
                       'considered outdated and is refreshed on the next '
                       'access.')),
+    cfg.BoolOpt('hash_ring_db_filtering',
+                default=True,
+                help=_('If True, conductors only request the nodes which '
+                       'may be mapped to them on the hash ring from the '
+                       'database when running periodic tasks, instead of '
+                       'fetching all nodes and filtering them afterwards. '
+                       'Nodes without a hash bucket, for example ones created '
+                       'before upgrading and not yet handled by the online '
+                       'data migrations, are always fetched.')),
 ]
 
 image_opts = [
@@ -327,6 +336,22 @@ service_opts = [
                         ('json-rpc', _('use JSON RPC transport'))],
                help=_('Which RPC transport implementation to use between '
                       'conductor and API services')),
+    cfg.IntOpt('rpc_concurrency',
+               default=16, min=1,
+               help=_('Maximum number of RPC calls to conductors which a '
+                      'process of the API service sends concurrently on '
+                      'behalf of requests touching nodes mapped to several '
+                      'conductors, such as bulk actions. When the service '
+                      'runs with eventlet, the calls are made in '
+                      'greenthreads, otherwise in native threads.')),
+    cfg.BoolOpt('rpc_send_changes_only',
+                default=False,
+                help=_('Whether API services send only the changed fields '
+                       'of a node to the conductor when updating it, '
+                       'instead of the whole node. The conductor loads the '
+                       'other fields from the database. The whole node is '
+                       'still sent while the RPC version is pinned to a '
+                       'release not supporting it.')),
     cfg.BoolOpt('require_agent_token',
                 default=False,
                 help=_('Used to require the use of agent tokens. These '
@@ -41,6 +41,20 @@ opts = [
                        'node power state if `ipmitool` process does not exit '
                        'after `command_retry_timeout` timeout expires. '
                        'Recommended setting is True')),
+    cfg.BoolOpt('use_persistent_sessions',
+                default=False,
+                help=_('Keep an `ipmitool shell` process running for each '
+                       'BMC to request power states, reusing its IPMI '
+                       'session, instead of starting a new `ipmitool` '
+                       'process and IPMI session on every request. At most '
+                       'one command at a time is sent to each BMC this way. '
+                       'Requires an `ipmitool` version supporting the '
+                       '`shell` and `echo` commands.')),
+    cfg.IntOpt('session_idle_timeout',
+               default=300, min=1,
+               help=_('Time in seconds after which an unused `ipmitool '
+                      'shell` process is stopped when '
+                      '[ipmi]use_persistent_sessions is enabled.')),
     cfg.BoolOpt('disable_boot_timeout',
                 default=True,
                 help=_('Default timeout behavior whether ironic sends a raw '
@@ -32,6 +32,44 @@ opts = [
     cfg.BoolOpt('use_ssl',
                 default=False,
                 help=_('Whether to use TLS for JSON RPC')),
+    cfg.IntOpt('connection_pool_size',
+               default=10,
+               min=1,
+               help=_('Maximum number of connections to each conductor kept '
+                      'open by a JSON RPC client for reuse.')),
+    cfg.IntOpt('connection_pool_max_hosts',
+               default=64,
+               min=1,
+               help=_('Maximum number of conductors a JSON RPC client keeps '
+                      'connection pools for. When more conductors are '
+                      'contacted, the pool of the least recently used one is '
+                      'closed.')),
+    cfg.BoolOpt('connection_pool_block',
+                default=False,
+                help=_('Whether a JSON RPC client waits for a free '
+                       'connection when all pooled connections to a '
+                       'conductor are in use. If disabled, an extra '
+                       'connection is opened and closed after the request.')),
+    cfg.IntOpt('tcp_keepidle',
+               default=600,
+               min=0,
+               help=_('Idle time in seconds before TCP keep-alive probes '
+                      'are sent on the pooled JSON RPC client connections. '
+                      'Set to 0 to disable TCP keep-alive.')),
+    cfg.StrOpt('payload_encoding',
+               default='json',
+               choices=[('json', _('encode payloads as JSON')),
+                        ('msgpack', _('encode payloads with MessagePack when '
+                                      'the conductor supports it, otherwise '
+                                      'as JSON'))],
+               help=_('Encoding of the JSON RPC payloads sent by the '
+                      'client. Conductors accept both encodings and reply '
+                      'in the one accepted by the client.')),
+    cfg.IntOpt('batch_pool_size',
+               default=100,
+               min=1,
+               help=_('Maximum number of requests from JSON RPC batch '
+                      'requests processed concurrently by a conductor.')),
 ]
 
 
@@ -63,6 +63,10 @@ class Connection(object, metaclass=abc.ABCMeta):
                         :provisioned_before:
                             nodes with provision_updated_at field before this
                             interval in seconds
+                        :hash_buckets:
+                            dictionary mapping (conductor_group, driver)
+                            tuples to lists of inclusive hash bucket ranges,
+                            see HashRingManager.get_hash_buckets
         :param limit: Maximum number of nodes to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
@@ -72,9 +76,32 @@ class Connection(object, metaclass=abc.ABCMeta):
         :returns: A list of tuples of the specified columns.
         """
 
+    @abc.abstractmethod
+    def get_nodeinfo_iter(self, columns=None, filters=None, sort_key=None,
+                          sort_dir=None, chunk_size=None):
+        """Iterate over specific columns of matching nodes.
+
+        Same as get_nodeinfo_list, but the nodes are fetched lazily in chunks
+        using keyset pagination, so that the caller can start processing the
+        first nodes before all of them are loaded, and the memory usage does
+        not depend on the number of matching nodes.
+
+        :param columns: List of column names to return.
+                        Defaults to 'id' column when columns == None.
+        :param filters: Filters to apply, see get_nodeinfo_list.
+        :param sort_key: Attribute by which results should be sorted. Should
+                         not be nullable, since rows with a NULL value cannot
+                         be reliably paginated.
+        :param sort_dir: direction in which results should be sorted.
+                         (asc, desc)
+        :param chunk_size: Number of nodes to fetch in one query. Defaults to
+                           the [database]node_chunk_size option.
+        :returns: A generator of tuples of the specified columns.
+        """
+
     @abc.abstractmethod
     def get_node_list(self, filters=None, limit=None, marker=None,
-                      sort_key=None, sort_dir=None):
+                      sort_key=None, sort_dir=None, fields=None):
         """Return a list of nodes.
 
         :param filters: Filters to apply. Defaults to None.
@@ -88,12 +115,17 @@ class Connection(object, metaclass=abc.ABCMeta):
                         :provisioned_before:
                             nodes with provision_updated_at field before this
                             interval in seconds
+                        :traits: list of traits, all of which the nodes
+                            must have
         :param limit: Maximum number of nodes to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
+        :param fields: Names of the fields to load, or None to load all
+                       fields. Other fields of the returned objects must not
+                       be accessed.
         """
 
     @abc.abstractmethod
@@ -111,7 +143,7 @@ class Connection(object, metaclass=abc.ABCMeta):
         """
 
     @abc.abstractmethod
-    def reserve_node(self, tag, node_id):
+    def reserve_node(self, tag, node_id, constraints=None):
         """Reserve a node.
 
         To prevent other ManagerServices from manipulating the given
@@ -119,9 +151,22 @@ class Connection(object, metaclass=abc.ABCMeta):
 
         :param tag: A string uniquely identifying the reservation holder.
         :param node_id: A node id or uuid.
+        :param constraints: Optional dictionary of constraints the node has
+                            to meet to be reserved. Keys are node field
+                            names, optionally with an ``_in`` or ``_not_in``
+                            suffix, e.g.::
+
+                                {'maintenance': False,
+                                 'provision_state_not_in': [...]}
+
+                            They are checked atomically with the
+                            reservation.
         :returns: A Node object.
         :raises: NodeNotFound if the node is not found.
         :raises: NodeLocked if the node is already reserved.
+        :raises: NodeConstraintsNotMet if the node does not meet the
+                 constraints.
+        :raises: ValueError if a constraint refers to an unknown field.
         """
 
     @abc.abstractmethod
@@ -169,18 +214,24 @@ class Connection(object, metaclass=abc.ABCMeta):
         """
 
     @abc.abstractmethod
-    def get_node_by_uuid(self, node_uuid):
+    def get_node_by_uuid(self, node_uuid, fields=None):
         """Return a node.
 
         :param node_uuid: The uuid of a node.
+        :param fields: Names of the fields to load, or None to load all
+                       fields. Other fields of the returned node must not
+                       be accessed.
         :returns: A node.
         """
 
     @abc.abstractmethod
-    def get_node_by_name(self, node_name):
+    def get_node_by_name(self, node_name, fields=None):
         """Return a node.
 
         :param node_name: The logical name of a node.
+        :param fields: Names of the fields to load, or None to load all
+                       fields. Other fields of the returned node must not
+                       be accessed.
         :returns: A node.
         """
 
@@ -253,7 +304,7 @@ class Connection(object, metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def get_port_list(self, limit=None, marker=None,
-                      sort_key=None, sort_dir=None):
+                      sort_key=None, sort_dir=None, fields=None):
         """Return a list of ports.
 
         :param limit: Maximum number of ports to return.
@@ -262,11 +313,14 @@ class Connection(object, metaclass=abc.ABCMeta):
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
+        :param fields: Names of the fields to load, or None to load all
+                       fields. Other fields of the returned objects must not
+                       be accessed.
         """
 
     @abc.abstractmethod
     def get_ports_by_node_id(self, node_id, limit=None, marker=None,
-                             sort_key=None, sort_dir=None):
+                             sort_key=None, sort_dir=None, fields=None):
         """List all the ports for a given node.
 
         :param node_id: The integer node ID.
@@ -276,12 +330,15 @@ class Connection(object, metaclass=abc.ABCMeta):
         :param sort_key: Attribute by which results should be sorted
         :param sort_dir: direction in which results should be sorted
                          (asc, desc)
+        :param fields: Names of the fields to load, or None to load all
+                       fields. Other fields of the returned objects must not
+                       be accessed.
         :returns: A list of ports.
         """
 
     @abc.abstractmethod
     def get_ports_by_portgroup_id(self, portgroup_id, limit=None, marker=None,
-                                  sort_key=None, sort_dir=None):
+                                  sort_key=None, sort_dir=None, fields=None):
         """List all the ports for a given portgroup.
 
         :param portgroup_id: The integer portgroup ID.
@@ -291,6 +348,9 @@ class Connection(object, metaclass=abc.ABCMeta):
         :param sort_key: Attribute by which results should be sorted
         :param sort_dir: Direction in which results should be sorted
                          (asc, desc)
+        :param fields: Names of the fields to load, or None to load all
+                       fields. Other fields of the returned objects must not
+                       be accessed.
         :returns: A list of ports.
         """
 
@@ -355,7 +415,7 @@ class Connection(object, metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def get_portgroup_list(self, limit=None, marker=None,
-                           sort_key=None, sort_dir=None):
+                           sort_key=None, sort_dir=None, fields=None):
         """Return a list of portgroups.
 
         :param limit: Maximum number of portgroups to return.
@@ -364,12 +424,15 @@ class Connection(object, metaclass=abc.ABCMeta):
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: Direction in which results should be sorted.
                          (asc, desc)
+        :param fields: Names of the fields to load, or None to load all
+                       fields. Other fields of the returned objects must not
+                       be accessed.
         :returns: A list of portgroups.
         """
 
     @abc.abstractmethod
     def get_portgroups_by_node_id(self, node_id, limit=None, marker=None,
-                                  sort_key=None, sort_dir=None):
+                                  sort_key=None, sort_dir=None, fields=None):
         """List all the portgroups for a given node.
 
         :param node_id: The integer node ID.
@@ -379,6 +442,9 @@ class Connection(object, metaclass=abc.ABCMeta):
         :param sort_key: Attribute by which results should be sorted
         :param sort_dir: Direction in which results should be sorted
                          (asc, desc)
+        :param fields: Names of the fields to load, or None to load all
+                       fields. Other fields of the returned objects must not
+                       be accessed.
         :returns: A list of portgroups.
         """
 
@@ -561,6 +627,17 @@ class Connection(object, metaclass=abc.ABCMeta):
                      hardware-type-b: set([host2, host3])}
         """
 
+    @abc.abstractmethod
+    def get_active_hardware_type_fingerprint(self):
+        """Get a cheap fingerprint of the active hardware type mapping.
+
+        The fingerprint changes whenever the result of
+        get_active_hardware_type_dict may change: when conductors register,
+        unregister or stop heart-beating. Heartbeats alone do not change it.
+
+        :returns: A tuple which can be compared with the previous result.
+        """
+
     @abc.abstractmethod
     def get_offline_conductors(self, field='hostname'):
         """Get a list conductors that are offline (dead).
@@ -935,6 +1012,18 @@ class Connection(object, metaclass=abc.ABCMeta):
                   False otherwise.
         """
 
+    @abc.abstractmethod
+    def backfill_node_hash_buckets(self, context, max_count):
+        """Calculates the hash bucket of nodes that do not have one.
+
+        :param context: the admin context
+        :param max_count: The maximum number of objects to migrate. Must be
+                          >= 0. If zero, all the objects will be migrated.
+        :returns: A 2-tuple, 1. the total number of objects that need to be
+                  migrated (at the beginning of this call) and 2. the number
+                  of migrated objects.
+        """
+
     @abc.abstractmethod
     def update_to_latest_versions(self, context, max_count):
         """Updates objects to their latest known versions.
@@ -1147,6 +1236,15 @@ class Connection(object, metaclass=abc.ABCMeta):
         :returns: A list of allocations.
         """
 
+    @abc.abstractmethod
+    def get_allocation_uuids(self, allocation_ids):
+        """Map allocation IDs to allocation UUIDs.
+
+        :param allocation_ids: A list of allocation IDs.
+        :returns: A dictionary mapping the IDs of existing allocations to
+            their UUIDs.
+        """
+
     @abc.abstractmethod
     def create_allocation(self, values):
         """Create a new allocation.
@@ -1189,6 +1287,24 @@ class Connection(object, metaclass=abc.ABCMeta):
         :raises: AllocationNotFound
         """
 
+    @abc.abstractmethod
+    def claim_node_for_allocation(self, allocation_id, node_id):
+        """Associate a node with an allocation if it is still suitable.
+
+        The node is only updated if it is available, not in maintenance,
+        not reserved by a conductor, not associated with an instance or
+        another allocation, and still matches the resource class, owner and
+        traits of the allocation. This check and the update are done with one
+        conditional UPDATE statement, without locking the node.
+
+        :param allocation_id: Allocation ID or UUID
+        :param node_id: The ID of the node to claim.
+        :returns: The updated allocation if the node was claimed, None if it
+            no longer matches the conditions above.
+        :raises: AllocationNotFound
+        :raises: InstanceAssociated
+        """
+
     @abc.abstractmethod
     def destroy_allocation(self, allocation_id):
         """Destroy an allocation.
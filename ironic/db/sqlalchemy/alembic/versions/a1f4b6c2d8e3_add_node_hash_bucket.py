@@ -0,0 +1,33 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""add nodes.hash_bucket field
+
+Revision ID: a1f4b6c2d8e3
+Revises: cd2c80feb331
+Create Date: 2026-10-16 10:12:41.203511
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a1f4b6c2d8e3'
+down_revision = 'cd2c80feb331'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('nodes', sa.Column('hash_bucket', sa.Integer(),
+                                     nullable=True))
+    op.create_index('node_hash_bucket_idx', 'nodes', ['hash_bucket'],
+                    unique=False)
@@ -18,6 +18,7 @@ import collections
 import datetime
 import json
 import threading
+import types
 
 from oslo_db import api as oslo_db_api
 from oslo_db import exception as db_exc
@@ -32,9 +33,11 @@ from osprofiler import sqlalchemy as osp_sqlalchemy
 import sqlalchemy as sa
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import load_only
 from sqlalchemy import sql
 
 from ironic.common import exception
+from ironic.common import hash_ring
 from ironic.common.i18n import _
 from ironic.common import profiler
 from ironic.common import release_mappings
@@ -87,6 +90,42 @@ def _get_node_query_with_all():
             .options(joinedload('traits')))
 
 
+def _add_load_only(query, model, fields):
+    """Only load some columns of the model.
+
+    The ``id`` and ``version`` columns are always loaded. Names that are not
+    columns of the model are ignored.
+
+    :param query: Initial query to add the option to.
+    :param model: the model class of the query.
+    :param fields: names of the columns to load, or None to load all of them.
+    :returns: Modified query.
+    """
+    if fields is None:
+        return query
+    columns = set(model.__table__.columns.keys())
+    names = {'id', 'version'} | (columns & set(fields))
+    return query.options(load_only(*sorted(names)))
+
+
+def _get_node_query_with_fields(fields):
+    """Return a query object for the Node loading only the given fields.
+
+    Tags and traits are only joined if they are requested.
+
+    :param fields: names of the fields to load, or None to load all of them.
+    :returns: a query object.
+    """
+    if fields is None:
+        return _get_node_query_with_all()
+
+    query = _add_load_only(model_query(models.Node), models.Node, fields)
+    for relationship in ('tags', 'traits'):
+        if relationship in fields:
+            query = query.options(joinedload(relationship))
+    return query
+
+
 def _get_deploy_template_query_with_steps():
     """Return a query object for the DeployTemplate joined with steps.
 
@@ -124,6 +163,52 @@ def add_identity_filter(query, value):
         raise exception.InvalidIdentity(identity=value)
 
 
+def add_node_constraints(query, constraints):
+    """Adds constraints on node fields to a query.
+
+    Each key of the constraints is either a node field name, which must
+    be equal to the value, or a field name with an ``_in`` or ``_not_in``
+    suffix, in which case the field value must (not) be in the value.
+
+    :param query: Initial query to add constraints to.
+    :param constraints: Dictionary of constraints, may be None.
+    :return: Modified query.
+    :raises: ValueError if a constraint refers to an unknown field.
+    """
+    for key, value in (constraints or {}).items():
+        if key.endswith('_not_in'):
+            field, operator = key[:-len('_not_in')], 'notin_'
+        elif key.endswith('_in'):
+            field, operator = key[:-len('_in')], 'in_'
+        else:
+            field, operator = key, '__eq__'
+        column = getattr(models.Node, field, None)
+        if column is None:
+            raise ValueError(_("Unknown node field %s in constraints")
+                             % field)
+        query = query.filter(getattr(column, operator)(value))
+    return query
+
+
+def _node_meets_constraints(node, constraints):
+    """Check that a node row meets the constraints.
+
+    :param node: a Node model.
+    :param constraints: Dictionary of constraints, see add_node_constraints.
+    :return: True if all constraints are met, False otherwise.
+    """
+    for key, value in constraints.items():
+        if key.endswith('_not_in'):
+            met = node[key[:-len('_not_in')]] not in value
+        elif key.endswith('_in'):
+            met = node[key[:-len('_in')]] in value
+        else:
+            met = node[key] == value
+        if not met:
+            return False
+    return True
+
+
 def add_port_filter(query, value):
     """Adds a port-specific filter to a query.
 
@@ -218,6 +303,51 @@ def add_allocation_filter_by_conductor(query, value):
         return query.filter(models.Conductor.hostname == value)
 
 
+def add_node_filter_by_hash_buckets(query, value):
+    """Adds a hash ring bucket filter to a node query.
+
+    Nodes that do not have a hash bucket yet always match the filter.
+
+    :param query: Initial query to add filter to.
+    :param value: A dictionary mapping (conductor_group, driver) tuples to
+        lists of (first, last) inclusive hash bucket ranges. A conductor
+        group of None matches any conductor group.
+    :return: Modified query.
+    """
+    clauses = []
+    for (conductor_group, driver), ranges in value.items():
+        ring_clause = sql.or_(
+            models.Node.hash_bucket == sql.null(),
+            *[models.Node.hash_bucket.between(first, last)
+              for first, last in ranges])
+        if conductor_group is not None:
+            ring_clause = sql.and_(
+                models.Node.conductor_group == conductor_group, ring_clause)
+        clauses.append(sql.and_(models.Node.driver == driver, ring_clause))
+    return query.filter(sql.or_(sql.false(), *clauses))
+
+
+def add_node_filter_by_traits(query, value):
+    """Adds a filter to a node query matching the nodes with all given traits.
+
+    The nodes are found in the node_traits_idx index, by counting how many of
+    the requested traits each of them has.
+
+    :param query: Initial query to add filter to.
+    :param value: A list of traits.
+    :return: Modified query.
+    """
+    traits = set(value)
+    if not traits:
+        return query
+    node_ids = (model_query(models.NodeTrait.node_id)
+                .filter(models.NodeTrait.trait.in_(traits))
+                .group_by(models.NodeTrait.node_id)
+                .having(sql.func.count(models.NodeTrait.trait) == len(traits))
+                .subquery())
+    return query.filter(models.Node.id.in_(node_ids))
+
+
 def _paginate_query(model, limit=None, marker=None, sort_key=None,
                     sort_dir=None, query=None):
     if not query:
@@ -225,6 +355,15 @@ def _paginate_query(model, limit=None, marker=None, sort_key=None,
     sort_keys = ['id']
     if sort_key and sort_key not in sort_keys:
         sort_keys.insert(0, sort_key)
+    if (marker is not None and hasattr(marker, 'obj_attr_is_set')
+            and not marker.obj_attr_is_set('id')):
+        # NOTE(yrobla): markers from the next links of the API do not expose
+        # the internal ID of the last item, find it in the same query.
+        marker_id = (sa.select([model.id]).where(model.uuid == marker.uuid)
+                     .as_scalar())
+        marker = types.SimpleNamespace(**{
+            key: marker_id if key == 'id' else getattr(marker, key)
+            for key in sort_keys})
     try:
         query = db_utils.paginate_query(query, model, limit, sort_keys,
                                         marker=marker, sort_dir=sort_dir)
@@ -296,7 +435,7 @@ class Connection(api.Connection):
                               'with_power_state': 'power_state'}
     _NODE_FILTERS = ({'chassis_uuid', 'reserved_by_any_of',
                       'provisioned_before', 'inspection_started_before',
-                      'description_contains'}
+                      'description_contains', 'hash_buckets', 'traits'}
                      | _NODE_QUERY_FIELDS
                      | set(_NODE_IN_QUERY_FIELDS)
                      | set(_NODE_NON_NULL_FILTERS))
@@ -354,6 +493,11 @@ class Connection(api.Connection):
             if keyword is not None:
                 query = query.filter(
                     models.Node.description.like(r'%{}%'.format(keyword)))
+        if 'hash_buckets' in filters:
+            query = add_node_filter_by_hash_buckets(query,
+                                                    filters['hash_buckets'])
+        if 'traits' in filters:
+            query = add_node_filter_by_traits(query, filters['traits'])
 
         return query
 
@@ -400,9 +544,37 @@ class Connection(api.Connection):
         return _paginate_query(models.Node, limit, marker,
                                sort_key, sort_dir, query)
 
+    def get_nodeinfo_iter(self, columns=None, filters=None, sort_key=None,
+                          sort_dir=None, chunk_size=None):
+        if columns is None:
+            columns = ['id']
+        if chunk_size is None:
+            chunk_size = CONF.database.node_chunk_size
+        # NOTE(yrobla): the columns used for pagination have to be fetched
+        # to build the marker for the next chunk, but are not returned.
+        extra_columns = [c for c in ('id', sort_key)
+                         if c and c not in columns]
+        query_columns = [getattr(models.Node, c)
+                         for c in columns + extra_columns]
+
+        marker = None
+        while True:
+            # NOTE(yrobla): every chunk is fetched in its own short query
+            # instead of keeping a server-side cursor open while the caller
+            # processes the rows, which can take a long time.
+            query = model_query(*query_columns)
+            query = self._add_nodes_filters(query, filters)
+            rows = _paginate_query(models.Node, chunk_size, marker,
+                                   sort_key, sort_dir, query)
+            for row in rows:
+                yield tuple(row[:len(columns)]) if extra_columns else row
+            if len(rows) < chunk_size:
+                return
+            marker = rows[-1]
+
     def get_node_list(self, filters=None, limit=None, marker=None,
-                      sort_key=None, sort_dir=None):
-        query = _get_node_query_with_all()
+                      sort_key=None, sort_dir=None, fields=None):
+        query = _get_node_query_with_fields(fields)
         query = self._add_nodes_filters(query, filters)
         return _paginate_query(models.Node, limit, marker,
                                sort_key, sort_dir, query)
@@ -441,16 +613,29 @@ class Connection(api.Connection):
         return mapping
 
     @oslo_db_api.retry_on_deadlock
-    def reserve_node(self, tag, node_id):
+    def reserve_node(self, tag, node_id, constraints=None):
         with _session_for_write():
             query = _get_node_query_with_all()
             query = add_identity_filter(query, node_id)
+            # NOTE(yrobla): the constraints are checked in the same UPDATE
+            # statement, so that nodes not meeting them are never reserved.
+            update_query = add_node_constraints(
+                query.filter_by(reservation=None), constraints)
             # be optimistic and assume we usually create a reservation
-            count = query.filter_by(reservation=None).update(
+            count = update_query.update(
                 {'reservation': tag}, synchronize_session=False)
             try:
                 node = query.one()
                 if count != 1:
+                    # NOTE(yrobla): nodes not meeting the constraints are
+                    # reported as such even when locked, so that callers do
+                    # not retry locking them.
+                    if constraints and (
+                            node['reservation'] is None
+                            or not _node_meets_constraints(node,
+                                                           constraints)):
+                        raise exception.NodeConstraintsNotMet(
+                            node=node.uuid, constraints=constraints)
                     # Nothing updated and node exists. Must already be
                     # locked.
                     raise exception.NodeLocked(node=node.uuid,
@@ -487,6 +672,7 @@ class Connection(api.Connection):
             values['power_state'] = states.NOSTATE
         if 'provision_state' not in values:
             values['provision_state'] = states.ENROLL
+        values['hash_bucket'] = hash_ring.get_hash_bucket(values['uuid'])
 
         # TODO(zhenguo): Support creating node with tags
         if 'tags' in values:
@@ -528,16 +714,16 @@ class Connection(api.Connection):
         except NoResultFound:
             raise exception.NodeNotFound(node=node_id)
 
-    def get_node_by_uuid(self, node_uuid):
-        query = _get_node_query_with_all()
+    def get_node_by_uuid(self, node_uuid, fields=None):
+        query = _get_node_query_with_fields(fields)
         query = query.filter_by(uuid=node_uuid)
         try:
             return query.one()
         except NoResultFound:
             raise exception.NodeNotFound(node=node_uuid)
 
-    def get_node_by_name(self, node_name):
-        query = _get_node_query_with_all()
+    def get_node_by_name(self, node_name, fields=None):
+        query = _get_node_query_with_fields(fields)
         query = query.filter_by(name=node_name)
         try:
             return query.one()
@@ -688,16 +874,17 @@ class Connection(api.Connection):
             raise exception.PortNotFound(port=address)
 
     def get_port_list(self, limit=None, marker=None,
-                      sort_key=None, sort_dir=None, owner=None):
-        query = model_query(models.Port)
+                      sort_key=None, sort_dir=None, owner=None, fields=None):
+        query = _add_load_only(model_query(models.Port), models.Port, fields)
         if owner:
             query = add_port_filter_by_node_owner(query, owner)
         return _paginate_query(models.Port, limit, marker,
                                sort_key, sort_dir, query)
 
     def get_ports_by_node_id(self, node_id, limit=None, marker=None,
-                             sort_key=None, sort_dir=None, owner=None):
-        query = model_query(models.Port)
+                             sort_key=None, sort_dir=None, owner=None,
+                             fields=None):
+        query = _add_load_only(model_query(models.Port), models.Port, fields)
         query = query.filter_by(node_id=node_id)
         if owner:
             query = add_port_filter_by_node_owner(query, owner)
@@ -705,8 +892,9 @@ class Connection(api.Connection):
                                sort_key, sort_dir, query)
 
     def get_ports_by_portgroup_id(self, portgroup_id, limit=None, marker=None,
-                                  sort_key=None, sort_dir=None, owner=None):
-        query = model_query(models.Port)
+                                  sort_key=None, sort_dir=None, owner=None,
+                                  fields=None):
+        query = _add_load_only(model_query(models.Port), models.Port, fields)
         query = query.filter_by(portgroup_id=portgroup_id)
         if owner:
             query = add_port_filter_by_node_owner(query, owner)
@@ -788,13 +976,16 @@ class Connection(api.Connection):
             raise exception.PortgroupNotFound(portgroup=name)
 
     def get_portgroup_list(self, limit=None, marker=None,
-                           sort_key=None, sort_dir=None):
+                           sort_key=None, sort_dir=None, fields=None):
+        query = _add_load_only(model_query(models.Portgroup),
+                               models.Portgroup, fields)
         return _paginate_query(models.Portgroup, limit, marker,
-                               sort_key, sort_dir)
+                               sort_key, sort_dir, query)
 
     def get_portgroups_by_node_id(self, node_id, limit=None, marker=None,
-                                  sort_key=None, sort_dir=None):
-        query = model_query(models.Portgroup)
+                                  sort_key=None, sort_dir=None, fields=None):
+        query = _add_load_only(model_query(models.Portgroup),
+                               models.Portgroup, fields)
         query = query.filter_by(node_id=node_id)
         return _paginate_query(models.Portgroup, limit, marker,
                                sort_key, sort_dir, query)
@@ -1045,6 +1236,20 @@ class Connection(api.Connection):
             d2c[key].add(cdr_row['hostname'])
         return d2c
 
+    def get_active_hardware_type_fingerprint(self):
+        # NOTE(yrobla): the hardware interfaces are re-created every time a
+        # conductor registers, while updated_at of conductors changes with
+        # every heartbeat, so it is not used here. The sum of conductor IDs
+        # changes when one conductor goes away while another one comes back.
+        iface = models.ConductorHardwareInterfaces
+        query = (model_query(sa.func.count(iface.id),
+                             sa.func.max(iface.created_at),
+                             sa.func.sum(models.Conductor.id))
+                 .select_from(iface)
+                 .join(models.Conductor))
+        query = _filter_active_conductors(query)
+        return tuple(query.one())
+
     def get_offline_conductors(self, field='hostname'):
         field = getattr(models.Conductor, field)
         interval = CONF.conductor.heartbeat_timeout
@@ -1419,6 +1624,39 @@ class Connection(api.Connection):
 
         return True
 
+    @oslo_db_api.retry_on_deadlock
+    def backfill_node_hash_buckets(self, context, max_count):
+        """Calculates the hash bucket of nodes that do not have one.
+
+        :param context: the admin context
+        :param max_count: The maximum number of objects to migrate. Must be
+                          >= 0. If zero, all the objects will be migrated.
+        :returns: A 2-tuple, 1. the total number of objects that need to be
+                  migrated (at the beginning of this call) and 2. the number
+                  of migrated objects.
+        """
+        query = model_query(models.Node.id, models.Node.uuid).filter(
+            models.Node.hash_bucket == sql.null())
+        total_to_migrate = query.count()
+        if not total_to_migrate:
+            return total_to_migrate, 0
+
+        if max_count:
+            query = query.limit(max_count)
+
+        total_migrated = 0
+        with _session_for_write():
+            for node_id, node_uuid in query.all():
+                total_migrated += (
+                    model_query(models.Node).
+                    filter(sql.and_(models.Node.id == node_id,
+                                    models.Node.hash_bucket == sql.null())).
+                    update({models.Node.hash_bucket:
+                            hash_ring.get_hash_bucket(node_uuid)},
+                           synchronize_session=False))
+
+        return total_to_migrate, total_migrated
+
     @oslo_db_api.retry_on_deadlock
     def update_to_latest_versions(self, context, max_count):
         """Updates objects to their latest known versions.
@@ -1716,6 +1954,21 @@ class Connection(api.Connection):
         return _paginate_query(models.Allocation, limit, marker,
                                sort_key, sort_dir, query)
 
+    def get_allocation_uuids(self, allocation_ids):
+        """Map allocation IDs to allocation UUIDs.
+
+        :param allocation_ids: A list of allocation IDs.
+        :returns: A dictionary mapping the IDs of existing allocations to
+            their UUIDs.
+        """
+        allocation_ids = set(allocation_ids)
+        if not allocation_ids:
+            return {}
+        query = model_query(models.Allocation.id,
+                            models.Allocation.uuid).filter(
+            models.Allocation.id.in_(allocation_ids))
+        return dict(query.all())
+
     @oslo_db_api.retry_on_deadlock
     def create_allocation(self, values):
         """Create a new allocation.
@@ -1836,6 +2089,65 @@ class Connection(api.Connection):
             else:
                 return True
 
+    @oslo_db_api.retry_on_deadlock
+    def claim_node_for_allocation(self, allocation_id, node_id):
+        """Associate a node with an allocation if it is still suitable.
+
+        The node is only updated if it is available, not in maintenance,
+        not reserved by a conductor, not associated with an instance or
+        another allocation, and still matches the resource class, owner and
+        traits of the allocation. This check and the update are done with one
+        conditional UPDATE statement, without locking the node.
+
+        :param allocation_id: Allocation ID or UUID
+        :param node_id: The ID of the node to claim.
+        :returns: The updated allocation if the node was claimed, None if it
+            no longer matches the conditions above.
+        :raises: AllocationNotFound
+        :raises: InstanceAssociated
+        """
+        with _session_for_write() as session:
+            try:
+                query = model_query(models.Allocation, session=session)
+                query = add_identity_filter(query, allocation_id)
+                ref = query.one()
+            except NoResultFound:
+                raise exception.AllocationNotFound(allocation=allocation_id)
+
+            query = model_query(models.Node, session=session).filter_by(
+                id=node_id, provision_state=states.AVAILABLE,
+                maintenance=False, reservation=None, instance_uuid=None,
+                allocation_id=None)
+            query = query.filter(models.Node.power_state.isnot(None))
+            if ref.resource_class:
+                query = query.filter_by(resource_class=ref.resource_class)
+            if ref.owner:
+                query = query.filter_by(owner=ref.owner)
+            if ref.traits:
+                query = add_node_filter_by_traits(query, ref.traits)
+
+            try:
+                count = query.update({'allocation_id': ref.id,
+                                      'instance_uuid': ref.uuid},
+                                     synchronize_session=False)
+            except db_exc.DBDuplicateEntry:
+                # Case when the allocation UUID is already used on some
+                # node as instance_uuid.
+                raise exception.InstanceAssociated(instance_uuid=ref.uuid,
+                                                   node=node_id)
+            if not count:
+                return None
+
+            node = model_query(models.Node, session=session).filter_by(
+                id=node_id).one()
+            iinfo = node.instance_info.copy()
+            iinfo['traits'] = ref.traits or []
+            node.update({'instance_info': iinfo})
+            ref.update({'node_id': node_id, 'state': states.ACTIVE,
+                        'last_error': None})
+            session.flush()
+            return ref
+
     @oslo_db_api.retry_on_deadlock
     def destroy_allocation(self, allocation_id):
         """Destroy an allocation.
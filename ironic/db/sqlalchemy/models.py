@@ -125,6 +125,7 @@ class Node(Base):
         schema.UniqueConstraint('instance_uuid',
                                 name='uniq_nodes0instance_uuid'),
         schema.UniqueConstraint('name', name='uniq_nodes0name'),
+        Index('node_hash_bucket_idx', 'hash_bucket'),
         table_args())
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36))
@@ -199,6 +200,9 @@ class Node(Base):
     storage_interface = Column(String(255), nullable=True)
     power_interface = Column(String(255), nullable=True)
     vendor_interface = Column(String(255), nullable=True)
+    # NOTE(yrobla): the leading bits of the hash used to place the node on
+    #               the hash ring, see ironic.common.hash_ring.
+    hash_bucket = Column(Integer, nullable=True)
 
 
 class Port(Base):
@@ -25,6 +25,7 @@ import inspect
 import json
 import os
 
+import eventlet
 from oslo_log import log as logging
 from oslo_utils import excutils
 
@@ -583,6 +584,33 @@ class PowerInterface(BaseInterface):
         :returns: A power state. One of :mod:`ironic.common.states`.
         """
 
+    def get_power_states(self, tasks):
+        """Return the power states of several nodes.
+
+        Drivers that can query the power state of many nodes with a single
+        request (for example, all outlets of a PDU) should override this
+        method. The default implementation calls :meth:`get_power_state`
+        for all tasks in parallel.
+
+        :param tasks: A list of TaskManager instances containing the nodes
+            to act on. All nodes use this power interface.
+        :returns: A dictionary mapping node UUIDs to either a power state
+            from :mod:`ironic.common.states` or the exception raised while
+            getting it.
+        """
+        if not tasks:
+            return {}
+
+        def _get_power_state(task):
+            try:
+                return self.get_power_state(task)
+            except Exception as e:
+                return e
+
+        pool = eventlet.GreenPool(len(tasks))
+        return {task.node.uuid: result for task, result
+                in zip(tasks, pool.imap(_get_power_state, tasks))}
+
     @abc.abstractmethod
     def set_power_state(self, task, power_state, timeout=None):
         """Set the power state of the task's node.
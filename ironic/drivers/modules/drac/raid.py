@@ -1148,6 +1148,7 @@ class DracWSManRAID(base.RAIDInterface):
         """Periodic task to check the progress of running RAID config jobs."""
 
         filters = {'reserved': False, 'maintenance': False}
+        constraints = {'reservation': None, 'maintenance': False}
         fields = ['driver_internal_info']
 
         node_list = manager.iter_nodes(fields=fields, filters=filters)
@@ -1157,7 +1158,8 @@ class DracWSManRAID(base.RAIDInterface):
                 lock_purpose = 'checking async raid configuration jobs'
                 with task_manager.acquire(context, node_uuid,
                                           purpose=lock_purpose,
-                                          shared=True) as task:
+                                          shared=True,
+                                          constraints=constraints) as task:
                     if not isinstance(task.driver.raid, DracRAID):
                         continue
 
@@ -1175,6 +1177,8 @@ class DracWSManRAID(base.RAIDInterface):
                 LOG.info("During query_raid_config_job_status, node "
                          "%(node)s was already locked by another process. "
                          "Skip.", {'node': node_uuid})
+            except exception.NodeConstraintsNotMet:
+                continue
 
     @METRICS.timer('DracRAID._check_node_raid_jobs')
     def _check_node_raid_jobs(self, task):
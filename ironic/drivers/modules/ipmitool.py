@@ -35,14 +35,18 @@ import os
 import re
 import subprocess
 import tempfile
+import threading
 import time
 
+import eventlet
+from futurist import periodics
 from ironic_lib import metrics_utils
 from ironic_lib import utils as ironic_utils
 from oslo_concurrency import processutils
 from oslo_log import log as logging
 from oslo_utils import excutils
 from oslo_utils import strutils
+from oslo_utils import uuidutils
 
 from ironic.common import boot_devices
 from ironic.common import exception
@@ -120,7 +124,6 @@ BRIDGING_OPTIONS = [('local_address', '-m'),
                     ('transit_channel', '-B'), ('transit_address', '-T'),
                     ('target_channel', '-b'), ('target_address', '-t')]
 
-LAST_CMD_TIME = {}
 TIMING_SUPPORT = None
 SINGLE_BRIDGE_SUPPORT = None
 DUAL_BRIDGE_SUPPORT = None
@@ -455,8 +458,352 @@ def _get_ipmitool_args(driver_info, pw_file=None):
     return args
 
 
+class _BMCQueue(object):
+    """The commands waiting for or running against a single BMC."""
+
+    __slots__ = ('waiting', 'ready_at', 'idle_at')
+
+    def __init__(self):
+        self.waiting = 0
+        # The time the next command may start at
+        self.ready_at = 0
+        # The time after the end of the last command a command may start at
+        self.idle_at = 0
+
+
+class _BMCRateLimiter(object):
+    """Paces the commands sent to each BMC.
+
+    A BMC is identified by its address and port, since several BMCs, e.g.
+    emulated ones, may share an address. A command may start
+    [ipmi]min_command_interval seconds after the previous command to the
+    same BMC started, and after the last command running against it ended.
+    Each command is given a start time in order of arrival, and the lock is
+    released before waiting for it, so that waiting commands do not block
+    each other. Commands still run concurrently. A command which could not
+    start before its timeout fails right away.
+
+    Entries of BMCs without commands, which can start a command right away,
+    are expired.
+    """
+
+    _EXPIRE_INTERVAL = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._expired_at = time.time()
+
+    def _expire(self, now):
+        for address, queue in list(self._queues.items()):
+            if (not queue.waiting and queue.ready_at <= now
+                    and queue.idle_at <= now):
+                del self._queues[address]
+        self._expired_at = now
+
+    def _schedule(self, address, deadline):
+        """Give the next command to a BMC a start time.
+
+        :returns: a tuple with the queue of the BMC and the start time, or
+            None for the start time if it is after the deadline.
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._expired_at > self._EXPIRE_INTERVAL:
+                self._expire(now)
+            queue = self._queues.get(address)
+            if queue is None:
+                queue = self._queues[address] = _BMCQueue()
+            start = max(now, queue.ready_at, queue.idle_at)
+            if start > deadline:
+                return queue, None
+            queue.ready_at = start + CONF.ipmi.min_command_interval
+            queue.waiting += 1
+            depth = queue.waiting
+        METRICS.send_gauge('BMCRateLimiter.queue_depth', depth)
+        return queue, start
+
+    def _dequeue(self, queue):
+        with self._lock:
+            queue.waiting -= 1
+
+    @staticmethod
+    def _timeout_error(address, port, timeout):
+        bmc = address if port is None else '%s:%s' % (address, port)
+        return processutils.ProcessExecutionError(
+            description=_('Timed out after %(timeout)s seconds waiting to '
+                          'send a command to BMC %(bmc)s') %
+            {'timeout': timeout, 'bmc': bmc})
+
+    @contextlib.contextmanager
+    def command(self, address, timeout, port=None):
+        """Wait until a command can be sent to a BMC.
+
+        :param address: the address of the BMC.
+        :param timeout: the maximum time to wait, in seconds.
+        :param port: the port of the BMC, if not the default one.
+        :raises: processutils.ProcessExecutionError if the command could not
+            be started before the timeout.
+        """
+        begin = time.time()
+        deadline = begin + timeout
+        queue, start = self._schedule((address, port), deadline)
+        if start is None:
+            raise self._timeout_error(address, port, timeout)
+        try:
+            wait = start - time.time()
+            while wait > 0:
+                time.sleep(wait)
+                # NOTE(yrobla): a command running against the BMC may have
+                # ended after the start time was given, wait for the interval
+                # after its end as well.
+                idle_at = queue.idle_at
+                if idle_at <= start:
+                    break
+                if idle_at > deadline:
+                    raise self._timeout_error(address, port, timeout)
+                wait = idle_at - start
+                start = idle_at
+            METRICS.send_timer('BMCRateLimiter.wait_time',
+                               (time.time() - begin) * 1000)
+            try:
+                yield
+            finally:
+                queue.idle_at = max(
+                    queue.idle_at,
+                    time.time() + CONF.ipmi.min_command_interval)
+        finally:
+            self._dequeue(queue)
+
+    def clear(self):
+        """Forget all BMCs."""
+        with self._lock:
+            self._queues.clear()
+
+
+_BMC_RATE_LIMITER = _BMCRateLimiter()
+
+
+class _IPMIToolShell(object):
+    """A long running ``ipmitool shell`` process holding an IPMI session.
+
+    Commands are written to the shell one at a time, each one followed by
+    an ``echo`` of a unique marker. Reading the output up to the marker
+    gives the output of the command. The ``lock`` must be held while
+    executing commands.
+    """
+
+    _PROMPT = 'ipmitool> '
+    _ERRORS = ('Error', 'Unable to', 'Invalid', 'Close Session command failed')
+
+    def __init__(self, args, password):
+        self._marker = 'ironic-%s' % uuidutils.generate_uuid(dashed=False)
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self._process = None
+        # NOTE(yrobla): ipmitool reads the password file when starting, so it
+        # can be removed once the shell answered the first echo.
+        with _make_password_file(password or '\0') as pw_file:
+            cmd_args = args + ['-f', pw_file, 'shell']
+            try:
+                self._process = subprocess.Popen(
+                    cmd_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT, universal_newlines=True)
+            except OSError as e:
+                raise processutils.ProcessExecutionError(
+                    description=str(e), cmd=' '.join(cmd_args))
+            self._communicate(None)
+
+    @property
+    def alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def close(self):
+        """Stop the shell process."""
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+        except (IOError, OSError):
+            pass
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+    def _communicate(self, command):
+        if self._process is None:
+            raise processutils.ProcessExecutionError(
+                description=_('ipmitool shell exited'), cmd=command)
+        lines = [command] if command else []
+        lines.append('echo %s' % self._marker)
+        output = []
+        try:
+            with eventlet.Timeout(CONF.ipmi.command_retry_timeout):
+                self._process.stdin.write('\n'.join(lines) + '\n')
+                self._process.stdin.flush()
+                while True:
+                    line = self._process.stdout.readline()
+                    if not line:
+                        raise IOError(_('ipmitool shell exited'))
+                    while line.startswith(self._PROMPT):
+                        line = line[len(self._PROMPT):]
+                    if line.rstrip('\n') == self._marker:
+                        break
+                    output.append(line)
+        except (eventlet.Timeout, IOError, OSError) as e:
+            self.close()
+            raise processutils.ProcessExecutionError(
+                stdout=''.join(output), description=str(e) or _('Timeout'),
+                cmd=command)
+        return ''.join(output)
+
+    def execute(self, command):
+        """Execute a command in the shell.
+
+        :param command: the ipmitool command to be executed.
+        :returns: (stdout, stderr) from executing the command. As the shell
+            does not report exit codes, stderr is always empty.
+        :raises: processutils.ProcessExecutionError if the shell failed or
+            the command printed an error.
+        """
+        out = self._communicate(command)
+        self.last_used = time.time()
+        errors = [line for line in out.splitlines()
+                  if line.startswith(self._ERRORS)]
+        if errors:
+            raise processutils.ProcessExecutionError(
+                stdout=out, stderr='\n'.join(errors), cmd=command)
+        return out, ''
+
+
+_IPMITOOL_SHELLS = {}
+_IPMITOOL_SHELLS_LOCK = threading.Lock()
+
+
+def _close_idle_ipmitool_shells(keep=None):
+    """Stop the shells unused for longer than [ipmi]session_idle_timeout.
+
+    :param keep: the key of a shell to keep running, if any.
+    """
+    now = time.time()
+    idle = []
+    with _IPMITOOL_SHELLS_LOCK:
+        for shell_key, shell in list(_IPMITOOL_SHELLS.items()):
+            if (shell_key != keep
+                    and now - shell.last_used > CONF.ipmi.session_idle_timeout
+                    and shell.lock.acquire(False)):
+                del _IPMITOOL_SHELLS[shell_key]
+                idle.append(shell)
+
+    for idle_shell in idle:
+        idle_shell.close()
+        idle_shell.lock.release()
+
+
+def _evict_ipmitool_shell(args, password, shell):
+    """Stop a shell and forget about it, so that a new one gets started.
+
+    The ``lock`` of the shell must be held.
+    """
+    key = (tuple(args), password)
+    with _IPMITOOL_SHELLS_LOCK:
+        if _IPMITOOL_SHELLS.get(key) is shell:
+            del _IPMITOOL_SHELLS[key]
+    shell.close()
+
+
+def _get_ipmitool_shell(args, password):
+    """Return the running ipmitool shell for the given arguments.
+
+    A new shell is started if needed. Other shells unused for longer than
+    [ipmi]session_idle_timeout are stopped.
+    """
+    key = (tuple(args), password)
+    _close_idle_ipmitool_shells(keep=key)
+    with _IPMITOOL_SHELLS_LOCK:
+        shell = _IPMITOOL_SHELLS.get(key)
+
+    if shell is None or not shell.alive:
+        shell = _IPMIToolShell(args, password)
+        with _IPMITOOL_SHELLS_LOCK:
+            current = _IPMITOOL_SHELLS.get(key)
+            if current is not None and current.alive:
+                # Another thread started one in the meantime
+                shell.close()
+                shell = current
+            else:
+                _IPMITOOL_SHELLS[key] = shell
+    return shell
+
+
+def _is_retryable_ipmitool_error(error):
+    """Whether an ipmitool failure is worth retrying."""
+    return any(x in str(error) for x in (
+        IPMITOOL_RETRYABLE_FAILURES
+        + CONF.ipmi.additional_retryable_ipmi_errors))
+
+
+def _exec_ipmitool_shell(driver_info, args, command, end_time, num_tries):
+    """Execute the ipmitool command in a persistent ipmitool shell.
+
+    Commands to a BMC are paced by the BMC rate limiter, and serialized
+    through its shell. A shell is stopped after any error, and a command
+    failing with an error which is not retryable is retried once with a new
+    shell, since the IPMI session of the shell may have expired or been
+    dropped by the BMC.
+
+    :param driver_info: the ipmitool parameters for accessing a node.
+    :param args: the ipmitool arguments, without the password file.
+    :param command: the ipmitool command to be executed.
+    :param end_time: the time after which failures are not retried.
+    :param num_tries: the maximum number of attempts.
+    :returns: (stdout, stderr) from executing the command.
+    :raises: PasswordFileFailedToCreate from creating or writing to the
+             temporary file.
+    :raises: processutils.ProcessExecutionError from executing the command.
+    """
+    new_session_retried = False
+    while True:
+        num_tries = num_tries - 1
+        try:
+            shell = None
+            with _BMC_RATE_LIMITER.command(driver_info['address'],
+                                           max(end_time - time.time(), 0),
+                                           port=driver_info['dest_port']):
+                shell = _get_ipmitool_shell(args, driver_info['password'])
+                with shell.lock:
+                    try:
+                        return shell.execute(command)
+                    except processutils.ProcessExecutionError:
+                        _evict_ipmitool_shell(args, driver_info['password'],
+                                              shell)
+                        raise
+        except processutils.ProcessExecutionError as e:
+            with excutils.save_and_reraise_exception() as ctxt:
+                if time.time() > end_time:
+                    retry = False
+                elif num_tries > 0 and _is_retryable_ipmitool_error(e):
+                    retry = True
+                else:
+                    retry = shell is not None and not new_session_retried
+                    new_session_retried = True
+                if not retry:
+                    LOG.error('IPMI Error while attempting "%(cmd)s" '
+                              'for node %(node)s. Error: %(error)s',
+                              {'node': driver_info['uuid'],
+                               'cmd': command, 'error': e})
+                else:
+                    ctxt.reraise = False
+                    LOG.warning('IPMI Error encountered, retrying '
+                                '"%(cmd)s" for node %(node)s. '
+                                'Error: %(error)s',
+                                {'node': driver_info['uuid'],
+                                 'cmd': command, 'error': e})
+
+
 def _exec_ipmitool(driver_info, command, check_exit_code=None,
-                   kill_on_timeout=False):
+                   kill_on_timeout=False, reuse_session=False):
     """Execute the ipmitool command.
 
     :param driver_info: the ipmitool parameters for accessing a node.
@@ -465,6 +812,10 @@ def _exec_ipmitool(driver_info, command, check_exit_code=None,
     :param kill_on_timeout: if `True`, kill unresponsive ipmitool on
         `min_command_interval` timeout. Default is `False`. Makes no
         effect on Windows.
+    :param reuse_session: if `True` and [ipmi]use_persistent_sessions is
+        enabled, run the command in a persistent ipmitool shell for the BMC.
+        Only suitable for commands whose exit code does not matter.
+        Default is `False`.
     :returns: (stdout, stderr) from executing the command.
     :raises: PasswordFileFailedToCreate from creating or writing to the
              temporary file.
@@ -485,6 +836,13 @@ def _exec_ipmitool(driver_info, command, check_exit_code=None,
         args.append('-N')
         args.append(str(CONF.ipmi.min_command_interval))
 
+    if reuse_session and CONF.ipmi.use_persistent_sessions:
+        # NOTE(yrobla): verbose output would be mixed with the command output
+        # as the shell can not separate them.
+        shell_args = [arg for arg in args if arg != '-v']
+        return _exec_ipmitool_shell(driver_info, shell_args, command,
+                                    time.time() + timeout, num_tries)
+
     extra_args = {}
 
     if kill_on_timeout:
@@ -504,12 +862,6 @@ def _exec_ipmitool(driver_info, command, check_exit_code=None,
 
     while True:
         num_tries = num_tries - 1
-        # NOTE(deva): ensure that no communications are sent to a BMC more
-        #             often than once every min_command_interval seconds.
-        time_till_next_poll = CONF.ipmi.min_command_interval - (
-            time.time() - LAST_CMD_TIME.get(driver_info['address'], 0))
-        if time_till_next_poll > 0:
-            time.sleep(time_till_next_poll)
         # Resetting the list that will be utilized so the password arguments
         # from any previous execution are preserved.
         cmd_args = args[:]
@@ -521,18 +873,20 @@ def _exec_ipmitool(driver_info, command, check_exit_code=None,
             cmd_args.append(pw_file)
             cmd_args.extend(command.split(" "))
             try:
-                out, err = utils.execute(*cmd_args, **extra_args)
+                # NOTE(deva): ensure that no communications are sent to a BMC
+                #             more often than once every min_command_interval
+                #             seconds.
+                with _BMC_RATE_LIMITER.command(
+                        driver_info['address'],
+                        max(end_time - time.time(), 0),
+                        port=driver_info['dest_port']):
+                    out, err = utils.execute(*cmd_args, **extra_args)
                 return out, err
             except processutils.ProcessExecutionError as e:
                 with excutils.save_and_reraise_exception() as ctxt:
-                    err_list = [
-                        x for x in (
-                            IPMITOOL_RETRYABLE_FAILURES +
-                            CONF.ipmi.additional_retryable_ipmi_errors)
-                        if x in str(e)]
                     if ((time.time() > end_time)
                         or (num_tries == 0)
-                        or not err_list):
+                        or not _is_retryable_ipmitool_error(e)):
                         LOG.error('IPMI Error while attempting "%(cmd)s" '
                                   'for node %(node)s. Error: %(error)s',
                                   {'node': driver_info['uuid'],
@@ -544,8 +898,6 @@ def _exec_ipmitool(driver_info, command, check_exit_code=None,
                                     'Error: %(error)s',
                                     {'node': driver_info['uuid'],
                                      'cmd': e.cmd, 'error': e})
-            finally:
-                LAST_CMD_TIME[driver_info['address']] = time.time()
 
 
 def _set_and_wait(task, power_action, driver_info, timeout=None):
@@ -642,7 +994,8 @@ def _power_status(driver_info):
     cmd = "power status"
     try:
         out_err = _exec_ipmitool(
-            driver_info, cmd, kill_on_timeout=CONF.ipmi.kill_on_timeout)
+            driver_info, cmd, kill_on_timeout=CONF.ipmi.kill_on_timeout,
+            reuse_session=True)
     except (exception.PasswordFileFailedToCreate,
             processutils.ProcessExecutionError) as e:
         LOG.warning("IPMI power status failed for node %(node_id)s with "
@@ -876,6 +1229,17 @@ class IPMIPower(base.PowerInterface):
         #             This is a temporary measure to mitigate problems while
         #             1314954 and 1314961 are resolved.
 
+    @METRICS.timer('IPMIPower._close_idle_sessions')
+    @periodics.periodic(spacing=CONF.ipmi.session_idle_timeout,
+                        enabled=CONF.ipmi.use_persistent_sessions)
+    def _close_idle_sessions(self, manager, context):
+        """Periodically stops the ipmitool shells which are not used.
+
+        :param manager: conductor manager.
+        :param context: request context.
+        """
+        _close_idle_ipmitool_shells()
+
     @METRICS.timer('IPMIPower.get_power_state')
     def get_power_state(self, task):
         """Get the current power state of the task's node.
@@ -1354,7 +1718,14 @@ class IPMIConsole(base.ConsoleInterface):
         ipmi_cmd += ' sol activate'
 
         try:
-            start_method(driver_info['uuid'], driver_info['port'], ipmi_cmd)
+            with _BMC_RATE_LIMITER.command(driver_info['address'],
+                                           CONF.ipmi.command_retry_timeout,
+                                           port=driver_info['dest_port']):
+                start_method(driver_info['uuid'], driver_info['port'],
+                             ipmi_cmd)
+        except processutils.ProcessExecutionError as e:
+            ironic_utils.unlink_without_raise(path)
+            raise exception.ConsoleSubprocessFailed(error=e)
         except (exception.ConsoleError, exception.ConsoleSubprocessFailed):
             with excutils.save_and_reraise_exception():
                 ironic_utils.unlink_without_raise(path)
@@ -432,6 +432,9 @@ class IRMCRAID(base.RAIDInterface):
 
         filters = {'reserved': False, 'provision_state': states.CLEANWAIT,
                    'maintenance': False}
+        constraints = {'reservation': None,
+                       'provision_state': states.CLEANWAIT,
+                       'maintenance': False}
         fields = ['raid_config']
         node_list = manager.iter_nodes(fields=fields, filters=filters)
         for (node_uuid, driver, conductor_group, raid_config) in node_list:
@@ -439,8 +442,8 @@ class IRMCRAID(base.RAIDInterface):
                 lock_purpose = 'checking async RAID configuration tasks'
                 with task_manager.acquire(context, node_uuid,
                                           purpose=lock_purpose,
-                                          shared=True) as task:
-                    node = task.node
+                                          shared=True,
+                                          constraints=constraints) as task:
                     node_uuid = task.node.uuid
                     if not isinstance(task.driver.raid, IRMCRAID):
                         continue
@@ -448,9 +451,9 @@ class IRMCRAID(base.RAIDInterface):
                         continue
                     if not raid_config or raid_config.get('fgi_status'):
                         continue
-                    task.upgrade_lock()
-                    if node.provision_state != states.CLEANWAIT:
-                        continue
+                    task.upgrade_lock(
+                        constraints={'provision_state': states.CLEANWAIT})
+                    node = task.node
                     # Avoid hitting clean_callback_timeout expiration
                     node.touch_provisioning()
 
@@ -493,6 +496,8 @@ class IRMCRAID(base.RAIDInterface):
                 LOG.info('During query_raid_config_job_status, node '
                          '%(node)s was already locked by another process. '
                          'Skip.', {'node': node_uuid})
+            except exception.NodeConstraintsNotMet:
+                continue
 
     def _set_clean_failed(self, task, fgi_status_dict):
         LOG.error('RAID configuration task failed for node %(node)s. '
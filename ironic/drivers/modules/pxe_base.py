@@ -327,6 +327,9 @@ class PXEBaseMixin(object):
     _RETRY_ALLOWED_STATES = {states.DEPLOYWAIT, states.CLEANWAIT,
                              states.RESCUEWAIT}
 
+    _RETRY_CONSTRAINTS = {'provision_state_in': _RETRY_ALLOWED_STATES,
+                          'maintenance': False}
+
     @METRICS.timer('PXEBaseMixin._check_boot_timeouts')
     @periodics.periodic(spacing=CONF.pxe.boot_retry_check_interval,
                         enabled=bool(CONF.pxe.boot_retry_timeout))
@@ -345,11 +348,13 @@ class PXEBaseMixin(object):
         for node_uuid, driver, conductor_group in node_iter:
             try:
                 lock_purpose = 'checking PXE boot status'
-                with task_manager.acquire(context, node_uuid,
-                                          shared=True,
-                                          purpose=lock_purpose) as task:
+                with task_manager.acquire(
+                        context, node_uuid, shared=True,
+                        purpose=lock_purpose,
+                        constraints=self._RETRY_CONSTRAINTS) as task:
                     self._check_boot_status(task)
-            except (exception.NodeLocked, exception.NodeNotFound):
+            except (exception.NodeLocked, exception.NodeNotFound,
+                    exception.NodeConstraintsNotMet):
                 continue
 
     def _check_boot_status(self, task):
@@ -359,12 +364,11 @@ class PXEBaseMixin(object):
         if not _should_retry_boot(task.node):
             return
 
-        task.upgrade_lock(purpose='retrying PXE boot')
+        # Critical checks are repeated when acquiring the exclusive lock.
+        task.upgrade_lock(purpose='retrying PXE boot',
+                          constraints=self._RETRY_CONSTRAINTS)
 
-        # Retry critical checks after acquiring the exclusive lock.
-        if (task.node.maintenance or task.node.provision_state
-                not in self._RETRY_ALLOWED_STATES
-                or not _should_retry_boot(task.node)):
+        if not _should_retry_boot(task.node):
             return
 
         LOG.info('Booting the ramdisk on node %(node)s is taking more than '
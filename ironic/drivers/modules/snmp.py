@@ -24,6 +24,7 @@ models.
 """
 
 import abc
+import collections
 import time
 
 from oslo_log import log as logging
@@ -106,6 +107,10 @@ SNMP_V2C = '2c'
 SNMP_V3 = '3'
 SNMP_PORT = 161
 
+# Maximum number of objects requested with a single SNMP GET, keeping the
+# request and response within the minimum message size agents must accept.
+_MAX_OIDS_PER_GET = 16
+
 REQUIRED_PROPERTIES = {
     'snmp_driver': _("PDU manufacturer driver.  Required."),
     'snmp_address': _("PDU IPv4 address or hostname.  Required."),
@@ -307,6 +312,41 @@ class SNMPClient(object):
         name, val = var_binds[0]
         return val
 
+    def get_many(self, oids):
+        """Use PySNMP to perform an SNMP GET operation on several objects.
+
+        All objects are requested with a single SNMP request.
+
+        :param oids: A list of OIDs of the objects to get.
+        :raises: SNMPFailure if an SNMP request fails.
+        :returns: A list of the values of the requested objects, in the same
+            order as `oids`.
+        """
+        try:
+            snmp_gen = snmp.getCmd(self.snmp_engine,
+                                   self._get_auth(),
+                                   self._get_transport(),
+                                   self._get_context(),
+                                   *[snmp.ObjectType(snmp.ObjectIdentity(oid))
+                                     for oid in oids])
+
+        except snmp_error.PySnmpError as e:
+            raise exception.SNMPFailure(operation="GET", error=e)
+
+        error_indication, error_status, error_index, var_binds = next(snmp_gen)
+
+        if error_indication:
+            # SNMP engine-level error.
+            raise exception.SNMPFailure(operation="GET",
+                                        error=error_indication)
+
+        if error_status:
+            # SNMP PDU error.
+            raise exception.SNMPFailure(operation="GET",
+                                        error=error_status.prettyPrint())
+
+        return [val for name, val in var_binds]
+
     def get_next(self, oid):
         """Use PySNMP to perform an SNMP GET NEXT operation on a table object.
 
@@ -451,6 +491,27 @@ class SNMPDriverBase(object, metaclass=abc.ABCMeta):
         :returns: power state. One of :class:`ironic.common.states`.
         """
 
+    def _snmp_power_state_oid(self):
+        """Return the OID of the object holding the power state.
+
+        Drivers returning an OID must also implement
+        :meth:`_snmp_power_state_from_value`. This allows requesting the
+        power states of several outlets of the same PDU at once.
+
+        :returns: the OID as a tuple of integers, or None if the power state
+            can not be read from a single object.
+        """
+        return None
+
+    def _snmp_power_state_from_value(self, state):
+        """Translate the power state object value to a power state.
+
+        :param state: the value of the object at
+            :meth:`_snmp_power_state_oid`.
+        :returns: power state. One of :class:`ironic.common.states`.
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def _snmp_power_on(self):
         """Perform the SNMP request required to set the power on.
@@ -576,7 +637,12 @@ class SNMPDriverSimple(SNMPDriverBase):
 
     def _snmp_power_state(self):
         state = self.client.get(self.oid)
+        return self._snmp_power_state_from_value(state)
+
+    def _snmp_power_state_oid(self):
+        return self.oid
 
+    def _snmp_power_state_from_value(self, state):
         # Translate the state to an Ironic power state.
         if state == self.value_power_on:
             power_state = states.POWER_ON
@@ -747,9 +813,13 @@ class SNMPDriverEatonPower(SNMPDriverBase):
         return self.oid_base + oid + (outlet,)
 
     def _snmp_power_state(self):
-        oid = self._snmp_oid(self.oid_status)
-        state = self.client.get(oid)
+        state = self.client.get(self._snmp_power_state_oid())
+        return self._snmp_power_state_from_value(state)
 
+    def _snmp_power_state_oid(self):
+        return self._snmp_oid(self.oid_status)
+
+    def _snmp_power_state_from_value(self, state):
         # Translate the state to an Ironic power state.
         if state in (self.status_on, self.status_pending_off):
             power_state = states.POWER_ON
@@ -846,6 +916,12 @@ class SNMPDriverAuto(SNMPDriverBase):
         current_power_state = self.driver._snmp_power_state()
         return current_power_state
 
+    def _snmp_power_state_oid(self):
+        return self.driver._snmp_power_state_oid()
+
+    def _snmp_power_state_from_value(self, state):
+        return self.driver._snmp_power_state_from_value(state)
+
     @retry_on_outdated_cache
     def _snmp_power_on(self):
         return self.driver._snmp_power_on()
@@ -1119,6 +1195,57 @@ class SNMPPower(base.PowerInterface):
         power_state = driver.power_state()
         return power_state
 
+    def get_power_states(self, tasks):
+        """Get the current power states of several nodes.
+
+        The power states of nodes plugged into the same PDU are requested
+        with a single SNMP GET request.
+
+        :param tasks: A list of instances of
+            `ironic.manager.task_manager.TaskManager`.
+        :returns: A dictionary mapping node UUIDs to either a power state
+            from :class:`ironic.common.states` or the exception raised while
+            getting it.
+        """
+        results = {}
+        pdus = collections.OrderedDict()
+        for task in tasks:
+            try:
+                driver = _get_driver(task.node)
+                oid = driver._snmp_power_state_oid()
+            except Exception as e:
+                results[task.node.uuid] = e
+                continue
+
+            if oid is None:
+                try:
+                    results[task.node.uuid] = driver.power_state()
+                except Exception as e:
+                    results[task.node.uuid] = e
+                continue
+
+            pdu = frozenset((key, val)
+                            for key, val in driver.snmp_info.items()
+                            if key != 'outlet')
+            pdus.setdefault(pdu, []).append((task, driver, oid))
+
+        for outlets in pdus.values():
+            for i in range(0, len(outlets), _MAX_OIDS_PER_GET):
+                chunk = outlets[i:i + _MAX_OIDS_PER_GET]
+                try:
+                    values = chunk[0][1].client.get_many(
+                        [oid for _task, _driver, oid in chunk])
+                except Exception as e:
+                    for task, _driver, _oid in chunk:
+                        results[task.node.uuid] = e
+                    continue
+
+                for (task, driver, _oid), value in zip(chunk, values):
+                    results[task.node.uuid] = (
+                        driver._snmp_power_state_from_value(value))
+
+        return results
+
     @task_manager.require_exclusive_lock
     def set_power_state(self, task, pstate, timeout=None):
         """Turn the power on or off.
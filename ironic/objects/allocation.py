@@ -121,6 +121,21 @@ class Allocation(base.IronicObject, object_base.VersionedObjectDictCompat):
         allocation = cls._from_db_object(context, cls(), db_allocation)
         return allocation
 
+    # NOTE(yrobla): This is a bulk lookup for API responses, it does not
+    # return objects and is not meant to become remotable.
+    @classmethod
+    def get_uuids_by_ids(cls, context, allocation_ids):
+        """Find the UUIDs of allocations by their integer IDs.
+
+        :param cls: the :class:`Allocation`
+        :param context: Security context
+        :param allocation_ids: A list of allocation IDs.
+        :returns: A dictionary mapping the IDs of existing allocations to
+            their UUIDs.
+
+        """
+        return cls.dbapi.get_allocation_uuids(allocation_ids)
+
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
     # Implications of calling new remote procedures should be thought through.
@@ -248,6 +263,32 @@ class Allocation(base.IronicObject, object_base.VersionedObjectDictCompat):
         updated_allocation = self.dbapi.update_allocation(self.uuid, updates)
         self._from_db_object(self._context, self, updated_allocation)
 
+    # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
+    # methods can be used in the future to replace current explicit RPC calls.
+    # Implications of calling new remote procedures should be thought through.
+    # @object_base.remotable
+    def claim_node(self, node_id, context=None):
+        """Associate a node with this Allocation if it is still suitable.
+
+        :param node_id: The ID of the node to claim.
+        :param context: Security context. NOTE: This should only
+                        be used internally by the indirection_api.
+                        Unfortunately, RPC requires context as the first
+                        argument, even though we don't use it.
+                        A context should be set when instantiating the
+                        object, e.g.: Allocation(context)
+        :returns: True if the node was claimed, False if it is no longer
+            available for this Allocation.
+        :raises: AllocationNotFound, InstanceAssociated
+
+        """
+        db_allocation = self.dbapi.claim_node_for_allocation(self.uuid,
+                                                             node_id)
+        if db_allocation is None:
+            return False
+        self._from_db_object(self._context, self, db_allocation)
+        return True
+
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
     # Implications of calling new remote procedures should be thought through.
@@ -110,6 +110,36 @@ class IronicObject(object_base.VersionedObject):
                     and self[field] != loaded_object[field]):
                 self[field] = loaded_object[field]
 
+    def obj_changes_only(self, fields=('uuid',)):
+        """Return a copy of this object with only its changed fields set.
+
+        :param fields: additional fields to set on the copy, e.g. to identify
+            the object. They are not marked as changed unless they are.
+        :returns: a new object of the same class.
+        """
+        changes = self.obj_what_changed()
+        result = self.__class__(self._context)
+        for field in changes | set(fields):
+            if self.obj_attr_is_set(field):
+                setattr(result, field, getattr(self, field))
+        result.obj_reset_changes(set(fields) - changes)
+        return result
+
+    def obj_fill_unset(self, loaded_object):
+        """Set the fields unset on this object from a loaded object.
+
+        The fields set this way are not marked as changed.
+
+        :param loaded_object: an object of the same class, e.g. fetched from
+            the database.
+        """
+        unset = [field for field in self.fields
+                 if not self.obj_attr_is_set(field)
+                 and loaded_object.obj_attr_is_set(field)]
+        for field in unset:
+            setattr(self, field, getattr(loaded_object, field))
+        self.obj_reset_changes(unset)
+
     def _convert_to_version(self, target_version,
                             remove_unavailable_fields=True):
         """Convert to the target version.
@@ -299,7 +329,7 @@ class IronicObject(object_base.VersionedObject):
         return obj
 
     @classmethod
-    def _from_db_object_list(cls, context, db_objects):
+    def _from_db_object_list(cls, context, db_objects, fields=None):
         """Returns objects corresponding to database entities.
 
         Returns a list of formal objects of this class that correspond to
@@ -308,11 +338,28 @@ class IronicObject(object_base.VersionedObject):
         :param cls: the VersionedObject class of the desired object
         :param context: security context
         :param db_objects: A  list of DB models of the object
+        :param fields: names of the fields to set on the objects, or None
+            to set all of them. The ``id`` field is always set, names that
+            are not fields of the object are ignored.
         :returns: A list of objects corresponding to the database entities
         """
-        return [cls._from_db_object(context, cls(), db_obj)
+        fields = cls._get_fields_to_set(fields)
+        return [cls._from_db_object(context, cls(), db_obj, fields=fields)
                 for db_obj in db_objects]
 
+    @classmethod
+    def _get_fields_to_set(cls, fields):
+        """Returns the fields of this class to set from loaded DB entities.
+
+        :param fields: names of the loaded fields, or None if all fields were
+            loaded. The ``id`` field is always set, names that are not fields
+            of the object are ignored.
+        :returns: A list of field names, or None to set all fields.
+        """
+        if fields is None:
+            return None
+        return [f for f in cls.fields if f in fields or f == 'id']
+
     def do_version_changes_for_db(self):
         """Change the object to the version needed for the database.
 
@@ -12,8 +12,11 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import hashlib
+
 from oslo_config import cfg
 from oslo_log import log
+from oslo_serialization import jsonutils
 from oslo_utils import strutils
 from oslo_utils import uuidutils
 from oslo_utils import versionutils
@@ -175,6 +178,24 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
                 d.get('driver_internal_info', {}), "******")
         return d
 
+    def content_digest(self):
+        """Compute a digest of the content of the node.
+
+        The digest covers all fields of the node, including its traits, but
+        not the reservation and the update time, which change when the node
+        is locked. It is used to check that a node has not been modified
+        since it was read.
+
+        :returns: the digest as a hexadecimal string.
+        """
+        values = self.as_dict()
+        values.pop('reservation', None)
+        values.pop('updated_at', None)
+        if self.obj_attr_is_set('traits') and self.traits is not None:
+            values['traits'] = sorted(self.traits.get_trait_names())
+        return hashlib.sha256(
+            jsonutils.dump_as_bytes(values, sort_keys=True)).hexdigest()
+
     def _validate_property_values(self, properties):
         """Check if the input of local_gb, cpus and memory_mb are valid.
 
@@ -204,12 +225,14 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
             raise exception.InvalidParameterValue(msg)
 
     def _set_from_db_object(self, context, db_object, fields=None):
-        fields = set(fields or self.fields) - {'traits'}
-        super(Node, self)._set_from_db_object(context, db_object, fields)
-        self.traits = object_base.obj_make_list(
-            context, objects.TraitList(context),
-            objects.Trait, db_object['traits'])
-        self.traits.obj_reset_changes()
+        fields = set(fields or self.fields)
+        super(Node, self)._set_from_db_object(context, db_object,
+                                              fields - {'traits'})
+        if 'traits' in fields:
+            self.traits = object_base.obj_make_list(
+                context, objects.TraitList(context),
+                objects.Trait, db_object['traits'])
+            self.traits.obj_reset_changes()
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
@@ -252,16 +275,19 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
     # Implications of calling new remote procedures should be thought through.
     # @object_base.remotable_classmethod
     @classmethod
-    def get_by_uuid(cls, context, uuid):
+    def get_by_uuid(cls, context, uuid, fields=None):
         """Find a node based on UUID and return a Node object.
 
         :param cls: the :class:`Node`
         :param context: Security context
         :param uuid: the UUID of a node.
+        :param fields: names of the fields to load, or None to load all
+            fields. Other fields are not set on the returned object.
         :returns: a :class:`Node` object.
         """
-        db_node = cls.dbapi.get_node_by_uuid(uuid)
-        node = cls._from_db_object(context, cls(), db_node)
+        db_node = cls.dbapi.get_node_by_uuid(uuid, fields=fields)
+        node = cls._from_db_object(context, cls(), db_node,
+                                   fields=cls._get_fields_to_set(fields))
         return node
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
@@ -269,16 +295,19 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
     # Implications of calling new remote procedures should be thought through.
     # @object_base.remotable_classmethod
     @classmethod
-    def get_by_name(cls, context, name):
+    def get_by_name(cls, context, name, fields=None):
         """Find a node based on name and return a Node object.
 
         :param cls: the :class:`Node`
         :param context: Security context
         :param name: the logical name of a node.
+        :param fields: names of the fields to load, or None to load all
+            fields. Other fields are not set on the returned object.
         :returns: a :class:`Node` object.
         """
-        db_node = cls.dbapi.get_node_by_name(name)
-        node = cls._from_db_object(context, cls(), db_node)
+        db_node = cls.dbapi.get_node_by_name(name, fields=fields)
+        node = cls._from_db_object(context, cls(), db_node,
+                                   fields=cls._get_fields_to_set(fields))
         return node
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
@@ -304,7 +333,7 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
     # @object_base.remotable_classmethod
     @classmethod
     def list(cls, context, limit=None, marker=None, sort_key=None,
-             sort_dir=None, filters=None):
+             sort_dir=None, filters=None, fields=None):
         """Return a list of Node objects.
 
         :param cls: the :class:`Node`
@@ -314,20 +343,22 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
         :param sort_key: column to sort results by.
         :param sort_dir: direction to sort. "asc" or "desc".
         :param filters: Filters to apply.
+        :param fields: names of the fields to load, or None to load all
+            fields. Other fields are not set on the returned objects.
         :returns: a list of :class:`Node` object.
 
         """
         db_nodes = cls.dbapi.get_node_list(filters=filters, limit=limit,
                                            marker=marker, sort_key=sort_key,
-                                           sort_dir=sort_dir)
-        return cls._from_db_object_list(context, db_nodes)
+                                           sort_dir=sort_dir, fields=fields)
+        return cls._from_db_object_list(context, db_nodes, fields=fields)
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
     # Implications of calling new remote procedures should be thought through.
     # @object_base.remotable_classmethod
     @classmethod
-    def reserve(cls, context, tag, node_id):
+    def reserve(cls, context, tag, node_id, constraints=None):
         """Get and reserve a node.
 
         To prevent other ManagerServices from manipulating the given
@@ -337,11 +368,16 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
         :param context: Security context.
         :param tag: A string uniquely identifying the reservation holder.
         :param node_id: A node ID or UUID.
+        :param constraints: Optional constraints the node has to meet, see
+                            :meth:`ironic.db.api.Connection.reserve_node`.
         :raises: NodeNotFound if the node is not found.
+        :raises: NodeConstraintsNotMet if the node does not meet the
+                 constraints.
         :returns: a :class:`Node` object.
 
         """
-        db_node = cls.dbapi.reserve_node(tag, node_id)
+        db_node = cls.dbapi.reserve_node(tag, node_id,
+                                         constraints=constraints)
         node = cls._from_db_object(context, cls(), db_node)
         return node
 
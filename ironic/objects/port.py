@@ -224,7 +224,7 @@ class Port(base.IronicObject, object_base.VersionedObjectDictCompat):
     # @object_base.remotable_classmethod
     @classmethod
     def list(cls, context, limit=None, marker=None,
-             sort_key=None, sort_dir=None, owner=None):
+             sort_key=None, sort_dir=None, owner=None, fields=None):
         """Return a list of Port objects.
 
         :param context: Security context.
@@ -233,6 +233,8 @@ class Port(base.IronicObject, object_base.VersionedObjectDictCompat):
         :param sort_key: column to sort results by.
         :param sort_dir: direction to sort. "asc" or "desc".
         :param owner: a node owner to match against
+        :param fields: names of the fields to load, or None to load all
+            fields. Other fields are not set on the returned objects.
         :returns: a list of :class:`Port` object.
         :raises: InvalidParameterValue
 
@@ -241,8 +243,9 @@ class Port(base.IronicObject, object_base.VersionedObjectDictCompat):
                                            marker=marker,
                                            sort_key=sort_key,
                                            sort_dir=sort_dir,
-                                           owner=owner)
-        return cls._from_db_object_list(context, db_ports)
+                                           owner=owner,
+                                           fields=fields)
+        return cls._from_db_object_list(context, db_ports, fields=fields)
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
@@ -250,7 +253,8 @@ class Port(base.IronicObject, object_base.VersionedObjectDictCompat):
     # @object_base.remotable_classmethod
     @classmethod
     def list_by_node_id(cls, context, node_id, limit=None, marker=None,
-                        sort_key=None, sort_dir=None, owner=None):
+                        sort_key=None, sort_dir=None, owner=None,
+                        fields=None):
         """Return a list of Port objects associated with a given node ID.
 
         :param context: Security context.
@@ -260,6 +264,8 @@ class Port(base.IronicObject, object_base.VersionedObjectDictCompat):
         :param sort_key: column to sort results by.
         :param sort_dir: direction to sort. "asc" or "desc".
         :param owner: a node owner to match against
+        :param fields: names of the fields to load, or None to load all
+            fields. Other fields are not set on the returned objects.
         :returns: a list of :class:`Port` object.
 
         """
@@ -267,8 +273,9 @@ class Port(base.IronicObject, object_base.VersionedObjectDictCompat):
                                                   marker=marker,
                                                   sort_key=sort_key,
                                                   sort_dir=sort_dir,
-                                                  owner=owner)
-        return cls._from_db_object_list(context, db_ports)
+                                                  owner=owner,
+                                                  fields=fields)
+        return cls._from_db_object_list(context, db_ports, fields=fields)
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
@@ -277,7 +284,7 @@ class Port(base.IronicObject, object_base.VersionedObjectDictCompat):
     @classmethod
     def list_by_portgroup_id(cls, context, portgroup_id, limit=None,
                              marker=None, sort_key=None, sort_dir=None,
-                             owner=None):
+                             owner=None, fields=None):
         """Return a list of Port objects associated with a given portgroup ID.
 
         :param context: Security context.
@@ -287,6 +294,8 @@ class Port(base.IronicObject, object_base.VersionedObjectDictCompat):
         :param sort_key: column to sort results by.
         :param sort_dir: direction to sort. "asc" or "desc".
         :param owner: a node owner to match against
+        :param fields: names of the fields to load, or None to load all
+            fields. Other fields are not set on the returned objects.
         :returns: a list of :class:`Port` object.
 
         """
@@ -295,8 +304,9 @@ class Port(base.IronicObject, object_base.VersionedObjectDictCompat):
                                                        marker=marker,
                                                        sort_key=sort_key,
                                                        sort_dir=sort_dir,
-                                                       owner=owner)
-        return cls._from_db_object_list(context, db_ports)
+                                                       owner=owner,
+                                                       fields=fields)
+        return cls._from_db_object_list(context, db_ports, fields=fields)
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
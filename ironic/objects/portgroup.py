@@ -191,7 +191,7 @@ class Portgroup(base.IronicObject, object_base.VersionedObjectDictCompat):
     # @object_base.remotable_classmethod
     @classmethod
     def list(cls, context, limit=None, marker=None,
-             sort_key=None, sort_dir=None):
+             sort_key=None, sort_dir=None, fields=None):
         """Return a list of Portgroup objects.
 
         :param cls: the :class:`Portgroup`
@@ -200,6 +200,8 @@ class Portgroup(base.IronicObject, object_base.VersionedObjectDictCompat):
         :param marker: Pagination marker for large data sets.
         :param sort_key: Column to sort results by.
         :param sort_dir: Direction to sort. "asc" or "desc".
+        :param fields: Names of the fields to load, or None to load all
+            fields. Other fields are not set on the returned objects.
         :returns: A list of :class:`Portgroup` object.
         :raises: InvalidParameterValue
 
@@ -207,8 +209,9 @@ class Portgroup(base.IronicObject, object_base.VersionedObjectDictCompat):
         db_portgroups = cls.dbapi.get_portgroup_list(limit=limit,
                                                      marker=marker,
                                                      sort_key=sort_key,
-                                                     sort_dir=sort_dir)
-        return cls._from_db_object_list(context, db_portgroups)
+                                                     sort_dir=sort_dir,
+                                                     fields=fields)
+        return cls._from_db_object_list(context, db_portgroups, fields=fields)
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
@@ -216,7 +219,7 @@ class Portgroup(base.IronicObject, object_base.VersionedObjectDictCompat):
     # @object_base.remotable_classmethod
     @classmethod
     def list_by_node_id(cls, context, node_id, limit=None, marker=None,
-                        sort_key=None, sort_dir=None):
+                        sort_key=None, sort_dir=None, fields=None):
         """Return a list of Portgroup objects associated with a given node ID.
 
         :param cls: the :class:`Portgroup`
@@ -226,6 +229,8 @@ class Portgroup(base.IronicObject, object_base.VersionedObjectDictCompat):
         :param marker: Pagination marker for large data sets.
         :param sort_key: Column to sort results by.
         :param sort_dir: Direction to sort. "asc" or "desc".
+        :param fields: Names of the fields to load, or None to load all
+            fields. Other fields are not set on the returned objects.
         :returns: A list of :class:`Portgroup` object.
         :raises: InvalidParameterValue
 
@@ -234,8 +239,9 @@ class Portgroup(base.IronicObject, object_base.VersionedObjectDictCompat):
                                                             limit=limit,
                                                             marker=marker,
                                                             sort_key=sort_key,
-                                                            sort_dir=sort_dir)
-        return cls._from_db_object_list(context, db_portgroups)
+                                                            sort_dir=sort_dir,
+                                                            fields=fields)
+        return cls._from_db_object_list(context, db_portgroups, fields=fields)
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
@@ -100,6 +100,7 @@ class TestCase(oslo_test_base.BaseTestCase):
         driver_factory.HardwareTypesFactory._extension_manager = None
         for factory in driver_factory._INTERFACE_LOADERS.values():
             factory._extension_manager = None
+        driver_factory._interfaces_cache.clear()
 
         # Ban running external processes via 'execute' like functions. If the
         # patched function is called, an exception is raised to warn the
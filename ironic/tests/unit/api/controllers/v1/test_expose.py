@@ -19,7 +19,11 @@ import sys
 
 import mock
 from oslo_utils import uuidutils
+from wsme.rest import json as wsme_json
+from wsme import types as wtypes
 
+from ironic.api.controllers.v1 import port as port_api
+from ironic.api import expose
 from ironic.tests import base as test_base
 
 
@@ -54,6 +58,7 @@ class TestExposedAPIMethodsCheckPolicy(test_base.TestCase):
                 ('api_utils.check_node_policy_and_retrieve' in src) or
                 ('api_utils.check_list_policy' in src) or
                 ('self._get_node_and_topic' in src) or
+                ('self._do_bulk_action' in src) or
                 ('api_utils.check_port_policy_and_retrieve' in src) or
                 ('api_utils.check_port_list_policy' in src) or
                 ('policy.authorize' in src and
@@ -81,3 +86,40 @@ class TestExposedAPIMethodsCheckPolicy(test_base.TestCase):
 
     def test_conductor_api_policy(self):
         self._test('ironic.api.controllers.v1.conductor')
+
+
+class TestStreamJson(test_base.TestCase):
+
+    def setUp(self):
+        super(TestStreamJson, self).setUp()
+        self.collection = port_api.PortCollection()
+        self.collection.ports = [
+            port_api.Port(uuid=uuidutils.generate_uuid(),
+                          address='52:54:00:cf:2d:3%d' % i,
+                          extra={'index': i})
+            for i in range(3)]
+        self.collection.next = 'http://localhost/v1/ports?marker=foo'
+
+    def _test(self, chunk_size=64 * 1024):
+        with mock.patch.object(expose, '_STREAM_CHUNK_SIZE', chunk_size):
+            result = list(expose._stream_json(port_api.PortCollection,
+                                              self.collection))
+        self.assertEqual(
+            wsme_json.encode_result(self.collection, port_api.PortCollection),
+            b''.join(result).decode('utf-8'))
+        return result
+
+    def test_stream_json(self):
+        result = self._test()
+        self.assertEqual(1, len(result))
+
+    def test_stream_json_chunks(self):
+        result = self._test(chunk_size=1)
+        self.assertGreater(len(result), len(self.collection.ports))
+        self.assertNotIn(b'', result)
+
+    def test_stream_json_unset(self):
+        self.collection.next = wtypes.Unset
+        self.collection.ports = []
+        result = self._test()
+        self.assertEqual([b'{"ports": []}'], result)
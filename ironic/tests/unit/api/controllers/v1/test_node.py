@@ -13,6 +13,7 @@
 Tests for the API /nodes/ methods.
 """
 
+import base64
 import datetime
 from http import client as http_client
 import json
@@ -35,6 +36,7 @@ from ironic.api.controllers.v1 import versions
 from ironic.common import boot_devices
 from ironic.common import driver_factory
 from ironic.common import exception
+from ironic.common import hash_ring
 from ironic.common import policy
 from ironic.common import states
 from ironic.conductor import rpcapi
@@ -68,6 +70,17 @@ class TestListNodes(test_api_base.BaseApiTest):
             fixtures.MockPatchObject(rpcapi.ConductorAPI, 'get_conductor_for',
                                      autospec=True)).mock
         self.mock_get_conductor_for.return_value = 'fake.conductor'
+        self.mock_get_conductors_for = self.useFixture(
+            fixtures.MockPatchObject(rpcapi.ConductorAPI, 'get_conductors_for',
+                                     autospec=True)).mock
+        self.mock_get_conductors_for.side_effect = (
+            lambda api, nodes: {n.uuid: 'fake.conductor' for n in nodes})
+        self.mock_get_hash_buckets = self.useFixture(
+            fixtures.MockPatchObject(hash_ring.HashRingManager,
+                                     'get_hash_buckets', autospec=True)).mock
+        last_bucket = 2 ** hash_ring.HASH_BUCKET_BITS - 1
+        self.mock_get_hash_buckets.return_value = {
+            (None, 'fake-hardware'): [(0, last_bucket)]}
 
     def _create_association_test_nodes(self):
         # create some unassociated nodes
@@ -408,6 +421,20 @@ class TestListNodes(test_api_base.BaseApiTest):
             # We always append "links"
             self.assertItemsEqual(['uuid', 'instance_info', 'links'], node)
 
+    @mock.patch.object(objects.Node, 'list', autospec=True)
+    def test_get_collection_custom_fields_db_fields(self, mock_list):
+        node = obj_utils.create_test_node(self.context,
+                                          chassis_id=self.chassis.id)
+        mock_list.return_value = [node]
+        data = self.get_json(
+            '/nodes?fields=name,chassis_uuid',
+            headers={api_base.Version.string: str(api_v1.max_version())})
+        self.assertEqual(self.chassis.uuid, data['nodes'][0]['chassis_uuid'])
+        mock_list.assert_called_once_with(
+            mock.ANY, mock.ANY, None, sort_key='id', sort_dir='asc',
+            filters={},
+            fields={'id', 'uuid', 'name', 'chassis_uuid', 'chassis_id'})
+
     def test_get_custom_fields_invalid_fields(self):
         node = obj_utils.create_test_node(self.context,
                                           chassis_id=self.chassis.id)
@@ -597,6 +624,46 @@ class TestListNodes(test_api_base.BaseApiTest):
                                  headers={api_base.Version.string: '1.52'})
         self.assertEqual(allocation.uuid, response['allocation_uuid'])
 
+    @mock.patch.object(objects.Allocation, 'get_by_id', autospec=True)
+    def test_many_with_allocations(self, mock_get_by_id):
+        allocations = [obj_utils.create_test_allocation(
+            self.context, uuid=uuidutils.generate_uuid(), name='a%d' % i)
+            for i in range(3)]
+        nodes = {}
+        for allocation in allocations:
+            node = obj_utils.create_test_node(self.context,
+                                              uuid=uuidutils.generate_uuid(),
+                                              allocation_id=allocation.id)
+            nodes[node.uuid] = allocation.uuid
+        node = obj_utils.create_test_node(self.context,
+                                          uuid=uuidutils.generate_uuid())
+        nodes[node.uuid] = None
+
+        with mock.patch.object(objects.Allocation, 'get_uuids_by_ids',
+                               autospec=True,
+                               wraps=objects.Allocation.get_uuids_by_ids
+                               ) as mock_get_uuids:
+            data = self.get_json('/nodes/detail',
+                                 headers={api_base.Version.string: '1.52'})
+
+        self.assertEqual(nodes, {n['uuid']: n['allocation_uuid']
+                                 for n in data['nodes']})
+        mock_get_uuids.assert_called_once_with(mock.ANY, mock.ANY)
+        self.assertFalse(mock_get_by_id.called)
+        self.mock_get_conductors_for.assert_called_once_with(mock.ANY,
+                                                             mock.ANY)
+        self.assertFalse(self.mock_get_conductor_for.called)
+
+    def test_many_without_allocation_field(self):
+        obj_utils.create_test_node(self.context)
+        with mock.patch.object(objects.Allocation, 'get_uuids_by_ids',
+                               autospec=True) as mock_get_uuids:
+            data = self.get_json('/nodes?fields=uuid',
+                                 headers={api_base.Version.string: '1.52'})
+        self.assertEqual(1, len(data['nodes']))
+        self.assertFalse(mock_get_uuids.called)
+        self.assertFalse(self.mock_get_conductors_for.called)
+
     def test_get_retired_fields(self):
         node = obj_utils.create_test_node(self.context,
                                           retired=True)
@@ -614,6 +681,23 @@ class TestListNodes(test_api_base.BaseApiTest):
         token_value = response['driver_internal_info']['agent_secret_token']
         self.assertEqual('******', token_value)
 
+    @mock.patch.object(policy, 'check', autospec=True)
+    def test_detail_policy_checked_once(self, mock_check):
+        mock_check.return_value = False
+        for _ in range(3):
+            obj_utils.create_test_node(
+                self.context, uuid=uuidutils.generate_uuid(),
+                driver_info={'ipmi_password': 'secret'})
+        data = self.get_json(
+            '/nodes/detail',
+            headers={api_base.Version.string: str(api_v1.max_version())})
+        self.assertEqual(3, len(data['nodes']))
+        for node in data['nodes']:
+            self.assertEqual('******', node['driver_info']['ipmi_password'])
+        checked = [c[0][0] for c in mock_check.call_args_list]
+        self.assertEqual(1, checked.count('show_password'))
+        self.assertEqual(1, checked.count('show_instance_secrets'))
+
     def test_detail(self):
         node = obj_utils.create_test_node(self.context,
                                           chassis_id=self.chassis.id)
@@ -1131,6 +1215,92 @@ class TestListNodes(test_api_base.BaseApiTest):
         self.assertEqual(limit, len(data['nodes']))
         self.assertIn('marker=%s' % nodes[limit - 1].uuid, data['next'])
 
+    @mock.patch.object(objects.Node, 'get_by_uuid', autospec=True)
+    def test_get_collection_follow_next(self, mock_get):
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        nodes = {}
+        for rc in ('c', 'a', 'c', 'b', 'a'):
+            node = obj_utils.create_test_node(self.context,
+                                              uuid=uuidutils.generate_uuid(),
+                                              resource_class='rc-%s' % rc)
+            nodes[node.uuid] = node
+
+        result = []
+        url = ('/nodes?fields=resource_class,uuid&limit=2'
+               '&sort_key=resource_class')
+        while url:
+            data = self.get_json(url, headers=headers)
+            result.extend(data['nodes'])
+            url = data.get('next', '').replace('http://localhost/v1', '')
+            if url:
+                marker = url.split('marker=')[1].split('&')[0]
+                self.assertEqual(
+                    {'k': 'resource_class',
+                     'v': data['nodes'][-1]['resource_class'],
+                     'u': data['nodes'][-1]['uuid']},
+                    json.loads(base64.urlsafe_b64decode(marker + '==')))
+
+        self.assertEqual(['rc-a', 'rc-a', 'rc-b', 'rc-c', 'rc-c'],
+                         [n['resource_class'] for n in result])
+        self.assertEqual(set(nodes), {n['uuid'] for n in result})
+        self.assertFalse(mock_get.called)
+
+    def test_get_collection_next_old_version(self):
+        headers = {api_base.Version.string: '1.64'}
+        nodes = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid(),
+                                            name='node-%d' % i)
+                 for i in range(2)]
+        data = self.get_json('/nodes?limit=1&sort_key=name', headers=headers)
+        self.assertIn('marker=%s' % nodes[0].uuid, data['next'])
+
+    def test_get_collection_next_sorted_by_id(self):
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        nodes = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid())
+                 for i in range(2)]
+        data = self.get_json('/nodes?limit=1', headers=headers)
+        self.assertIn('marker=%s' % nodes[0].uuid, data['next'])
+
+    def test_get_collection_marker_uuid(self):
+        nodes = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid())
+                 for i in range(3)]
+        data = self.get_json('/nodes?marker=%s' % nodes[0].uuid)
+        self.assertEqual([n.uuid for n in nodes[1:]],
+                         [n['uuid'] for n in data['nodes']])
+
+    def _get_next_marker(self, sort_key):
+        for i in range(2):
+            obj_utils.create_test_node(self.context,
+                                       uuid=uuidutils.generate_uuid(),
+                                       name='node-%d' % i)
+        data = self.get_json(
+            '/nodes?limit=1&sort_key=%s' % sort_key,
+            headers={api_base.Version.string: str(api_v1.max_version())})
+        return data['next'].split('marker=')[1].split('&')[0]
+
+    def test_get_collection_marker_other_sort_key(self):
+        marker = self._get_next_marker('name')
+        response = self.get_json(
+            '/nodes?sort_key=created_at&marker=%s' % marker,
+            headers={api_base.Version.string: str(api_v1.max_version())},
+            expect_errors=True)
+        self.assertEqual(http_client.BAD_REQUEST, response.status_int)
+
+    def test_get_collection_marker_old_version(self):
+        marker = self._get_next_marker('name')
+        response = self.get_json(
+            '/nodes?sort_key=name&marker=%s' % marker,
+            headers={api_base.Version.string: '1.64'},
+            expect_errors=True)
+        self.assertEqual(http_client.BAD_REQUEST, response.status_int)
+
+    def test_get_collection_marker_invalid(self):
+        response = self.get_json('/nodes?marker=spongebob',
+                                 expect_errors=True)
+        self.assertEqual(http_client.BAD_REQUEST, response.status_int)
+
     def test_collection_links_instance_uuid_param(self):
         cfg.CONF.set_override('max_limit', 1, 'api')
         nodes = []
@@ -1470,6 +1640,113 @@ class TestListNodes(test_api_base.BaseApiTest):
         self.assertEqual(fake_error, data['last_error'])
         self.assertFalse(data['console_enabled'])
 
+    def test_get_one_etag(self):
+        node = obj_utils.create_test_node(self.context)
+        response = self.get_json('/nodes/%s' % node.uuid, expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        etag = response.headers['ETag']
+
+        response = self.get_json('/nodes/%s' % node.uuid, expect_errors=True,
+                                 headers={'If-None-Match': etag})
+        self.assertEqual(http_client.NOT_MODIFIED, response.status_int)
+        self.assertEqual(b'', response.body)
+        self.assertEqual(etag, response.headers['ETag'])
+
+    def test_get_one_etag_modified(self):
+        node = obj_utils.create_test_node(self.context)
+        etag = self.get_json('/nodes/%s' % node.uuid,
+                             expect_errors=True).headers['ETag']
+        node.extra = {'answer': 42}
+        node.save()
+
+        response = self.get_json('/nodes/%s' % node.uuid, expect_errors=True,
+                                 headers={'If-None-Match': etag})
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertEqual({'answer': 42}, response.json['extra'])
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+    def test_get_one_etag_traits_modified(self):
+        node = obj_utils.create_test_node(self.context)
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        etag = self.get_json('/nodes/%s' % node.uuid, expect_errors=True,
+                             headers=headers).headers['ETag']
+        objects.TraitList.create(self.context, node.id, ['CUSTOM_1'])
+
+        headers['If-None-Match'] = etag
+        response = self.get_json('/nodes/%s' % node.uuid, expect_errors=True,
+                                 headers=headers)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertEqual(['CUSTOM_1'], response.json['traits'])
+
+    def test_get_one_etag_same_for_fields(self):
+        node = obj_utils.create_test_node(self.context)
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        etag = self.get_json('/nodes/%s' % node.uuid, expect_errors=True,
+                             headers=headers).headers['ETag']
+
+        headers['If-None-Match'] = etag
+        response = self.get_json('/nodes/%s?fields=uuid,name' % node.uuid,
+                                 expect_errors=True, headers=headers)
+        self.assertEqual(http_client.NOT_MODIFIED, response.status_int)
+        self.assertEqual(etag, response.headers['ETag'])
+
+    def test_get_one_etag_fields(self):
+        node = obj_utils.create_test_node(self.context)
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        response = self.get_json('/nodes/%s?fields=uuid,name' % node.uuid,
+                                 expect_errors=True, headers=headers)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertEqual({'uuid', 'name', 'links'}, set(response.json))
+        self.assertIn('ETag', response.headers)
+
+    def test_get_one_etag_not_modified_fields_loaded(self):
+        node = obj_utils.create_test_node(self.context)
+        etag = self.get_json('/nodes/%s' % node.uuid,
+                             expect_errors=True).headers['ETag']
+
+        with mock.patch.object(objects.Node, 'get_by_uuid', autospec=True,
+                               side_effect=objects.Node.get_by_uuid
+                               ) as mock_get, \
+                mock.patch.object(api_node.Node, 'convert_with_links',
+                                  autospec=True) as mock_convert:
+            response = self.get_json('/nodes/%s' % node.uuid,
+                                     expect_errors=True,
+                                     headers={'If-None-Match': etag})
+        self.assertEqual(http_client.NOT_MODIFIED, response.status_int)
+        mock_get.assert_called_once_with(
+            mock.ANY, node.uuid,
+            fields=set(api_node._ETAG_DB_FIELDS) | {'owner'})
+        self.assertFalse(mock_convert.called)
+
+    @mock.patch.object(api_utils, 'check_policy_bool', autospec=True)
+    def test_get_one_etag_policy(self, mock_policy):
+        node = obj_utils.create_test_node(self.context)
+        mock_policy.return_value = True
+        etag = self.get_json('/nodes/%s' % node.uuid,
+                             expect_errors=True).headers['ETag']
+
+        mock_policy.return_value = False
+        response = self.get_json('/nodes/%s' % node.uuid, expect_errors=True,
+                                 headers={'If-None-Match': etag})
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+    def test_node_states_etag(self):
+        node = obj_utils.create_test_node(self.context)
+        path = '/nodes/%s/states' % node.uuid
+        etag = self.get_json(path, expect_errors=True).headers['ETag']
+
+        response = self.get_json(path, expect_errors=True,
+                                 headers={'If-None-Match': etag})
+        self.assertEqual(http_client.NOT_MODIFIED, response.status_int)
+
+        node.power_state = states.POWER_OFF
+        node.save()
+        response = self.get_json(path, expect_errors=True,
+                                 headers={'If-None-Match': etag})
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertEqual(states.POWER_OFF, response.json['power_state'])
+
     def test_node_by_instance_uuid(self):
         node = obj_utils.create_test_node(
             self.context,
@@ -1765,9 +2042,9 @@ class TestListNodes(test_api_base.BaseApiTest):
 
         response = self.get_json(
             base_url % 'CUSTOM_TRAIT_1',
-            headers={api_base.Version.string: str(api_v1.max_version())},
+            headers={api_base.Version.string: '1.63'},
             expect_errors=True)
-        self.assertEqual(http_client.BAD_REQUEST, response.status_code)
+        self.assertEqual(http_client.NOT_ACCEPTABLE, response.status_code)
         self.assertTrue(response.json['error_message'])
 
     def test_get_nodes_by_traits_not_allowed(self):
@@ -1872,8 +2149,10 @@ class TestListNodes(test_api_base.BaseApiTest):
         self.assertIn(node1.uuid, uuids)
         self.assertIn(node2.uuid, uuids)
 
-        self.mock_get_conductor_for.side_effect = ['rocky.rocks',
-                                                   'fake.conductor']
+        self.mock_get_conductors_for.side_effect = (
+            lambda api, nodes: {n.uuid: ('rocky.rocks' if n.uuid == node1.uuid
+                                         else 'fake.conductor')
+                                for n in nodes})
         response = self.get_json('/nodes?conductor=fake.conductor',
                                  headers={api_base.Version.string: "1.49"})
         uuids = [n['uuid'] for n in response['nodes']]
@@ -1881,23 +2160,93 @@ class TestListNodes(test_api_base.BaseApiTest):
         self.assertNotIn(node1.uuid, uuids)
         self.assertIn(node2.uuid, uuids)
 
-    def test_get_nodes_by_conductor_no_valid_host(self):
+    def test_get_nodes_by_conductor_hash_buckets(self):
+        node1 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid())
+        obj_utils.create_test_node(self.context,
+                                   uuid=uuidutils.generate_uuid(),
+                                   driver='fake-ipmi')
+        obj_utils.create_test_node(self.context,
+                                   uuid=uuidutils.generate_uuid(),
+                                   conductor_group='other')
+        bucket = hash_ring.get_hash_bucket(node1.uuid)
+        self.mock_get_hash_buckets.return_value = {
+            ('', 'fake-hardware'): [(bucket, bucket)]}
+
+        response = self.get_json('/nodes?conductor=fake.conductor',
+                                 headers={api_base.Version.string: "1.49"})
+
+        self.assertEqual([node1.uuid],
+                         [n['uuid'] for n in response['nodes']])
+        self.mock_get_hash_buckets.assert_called_once_with(
+            mock.ANY, 'fake.conductor')
+
+    def test_get_nodes_by_conductor_hash_buckets_unsupported(self):
+        node1 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid())
+        node2 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid())
+        self.mock_get_conductors_for.side_effect = (
+            lambda api, nodes: {n.uuid: 'fake.conductor'
+                                if n.uuid == node1.uuid else 'other'
+                                for n in nodes})
+        self.mock_get_hash_buckets.return_value = None
+
+        response = self.get_json('/nodes?conductor=fake.conductor',
+                                 headers={api_base.Version.string: "1.49"})
+
+        self.assertEqual([node1.uuid],
+                         [n['uuid'] for n in response['nodes']])
+        self.assertNotIn(node2.uuid, [n['uuid'] for n in response['nodes']])
+
+    def test_get_nodes_by_conductor_not_in_ring(self):
         obj_utils.create_test_node(self.context,
                                    uuid=uuidutils.generate_uuid())
+        self.mock_get_hash_buckets.return_value = {}
 
-        self.mock_get_conductor_for.side_effect = exception.NoValidHost(
-            reason='hey a conductor just goes vacation')
-        response = self.get_json('/nodes?conductor=like.shadows',
+        response = self.get_json('/nodes?conductor=rocky.rocks',
                                  headers={api_base.Version.string: "1.49"})
+
+        self.assertEqual([], response['nodes'])
+        self.assertFalse(self.mock_get_conductors_for.called)
+
+    def test_get_nodes_by_conductor_full_page(self):
+        nodes = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid())
+                 for _ in range(5)]
+        # NOTE(yrobla): the first nodes are in shared hash buckets but are
+        # mapped to another conductor.
+        others = {nodes[0].uuid, nodes[1].uuid, nodes[3].uuid}
+        self.mock_get_conductors_for.side_effect = (
+            lambda api, nodes: {n.uuid: ('rocky.rocks' if n.uuid in others
+                                         else 'fake.conductor')
+                                for n in nodes})
+
+        response = self.get_json('/nodes?conductor=fake.conductor&limit=2',
+                                 headers={api_base.Version.string: "1.49"})
+
+        self.assertEqual([nodes[2].uuid, nodes[4].uuid],
+                         [n['uuid'] for n in response['nodes']])
+        self.assertIn('conductor=fake.conductor', response['next'])
+        self.assertEqual(3, self.mock_get_conductors_for.call_count)
+
+        next_marker = response['next'].split('marker=')[1].split('&')[0]
+        response = self.get_json(
+            '/nodes?conductor=fake.conductor&limit=2&marker=%s' % next_marker,
+            headers={api_base.Version.string: "1.49"})
         self.assertEqual([], response['nodes'])
 
-        self.mock_get_conductor_for.side_effect = exception.TemporaryFailure(
-            reason='this must be conductor strike')
+    def test_get_nodes_by_conductor_no_valid_host(self):
+        obj_utils.create_test_node(self.context,
+                                   uuid=uuidutils.generate_uuid())
+
+        self.mock_get_conductors_for.side_effect = (
+            lambda api, nodes: {n.uuid: None for n in nodes})
         response = self.get_json('/nodes?conductor=like.shadows',
                                  headers={api_base.Version.string: "1.49"})
         self.assertEqual([], response['nodes'])
 
-        self.mock_get_conductor_for.side_effect = exception.IronicException(
+        self.mock_get_conductors_for.side_effect = exception.IronicException(
             'Some unexpected thing happened')
         response = self.get_json('/nodes?conductor=fake.conductor',
                                  headers={api_base.Version.string: "1.49"},
@@ -1954,6 +2303,40 @@ class TestListNodes(test_api_base.BaseApiTest):
         self.assertIn(node2.uuid, uuids)
         self.assertNotIn(node1.uuid, uuids)
 
+    def test_get_nodes_by_traits(self):
+        node1 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid())
+        node2 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid())
+        objects.TraitList.create(self.context, node1.id,
+                                 ['CUSTOM_1', 'CUSTOM_2'])
+        objects.TraitList.create(self.context, node2.id, ['CUSTOM_1'])
+
+        for base_url in ('/nodes', '/nodes/detail'):
+            data = self.get_json(base_url + '?traits=CUSTOM_1',
+                                 headers={api_base.Version.string: '1.64'})
+            uuids = [n['uuid'] for n in data['nodes']]
+            self.assertEqual(sorted([node1.uuid, node2.uuid]), sorted(uuids))
+            data = self.get_json(base_url + '?traits=CUSTOM_2,CUSTOM_1',
+                                 headers={api_base.Version.string: '1.64'})
+            uuids = [n['uuid'] for n in data['nodes']]
+            self.assertEqual([node1.uuid], uuids)
+            data = self.get_json(base_url + '?traits=custom_1',
+                                 headers={api_base.Version.string: '1.64'})
+            self.assertEqual([], data['nodes'])
+
+    def test_get_nodes_by_traits_next_link(self):
+        for i in range(3):
+            node = obj_utils.create_test_node(self.context,
+                                              uuid=uuidutils.generate_uuid())
+            objects.TraitList.create(self.context, node.id,
+                                     ['CUSTOM_1', 'CUSTOM_2'])
+
+        data = self.get_json('/nodes?traits=CUSTOM_2,CUSTOM_1&limit=2',
+                             headers={api_base.Version.string: '1.64'})
+        self.assertEqual(2, len(data['nodes']))
+        self.assertIn('traits=CUSTOM_1,CUSTOM_2', data['next'])
+
     def test_get_console_information(self):
         node = obj_utils.create_test_node(self.context)
         expected_console_info = {'test': 'test-data'}
@@ -2152,7 +2535,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual(self.mock_update_node.return_value.updated_at,
                          timeutils.parse_isotime(response.json['updated_at']))
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
         mock_notify.assert_has_calls([mock.call(mock.ANY, mock.ANY, 'update',
                                       obj_fields.NotificationLevel.INFO,
                                       obj_fields.NotificationStatus.START,
@@ -2194,7 +2578,61 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual(self.mock_update_node.return_value.updated_at,
                          timeutils.parse_isotime(response.json['updated_at']))
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
+
+    def test_update_if_match(self):
+        self.mock_update_node.return_value = self.node
+        etag = self.get_json('/nodes/%s' % self.node.uuid,
+                             expect_errors=True).headers['ETag']
+        response = self.patch_json(
+            '/nodes/%s' % self.node.uuid,
+            [{'path': '/extra/foo', 'value': 'bar', 'op': 'add'}],
+            headers={'If-Match': etag})
+        self.assertEqual(http_client.OK, response.status_code)
+        self.assertIn('ETag', response.headers)
+        self.mock_update_node.assert_called_once_with(
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=objects.Node.get_by_uuid(
+                self.context, self.node.uuid).content_digest())
+
+    def test_update_if_match_fields(self):
+        self.mock_update_node.return_value = self.node
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        etag = self.get_json('/nodes/%s?fields=uuid,extra' % self.node.uuid,
+                             expect_errors=True,
+                             headers=headers).headers['ETag']
+        headers['If-Match'] = etag
+        response = self.patch_json(
+            '/nodes/%s' % self.node.uuid,
+            [{'path': '/extra/foo', 'value': 'bar', 'op': 'add'}],
+            headers=headers)
+        self.assertEqual(http_client.OK, response.status_code)
+        self.assertTrue(self.mock_update_node.called)
+
+    def test_update_if_match_modified_in_conductor(self):
+        self.mock_update_node.side_effect = exception.NodeModified(
+            node=self.node.uuid)
+        etag = self.get_json('/nodes/%s' % self.node.uuid,
+                             expect_errors=True).headers['ETag']
+        response = self.patch_json(
+            '/nodes/%s' % self.node.uuid,
+            [{'path': '/extra/foo', 'value': 'bar', 'op': 'add'}],
+            headers={'If-Match': etag}, expect_errors=True)
+        self.assertEqual(http_client.PRECONDITION_FAILED,
+                         response.status_code)
+        self.assertTrue(response.json['error_message'])
+
+    def test_update_if_match_modified(self):
+        response = self.patch_json(
+            '/nodes/%s' % self.node.uuid,
+            [{'path': '/extra/foo', 'value': 'bar', 'op': 'add'}],
+            headers={'If-Match': '"not-the-etag"'},
+            expect_errors=True)
+        self.assertEqual(http_client.PRECONDITION_FAILED,
+                         response.status_code)
+        self.assertTrue(response.json['error_message'])
+        self.assertFalse(self.mock_update_node.called)
 
     def test_update_ok_by_name_with_json(self):
         self.mock_update_node.return_value = self.node
@@ -2213,7 +2651,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual(self.mock_update_node.return_value.updated_at,
                          timeutils.parse_isotime(response.json['updated_at']))
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
 
     def test_update_state(self):
         response = self.patch_json('/nodes/%s' % self.node.uuid,
@@ -2241,7 +2680,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual(http_client.BAD_REQUEST, response.status_code)
 
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
         mock_notify.assert_has_calls([mock.call(mock.ANY, mock.ANY, 'update',
                                       obj_fields.NotificationLevel.INFO,
                                       obj_fields.NotificationStatus.START,
@@ -2278,7 +2718,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual(self.mock_update_node.return_value.updated_at,
                          timeutils.parse_isotime(response.json['updated_at']))
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', True)
+            mock.ANY, mock.ANY, 'test-topic', True,
+            expected_digest=None)
 
     def test_reset_interfaces_without_driver(self):
         response = self.patch_json(
@@ -2310,7 +2751,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual(http_client.OK, response.status_code)
 
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
 
     def test_add_root(self):
         self.mock_update_node.return_value = self.node
@@ -2322,7 +2764,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual('application/json', response.content_type)
         self.assertEqual(http_client.OK, response.status_code)
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
 
     def test_add_root_non_existent(self):
         response = self.patch_json('/nodes/%s' % self.node.uuid,
@@ -2343,7 +2786,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual(http_client.OK, response.status_code)
 
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
 
     def test_remove_non_existent_property_fail(self):
         response = self.patch_json('/nodes/%s' % self.node.uuid,
@@ -2411,7 +2855,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual('application/json', response.content_type)
         self.assertEqual(http_client.OK, response.status_code)
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
 
     def test_patch_ports_subresource_no_port_id(self):
         response = self.patch_json('/nodes/%s/ports' % self.node.uuid,
@@ -2628,7 +3073,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual(http_client.OK, response.status_code)
 
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
 
     def test_replace_maintenance_by_name(self):
         self.mock_update_node.return_value = self.node
@@ -2642,7 +3088,8 @@ class TestPatch(test_api_base.BaseApiTest):
         self.assertEqual(http_client.OK, response.status_code)
 
         self.mock_update_node.assert_called_once_with(
-            mock.ANY, mock.ANY, 'test-topic', None)
+            mock.ANY, mock.ANY, 'test-topic', None,
+            expected_digest=None)
 
     def test_replace_consoled_enabled(self):
         response = self.patch_json('/nodes/%s' % self.node.uuid,
@@ -2810,7 +3257,7 @@ class TestPatch(test_api_base.BaseApiTest):
                                      'value': 'foo',
                                      'op': 'add'}],
                                    expect_errors=True)
-        mock_rpc_node.assert_called_once_with(self.node.uuid)
+        mock_rpc_node.assert_called_once_with(self.node.uuid, fields=None)
         self.assertEqual('application/json', response.content_type)
         self.assertEqual(http_client.CONFLICT, response.status_code)
         self.assertTrue(response.json['error_message'])
@@ -4100,7 +4547,7 @@ class TestDelete(test_api_base.BaseApiTest):
         self.assertEqual(http_client.NOT_FOUND, response.status_int)
         self.assertEqual('application/json', response.content_type)
         self.assertTrue(response.json['error_message'])
-        mock_gbu.assert_called_once_with(mock.ANY, node.uuid)
+        mock_gbu.assert_called_once_with(mock.ANY, node.uuid, fields=None)
 
     @mock.patch.object(objects.Node, 'get_by_name')
     def test_delete_node_not_found_by_name_unsupported(self, mock_gbn):
@@ -4123,7 +4570,7 @@ class TestDelete(test_api_base.BaseApiTest):
         self.assertEqual(http_client.NOT_FOUND, response.status_int)
         self.assertEqual('application/json', response.content_type)
         self.assertTrue(response.json['error_message'])
-        mock_gbn.assert_called_once_with(mock.ANY, node.name)
+        mock_gbn.assert_called_once_with(mock.ANY, node.name, fields=None)
 
     def test_delete_ports_subresource_no_port_id(self):
         node = obj_utils.create_test_node(self.context)
@@ -4210,7 +4657,7 @@ class TestDelete(test_api_base.BaseApiTest):
         self.assertEqual(b'', response.body)
         self.assertFalse(node.maintenance)
         self.assertIsNone(node.maintenance_reason)
-        mock_get.assert_called_once_with(mock.ANY, node.uuid)
+        mock_get.assert_called_once_with(mock.ANY, node.uuid, fields=None)
         mock_update.assert_called_once_with(mock.ANY, mock.ANY,
                                             topic='test-topic')
 
@@ -4228,7 +4675,7 @@ class TestDelete(test_api_base.BaseApiTest):
         self.assertEqual(b'', response.body)
         self.assertFalse(node.maintenance)
         self.assertIsNone(node.maintenance_reason)
-        mock_get.assert_called_once_with(mock.ANY, node.name)
+        mock_get.assert_called_once_with(mock.ANY, node.name, fields=None)
         mock_update.assert_called_once_with(mock.ANY, mock.ANY,
                                             topic='test-topic')
 
@@ -5293,7 +5740,7 @@ class TestPut(test_api_base.BaseApiTest):
         self.assertEqual(b'', ret.body)
         self.assertTrue(self.node.maintenance)
         self.assertEqual(reason, self.node.maintenance_reason)
-        mock_get.assert_called_once_with(mock.ANY, node_ident)
+        mock_get.assert_called_once_with(mock.ANY, node_ident, fields=None)
         mock_update.assert_called_once_with(mock.ANY, mock.ANY,
                                             topic='test-topic')
 
@@ -5370,6 +5817,239 @@ class TestPut(test_api_base.BaseApiTest):
         self.assertEqual(http_client.ACCEPTED, ret.status_code)
 
 
+class TestBulkStates(test_api_base.BaseApiTest):
+
+    def setUp(self):
+        super(TestBulkStates, self).setUp()
+        self.nodes = [
+            obj_utils.create_test_node(
+                self.context, uuid=uuidutils.generate_uuid(),
+                name='node-%d' % i, provision_state=states.AVAILABLE)
+            for i in range(3)]
+        p = mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for',
+                              autospec=True)
+        self.mock_gtf = p.start()
+        self.mock_gtf.side_effect = lambda _self, nodes: {
+            node.uuid: 'test-topic' for node in nodes}
+        self.addCleanup(p.stop)
+        p = mock.patch.object(rpcapi.ConductorAPI, 'change_nodes_power_state',
+                              autospec=True)
+        self.mock_cnps = p.start()
+        self.mock_cnps.side_effect = (
+            lambda _self, context, node_ids, *args, **kwargs:
+            {node_id: None for node_id in node_ids})
+        self.addCleanup(p.stop)
+        p = mock.patch.object(rpcapi.ConductorAPI,
+                              'do_nodes_provisioning_action', autospec=True)
+        self.mock_dnpa = p.start()
+        self.mock_dnpa.side_effect = self.mock_cnps.side_effect
+        self.addCleanup(p.stop)
+
+    def _put(self, action, body, version=str(api_v1.max_version()),
+             expect_errors=False):
+        return self.put_json('/nodes/bulk/%s' % action, body,
+                             headers={api_base.Version.string: version},
+                             expect_errors=expect_errors)
+
+    def test_power(self):
+        idents = [self.nodes[0].uuid, self.nodes[1].name]
+        response = self._put('power', {'nodes': idents,
+                                       'target': states.POWER_OFF,
+                                       'timeout': 10})
+
+        self.assertEqual(http_client.ACCEPTED, response.status_code)
+        self.assertEqual(
+            [{'node': self.nodes[0].uuid, 'uuid': self.nodes[0].uuid,
+              'code': http_client.ACCEPTED},
+             {'node': self.nodes[1].name, 'uuid': self.nodes[1].uuid,
+              'code': http_client.ACCEPTED}],
+            response.json['nodes'])
+        self.mock_cnps.assert_called_once_with(
+            mock.ANY, mock.ANY, [self.nodes[0].uuid, self.nodes[1].uuid],
+            states.POWER_OFF, topic='test-topic', timeout=10)
+
+    def test_power_one_call_per_topic(self):
+        self.mock_gtf.side_effect = lambda _self, nodes: {
+            node.uuid: 'topic-%d' % (node.id % 2) for node in nodes}
+        response = self._put('power', {'nodes': [n.uuid for n in self.nodes],
+                                       'target': states.POWER_ON})
+
+        self.assertEqual(http_client.ACCEPTED, response.status_code)
+        self.assertEqual(2, self.mock_cnps.call_count)
+        sent = {}
+        for call in self.mock_cnps.call_args_list:
+            sent[call[1]['topic']] = call[0][2]
+        self.assertEqual(
+            sorted(self.nodes[i].uuid for i in range(3)
+                   if self.nodes[i].id % 2 == 0),
+            sorted(sent['topic-0']))
+        self.assertEqual(
+            sorted(self.nodes[i].uuid for i in range(3)
+                   if self.nodes[i].id % 2 == 1),
+            sorted(sent['topic-1']))
+
+    def test_power_one_topic_fails(self):
+        self.mock_gtf.side_effect = lambda _self, nodes: {
+            node.uuid: 'topic-%d' % (node.id % 2) for node in nodes}
+
+        def _change(_self, context, node_ids, *args, topic, **kwargs):
+            if topic == 'topic-0':
+                raise exception.NoFreeConductorWorker()
+            return {node_id: None for node_id in node_ids}
+
+        self.mock_cnps.side_effect = _change
+        response = self._put('power', {'nodes': [n.uuid for n in self.nodes],
+                                       'target': states.POWER_ON},
+                             expect_errors=True)
+
+        self.assertEqual(http_client.SERVICE_UNAVAILABLE,
+                         response.status_code)
+        # The other conductor is called regardless.
+        self.assertEqual(2, self.mock_cnps.call_count)
+
+    def test_power_errors(self):
+        self.nodes[0].provision_state = states.CLEANING
+        self.nodes[0].save()
+        self.mock_gtf.side_effect = lambda _self, nodes: {
+            node.uuid: None if node.uuid == self.nodes[1].uuid
+            else 'test-topic' for node in nodes}
+        self.mock_cnps.side_effect = None
+        self.mock_cnps.return_value = {
+            self.nodes[2].uuid: {'code': http_client.CONFLICT,
+                                 'message': 'Node is locked'}}
+
+        response = self._put('power', {'nodes': [n.uuid for n in self.nodes],
+                                       'target': states.POWER_ON})
+
+        self.assertEqual(http_client.ACCEPTED, response.status_code)
+        results = response.json['nodes']
+        self.assertEqual([http_client.BAD_REQUEST,
+                          http_client.NOT_FOUND,
+                          http_client.CONFLICT],
+                         [result['code'] for result in results])
+        self.assertIn(states.CLEANING, results[0]['error'])
+        self.assertIn('No valid host', results[1]['error'])
+        self.assertEqual('Node is locked', results[2]['error'])
+        self.mock_cnps.assert_called_once_with(
+            mock.ANY, mock.ANY, [self.nodes[2].uuid], states.POWER_ON,
+            topic='test-topic', timeout=None)
+
+    def test_power_duplicates(self):
+        idents = [self.nodes[0].uuid, self.nodes[0].name]
+        response = self._put('power', {'nodes': idents,
+                                       'target': states.POWER_ON})
+
+        self.assertEqual(http_client.ACCEPTED, response.status_code)
+        self.assertEqual([self.nodes[0].uuid] * 2,
+                         [result['uuid'] for result in response.json['nodes']])
+        self.mock_cnps.assert_called_once_with(
+            mock.ANY, mock.ANY, [self.nodes[0].uuid], states.POWER_ON,
+            topic='test-topic', timeout=None)
+
+    def test_power_invalid_target(self):
+        response = self._put('power', {'nodes': [self.nodes[0].uuid],
+                                       'target': 'foo'}, expect_errors=True)
+        self.assertEqual(http_client.BAD_REQUEST, response.status_code)
+        self.assertFalse(self.mock_cnps.called)
+
+    def test_power_node_not_found(self):
+        response = self._put('power', {'nodes': [self.nodes[0].uuid,
+                                                 'missing-node'],
+                                       'target': states.POWER_ON},
+                             expect_errors=True)
+        self.assertEqual(http_client.NOT_FOUND, response.status_code)
+        self.assertIn('missing-node', response.json['error_message'])
+        self.assertFalse(self.mock_cnps.called)
+
+    def test_power_no_nodes(self):
+        response = self._put('power', {'nodes': [],
+                                       'target': states.POWER_ON},
+                             expect_errors=True)
+        self.assertEqual(http_client.BAD_REQUEST, response.status_code)
+
+    def test_power_too_many_nodes(self):
+        self.config(max_limit=2, group='api')
+        response = self._put('power', {'nodes': [n.uuid for n in self.nodes],
+                                       'target': states.POWER_ON},
+                             expect_errors=True)
+        self.assertEqual(http_client.BAD_REQUEST, response.status_code)
+        self.assertFalse(self.mock_cnps.called)
+
+    def test_power_old_version(self):
+        response = self._put('power', {'nodes': [self.nodes[0].uuid],
+                                       'target': states.POWER_ON},
+                             version='1.62', expect_errors=True)
+        self.assertEqual(http_client.NOT_FOUND, response.status_code)
+        self.assertFalse(self.mock_cnps.called)
+
+    def test_provision(self):
+        self.nodes[1].provision_state = states.ACTIVE
+        self.nodes[1].save()
+        response = self._put('provision',
+                             {'nodes': [self.nodes[0].uuid,
+                                        self.nodes[1].name],
+                              'target': states.ACTIVE})
+
+        self.assertEqual(http_client.ACCEPTED, response.status_code)
+        results = response.json['nodes']
+        self.assertEqual(http_client.ACCEPTED, results[0]['code'])
+        self.assertNotIn('error', results[0])
+        # NOTE(yrobla): rebuilding is not supported in bulk.
+        self.assertEqual(http_client.BAD_REQUEST, results[1]['code'])
+        self.assertIn(states.ACTIVE, results[1]['error'])
+        self.mock_dnpa.assert_called_once_with(
+            mock.ANY, mock.ANY, [self.nodes[0].uuid], states.ACTIVE,
+            topic='test-topic')
+
+    def test_provision_maintenance(self):
+        self.nodes[0].maintenance = True
+        self.nodes[0].save()
+        response = self._put('provision', {'nodes': [self.nodes[0].uuid],
+                                           'target': states.ACTIVE})
+
+        self.assertEqual(http_client.ACCEPTED, response.status_code)
+        self.assertEqual(http_client.BAD_REQUEST,
+                         response.json['nodes'][0]['code'])
+        self.assertFalse(self.mock_dnpa.called)
+
+    def test_provision_locked(self):
+        self.nodes[0].provision_state = states.DEPLOYING
+        self.nodes[0].reservation = 'fake-host'
+        self.nodes[0].save()
+        response = self._put('provision', {'nodes': [self.nodes[0].uuid],
+                                           'target': states.DELETED})
+
+        self.assertEqual(http_client.ACCEPTED, response.status_code)
+        self.assertEqual(http_client.CONFLICT,
+                         response.json['nodes'][0]['code'])
+        self.assertFalse(self.mock_dnpa.called)
+
+    def test_provision_verb(self):
+        response = self._put('provision',
+                             {'nodes': [self.nodes[0].uuid],
+                              'target': states.VERBS['manage']})
+
+        self.assertEqual(http_client.ACCEPTED, response.status_code)
+        self.mock_dnpa.assert_called_once_with(
+            mock.ANY, mock.ANY, [self.nodes[0].uuid], states.VERBS['manage'],
+            topic='test-topic')
+
+    def test_provision_unsupported_target(self):
+        response = self._put('provision',
+                             {'nodes': [self.nodes[0].uuid],
+                              'target': states.VERBS['clean']},
+                             expect_errors=True)
+        self.assertEqual(http_client.BAD_REQUEST, response.status_code)
+        self.assertFalse(self.mock_dnpa.called)
+
+    def test_provision_old_version(self):
+        response = self._put('provision', {'nodes': [self.nodes[0].uuid],
+                                           'target': states.DELETED},
+                             version='1.62', expect_errors=True)
+        self.assertEqual(http_client.NOT_FOUND, response.status_code)
+        self.assertFalse(self.mock_dnpa.called)
+
+
 class TestCheckCleanSteps(base.TestCase):
     def test__check_clean_steps_not_list(self):
         clean_steps = {"step": "upgrade_firmware", "interface": "deploy"}
@@ -5468,7 +6148,7 @@ class TestAttachDetachVif(test_api_base.BaseApiTest):
                       headers={api_base.Version.string:
                                self.vif_version})
 
-        mock_get.assert_called_once_with(mock.ANY, self.node.uuid)
+        mock_get.assert_called_once_with(mock.ANY, self.node.uuid, fields=None)
         mock_list.assert_called_once_with(mock.ANY, self.node.uuid,
                                           topic='test-topic')
 
@@ -5488,7 +6168,7 @@ class TestAttachDetachVif(test_api_base.BaseApiTest):
                                       self.vif_version})
 
         self.assertEqual(http_client.NO_CONTENT, ret.status_code)
-        mock_get.assert_called_once_with(mock.ANY, self.node.uuid)
+        mock_get.assert_called_once_with(mock.ANY, self.node.uuid, fields=None)
         mock_attach.assert_called_once_with(mock.ANY, self.node.uuid,
                                             vif_info=request_body,
                                             topic='test-topic')
@@ -5509,7 +6189,7 @@ class TestAttachDetachVif(test_api_base.BaseApiTest):
                                       self.vif_version})
 
         self.assertEqual(http_client.NO_CONTENT, ret.status_code)
-        mock_get.assert_called_once_with(mock.ANY, self.node.name)
+        mock_get.assert_called_once_with(mock.ANY, self.node.name, fields=None)
         mock_attach.assert_called_once_with(mock.ANY, self.node.uuid,
                                             vif_info=request_body,
                                             topic='test-topic')
@@ -5614,7 +6294,7 @@ class TestAttachDetachVif(test_api_base.BaseApiTest):
                                    self.vif_version})
 
         self.assertEqual(http_client.NO_CONTENT, ret.status_code)
-        mock_get.assert_called_once_with(mock.ANY, self.node.uuid)
+        mock_get.assert_called_once_with(mock.ANY, self.node.uuid, fields=None)
         mock_detach.assert_called_once_with(mock.ANY, self.node.uuid,
                                             vif_id=vif_id,
                                             topic='test-topic')
@@ -5630,7 +6310,7 @@ class TestAttachDetachVif(test_api_base.BaseApiTest):
                           headers={api_base.Version.string: self.vif_version})
 
         self.assertEqual(http_client.NO_CONTENT, ret.status_code)
-        mock_get.assert_called_once_with(mock.ANY, self.node.name)
+        mock_get.assert_called_once_with(mock.ANY, self.node.name, fields=None)
         mock_detach.assert_called_once_with(mock.ANY, self.node.uuid,
                                             vif_id=vif_id,
                                             topic='test-topic')
@@ -213,9 +213,20 @@ class TestListPorts(test_api_base.BaseApiTest):
         # with listing ports - see https://launchpad.net/bugs/1748893
         obj_utils.create_test_port(self.context, node_id=self.node.id)
         mock_get_node.side_effect = exception.NodeNotFound('boom')
-        data = self.get_json('/ports')
+        data = self.get_json(
+            '/ports?fields=uuid,node_uuid',
+            headers={api_base.Version.string: str(api_v1.max_version())})
         self.assertEqual([], data['ports'])
 
+    # NOTE(jlvillal): autospec=True doesn't work on staticmethods:
+    # https://bugs.python.org/issue23078
+    @mock.patch.object(objects.Node, 'get', spec_set=types.FunctionType)
+    def test_list_without_node_uuid_field(self, mock_get_node):
+        port = obj_utils.create_test_port(self.context, node_id=self.node.id)
+        data = self.get_json('/ports')
+        self.assertEqual(port.uuid, data['ports'][0]['uuid'])
+        self.assertFalse(mock_get_node.called)
+
     # NOTE(jlvillal): autospec=True doesn't work on staticmethods:
     # https://bugs.python.org/issue23078
     @mock.patch.object(objects.Node, 'get', spec_set=types.FunctionType)
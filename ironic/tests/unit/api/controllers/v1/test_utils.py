@@ -14,7 +14,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import datetime
 from http import client as http_client
+import json
 
 import mock
 import os_traits
@@ -200,6 +203,69 @@ class TestApiUtils(base.TestCase):
                           requested, supported)
 
 
+class TestMarker(base.TestCase):
+
+    def setUp(self):
+        super(TestMarker, self).setUp()
+        self.node = objects.Node(id=42, uuid=uuidutils.generate_uuid(),
+                                 name='node-42',
+                                 created_at=datetime.datetime(2020, 1, 2))
+        p = mock.patch.object(api, 'request', spec_set=['context', 'version'])
+        self.mock_request = p.start()
+        self.addCleanup(p.stop)
+        self.mock_request.version.minor = 65
+
+    def test_marker_id(self):
+        self.assertEqual(self.node.uuid, utils.make_marker(self.node, 'id'))
+        self.assertEqual(self.node.uuid, utils.make_marker(self.node, None))
+
+    def test_marker_sort_key(self):
+        marker = utils.make_marker(self.node, 'created_at')
+        self.assertTrue(utils.is_valid_marker(marker))
+        self.assertEqual(
+            {'k': 'created_at', 'v': '2020-01-02T00:00:00Z',
+             'u': self.node.uuid},
+            json.loads(base64.urlsafe_b64decode(marker + '==')))
+        marker_obj = utils.get_marker_obj(objects.Node, marker, 'created_at')
+        self.assertFalse(marker_obj.obj_attr_is_set('id'))
+        self.assertEqual(self.node.uuid, marker_obj.uuid)
+        self.assertEqual(self.node.created_at, marker_obj.created_at)
+
+    def test_marker_sort_key_old_version(self):
+        self.mock_request.version.minor = 64
+        self.assertEqual(self.node.uuid,
+                         utils.make_marker(self.node, 'created_at'))
+
+    def test_marker_not_a_field(self):
+        marker = utils.make_marker(self.node, 'hash_bucket')
+        self.assertEqual(self.node.uuid, marker)
+
+    @mock.patch.object(objects.Node, 'get_by_uuid', autospec=True)
+    def test_get_marker_obj_uuid(self, mock_get):
+        marker_obj = utils.get_marker_obj(objects.Node, self.node.uuid, 'id')
+        self.assertEqual(mock_get.return_value, marker_obj)
+        mock_get.assert_called_once_with(self.mock_request.context,
+                                         self.node.uuid)
+
+    def test_get_marker_obj_none(self):
+        self.assertIsNone(utils.get_marker_obj(objects.Node, None, 'id'))
+
+    def test_get_marker_obj_other_sort_key(self):
+        marker = utils.make_marker(self.node, 'name')
+        self.assertRaises(exception.InvalidParameterValue,
+                          utils.get_marker_obj, objects.Node, marker, 'id')
+
+    def test_is_valid_marker(self):
+        marker = utils.make_marker(self.node, 'name')
+        self.assertTrue(utils.is_valid_marker(self.node.uuid))
+        self.assertTrue(utils.is_valid_marker(marker))
+        self.assertFalse(utils.is_valid_marker('spongebob'))
+        self.assertFalse(utils.is_valid_marker('e30'))  # {}
+        self.mock_request.version.minor = 64
+        self.assertTrue(utils.is_valid_marker(self.node.uuid))
+        self.assertFalse(utils.is_valid_marker(marker))
+
+
 @mock.patch.object(api, 'request', spec_set=['version'])
 class TestCheckAllowFields(base.TestCase):
 
@@ -307,6 +373,25 @@ class TestCheckAllowFields(base.TestCase):
         self.assertRaises(exception.NotAcceptable,
                           utils.check_allow_filter_by_conductor_group, 'foo')
 
+    def test_check_allow_filter_by_traits(self, mock_request):
+        mock_request.version.minor = 64
+        self.assertIsNone(utils.check_allow_filter_by_traits('CUSTOM_1'))
+
+    def test_check_allow_filter_by_traits_none(self, mock_request):
+        mock_request.version.minor = 63
+        self.assertIsNone(utils.check_allow_filter_by_traits(None))
+
+    def test_allow_keyset_marker(self, mock_request):
+        mock_request.version.minor = 65
+        self.assertTrue(utils.allow_keyset_marker())
+        mock_request.version.minor = 64
+        self.assertFalse(utils.allow_keyset_marker())
+
+    def test_check_allow_filter_by_traits_fail(self, mock_request):
+        mock_request.version.minor = 63
+        self.assertRaises(exception.NotAcceptable,
+                          utils.check_allow_filter_by_traits, 'CUSTOM_1')
+
     def test_check_allow_driver_detail(self, mock_request):
         mock_request.version.minor = 30
         self.assertIsNone(utils.check_allow_driver_detail(True))
@@ -571,6 +656,12 @@ class TestCheckAllowFields(base.TestCase):
         mock_request.version.minor = 61
         self.assertFalse(utils.allow_agent_token())
 
+    def test_allow_bulk_states(self, mock_request):
+        mock_request.version.minor = 63
+        self.assertTrue(utils.allow_bulk_states())
+        mock_request.version.minor = 62
+        self.assertFalse(utils.allow_bulk_states())
+
 
 @mock.patch.object(api, 'request')
 class TestNodeIdent(base.TestCase):
@@ -657,6 +748,33 @@ class TestNodeIdent(base.TestCase):
                           utils.get_rpc_node,
                           self.valid_name)
 
+    @mock.patch.object(objects.Node, 'list', autospec=True)
+    def test_get_rpc_nodes(self, mock_list, mock_pr):
+        node = objects.Node(uuid=self.valid_uuid)
+        mock_pr.dbapi.check_node_list.return_value = {
+            self.valid_name: self.valid_uuid,
+            self.valid_uuid: self.valid_uuid}
+        mock_list.return_value = [node]
+
+        result = utils.get_rpc_nodes([self.valid_name, self.valid_uuid],
+                                     fields=['owner'])
+
+        self.assertEqual({self.valid_name: node, self.valid_uuid: node},
+                         result)
+        mock_pr.dbapi.check_node_list.assert_called_once_with(
+            [self.valid_name, self.valid_uuid])
+        mock_list.assert_called_once_with(
+            mock_pr.context, filters={'uuid_in': [self.valid_uuid]},
+            fields={'owner', 'uuid'})
+
+    @mock.patch.object(objects.Node, 'list', autospec=True)
+    def test_get_rpc_nodes_deleted(self, mock_list, mock_pr):
+        mock_pr.dbapi.check_node_list.return_value = {
+            self.valid_name: self.valid_uuid}
+        mock_list.return_value = []
+        self.assertRaises(exception.NodeNotFound, utils.get_rpc_nodes,
+                          [self.valid_name])
+
 
 class TestVendorPassthru(base.TestCase):
 
@@ -746,7 +864,7 @@ class TestVendorPassthru(base.TestCase):
 
     def test_get_controller_reserved_names(self):
         expected = ['maintenance', 'management', 'states',
-                    'vendor_passthru', 'validate', 'detail']
+                    'vendor_passthru', 'validate', 'detail', 'bulk']
         self.assertEqual(sorted(expected),
                          sorted(utils.get_controller_reserved_names(
                                 api_node.NodesController)))
@@ -765,6 +883,38 @@ class TestVendorPassthru(base.TestCase):
         self.assertRaises(exception.HTTPForbidden,
                           utils.check_policy, 'fake-policy')
 
+    @mock.patch.object(api, 'request', spec_set=["context", "policy_cache"])
+    @mock.patch.object(policy, 'authorize', spec=True)
+    def test_check_policy_cached(self, mock_authorize, mock_pr):
+        mock_pr.context.to_policy_values.return_value = {}
+        mock_pr.policy_cache = policy.PolicyCache()
+        mock_authorize.return_value = True
+        for _ in range(2):
+            utils.check_policy('fake-policy')
+            utils.check_owner_policy('node', 'fake-policy', '12345')
+        mock_authorize.assert_has_calls([
+            mock.call('fake-policy', {}, {}),
+            mock.call('fake-policy', {'node.owner': '12345'}, {})])
+        self.assertEqual(2, mock_authorize.call_count)
+
+    @mock.patch.object(api, 'request', spec_set=["context"])
+    @mock.patch.object(policy, 'check', spec=True)
+    def test_check_policy_bool(self, mock_check, mock_pr):
+        mock_check.return_value = False
+        self.assertFalse(utils.check_policy_bool('fake-policy'))
+        cdict = api.request.context.to_policy_values()
+        mock_check.assert_called_once_with('fake-policy', cdict, cdict)
+
+    @mock.patch.object(api, 'request', spec_set=["context", "policy_cache"])
+    @mock.patch.object(policy, 'check', spec=True)
+    def test_check_policy_bool_cached(self, mock_check, mock_pr):
+        mock_pr.context.to_policy_values.return_value = {}
+        mock_pr.policy_cache = policy.PolicyCache()
+        mock_check.return_value = True
+        for _ in range(2):
+            self.assertTrue(utils.check_policy_bool('fake-policy'))
+        mock_check.assert_called_once_with('fake-policy', {}, {})
+
 
 class TestPortgroupIdent(base.TestCase):
     def setUp(self):
@@ -857,7 +1007,7 @@ class TestCheckNodePolicyAndRetrieve(base.TestCase):
         rpc_node = utils.check_node_policy_and_retrieve(
             'fake_policy', self.valid_node_uuid
         )
-        mock_grn.assert_called_once_with(self.valid_node_uuid)
+        mock_grn.assert_called_once_with(self.valid_node_uuid, fields=None)
         mock_grnws.assert_not_called()
         mock_authorize.assert_called_once_with(
             'fake_policy', {'node.owner': '12345'}, {})
@@ -878,7 +1028,7 @@ class TestCheckNodePolicyAndRetrieve(base.TestCase):
             'fake_policy', self.valid_node_uuid, True
         )
         mock_grn.assert_not_called()
-        mock_grnws.assert_called_once_with(self.valid_node_uuid)
+        mock_grnws.assert_called_once_with(self.valid_node_uuid, fields=None)
         mock_authorize.assert_called_once_with(
             'fake_policy', {'node.owner': '12345'}, {})
         self.assertEqual(self.node, rpc_node)
@@ -67,7 +67,8 @@ class TestACL(base.BaseApiTest):
                 self.node_path, headers={'X-Auth-Token': utils.ADMIN_TOKEN})
 
             self.assertEqual(self.fake_db_node['uuid'], response['uuid'])
-            mock_get_node.assert_called_once_with(self.fake_db_node['uuid'])
+            mock_get_node.assert_called_once_with(self.fake_db_node['uuid'],
+                                                  fields=None)
 
     def test_non_admin(self):
         response = self.get_json(self.node_path,
@@ -213,6 +213,7 @@ class TestContextHook(base.BaseApiTest):
         headers = fake_headers(admin=is_admin)
         environ = headers_to_environ(headers, is_public_api=is_public_api)
         reqstate = FakeRequestState(headers=headers, environ=environ)
+        hooks.PolicyHook().before(reqstate)
         context_hook = hooks.ContextHook(None)
         ctx = mock.Mock()
         if request_id:
@@ -257,6 +258,28 @@ class TestContextHook(base.BaseApiTest):
                          response.headers)
 
 
+class TestPolicyHook(tests_base.TestCase):
+
+    @mock.patch.object(hooks.METRICS, 'send_timer', autospec=True)
+    @mock.patch.object(policy, 'check', autospec=True)
+    def test_policy_hook(self, mock_check, mock_send_timer):
+        reqstate = FakeRequestState()
+        policy_hook = hooks.PolicyHook()
+        policy_hook.before(reqstate)
+        mock_check.return_value = True
+
+        cache = reqstate.request.policy_cache
+        self.assertTrue(cache.check('is_admin', {'user_id': 'foo'}))
+        self.assertTrue(cache.check('is_admin', {'user_id': 'foo'}))
+        mock_check.assert_called_once_with('is_admin', {'user_id': 'foo'},
+                                           {'user_id': 'foo'})
+
+        policy_hook.after(reqstate)
+        mock_send_timer.assert_called_once_with('PolicyHook.policy_time',
+                                                mock.ANY)
+        self.assertGreaterEqual(mock_send_timer.call_args[0][1], 0)
+
+
 class TestPolicyDeprecation(tests_base.TestCase):
 
     @mock.patch.object(hooks, 'CHECKED_DEPRECATED_POLICY_ARGS', False)
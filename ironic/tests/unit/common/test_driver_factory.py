@@ -447,6 +447,33 @@ class HardwareTypeLoadTestCase(db_base.DbTestCase):
                 self.assertIsNotNone(impl)
             self.assertIsInstance(task.driver.raid, noop.NoRAID)
 
+    def test_build_driver_for_task_cached(self):
+        node = obj_utils.create_test_node(self.context, driver='fake-hardware',
+                                          **self.node_kwargs)
+        with task_manager.acquire(self.context, node.id) as task:
+            driver1 = task.driver
+
+        with mock.patch.object(driver_factory, 'get_interface',
+                               autospec=True) as mock_get_interface:
+            with task_manager.acquire(self.context, node.id) as task:
+                driver2 = task.driver
+            self.assertFalse(mock_get_interface.called)
+
+        self.assertIsNot(driver1, driver2)
+        for iface in drivers_base.ALL_INTERFACES:
+            self.assertIs(getattr(driver1, iface), getattr(driver2, iface))
+
+    def test_build_driver_for_task_cache_cleared(self):
+        node = obj_utils.create_test_node(self.context, driver='fake-hardware',
+                                          **self.node_kwargs)
+        with task_manager.acquire(self.context, node.id):
+            pass
+        self.assertEqual(1, len(driver_factory._interfaces_cache))
+
+        driver_factory.HardwareTypesFactory._extension_manager = None
+        driver_factory.HardwareTypesFactory()
+        self.assertEqual({}, driver_factory._interfaces_cache)
+
     @mock.patch.object(driver_factory, 'get_hardware_type', autospec=True,
                        return_value=TestFakeHardware())
     def test_build_driver_for_task_not_fake(self, mock_get_hw_type):
@@ -12,6 +12,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from unittest import mock
+
 from ironic.common import exception as excp
 from ironic.common import fsm
 from ironic.tests import base
@@ -96,3 +98,75 @@ class FSMTest(base.TestCase):
         self.fsm.initialize('wakeup')
         self.assertRaises(excp.InvalidState, self.fsm.process_event,
                           'walk', 'daydream')
+
+
+class FSMCursorTest(base.TestCase):
+    def setUp(self):
+        super(FSMCursorTest, self).setUp()
+        self.on_enter = mock.Mock()
+        self.on_exit = mock.Mock()
+        m = fsm.FSM()
+        m.add_state('working', stable=True, on_enter=self.on_enter)
+        m.add_state('daydream')
+        m.add_state('wakeup', target='working', on_exit=self.on_exit)
+        m.add_state('play', stable=True)
+        m.add_transition('wakeup', 'working', 'walk')
+        self.machine = m
+        self.cursor = m.cursor()
+
+    def test_cursor_freezes_machine(self):
+        self.assertTrue(self.machine.frozen)
+        self.assertRaises(excp.InvalidState, self.machine.add_transition,
+                          'working', 'play', 'run')
+
+    def test_cursors_are_independent(self):
+        other = self.machine.cursor()
+        self.cursor.initialize('wakeup')
+        other.initialize('play')
+        self.cursor.process_event('walk')
+        self.assertEqual('working', self.cursor.current_state)
+        self.assertEqual('play', other.current_state)
+
+    def test_is_stable(self):
+        self.assertTrue(self.cursor.is_stable('working'))
+        self.assertFalse(self.cursor.is_stable('daydream'))
+        self.assertRaises(excp.InvalidState, self.cursor.is_stable, 'foo')
+
+    def test_is_actionable_event(self):
+        self.assertFalse(self.cursor.is_actionable_event('walk'))
+        self.cursor.initialize('wakeup')
+        self.assertTrue(self.cursor.is_actionable_event('walk'))
+        self.assertFalse(self.cursor.is_actionable_event('run'))
+
+    def test_initialize(self):
+        self.cursor.initialize('wakeup')
+        self.assertEqual('wakeup', self.cursor.current_state)
+        self.assertEqual('working', self.cursor.target_state)
+
+        self.cursor.initialize('wakeup', 'play')
+        self.assertEqual('play', self.cursor.target_state)
+
+        self.assertRaises(excp.InvalidState, self.cursor.initialize,
+                          'wakeup', 'daydream')
+        self.assertRaises(excp.InvalidState, self.cursor.initialize, 'foo')
+
+    def test_process_event(self):
+        self.cursor.initialize('wakeup')
+        self.cursor.process_event('walk')
+        self.assertEqual('working', self.cursor.current_state)
+        self.assertIsNone(self.cursor.target_state)
+        self.on_exit.assert_called_once_with('wakeup', 'walk')
+        self.on_enter.assert_called_once_with('working', 'walk')
+
+        self.cursor.initialize('wakeup')
+        self.cursor.process_event('walk', 'play')
+        self.assertEqual('working', self.cursor.current_state)
+        self.assertEqual('play', self.cursor.target_state)
+
+    def test_process_event_invalid(self):
+        self.assertRaises(excp.InvalidState, self.cursor.process_event,
+                          'walk')
+        self.cursor.initialize('wakeup')
+        self.assertRaises(excp.InvalidState, self.cursor.process_event,
+                          'run')
+        self.assertEqual('wakeup', self.cursor.current_state)
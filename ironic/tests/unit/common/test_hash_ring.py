@@ -15,7 +15,10 @@
 
 import time
 
+import mock
 from oslo_config import cfg
+from oslo_utils import uuidutils
+from tooz import hashring
 
 from ironic.common import exception
 from ironic.common import hash_ring
@@ -116,6 +119,69 @@ class HashRingManagerTestCase(db_base.DbTestCase):
         ring = self.ring_manager.get_ring('hardware-type', '')
         self.assertEqual(2, len(ring))
 
+    def test_hash_ring_manager_reset_interval_unchanged(self):
+        CONF.set_override('hash_ring_reset_interval', 30)
+        self.register_conductors()
+        rings = self.ring_manager.ring
+        self.dbapi.touch_conductor('host1')
+
+        self.ring_manager.updated_at = time.time() - 31
+        with mock.patch.object(self.ring_manager, '_load_hash_rings',
+                               autospec=True) as mock_load:
+            self.assertIs(rings, self.ring_manager.ring)
+            self.assertFalse(mock_load.called)
+        self.assertGreater(self.ring_manager.updated_at, time.time() - 30)
+
+    def test_hash_ring_manager_automatic_retry_unchanged(self):
+        self.register_conductors()
+        rings = self.ring_manager.ring
+        with mock.patch.object(self.ring_manager, '_load_hash_rings',
+                               autospec=True) as mock_load:
+            self.assertRaises(exception.DriverNotFound,
+                              self.ring_manager.get_ring,
+                              'driver3', '')
+            self.assertFalse(mock_load.called)
+        self.assertIs(rings, self.ring_manager.ring)
+
+    def test_hash_ring_manager_update(self):
+        CONF.set_override('hash_ring_reset_interval', 30)
+        self.register_conductors()
+        c6 = self.dbapi.register_conductor({
+            'hostname': 'host6',
+            'drivers': [],
+        })
+        self.dbapi.register_conductor_hardware_interfaces(
+            c6.id, 'other-type', 'deploy', ['iscsi', 'direct'], 'iscsi')
+        old_rings = self.ring_manager.ring
+
+        self.dbapi.unregister_conductor('host2')
+        self.ring_manager.updated_at = time.time() - 31
+        with mock.patch.object(hash_ring, '_update_ring',
+                               wraps=hash_ring._update_ring) as mock_update:
+            rings = self.ring_manager.ring
+        # Only the rings with host2 are updated
+        self.assertEqual(1, mock_update.call_count)
+        other_key = ':other-type' if self.use_groups else 'other-type'
+        self.assertIs(old_rings[other_key], rings[other_key])
+        ring = self.ring_manager.get_ring('hardware-type', '')
+        self.assertNotIn('host2', ring.nodes)
+        expected = hashring.HashRing(
+            ring.nodes, partitions=2 ** CONF.hash_partition_exponent)
+        self.assertEqual(expected._ring, ring._ring)
+
+    def test_hash_ring_manager_partitions_changed(self):
+        CONF.set_override('hash_ring_reset_interval', 30)
+        self.register_conductors()
+        self.ring_manager.ring
+        CONF.set_override('hash_partition_exponent', 2)
+
+        self.ring_manager.updated_at = time.time() - 31
+        with mock.patch.object(hash_ring, '_update_ring',
+                               autospec=True) as mock_update:
+            ring = self.ring_manager.get_ring('hardware-type', '')
+        self.assertFalse(mock_update.called)
+        self.assertEqual(4 * len(ring.nodes), len(ring))
+
     def test_hash_ring_manager_uncached(self):
         ring_mgr = hash_ring.HashRingManager(cache=False,
                                              use_groups=self.use_groups)
@@ -123,6 +189,101 @@ class HashRingManagerTestCase(db_base.DbTestCase):
         self.assertIsNotNone(ring)
         self.assertIsNone(hash_ring.HashRingManager._hash_rings)
 
+    def test_hash_ring_manager_get_hash_buckets(self):
+        self.register_conductors()
+        buckets = self.ring_manager.get_hash_buckets('host2')
+        self.assertEqual([(None, 'hardware-type')], list(buckets))
+        self.assertEqual({}, self.ring_manager.get_hash_buckets('host42'))
+
+    @mock.patch.object(hash_ring, '_check_tooz_internals', autospec=True)
+    def test_hash_ring_manager_get_hash_buckets_unsupported(self,
+                                                            mock_check):
+        mock_check.return_value = False
+        self.register_conductors()
+        self.assertIsNone(self.ring_manager.get_hash_buckets('host2'))
+
+
+class HashBucketTestCase(db_base.DbTestCase):
+
+    def test_get_hash_bucket(self):
+        bucket = hash_ring.get_hash_bucket(
+            '1be26c0b-03f2-4d2e-ae87-c02d7f33c123')
+        self.assertEqual(0x029b, bucket)
+
+    def _in_ranges(self, value, ranges):
+        return any(first <= value <= last for first, last in ranges)
+
+    def test_get_bucket_ranges(self):
+        hosts = ['host1', 'host2', 'host3']
+        ring = hashring.HashRing(hosts, partitions=32)
+        ranges = {host: hash_ring._get_bucket_ranges(ring, host)
+                  for host in hosts}
+        for _i in range(200):
+            node_uuid = uuidutils.generate_uuid()
+            bucket = hash_ring.get_hash_bucket(node_uuid)
+            host, = ring.get_nodes(node_uuid.encode('utf-8'))
+            self.assertTrue(self._in_ranges(bucket, ranges[host]))
+
+        # All buckets are covered and the ranges do not overlap much
+        covered = sum(last - first + 1
+                      for host_ranges in ranges.values()
+                      for first, last in host_ranges)
+        self.assertGreaterEqual(covered, 2 ** hash_ring.HASH_BUCKET_BITS)
+        self.assertLess(covered, 2 ** hash_ring.HASH_BUCKET_BITS + 3 * 32)
+
+    def test_get_bucket_ranges_single_host(self):
+        ring = hashring.HashRing(['host1'], partitions=32)
+        self.assertEqual([(0, 2 ** hash_ring.HASH_BUCKET_BITS - 1)],
+                         hash_ring._get_bucket_ranges(ring, 'host1'))
+        self.assertEqual([], hash_ring._get_bucket_ranges(ring, 'host2'))
+
+    def test_update_ring_unsupported(self):
+        ring = hashring.HashRing(['host1', 'host2'], partitions=32)
+        with mock.patch.object(hash_ring, '_check_tooz_internals',
+                               autospec=True) as mock_check:
+            mock_check.return_value = False
+            new_ring = hash_ring._update_ring(ring, frozenset(['host2']), 32)
+        expected = hashring.HashRing(['host2'], partitions=32)
+        self.assertEqual({'host2'}, set(new_ring.nodes))
+        self.assertEqual(expected.get_nodes(b'key'),
+                         new_ring.get_nodes(b'key'))
+
+    @mock.patch.object(hash_ring, '_TOOZ_INTERNALS', None)
+    def test_check_tooz_internals(self):
+        self.assertTrue(hash_ring._check_tooz_internals())
+
+    @mock.patch.object(hash_ring, '_TOOZ_INTERNALS', None)
+    @mock.patch.object(hash_ring.LOG, 'warning', autospec=True)
+    def test_check_tooz_internals_missing(self, mock_log):
+        class FakeRing(object):
+            def __init__(self, nodes, partitions):
+                self.nodes = dict.fromkeys(nodes, 1)
+
+        with mock.patch.object(hashring, 'HashRing', FakeRing):
+            self.assertFalse(hash_ring._check_tooz_internals())
+        self.assertTrue(mock_log.called)
+        # The result is cached
+        self.assertFalse(hash_ring._check_tooz_internals())
+
+    @mock.patch.object(hash_ring, '_TOOZ_INTERNALS', None)
+    def test_check_tooz_internals_changed_mapping(self):
+        with mock.patch.object(hashring.HashRing, 'get_nodes',
+                               autospec=True) as mock_get_nodes:
+            mock_get_nodes.return_value = {'other-host'}
+            self.assertFalse(hash_ring._check_tooz_internals())
+
+    def test_update_ring(self):
+        ring = hashring.HashRing(['host1', 'host2', 'host3'], partitions=32)
+        new_ring = hash_ring._update_ring(ring,
+                                          frozenset(['host2', 'host4']), 32)
+        expected = hashring.HashRing(['host2', 'host4'], partitions=32)
+        self.assertEqual(expected._ring, new_ring._ring)
+        self.assertEqual(expected._partitions, new_ring._partitions)
+        self.assertEqual({'host2', 'host4'}, set(new_ring.nodes))
+        # The original ring is not modified
+        self.assertEqual({'host1', 'host2', 'host3'}, set(ring.nodes))
+        self.assertEqual(96, len(ring._ring))
+
 
 class HashRingManagerWithGroupsTestCase(HashRingManagerTestCase):
 
@@ -137,3 +298,12 @@ class HashRingManagerWithGroupsTestCase(HashRingManagerTestCase):
         self.register_conductors()
         ring = self.ring_manager.get_ring('hardware-type', 'foogroup')
         self.assertEqual(sorted(['host3', 'host4']), sorted(ring.nodes))
+
+    def test_hash_ring_manager_get_hash_buckets(self):
+        self.register_conductors()
+        buckets = self.ring_manager.get_hash_buckets('host3')
+        self.assertEqual([('foogroup', 'hardware-type')], list(buckets))
+        buckets = self.ring_manager.get_hash_buckets('host5')
+        self.assertEqual({('bargroup', 'hardware-type'):
+                          [(0, 2 ** hash_ring.HASH_BUCKET_BITS - 1)]},
+                         buckets)
@@ -10,9 +10,12 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import socket
+
 import fixtures
 import mock
 import oslo_messaging
+from oslo_serialization import msgpackutils
 import webob
 
 from ironic.common import context as ir_ctx
@@ -166,10 +169,8 @@ class TestService(test_base.TestCase):
             {'method': 'no_result', 'params': {'context': self.ctx}},
             {'jsonrpc': '2.0', 'params': {'context': self.ctx}},
             42,
-            # We do not implement batched requests.
+            # Empty batch requests are invalid.
             [],
-            [{'jsonrpc': '2.0', 'method': 'no_result',
-              'params': {'context': self.ctx}}],
         ]
         for body in bodies:
             body = self._request(json_body=body)
@@ -251,6 +252,79 @@ class TestService(test_base.TestCase):
         self.assertEqual(-32602, body['error']['code'])
         self.assertNotIn('result', body)
 
+    def test_batch(self):
+        with mock.patch.object(self.service._batch_pool, 'spawn',
+                               wraps=self.service._batch_pool.spawn
+                               ) as mock_spawn:
+            body = self._request(json_body=[
+                {'jsonrpc': '2.0', 'id': 'a', 'method': 'success',
+                 'params': {'context': self.ctx, 'x': 42}},
+                {'jsonrpc': '2.0', 'method': 'no_result',
+                 'params': {'context': self.ctx}},
+                {'jsonrpc': '2.0', 'id': 'b', 'method': 'fail',
+                 'params': {'context': self.ctx, 'message': 'some error'}},
+                42,
+            ])
+        self.assertEqual(4, mock_spawn.call_count)
+        success, failure, invalid = body
+        self._check(success, result=42, request_id='a')
+        self._check(failure, request_id='b',
+                    error={
+                        'message': 'some error',
+                        'code': 500,
+                        'data': {
+                            'class': 'ironic_lib.exception.IronicException'
+                        }
+                    })
+        self._check(invalid, request_id=None,
+                    error={
+                        'message': server.InvalidRequest._msg_fmt,
+                        'code': -32600,
+                    })
+
+    def test_batch_notifications(self):
+        body = self._request(request_id=None, json_body=[
+            {'jsonrpc': '2.0', 'method': 'no_result',
+             'params': {'context': self.ctx}},
+            {'jsonrpc': '2.0', 'method': 'fail',
+             'params': {'context': self.ctx, 'message': 'some error'}},
+        ])
+        self.assertIsNone(body)
+
+    def _msgpack_request(self, body, **kwargs):
+        request = webob.Request.blank("/", method='POST', body=body,
+                                      **kwargs)
+        response = request.get_response(self.app)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/msgpack', response.content_type)
+        return msgpackutils.loads(response.body)
+
+    def test_msgpack(self):
+        body = self._msgpack_request(
+            msgpackutils.dumps({'jsonrpc': '2.0', 'id': 'abcd',
+                                'method': 'success',
+                                'params': {'context': self.ctx, 'x': 42}}),
+            headers={'Content-Type': 'application/msgpack'})
+        self._check(body, result=42)
+
+    def test_msgpack_accepted(self):
+        body = self._msgpack_request(
+            b'{"jsonrpc": "2.0", "id": "abcd", "method": "success", '
+            b'"params": {"context": {"user_name": "admin"}, "x": 42}}',
+            headers={'Content-Type': 'application/json',
+                     'Accept': 'application/msgpack, application/json'})
+        self._check(body, result=42)
+
+    def test_msgpack_invalid(self):
+        body = self._msgpack_request(
+            b'\xc1', headers={'Content-Type': 'application/msgpack'})
+        self._check(body,
+                    error={
+                        'message': server.ParseError._msg_fmt,
+                        'code': -32700,
+                    },
+                    request_id=None)
+
     def test_method_not_post(self):
         self._request('success', {'context': self.ctx, 'x': 42},
                       method='GET', expected_error=405)
@@ -267,8 +341,10 @@ class TestService(test_base.TestCase):
         self._request('success', {'context': self.ctx, 'x': 42},
                       expected_error=403)
 
+    @mock.patch.object(server.LOG, 'isEnabledFor', autospec=True,
+                       return_value=True)
     @mock.patch.object(server.LOG, 'debug', autospec=True)
-    def test_mask_secrets(self, mock_log):
+    def test_mask_secrets(self, mock_log, mock_enabled):
         node = obj_utils.get_test_node(
             self.context, driver_info=db_utils.get_test_ipmi_info())
         node = self.serializer.serialize_entity(self.context, node)
@@ -283,6 +359,21 @@ class TestService(test_base.TestCase):
         # The result is not affected, only logging
         self.assertEqual(db_utils.get_test_ipmi_info(), node.driver_info)
 
+    @mock.patch.object(server.LOG, 'isEnabledFor', autospec=True,
+                       return_value=False)
+    @mock.patch.object(server.strutils, 'mask_dict_password', autospec=True)
+    @mock.patch.object(server.LOG, 'debug', autospec=True)
+    def test_no_masking_without_debug(self, mock_log, mock_mask,
+                                      mock_enabled):
+        node = obj_utils.get_test_node(
+            self.context, driver_info=db_utils.get_test_ipmi_info())
+        node = self.serializer.serialize_entity(self.context, node)
+        body = self._request('with_node', {'context': self.ctx, 'node': node})
+        node = self.serializer.deserialize_entity(self.context, body['result'])
+        self.assertEqual(42, node.extra['answer'])
+        self.assertFalse(mock_mask.called)
+        self.assertFalse(mock_log.called)
+
 
 @mock.patch.object(client, '_get_session', autospec=True)
 class TestClient(test_base.TestCase):
@@ -511,8 +602,10 @@ class TestClient(test_base.TestCase):
                                answer=42)
         self.assertFalse(mock_session.return_value.post.called)
 
+    @mock.patch.object(client.LOG, 'isEnabledFor', autospec=True,
+                       return_value=True)
     @mock.patch.object(client.LOG, 'debug', autospec=True)
-    def test_mask_secrets(self, mock_log, mock_session):
+    def test_mask_secrets(self, mock_log, mock_enabled, mock_session):
         request = {
             'redfish_username': 'admin',
             'redfish_password': 'passw0rd'
@@ -541,3 +634,300 @@ class TestClient(test_base.TestCase):
                                 'redfish_password': '***'})
         resp_text = mock_log.call_args_list[1][0][2]
         self.assertEqual(body.replace('passw0rd', '***'), resp_text)
+
+    @mock.patch.object(client.LOG, 'isEnabledFor', autospec=True,
+                       return_value=False)
+    @mock.patch.object(client.strutils, 'mask_dict_password', autospec=True)
+    @mock.patch.object(client.LOG, 'debug', autospec=True)
+    def test_no_masking_without_debug(self, mock_log, mock_mask, mock_enabled,
+                                      mock_session):
+        cctx = self.client.prepare('foo.example.com')
+        cctx.cast(self.context, 'do_something', node={'password': 'x'})
+        self.assertTrue(mock_session.return_value.post.called)
+        self.assertFalse(mock_mask.called)
+        self.assertFalse(mock_log.called)
+
+    @mock.patch.object(client, '_MSGPACK_HOSTS', set())
+    def test_call_msgpack(self, mock_session):
+        self.config(payload_encoding='msgpack', group='json_rpc')
+        response = mock_session.return_value.post.return_value
+        response.headers = {'Content-Type': 'application/msgpack'}
+        response.content = msgpackutils.dumps({'jsonrpc': '2.0',
+                                               'result': 42})
+        cctx = self.client.prepare('foo.example.com')
+        # The first request is sent as JSON, but accepts MessagePack
+        self.assertEqual(42, cctx.call(self.context, 'do_something',
+                                       answer=42))
+        body = {'jsonrpc': '2.0',
+                'method': 'do_something',
+                'params': {'answer': 42, 'context': self.ctx_json},
+                'id': self.context.request_id}
+        mock_session.return_value.post.assert_called_once_with(
+            'http://example.com:8089', json=body,
+            headers={'Accept': 'application/msgpack, application/json'})
+        self.assertFalse(response.json.called)
+        # The conductor replied with MessagePack, so it accepts it
+        self.assertEqual(42, cctx.call(self.context, 'do_something',
+                                       answer=42))
+        mock_session.return_value.post.assert_called_with(
+            'http://example.com:8089', data=msgpackutils.dumps(body),
+            headers={'Content-Type': 'application/msgpack',
+                     'Accept': 'application/msgpack'})
+
+    @mock.patch.object(client, '_MSGPACK_HOSTS', set())
+    def test_call_msgpack_not_supported(self, mock_session):
+        self.config(payload_encoding='msgpack', group='json_rpc')
+        response = mock_session.return_value.post.return_value
+        response.headers = {'Content-Type': 'application/json'}
+        response.json.return_value = {'jsonrpc': '2.0', 'result': 42}
+        cctx = self.client.prepare('foo.example.com')
+        for _i in range(2):
+            self.assertEqual(42, cctx.call(self.context, 'do_something',
+                                           answer=42))
+        mock_session.return_value.post.assert_called_with(
+            'http://example.com:8089', json=mock.ANY,
+            headers={'Accept': 'application/msgpack, application/json'})
+        self.assertEqual(set(), client._MSGPACK_HOSTS)
+
+    @mock.patch.object(client, '_MSGPACK_HOSTS', {'example.com'})
+    def test_call_msgpack_rejected(self, mock_session):
+        self.config(payload_encoding='msgpack', group='json_rpc')
+        rejected = mock.MagicMock(
+            headers={'Content-Type': 'application/json'}, content=b'error')
+        rejected.json.return_value = {
+            'jsonrpc': '2.0', 'id': None,
+            'error': {'code': -32700, 'message': 'Parse error'}}
+        response = mock.MagicMock(
+            headers={'Content-Type': 'application/json'}, content=b'result')
+        response.json.return_value = {'jsonrpc': '2.0', 'result': 42}
+        mock_session.return_value.post.side_effect = [rejected, response]
+        cctx = self.client.prepare('foo.example.com')
+        self.assertEqual(42, cctx.call(self.context, 'do_something',
+                                       answer=42))
+        body = {'jsonrpc': '2.0',
+                'method': 'do_something',
+                'params': {'answer': 42, 'context': self.ctx_json},
+                'id': self.context.request_id}
+        mock_session.return_value.post.assert_has_calls([
+            mock.call('http://example.com:8089',
+                      data=msgpackutils.dumps(body),
+                      headers={'Content-Type': 'application/msgpack',
+                               'Accept': 'application/msgpack'}),
+            mock.call('http://example.com:8089', json=body,
+                      headers={'Accept':
+                               'application/msgpack, application/json'}),
+        ])
+        self.assertEqual(set(), client._MSGPACK_HOSTS)
+
+    @mock.patch.object(client, '_MSGPACK_HOSTS', {'example.com'})
+    def test_call_msgpack_error_not_retried(self, mock_session):
+        self.config(payload_encoding='msgpack', group='json_rpc')
+        response = mock_session.return_value.post.return_value
+        response.headers = {'Content-Type': 'application/msgpack'}
+        response.content = msgpackutils.dumps({
+            'jsonrpc': '2.0',
+            'error': {'code': 404, 'message': 'oops',
+                      'data': {'class':
+                               'ironic.common.exception.NodeNotFound'}}})
+        cctx = self.client.prepare('foo.example.com')
+        self.assertRaises(exception.NodeNotFound, cctx.call, self.context,
+                          'do_something', answer=42)
+        self.assertEqual(1, mock_session.return_value.post.call_count)
+        self.assertEqual({'example.com'}, client._MSGPACK_HOSTS)
+
+    @mock.patch.object(client.METRICS, 'send_gauge', autospec=True)
+    def test_payload_metrics(self, mock_gauge, mock_session):
+        response = mock_session.return_value.post.return_value
+        response.request.body = b'request'
+        response.content = b'{"jsonrpc": "2.0", "result": 42}'
+        response.json.return_value = {'jsonrpc': '2.0', 'result': 42}
+        cctx = self.client.prepare('foo.example.com')
+        cctx.call(self.context, 'do_something', answer=42)
+        mock_gauge.assert_has_calls([
+            mock.call('JsonRpcClient.do_something.request_bytes', 7),
+            mock.call('JsonRpcClient.do_something.response_bytes', 32)])
+
+    def _batch(self):
+        cctx = self.client.prepare('foo.example.com')
+        batch = cctx.batch()
+        batch.call(self.context, 'do_something', answer=42)
+        batch.cast(self.context, 'do_something', answer=43)
+        batch.call(self.context, 'fail', answer=44)
+        self.assertEqual(3, len(batch))
+        return batch
+
+    @mock.patch.object(client.uuidutils, 'generate_uuid', autospec=True)
+    def test_batch(self, mock_uuid, mock_session):
+        mock_uuid.side_effect = ['id1', 'id2']
+        response = mock_session.return_value.post.return_value
+        # The order of the responses may differ from the one of the requests
+        response.json.return_value = [
+            {
+                'jsonrpc': '2.0',
+                'id': 'id2',
+                'error': {
+                    'code': 418,
+                    'message': 'I am a teapot',
+                    'data': {
+                        'class': 'ironic.common.exception.Invalid'
+                    }
+                }
+            },
+            {'jsonrpc': '2.0', 'id': 'id1', 'result': 42},
+        ]
+        result = self._batch().send()
+        self.assertEqual(3, len(result))
+        self.assertEqual(42, result[0])
+        self.assertIsNone(result[1])
+        self.assertIsInstance(result[2], exception.Invalid)
+        self.assertEqual(418, result[2].code)
+        mock_session.return_value.post.assert_called_once_with(
+            'http://example.com:8089',
+            json=[{'jsonrpc': '2.0',
+                   'method': 'do_something',
+                   'params': {'answer': 42, 'context': self.ctx_json},
+                   'id': 'id1'},
+                  {'jsonrpc': '2.0',
+                   'method': 'do_something',
+                   'params': {'answer': 43, 'context': self.ctx_json}},
+                  {'jsonrpc': '2.0',
+                   'method': 'fail',
+                   'params': {'answer': 44, 'context': self.ctx_json},
+                   'id': 'id2'}])
+
+    def test_batch_missing_response(self, mock_session):
+        response = mock_session.return_value.post.return_value
+        response.json.return_value = []
+        result = self._batch().send()
+        self.assertIsInstance(result[0], exception.IronicException)
+        self.assertIsNone(result[1])
+        self.assertIsInstance(result[2], exception.IronicException)
+
+    def test_batch_casts(self, mock_session):
+        response = mock_session.return_value.post.return_value
+        response.content = b''
+        cctx = self.client.prepare('foo.example.com')
+        batch = cctx.batch()
+        batch.cast(self.context, 'do_something', answer=42)
+        batch.cast(self.context, 'do_something', answer=43)
+        self.assertEqual([None, None], batch.send())
+        self.assertFalse(response.json.called)
+        mock_session.return_value.post.assert_called_once_with(
+            'http://example.com:8089',
+            json=[{'jsonrpc': '2.0',
+                   'method': 'do_something',
+                   'params': {'answer': 42, 'context': self.ctx_json}},
+                  {'jsonrpc': '2.0',
+                   'method': 'do_something',
+                   'params': {'answer': 43, 'context': self.ctx_json}}])
+
+    def test_batch_empty(self, mock_session):
+        cctx = self.client.prepare('foo.example.com')
+        self.assertEqual([], cctx.batch().send())
+        self.assertFalse(mock_session.return_value.post.called)
+
+    def test_batch_failure(self, mock_session):
+        response = mock_session.return_value.post.return_value
+        response.json.return_value = {
+            'jsonrpc': '2.0',
+            'error': {
+                'code': -32700,
+                'message': 'Invalid JSON received by RPC server',
+            }
+        }
+        exc = self.assertRaises(exception.IronicException,
+                                self._batch().send)
+        self.assertIn('Unexpected error', str(exc))
+        self.assertEqual(1, mock_session.return_value.post.call_count)
+
+    @mock.patch.object(client.uuidutils, 'generate_uuid', autospec=True)
+    def test_batch_not_supported(self, mock_uuid, mock_session):
+        mock_uuid.side_effect = ['id1', 'id2']
+        batch_response = mock.MagicMock()
+        batch_response.json.return_value = {
+            'jsonrpc': '2.0',
+            'id': None,
+            'error': {
+                'code': -32600,
+                'message': 'Invalid request object received by RPC server',
+            }
+        }
+        call_response = mock.MagicMock()
+        call_response.json.return_value = {'jsonrpc': '2.0', 'id': 'id1',
+                                           'result': 42}
+        failure_response = mock.MagicMock()
+        failure_response.json.return_value = {
+            'jsonrpc': '2.0',
+            'id': 'id2',
+            'error': {
+                'code': 418,
+                'message': 'I am a teapot',
+                'data': {
+                    'class': 'ironic.common.exception.Invalid'
+                }
+            }
+        }
+        mock_session.return_value.post.side_effect = [
+            batch_response, call_response, mock.MagicMock(content=b''),
+            failure_response]
+        result = self._batch().send()
+        self.assertEqual(42, result[0])
+        self.assertIsNone(result[1])
+        self.assertIsInstance(result[2], exception.Invalid)
+        mock_session.return_value.post.assert_has_calls([
+            mock.call('http://example.com:8089', json=mock.ANY),
+            mock.call('http://example.com:8089',
+                      json={'jsonrpc': '2.0',
+                            'method': 'do_something',
+                            'params': {'answer': 42,
+                                       'context': self.ctx_json},
+                            'id': 'id1'}),
+            mock.call('http://example.com:8089',
+                      json={'jsonrpc': '2.0',
+                            'method': 'do_something',
+                            'params': {'answer': 43,
+                                       'context': self.ctx_json}}),
+            mock.call('http://example.com:8089',
+                      json={'jsonrpc': '2.0',
+                            'method': 'fail',
+                            'params': {'answer': 44,
+                                       'context': self.ctx_json},
+                            'id': 'id2'}),
+        ])
+
+
+@mock.patch.object(client, '_SESSION', None)
+class TestSession(test_base.TestCase):
+
+    def setUp(self):
+        super(TestSession, self).setUp()
+        self.config(auth_strategy='noauth', group='json_rpc')
+
+    def _get_pool_kwargs(self):
+        session = client._get_session()
+        adapter = session.session.get_adapter('http://example.com:8089')
+        self.assertIsInstance(adapter, client._PoolAdapter)
+        return adapter.poolmanager, adapter.poolmanager.connection_pool_kw
+
+    def test_pool(self):
+        self.config(connection_pool_size=5, connection_pool_max_hosts=3,
+                    connection_pool_block=True, group='json_rpc')
+        manager, kwargs = self._get_pool_kwargs()
+        self.assertEqual(5, kwargs['maxsize'])
+        self.assertTrue(kwargs['block'])
+        self.assertEqual(3, manager.pools._maxsize)
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+                      kwargs['socket_options'])
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            self.assertIn((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 600),
+                          kwargs['socket_options'])
+        # The session is reused
+        self.assertIs(client._get_session(), client._get_session())
+
+    def test_pool_no_keepalive(self):
+        self.config(tcp_keepidle=0, group='json_rpc')
+        manager, kwargs = self._get_pool_kwargs()
+        self.assertEqual(10, kwargs['maxsize'])
+        self.assertFalse(kwargs['block'])
+        self.assertNotIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+                         kwargs['socket_options'])
@@ -174,3 +174,43 @@ class PolicyTestCase(base.TestCase):
         mock_cfg.assert_called_once_with(['--config-file', 'my.cfg'],
                                          project='ironic')
         self.assertEqual(1, mock_gpe.call_count)
+
+
+class PolicyCacheTestCase(base.TestCase):
+
+    def setUp(self):
+        super(PolicyCacheTestCase, self).setUp()
+        self.cache = policy.PolicyCache()
+        self.creds = {'roles': ['_member_'], 'project_id': '1234'}
+
+    def test_authorize_owner(self):
+        for _ in range(2):
+            self.assertTrue(self.cache.authorize(
+                'is_node_owner', self.creds, {'node.owner': '1234'}))
+            self.assertRaises(exception.HTTPForbidden, self.cache.authorize,
+                              'is_node_owner', self.creds,
+                              {'node.owner': '5678'})
+
+    @mock.patch.object(policy, 'check', autospec=True)
+    def test_check_memoized(self, mock_check):
+        mock_check.side_effect = [True, False]
+        for _ in range(3):
+            self.assertTrue(self.cache.check('is_admin', self.creds))
+            self.assertFalse(self.cache.check('is_admin', self.creds,
+                                              {'node.owner': '5678'}))
+
+        mock_check.assert_has_calls([
+            mock.call('is_admin', self.creds, self.creds),
+            mock.call('is_admin', dict(self.creds, **{'node.owner': '5678'}),
+                      self.creds)])
+        self.assertEqual(2, mock_check.call_count)
+        self.assertGreater(self.cache.elapsed, 0)
+
+    @mock.patch.object(policy, 'authorize', autospec=True)
+    def test_authorize_memoized(self, mock_authorize):
+        mock_authorize.side_effect = exception.HTTPForbidden(resource='rule')
+        for _ in range(3):
+            self.assertRaises(exception.HTTPForbidden, self.cache.authorize,
+                              'rule', self.creds)
+        mock_authorize.assert_called_once_with('rule', self.creds,
+                                               self.creds)
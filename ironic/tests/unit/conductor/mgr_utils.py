@@ -25,6 +25,7 @@ from oslo_utils import uuidutils
 from ironic.common import exception
 from ironic.common import states
 from ironic.conductor import manager
+from ironic.conductor import task_manager
 from ironic import objects
 
 
@@ -36,7 +37,8 @@ class CommonMixIn(object):
                  'power_state': states.POWER_OFF,
                  'target_power_state': None,
                  'maintenance': False,
-                 'reservation': None}
+                 'reservation': None,
+                 'driver_info': {}}
         attrs.update(kwargs)
         node = mock.Mock(spec_set=objects.Node)
         for attr in attrs:
@@ -99,6 +101,7 @@ class CommonMixIn(object):
                 # node_id so we can assert we're returning the correct node
                 # in __enter__().
                 fa_self.node_id = node_id
+                fa_self.constraints = kwargs.get('constraints')
 
             def __enter__(fa_self):
                 task = tasks.pop(0)
@@ -111,6 +114,8 @@ class CommonMixIn(object):
                     self.assertEqual(fa_self.node_id, task.node.id)
                 else:
                     self.assertEqual(fa_self.node_id, task.node.uuid)
+                task_manager._check_constraints(task.node,
+                                                fa_self.constraints)
                 return task
 
             def __exit__(fa_self, exc_typ, exc_val, exc_tb):
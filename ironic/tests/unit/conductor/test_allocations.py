@@ -16,6 +16,7 @@ import mock
 import oslo_messaging as messaging
 from oslo_utils import uuidutils
 
+from ironic.common import context
 from ironic.common import exception
 from ironic.conductor import allocations
 from ironic.conductor import manager
@@ -56,8 +57,88 @@ class AllocationTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
         self.assertEqual(self.service.conductor.id, res['conductor_affinity'])
 
         mock_spawn.assert_called_once_with(self.service,
-                                           allocations.do_allocate,
-                                           self.context, mock.ANY)
+                                           self.service._process_allocations)
+        self.assertEqual([(self.context, allocation['uuid'], 1)],
+                         [(p.context, p.allocation.uuid, p.attempt)
+                          for p in self.service._pending_allocations])
+
+        # The running worker picks up the next allocation, with the context
+        # of its own request
+        context2 = context.get_admin_context()
+        allocation2 = obj_utils.get_test_allocation(
+            context2, uuid=uuidutils.generate_uuid())
+        self.service.create_allocation(context2, allocation2)
+        mock_spawn.assert_called_once_with(self.service,
+                                           self.service._process_allocations)
+        self.assertEqual([(self.context, allocation['uuid']),
+                          (context2, allocation2['uuid'])],
+                         [(p.context, p.allocation.uuid)
+                          for p in self.service._pending_allocations])
+
+    @mock.patch.object(allocations, 'allocate_nodes', autospec=True)
+    def test_process_allocations(self, mock_allocate):
+        self.config(allocation_batch_size=2, group='conductor')
+        self._start_service()
+        batch = [allocations.PendingAllocation(
+            self.context,
+            obj_utils.create_test_allocation(
+                self.context, uuid=uuidutils.generate_uuid()),
+            1) for _ in range(3)]
+        self.service._pending_allocations.extend(batch)
+        self.service._allocations_worker_running = True
+        mock_allocate.return_value = []
+
+        self.service._process_allocations()
+
+        mock_allocate.assert_has_calls([
+            mock.call(batch[:2]),
+            mock.call(batch[2:]),
+        ])
+        self.assertEqual(2, mock_allocate.call_count)
+        self.assertFalse(self.service._pending_allocations)
+        self.assertFalse(self.service._allocations_worker_running)
+
+    @mock.patch.object(manager.time, 'monotonic', autospec=True)
+    @mock.patch.object(allocations, 'allocate_nodes', autospec=True)
+    def test_process_allocations_retry(self, mock_allocate, mock_time):
+        self.config(node_locked_retry_interval=10, group='conductor')
+        self._start_service()
+        first, second = [allocations.PendingAllocation(
+            self.context,
+            obj_utils.create_test_allocation(
+                self.context, uuid=uuidutils.generate_uuid()),
+            1) for _ in range(2)]
+        retry = first._replace(attempt=2)
+        self.service._pending_allocations.append(first)
+        self.service._allocations_worker_running = True
+        mock_time.return_value = 100
+
+        def _allocate(batch):
+            if batch == [first]:
+                return [retry]
+            return []
+
+        def _wait(timeout):
+            self.assertEqual(10, timeout)
+            if mock_wait.call_count == 1:
+                # A new allocation is processed while the first one waits
+                self.service._pending_allocations.append(second)
+            else:
+                mock_time.return_value = 110
+            return True
+
+        mock_allocate.side_effect = _allocate
+        with mock.patch.object(self.service._allocations_event, 'wait',
+                               autospec=True) as mock_wait:
+            mock_wait.side_effect = _wait
+            self.service._process_allocations()
+
+        self.assertEqual([mock.call([first]), mock.call([second]),
+                          mock.call([retry])],
+                         mock_allocate.call_args_list)
+        self.assertEqual(2, mock_wait.call_count)
+        self.assertFalse(self.service._delayed_allocations)
+        self.assertFalse(self.service._allocations_worker_running)
 
     @mock.patch.object(manager.ConductorManager, '_spawn_worker', mock.Mock())
     @mock.patch.object(allocations, 'backfill_allocation', autospec=True)
@@ -165,7 +246,7 @@ class AllocationTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
         self.assertIsNone(node['instance_uuid'])
         self.assertIsNone(node['allocation_id'])
 
-    @mock.patch.object(allocations, 'do_allocate', autospec=True)
+    @mock.patch.object(allocations, 'do_allocate_batch', autospec=True)
     def test_resume_allocations(self, mock_allocate):
         another_conductor = obj_utils.create_test_conductor(
             self.context, id=42, hostname='another-host')
@@ -189,10 +270,10 @@ class AllocationTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
 
         mock_allocate.assert_called_once_with(self.context, mock.ANY)
         actual = mock_allocate.call_args[0][1]
-        self.assertEqual(allocation.uuid, actual.uuid)
-        self.assertIsInstance(allocation, objects.Allocation)
+        self.assertEqual([allocation.uuid], [a.uuid for a in actual])
+        self.assertIsInstance(actual[0], objects.Allocation)
 
-    @mock.patch.object(allocations, 'do_allocate', autospec=True)
+    @mock.patch.object(allocations, 'do_allocate_batch', autospec=True)
     def test_check_orphaned_allocations(self, mock_allocate):
         alive_conductor = obj_utils.create_test_conductor(
             self.context, id=42, hostname='alive')
@@ -216,8 +297,8 @@ class AllocationTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
 
         mock_allocate.assert_called_once_with(self.context, mock.ANY)
         actual = mock_allocate.call_args[0][1]
-        self.assertEqual(allocation.uuid, actual.uuid)
-        self.assertIsInstance(allocation, objects.Allocation)
+        self.assertEqual([allocation.uuid], [a.uuid for a in actual])
+        self.assertIsInstance(actual[0], objects.Allocation)
 
         allocation = self.dbapi.get_allocation_by_id(allocation.id)
         self.assertEqual(self.service.conductor.id,
@@ -372,7 +453,42 @@ class DoAllocateTestCase(db_base.DbTestCase):
 
     @mock.patch.object(task_manager, 'acquire', autospec=True,
                        side_effect=task_manager.acquire)
-    def test_nodes_locked(self, mock_acquire):
+    def test_nodes_filtered_out_traits(self, mock_acquire):
+        # Only some of the traits match
+        node = obj_utils.create_test_node(self.context,
+                                          uuid=uuidutils.generate_uuid(),
+                                          resource_class='x-large',
+                                          power_state='power off',
+                                          provision_state='available')
+        db_utils.create_test_node_traits(['tr1', 'tr2'], node_id=node.id)
+
+        allocation = obj_utils.create_test_allocation(self.context,
+                                                      resource_class='x-large',
+                                                      traits=['tr1', 'tr3'])
+        allocations.do_allocate(self.context, allocation)
+        self.assertIn('no suitable nodes have the requested traits',
+                      allocation['last_error'])
+        self.assertIn('tr3', allocation['last_error'])
+        self.assertEqual('error', allocation['state'])
+
+        # All nodes are filtered out on the database level.
+        self.assertFalse(mock_acquire.called)
+
+    @mock.patch.object(task_manager, 'acquire', autospec=True,
+                       side_effect=task_manager.acquire)
+    def test_nodes_filtered_out_traits_no_nodes(self, mock_acquire):
+        allocation = obj_utils.create_test_allocation(self.context,
+                                                      resource_class='x-large',
+                                                      traits=['tr1'])
+        allocations.do_allocate(self.context, allocation)
+        self.assertIn('no available nodes', allocation['last_error'])
+        self.assertIn('x-large', allocation['last_error'])
+        self.assertEqual('error', allocation['state'])
+        self.assertFalse(mock_acquire.called)
+
+    @mock.patch.object(objects.Allocation, 'claim_node', autospec=True,
+                       side_effect=objects.Allocation.claim_node)
+    def test_nodes_reserved(self, mock_claim):
         self.config(node_locked_retry_attempts=2, group='conductor')
         node1 = obj_utils.create_test_node(self.context,
                                            uuid=uuidutils.generate_uuid(),
@@ -394,17 +510,42 @@ class DoAllocateTestCase(db_base.DbTestCase):
         self.assertIn('could not reserve any of 2', allocation['last_error'])
         self.assertEqual('error', allocation['state'])
 
-        self.assertEqual(6, mock_acquire.call_count)
+        self.assertEqual(4, mock_claim.call_count)
         # NOTE(dtantsur): node are tried in random order by design, so we
         # cannot directly use assert_has_calls. Check that all nodes are tried
-        # before going into retries (rather than each tried 3 times in a row).
-        nodes = [call[0][1] for call in mock_acquire.call_args_list]
-        for offset in (0, 2, 4):
+        # before going into retries (rather than each tried 2 times in a row).
+        nodes = [call[0][1] for call in mock_claim.call_args_list]
+        for offset in (0, 2):
             self.assertEqual(set(nodes[offset:offset + 2]),
-                             {node1.uuid, node2.uuid})
+                             {node1.id, node2.id})
 
-    @mock.patch.object(task_manager, 'acquire', autospec=True)
-    def test_nodes_changed_after_lock(self, mock_acquire):
+    @mock.patch.object(objects.Allocation, 'claim_node', autospec=True,
+                       side_effect=objects.Allocation.claim_node)
+    def test_nodes_reserved_then_released(self, mock_claim):
+        node = obj_utils.create_test_node(self.context,
+                                          uuid=uuidutils.generate_uuid(),
+                                          resource_class='x-large',
+                                          power_state='power off',
+                                          provision_state='available',
+                                          reservation='example.com')
+
+        def _release(seconds):
+            self.dbapi.update_node(node.id, {'reservation': None})
+
+        allocation = obj_utils.create_test_allocation(self.context,
+                                                      resource_class='x-large')
+        with mock.patch.object(allocations, 'time', autospec=True) as mock_t:
+            mock_t.sleep.side_effect = _release
+            allocations.do_allocate(self.context, allocation)
+
+        self.assertIsNone(allocation['last_error'])
+        self.assertEqual('active', allocation['state'])
+        self.assertEqual(node.id, allocation['node_id'])
+        self.assertEqual(2, mock_claim.call_count)
+
+    @mock.patch.object(allocations, '_candidate_nodes', autospec=True)
+    def test_nodes_changed_after_listing(self, mock_candidates):
+        self.config(node_locked_retry_attempts=1, group='conductor')
         nodes = [obj_utils.create_test_node(self.context,
                                             uuid=uuidutils.generate_uuid(),
                                             resource_class='x-large',
@@ -413,34 +554,101 @@ class DoAllocateTestCase(db_base.DbTestCase):
                  for _ in range(5)]
         for node in nodes:
             db_utils.create_test_node_trait(trait='tr1', node_id=node.id)
+        mock_candidates.side_effect = lambda *args: list(nodes)
 
-        # Modify nodes in-memory so that they no longer match the allocation:
+        # Modify nodes in the database so that they no longer match the
+        # allocation:
 
         # Resource class does not match
-        nodes[0].resource_class = 'x-small'
+        self.dbapi.update_node(nodes[0].id, {'resource_class': 'x-small'})
         # Provision state is not available
-        nodes[1].provision_state = 'deploying'
+        self.dbapi.update_node(nodes[1].id, {'provision_state': 'deploying'})
         # Maintenance mode is on
-        nodes[2].maintenance = True
+        self.dbapi.update_node(nodes[2].id, {'maintenance': True})
         # Already associated
-        nodes[3].instance_uuid = uuidutils.generate_uuid()
+        self.dbapi.update_node(nodes[3].id,
+                               {'instance_uuid': uuidutils.generate_uuid()})
         # Traits changed
-        nodes[4].traits.objects[:] = []
-
-        mock_acquire.side_effect = [
-            mock.MagicMock(**{'__enter__.return_value.node': node})
-            for node in nodes
-        ]
+        self.dbapi.unset_node_traits(nodes[4].id)
 
         allocation = obj_utils.create_test_allocation(self.context,
                                                       resource_class='x-large',
                                                       traits=['tr1'])
         allocations.do_allocate(self.context, allocation)
-        self.assertIn('all nodes were filtered out', allocation['last_error'])
+        self.assertIn('could not reserve any of 5', allocation['last_error'])
         self.assertEqual('error', allocation['state'])
 
-        # No retries for these failures.
-        self.assertEqual(5, mock_acquire.call_count)
+        for node in nodes:
+            node.refresh()
+            self.assertIsNone(node.allocation_id)
+
+    @mock.patch.object(objects.Node, 'list', autospec=True,
+                       side_effect=objects.Node.list)
+    def test_batch(self, mock_list):
+        nodes = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid(),
+                                            resource_class='x-large',
+                                            power_state='power off',
+                                            provision_state='available')
+                 for _ in range(2)]
+        small = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid(),
+                                           resource_class='x-small',
+                                           power_state='power off',
+                                           provision_state='available')
+        batch = [obj_utils.create_test_allocation(
+            self.context, uuid=uuidutils.generate_uuid(),
+            resource_class=rsc) for rsc in ('x-large', 'x-small', 'x-large',
+                                            'x-large')]
+
+        allocations.do_allocate_batch(self.context, batch)
+
+        for allocation in batch[:3]:
+            self.assertIsNone(allocation['last_error'])
+            self.assertEqual('active', allocation['state'])
+        self.assertEqual(small.id, batch[1]['node_id'])
+        self.assertEqual({n.id for n in nodes},
+                         {batch[0]['node_id'], batch[2]['node_id']})
+        self.assertIn('no available nodes', batch[3]['last_error'])
+        self.assertEqual('error', batch[3]['state'])
+        # One list of candidates for each resource class in the first pass,
+        # then a new one for the last allocation in the second pass.
+        self.assertEqual(3, mock_list.call_count)
+
+    def test_batch_same_failure(self):
+        batch = [obj_utils.create_test_allocation(
+            self.context, uuid=uuidutils.generate_uuid(),
+            resource_class='x-large') for _ in range(3)]
+
+        with mock.patch.object(allocations, '_no_candidates_error',
+                               autospec=True,
+                               side_effect=allocations._no_candidates_error
+                               ) as mock_error:
+            allocations.do_allocate_batch(self.context, batch)
+
+        for allocation in batch:
+            self.assertIn('no available nodes', allocation['last_error'])
+            self.assertEqual('error', allocation['state'])
+        mock_error.assert_called_once_with(self.context, batch[0])
+
+    def test_batch_allocation_deleted(self):
+        node = obj_utils.create_test_node(self.context,
+                                          uuid=uuidutils.generate_uuid(),
+                                          resource_class='x-large',
+                                          power_state='power off',
+                                          provision_state='available')
+        deleted = obj_utils.create_test_allocation(
+            self.context, uuid=uuidutils.generate_uuid(),
+            resource_class='x-large')
+        allocation = obj_utils.create_test_allocation(
+            self.context, uuid=uuidutils.generate_uuid(),
+            resource_class='x-large')
+        deleted.destroy()
+
+        allocations.do_allocate_batch(self.context, [deleted, allocation])
+
+        self.assertEqual('active', allocation['state'])
+        self.assertEqual(node.id, allocation['node_id'])
 
     @mock.patch.object(task_manager, 'acquire', autospec=True,
                        side_effect=task_manager.acquire)
@@ -52,6 +52,7 @@ from ironic.drivers.modules.network import flat as n_flat
 from ironic import objects
 from ironic.objects import base as obj_base
 from ironic.objects import fields as obj_fields
+from ironic.tests import base as tests_base
 from ironic.tests.unit.conductor import mgr_utils
 from ironic.tests.unit.db import base as db_base
 from ironic.tests.unit.db import utils as db_utils
@@ -88,6 +89,31 @@ class ChangeNodePowerStateTestCase(mgr_utils.ServiceSetUpMixin,
         # background task's link callback.
         self.assertIsNone(node.reservation)
 
+    @mock.patch.object(fake.FakePower, 'get_power_state', autospec=True)
+    def test_change_node_power_state_resets_power_sync(self,
+                                                       get_power_mock):
+        self.config(sync_power_state_interval=60,
+                    sync_power_state_max_interval=300, group='conductor')
+        get_power_mock.return_value = states.POWER_OFF
+        node = obj_utils.create_test_node(self.context,
+                                          driver='fake-hardware',
+                                          power_state=states.POWER_OFF)
+        self._start_service()
+        scheduler = self.service._power_sync_scheduler
+        scheduler.start_run()
+        scheduler.record(node.uuid, stable=True)
+        scheduler.start_run()
+        scheduler.record(node.uuid, stable=True)
+        scheduler.start_run()
+        self.assertFalse(scheduler.is_due(node.uuid))
+
+        self.service.change_node_power_state(self.context,
+                                             node.uuid,
+                                             states.POWER_ON)
+        self._stop_service()
+
+        self.assertTrue(scheduler.is_due(node.uuid))
+
     @mock.patch.object(fake.FakePower, 'get_power_state', autospec=True)
     def test_change_node_power_state_soft_power_off_timeout(self,
                                                             get_power_mock):
@@ -438,6 +464,54 @@ class ChangeNodePowerStateTestCase(mgr_utils.ServiceSetUpMixin,
         self.assertIsNone(node.last_error)
 
 
+@mgr_utils.mock_record_keepalive
+class ChangeNodesPowerStateTestCase(mgr_utils.ServiceSetUpMixin,
+                                    db_base.DbTestCase):
+
+    @mock.patch.object(manager.ConductorManager, 'change_node_power_state',
+                       autospec=True)
+    def test_change_nodes_power_state(self, mock_change):
+        self._start_service()
+        try:
+            raise exception.NodeLocked(node='node2', host='host')
+        except exception.NodeLocked:
+            mock_change.side_effect = [
+                None, messaging.rpc.ExpectedException()]
+
+        result = self.service.change_nodes_power_state(
+            self.context, ['node1', 'node2'], states.POWER_OFF, timeout=5)
+
+        self.assertEqual({'node1': None,
+                          'node2': {'code': 409, 'message': mock.ANY}},
+                         result)
+        mock_change.assert_has_calls([
+            mock.call(self.service, self.context, 'node1', states.POWER_OFF,
+                      timeout=5),
+            mock.call(self.service, self.context, 'node2', states.POWER_OFF,
+                      timeout=5)])
+
+    @mock.patch.object(fake.FakePower, 'get_power_state', autospec=True)
+    def test_change_nodes_power_state_power_on(self, get_power_mock):
+        nodes = [obj_utils.create_test_node(self.context,
+                                            driver='fake-hardware',
+                                            uuid=uuidutils.generate_uuid(),
+                                            power_state=states.POWER_OFF)
+                 for _ in range(2)]
+        self._start_service()
+        get_power_mock.return_value = states.POWER_OFF
+
+        result = self.service.change_nodes_power_state(
+            self.context, [node.uuid for node in nodes], states.POWER_ON)
+        self._stop_service()
+
+        self.assertEqual({node.uuid: None for node in nodes}, result)
+        for node in nodes:
+            node.refresh()
+            self.assertEqual(states.POWER_ON, node.power_state)
+            self.assertIsNone(node.target_power_state)
+            self.assertIsNone(node.reservation)
+
+
 @mgr_utils.mock_record_keepalive
 class CreateNodeTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
     def test_create_node(self):
@@ -480,6 +554,60 @@ class UpdateNodeTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
         res = self.service.update_node(self.context, node)
         self.assertEqual({'test': 'two'}, res['extra'])
 
+    def test_update_node_changes_only(self):
+        node = obj_utils.create_test_node(self.context, driver='fake-hardware',
+                                          extra={'test': 'one'},
+                                          instance_info={'foo': 'bar'},
+                                          maintenance=True)
+
+        node.extra = {'test': 'two'}
+        node_obj = node.obj_changes_only()
+        self.assertFalse(node_obj.obj_attr_is_set('instance_info'))
+        res = self.service.update_node(self.context, node_obj)
+        self.assertEqual({'test': 'two'}, res['extra'])
+        self.assertEqual({'foo': 'bar'}, res['instance_info'])
+        self.assertTrue(res['maintenance'])
+        node.refresh()
+        self.assertEqual({'test': 'two'}, node.extra)
+
+    def test_update_node_expected_digest(self):
+        node = obj_utils.create_test_node(self.context, driver='fake-hardware',
+                                          extra={'test': 'one'})
+        digest = node.content_digest()
+
+        node.extra = {'test': 'two'}
+        res = self.service.update_node(self.context, node,
+                                       expected_digest=digest)
+        self.assertEqual({'test': 'two'}, res['extra'])
+
+    def test_update_node_expected_digest_modified(self):
+        node = obj_utils.create_test_node(self.context, driver='fake-hardware',
+                                          extra={'test': 'one'})
+        digest = node.content_digest()
+        self.dbapi.update_node(node.id, {'name': 'concurrent'})
+
+        node.extra = {'test': 'two'}
+        exc = self.assertRaises(messaging.rpc.ExpectedException,
+                                self.service.update_node,
+                                self.context, node,
+                                expected_digest=digest)
+        self.assertEqual(exception.NodeModified, exc.exc_info[0])
+        node.refresh()
+        self.assertEqual({'test': 'one'}, node.extra)
+        self.assertIsNone(node.reservation)
+
+    def test_update_node_changes_only_protected_invalid_state(self):
+        node = obj_utils.create_test_node(self.context,
+                                          provision_state='available')
+
+        # The provision state checked is loaded from the database
+        node.protected = True
+        exc = self.assertRaises(messaging.rpc.ExpectedException,
+                                self.service.update_node,
+                                self.context,
+                                node.obj_changes_only())
+        self.assertEqual(exception.InvalidState, exc.exc_info[0])
+
     def test_update_node_maintenance_set_false(self):
         node = obj_utils.create_test_node(self.context,
                                           driver='fake-hardware',
@@ -2468,6 +2596,58 @@ class DoProvisioningActionTestCase(mgr_utils.ServiceSetUpMixin,
         self.assertEqual(states.AVAILABLE, node.target_provision_state)
 
 
+@mgr_utils.mock_record_keepalive
+class DoNodesProvisioningActionTestCase(mgr_utils.ServiceSetUpMixin,
+                                        db_base.DbTestCase):
+
+    def _test(self, target, method, args=()):
+        self._start_service()
+        with mock.patch.object(manager.ConductorManager, method,
+                               autospec=True) as mock_method:
+            result = self.service.do_nodes_provisioning_action(
+                self.context, ['node1', 'node2'], target)
+
+        self.assertEqual({'node1': None, 'node2': None}, result)
+        mock_method.assert_has_calls([
+            mock.call(self.service, self.context, 'node1', *args),
+            mock.call(self.service, self.context, 'node2', *args)])
+
+    def test_deploy(self):
+        self._test(states.ACTIVE, 'do_node_deploy')
+
+    def test_tear_down(self):
+        self._test(states.DELETED, 'do_node_tear_down')
+
+    def test_inspect(self):
+        self._test(states.VERBS['inspect'], 'inspect_hardware')
+
+    def test_provisioning_action(self):
+        self._test(states.VERBS['provide'], 'do_provisioning_action',
+                   args=(states.VERBS['provide'],))
+
+    def test_invalid_state(self):
+        node1 = obj_utils.create_test_node(self.context,
+                                           driver='fake-hardware',
+                                           uuid=uuidutils.generate_uuid(),
+                                           provision_state=states.MANAGEABLE)
+        node2 = obj_utils.create_test_node(self.context,
+                                           driver='fake-hardware',
+                                           uuid=uuidutils.generate_uuid(),
+                                           provision_state=states.AVAILABLE)
+        self._start_service()
+
+        with mock.patch('ironic.conductor.manager.ConductorManager.'
+                        '_spawn_worker', autospec=True) as mock_spawn:
+            result = self.service.do_nodes_provisioning_action(
+                self.context, [node1.uuid, node2.uuid],
+                states.VERBS['provide'])
+
+        self.assertIsNone(result[node1.uuid])
+        self.assertEqual(400, result[node2.uuid]['code'])
+        self.assertIn(node2.uuid, result[node2.uuid]['message'])
+        self.assertEqual(1, mock_spawn.call_count)
+
+
 @mgr_utils.mock_record_keepalive
 class DoNodeCleanTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
     def setUp(self):
@@ -3347,9 +3527,10 @@ class MiscTestCase(mgr_utils.ServiceSetUpMixin, mgr_utils.CommonMixIn,
     @mock.patch.object(manager.ConductorManager, '_fail_if_in_state',
                        autospec=True)
     @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
     def test_iter_nodes(self, mock_nodeinfo_list, mock_mapped,
                         mock_fail_if_state):
+        self.config(hash_ring_db_filtering=False)
         self._start_service()
         self.columns = ['uuid', 'driver', 'conductor_group', 'id']
         nodes = [self._create_node(id=i, driver='fake-hardware',
@@ -3378,8 +3559,95 @@ class MiscTestCase(mgr_utils.ServiceSetUpMixin, mgr_utils.CommonMixIn,
                                     last_error=mock.ANY)]
         mock_fail_if_state.assert_has_calls(expected_calls)
 
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+    @mock.patch.object(manager.ConductorManager, '_fail_if_in_state',
+                       autospec=True)
+    @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
+    def test_iter_nodes_hash_buckets(self, mock_nodeinfo_list, mock_mapped,
+                                     mock_fail_if_state):
+        self._start_service()
+        self.columns = ['uuid', 'driver', 'conductor_group', 'id']
+        nodes = [self._create_node(id=i, driver='fake-hardware',
+                                   conductor_group='')
+                 for i in range(2)]
+        mock_nodeinfo_list.return_value = self._get_nodeinfo_list_response(
+            nodes)
+        mock_mapped.side_effect = [True, False]
+        filters = {'maintenance': False}
+
+        with mock.patch.object(self.service.ring_manager, 'get_hash_buckets',
+                               autospec=True) as mock_buckets:
+            mock_buckets.return_value = {('', 'fake-hardware'): [(0, 42)]}
+            result = list(self.service.iter_nodes(fields=['id'],
+                                                  filters=filters))
+
+        self.assertEqual([(nodes[0].uuid, 'fake-hardware', '', 0)], result)
+        mock_buckets.assert_called_once_with(self.service.host)
+        mock_nodeinfo_list.assert_called_once_with(
+            columns=self.columns,
+            filters={'maintenance': False,
+                     'hash_buckets': {('', 'fake-hardware'): [(0, 42)]}})
+        # The caller's filters are not modified
+        self.assertEqual({'maintenance': False}, filters)
+
+    @mock.patch.object(manager.ConductorManager, '_fail_if_in_state',
+                       autospec=True)
+    @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
+    def test_iter_nodes_hash_buckets_unsupported(self, mock_nodeinfo_list,
+                                                 mock_mapped,
+                                                 mock_fail_if_state):
+        self._start_service()
+        self.columns = ['uuid', 'driver', 'conductor_group']
+        nodes = [self._create_node(id=i, driver='fake-hardware',
+                                   conductor_group='')
+                 for i in range(2)]
+        mock_nodeinfo_list.return_value = self._get_nodeinfo_list_response(
+            nodes)
+        mock_mapped.side_effect = [True, False]
+
+        with mock.patch.object(self.service.ring_manager, 'get_hash_buckets',
+                               autospec=True) as mock_buckets:
+            mock_buckets.return_value = None
+            result = list(self.service.iter_nodes(
+                filters={'maintenance': False}))
+
+        self.assertEqual([(nodes[0].uuid, 'fake-hardware', '')], result)
+        mock_nodeinfo_list.assert_called_once_with(
+            columns=self.columns, filters={'maintenance': False})
+
+    @mock.patch.object(manager.ConductorManager, '_fail_if_in_state',
+                       autospec=True)
+    def test_iter_nodes_hash_buckets_db(self, mock_fail_if_state):
+        self._start_service()
+        self.dbapi.register_conductor({'hostname': 'other-host',
+                                       'drivers': []})
+        self.dbapi.register_conductor_hardware_interfaces(
+            self.dbapi.get_conductor('other-host').id, 'fake-hardware',
+            'deploy', ['direct', 'fake'], 'fake')
+        self.service.ring_manager.reset()
+        nodes = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid(),
+                                            driver='fake-hardware')
+                 for i in range(20)]
+        ring = self.service.ring_manager.get_ring('fake-hardware', '')
+        expected = {node.uuid for node in nodes
+                    if self.service.host in ring.get_nodes(
+                        node.uuid.encode('utf-8'))}
+
+        with mock.patch.object(self.dbapi, 'get_nodeinfo_iter',
+                               wraps=self.dbapi.get_nodeinfo_iter) as mock_l:
+            result = list(self.service.iter_nodes())
+
+        self.assertEqual(expected, {r[0] for r in result})
+        # The database only returns the nodes of this conductor
+        db_result = self.dbapi.get_nodeinfo_list(
+            columns=['uuid'], filters=mock_l.call_args[1]['filters'])
+        self.assertEqual(expected, {r[0] for r in db_result})
+
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
     def test_iter_nodes_shutdown(self, mock_nodeinfo_list):
+        self.config(hash_ring_db_filtering=False)
         self._start_service()
         self.columns = ['uuid', 'driver', 'conductor_group', 'id']
         nodes = [self._create_node(driver='fake-hardware')]
@@ -3488,11 +3756,16 @@ class ConsoleTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
              mock.call(mock.ANY, 'console_set',
                        obj_fields.NotificationStatus.ERROR)])
 
+    @mock.patch.object(manager.ConductorManager, '_start_consoles',
+                       autospec=True)
     @mock.patch.object(fake.FakeConsole, 'start_console', autospec=True)
     @mock.patch.object(notification_utils, 'emit_console_notification')
-    def test_enable_console_already_enabled(self, mock_notify, mock_sc):
+    def test_enable_console_already_enabled(self, mock_notify, mock_sc,
+                                            mock_start_consoles):
         node = obj_utils.create_test_node(self.context, driver='fake-hardware',
                                           console_enabled=True)
+        # NOTE(yrobla): the consoles are restored in a worker on start up,
+        # which would otherwise race with set_console_mode below.
         self._start_service()
         self.service.set_console_mode(self.context, node.uuid, True)
         self._stop_service()
@@ -4153,7 +4426,7 @@ class SensorsTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
     @mock.patch.object(manager.ConductorManager, '_spawn_worker',
                        autospec=True)
     @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
     def test___send_sensor_data(self, get_nodeinfo_list_mock,
                                 _mapped_to_this_conductor_mock,
                                 mock_spawn):
@@ -4173,7 +4446,7 @@ class SensorsTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
     @mock.patch('ironic.conductor.manager.ConductorManager._spawn_worker',
                 autospec=True)
     @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
     def test___send_sensor_data_multiple_workers(
             self, get_nodeinfo_list_mock, _mapped_to_this_conductor_mock,
             mock_spawn):
@@ -4793,6 +5066,28 @@ class ManagerDoSyncPowerStateTestCase(db_base.DbTestCase):
         self.assertEqual(1,
                          self.service.power_state_sync_count[self.node.uuid])
 
+    @mock.patch.object(nova, 'power_update', autospec=True)
+    def test_power_state_result(self, mock_power_update, node_power_action):
+        self.node.power_state = states.POWER_ON
+        count = manager.do_sync_power_state(
+            self.task, 0, power_state_result=states.POWER_OFF)
+
+        self.assertEqual(1, count)
+        self.assertFalse(self.power.get_power_state.called)
+        self.assertEqual(states.POWER_OFF, self.node.power_state)
+        self.task.upgrade_lock.assert_called_once_with()
+
+    def test_power_state_result_exception(self, node_power_action):
+        self.node.power_state = states.POWER_ON
+        count = manager.do_sync_power_state(
+            self.task, 0,
+            power_state_result=exception.IronicException('foo'))
+
+        self.assertEqual(1, count)
+        self.assertFalse(self.power.get_power_state.called)
+        self.assertEqual(states.POWER_ON, self.node.power_state)
+        self.assertFalse(self.task.upgrade_lock.called)
+
     def test_get_power_state_error(self, node_power_action):
         self._do_sync_power_state('fake', states.ERROR)
         self.assertFalse(self.power.validate.called)
@@ -5025,16 +5320,18 @@ class ManagerDoSyncPowerStateTestCase(db_base.DbTestCase):
 @mock.patch.object(manager, 'do_sync_power_state')
 @mock.patch.object(task_manager, 'acquire')
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
 class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
                                      db_base.DbTestCase):
     def setUp(self):
         super(ManagerSyncPowerStatesTestCase, self).setUp()
+        self.config(hash_ring_db_filtering=False)
         self.service = manager.ConductorManager('hostname', 'test-topic')
         self.service.dbapi = self.dbapi
         self.node = self._create_node()
         self.filters = {'maintenance': False}
-        self.columns = ['uuid', 'driver', 'conductor_group', 'id']
+        self.columns = ['uuid', 'driver', 'conductor_group', 'id',
+                        'power_interface', 'driver_info']
 
     def test_node_not_mapped(self, get_nodeinfo_mock,
                              mapped_mock, acquire_mock, sync_mock):
@@ -5066,9 +5363,9 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            constraints=manager.SYNC_CONSTRAINTS)
         self.assertFalse(sync_mock.called)
 
     def test_node_in_deploywait_on_acquire(self, get_nodeinfo_mock,
@@ -5089,9 +5386,9 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            constraints=manager.SYNC_CONSTRAINTS)
         self.assertFalse(sync_mock.called)
 
     def test_node_in_enroll_on_acquire(self, get_nodeinfo_mock, mapped_mock,
@@ -5111,9 +5408,9 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            constraints=manager.SYNC_CONSTRAINTS)
         self.assertFalse(sync_mock.called)
 
     def test_node_in_power_transition_on_acquire(self, get_nodeinfo_mock,
@@ -5133,9 +5430,9 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            constraints=manager.SYNC_CONSTRAINTS)
         self.assertFalse(sync_mock.called)
 
     def test_node_in_maintenance_on_acquire(self, get_nodeinfo_mock,
@@ -5154,9 +5451,9 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            constraints=manager.SYNC_CONSTRAINTS)
         self.assertFalse(sync_mock.called)
 
     def test_node_disappears_on_acquire(self, get_nodeinfo_mock,
@@ -5173,9 +5470,9 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            constraints=manager.SYNC_CONSTRAINTS)
         self.assertFalse(sync_mock.called)
 
     def test_single_node(self, get_nodeinfo_mock,
@@ -5192,10 +5489,11 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
-        sync_mock.assert_called_once_with(task, mock.ANY)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            constraints=manager.SYNC_CONSTRAINTS)
+        sync_mock.assert_called_once_with(task, mock.ANY,
+                                          power_state_result=None)
 
     def test__sync_power_state_multiple_nodes(self, get_nodeinfo_mock,
                                               mapped_mock, acquire_mock,
@@ -5253,22 +5551,164 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         self.assertEqual(mapped_calls, mapped_mock.call_args_list)
         acquire_calls = [mock.call(self.context, x.uuid,
                                    purpose=mock.ANY,
-                                   shared=True)
+                                   shared=True,
+                                   constraints=manager.SYNC_CONSTRAINTS)
                          for x in nodes if x.id != 2]
         self.assertEqual(acquire_calls, acquire_mock.call_args_list)
         # Nodes 1 and 7 (5 = index of Node7 after removing Node2)
-        sync_calls = [mock.call(tasks[0], mock.ANY),
-                      mock.call(tasks[5], mock.ANY)]
+        sync_calls = [mock.call(tasks[0], mock.ANY, power_state_result=None),
+                      mock.call(tasks[5], mock.ANY, power_state_result=None)]
         self.assertEqual(sync_calls, sync_mock.call_args_list)
 
+    @mock.patch.object(manager._PowerSyncScheduler, 'record', autospec=True)
+    def test_single_node_records_result(self, record_mock, get_nodeinfo_mock,
+                                        mapped_mock, acquire_mock,
+                                        sync_mock):
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+        mapped_mock.return_value = True
+        task = self._create_task(
+            node_attrs=dict(uuid=self.node.uuid,
+                            provision_state=states.ACTIVE))
+        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+        sync_mock.return_value = 0
+
+        self.service._sync_power_states(self.context)
+
+        record_mock.assert_called_once_with(
+            self.service._power_sync_scheduler, self.node.uuid, stable=True)
+
+    @mock.patch.object(manager._PowerSyncScheduler, 'record', autospec=True)
+    def test_single_node_records_failure(self, record_mock,
+                                         get_nodeinfo_mock, mapped_mock,
+                                         acquire_mock, sync_mock):
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+        mapped_mock.return_value = True
+        task = self._create_task(
+            node_attrs=dict(uuid=self.node.uuid,
+                            provision_state=states.ACTIVE))
+        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+        sync_mock.return_value = 1
+
+        self.service._sync_power_states(self.context)
+
+        record_mock.assert_called_once_with(
+            self.service._power_sync_scheduler, self.node.uuid, stable=False)
+
+    @mock.patch.object(manager._PowerSyncScheduler, 'record', autospec=True)
+    def test_single_node_records_change(self, record_mock, get_nodeinfo_mock,
+                                        mapped_mock, acquire_mock,
+                                        sync_mock):
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+        mapped_mock.return_value = True
+        task = self._create_task(
+            node_attrs=dict(uuid=self.node.uuid,
+                            provision_state=states.ACTIVE,
+                            power_state=states.POWER_ON))
+        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+
+        def _sync(task, count, power_state_result=None):
+            # The power state changed and was recorded by the sync
+            task.node.power_state = states.POWER_OFF
+            return 0
+
+        sync_mock.side_effect = _sync
+
+        self.service._sync_power_states(self.context)
+
+        record_mock.assert_called_once_with(
+            self.service._power_sync_scheduler, self.node.uuid, stable=False)
+
+    def _prepare_bmc_nodes(self, get_nodeinfo_mock, mapped_mock,
+                           acquire_mock, sync_mock,
+                           addresses=('pdu1', 'pdu1', 'pdu2', None)):
+        # By default, nodes 1 and 2 share a BMC, node 3 has another one and
+        # node 4 has no known BMC address.
+        nodes = []
+        for i, address in enumerate(addresses, 1):
+            driver_info = {'snmp_address': address} if address else {}
+            nodes.append(self._create_node(
+                id=i, uuid=uuidutils.generate_uuid(), driver='fake-hardware',
+                power_interface='fake', driver_info=driver_info))
+        tasks = [self._create_task(node=n) for n in nodes]
+        get_nodeinfo_mock.return_value = (
+            self._get_nodeinfo_list_response(nodes))
+        mapped_mock.return_value = True
+        acquire_mock.side_effect = self._get_acquire_side_effect(tasks)
+        sync_mock.return_value = 0
+        return nodes, tasks
+
+    def test_nodes_sharing_bmc(self, get_nodeinfo_mock, mapped_mock,
+                               acquire_mock, sync_mock):
+        nodes, tasks = self._prepare_bmc_nodes(get_nodeinfo_mock,
+                                               mapped_mock, acquire_mock,
+                                               sync_mock)
+        get_power_states = tasks[0].driver.power.get_power_states
+        get_power_states.return_value = {nodes[0].uuid: states.POWER_ON,
+                                         nodes[1].uuid: states.POWER_OFF}
+
+        self.service._sync_power_states(self.context)
+
+        get_power_states.assert_called_once_with(tasks[:2])
+        self.assertFalse(tasks[2].driver.power.get_power_states.called)
+        self.assertFalse(tasks[3].driver.power.get_power_states.called)
+        self.assertEqual([
+            mock.call(tasks[0], 0, power_state_result=states.POWER_ON),
+            mock.call(tasks[1], 0, power_state_result=states.POWER_OFF),
+            mock.call(tasks[2], 0, power_state_result=None),
+            mock.call(tasks[3], 0, power_state_result=None),
+        ], sync_mock.call_args_list)
+        for task in tasks:
+            task.release_resources.assert_called_once_with()
+
+    def test_nodes_sharing_bmc_batch_size(self, get_nodeinfo_mock,
+                                          mapped_mock, acquire_mock,
+                                          sync_mock):
+        # Nodes sharing a BMC are not split into batches, even if they are
+        # not next to each other.
+        self.config(sync_power_state_batch_size=1, group='conductor')
+        nodes, tasks = self._prepare_bmc_nodes(
+            get_nodeinfo_mock, mapped_mock, acquire_mock, sync_mock,
+            addresses=('pdu1', 'pdu2', None, 'pdu1'))
+        acquire_mock.side_effect = self._get_acquire_side_effect(
+            [tasks[0], tasks[3], tasks[1], tasks[2]])
+        get_power_states = tasks[0].driver.power.get_power_states
+        get_power_states.return_value = {nodes[0].uuid: states.POWER_ON,
+                                         nodes[3].uuid: states.POWER_OFF}
+
+        self.service._sync_power_states(self.context)
+
+        get_power_states.assert_called_once_with([tasks[0], tasks[3]])
+        self.assertEqual([
+            mock.call(tasks[0], 0, power_state_result=states.POWER_ON),
+            mock.call(tasks[3], 0, power_state_result=states.POWER_OFF),
+            mock.call(tasks[1], 0, power_state_result=None),
+            mock.call(tasks[2], 0, power_state_result=None),
+        ], sync_mock.call_args_list)
+
+    def test_nodes_sharing_bmc_bulk_failure(self, get_nodeinfo_mock,
+                                            mapped_mock, acquire_mock,
+                                            sync_mock):
+        nodes, tasks = self._prepare_bmc_nodes(get_nodeinfo_mock,
+                                               mapped_mock, acquire_mock,
+                                               sync_mock)
+        get_power_states = tasks[0].driver.power.get_power_states
+        get_power_states.side_effect = exception.IronicException('boom')
+
+        self.service._sync_power_states(self.context)
+
+        get_power_states.assert_called_once_with(tasks[:2])
+        self.assertEqual([mock.call(task, 0, power_state_result=None)
+                          for task in tasks], sync_mock.call_args_list)
+
 
 @mock.patch.object(task_manager, 'acquire')
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
 class ManagerPowerRecoveryTestCase(mgr_utils.CommonMixIn,
                                    db_base.DbTestCase):
     def setUp(self):
         super(ManagerPowerRecoveryTestCase, self).setUp()
+        self.config(hash_ring_db_filtering=False)
         self.service = manager.ConductorManager('hostname', 'test-topic')
         self.service.dbapi = self.dbapi
         self.driver = mock.Mock(spec_set=drivers_base.BareDriver)
@@ -5425,11 +5865,12 @@ class ManagerPowerRecoveryTestCase(mgr_utils.CommonMixIn,
 
 @mock.patch.object(task_manager, 'acquire')
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
 class ManagerCheckDeployTimeoutsTestCase(mgr_utils.CommonMixIn,
                                          db_base.DbTestCase):
     def setUp(self):
         super(ManagerCheckDeployTimeoutsTestCase, self).setUp()
+        self.config(hash_ring_db_filtering=False)
         self.config(deploy_callback_timeout=300, group='conductor')
         self.service = manager.ConductorManager('hostname', 'test-topic')
         self.service.dbapi = self.dbapi
@@ -5758,6 +6199,13 @@ class ParallelPowerSyncTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
     def setUp(self):
         super(ParallelPowerSyncTestCase, self).setUp()
         self.service = manager.ConductorManager('hostname', 'test-topic')
+        self.fields = ['id', 'power_interface', 'driver_info']
+
+    @staticmethod
+    def _node_info(node_uuid, address=None):
+        driver_info = {'snmp_address': address} if address else {}
+        return (node_uuid, 'fake-hardware', '', node_uuid, 'fake',
+                driver_info)
 
     def test__sync_power_states_9_nodes_8_workers(
             self, sync_mock, spawn_mock, waiter_mock):
@@ -5765,7 +6213,8 @@ class ParallelPowerSyncTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
         CONF.set_override('sync_power_state_workers', 8, group='conductor')
 
         with mock.patch.object(self.service, 'iter_nodes',
-                               new=mock.MagicMock(return_value=[[0]] * 9)):
+                               new=mock.MagicMock(return_value=[
+                                   self._node_info(i) for i in range(9)])):
 
             self.service._sync_power_states(self.context)
 
@@ -5779,7 +6228,8 @@ class ParallelPowerSyncTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
         CONF.set_override('sync_power_state_workers', 8, group='conductor')
 
         with mock.patch.object(self.service, 'iter_nodes',
-                               new=mock.MagicMock(return_value=[[0]] * 6)):
+                               new=mock.MagicMock(return_value=[
+                                   self._node_info(i) for i in range(6)])):
 
             self.service._sync_power_states(self.context)
 
@@ -5793,7 +6243,8 @@ class ParallelPowerSyncTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
         CONF.set_override('sync_power_state_workers', 8, group='conductor')
 
         with mock.patch.object(self.service, 'iter_nodes',
-                               new=mock.MagicMock(return_value=[[0]])):
+                               new=mock.MagicMock(
+                                   return_value=[self._node_info(0)])):
 
             self.service._sync_power_states(self.context)
 
@@ -5807,7 +6258,8 @@ class ParallelPowerSyncTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
         CONF.set_override('sync_power_state_workers', 1, group='conductor')
 
         with mock.patch.object(self.service, 'iter_nodes',
-                               new=mock.MagicMock(return_value=[[0]] * 9)):
+                               new=mock.MagicMock(return_value=[
+                                   self._node_info(i) for i in range(9)])):
 
             self.service._sync_power_states(self.context)
 
@@ -5815,34 +6267,230 @@ class ParallelPowerSyncTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
             self.assertEqual(1, sync_mock.call_count)
             self.assertEqual(1, waiter_mock.call_count)
 
-    @mock.patch.object(queue, 'Queue', autospec=True)
     def test__sync_power_states_node_prioritization(
-            self, queue_mock, sync_mock, spawn_mock, waiter_mock):
+            self, sync_mock, spawn_mock, waiter_mock):
 
         CONF.set_override('sync_power_state_workers', 1, group='conductor')
+        synced = []
+
+        def _drain(context, nodes_queue):
+            while True:
+                try:
+                    synced.append([node_info[0] for node_info
+                                   in nodes_queue.get_nowait()])
+                except queue.Empty:
+                    break
+
+        sync_mock.side_effect = _drain
 
         with mock.patch.object(
-            self.service, 'iter_nodes',
-            new=mock.MagicMock(return_value=[[0], [1], [2]])
-        ), mock.patch.dict(
+            self.service, 'iter_nodes', autospec=True,
+            side_effect=[[self._node_info(0), self._node_info(2)],
+                         [self._node_info(i) for i in range(3)]]
+        ) as iter_mock, mock.patch.dict(
                 self.service.power_state_sync_count,
                 {0: 1, 1: 0, 2: 2}, clear=True):
 
-            queue_mock.return_value.qsize.return_value = 0
+            self.service._sync_power_states(self.context)
+
+            self.assertEqual([[2], [0], [1]], synced)
+            iter_mock.assert_has_calls([
+                mock.call(fields=self.fields,
+                          filters={'maintenance': False, 'uuid_in': [0, 2]}),
+                mock.call(fields=self.fields,
+                          filters={'maintenance': False})])
+
+    def test__sync_power_states_groups_by_bmc(
+            self, sync_mock, spawn_mock, waiter_mock):
+        CONF.set_override('sync_power_state_workers', 2, group='conductor')
+        synced = self._drain_nodes(sync_mock)
+        addresses = ['pdu1', 'pdu2', None, 'pdu1', None, 'pdu2', 'pdu1']
+        node_infos = [self._node_info(i, address)
+                      for i, address in enumerate(addresses)]
+
+        with mock.patch.object(self.service, 'iter_nodes',
+                               return_value=node_infos):
+            self.service._sync_power_states(self.context)
+
+        # Nodes sharing a BMC are synced together, wherever they are in
+        # the list of nodes
+        self.assertEqual([[0, 3, 6], [1, 5], [2], [4]], synced)
+        self.assertEqual(1, spawn_mock.call_count)
+
+    def _drain_nodes(self, sync_mock):
+        synced = []
+
+        def _drain(context, nodes_queue):
+            while True:
+                try:
+                    synced.append([node_info[0] for node_info
+                                   in nodes_queue.get_nowait()])
+                except queue.Empty:
+                    break
+
+        sync_mock.side_effect = _drain
+        return synced
+
+    def test__sync_power_states_max_rate(
+            self, sync_mock, spawn_mock, waiter_mock):
+        CONF.set_override('sync_power_state_workers', 1, group='conductor')
+        CONF.set_override('sync_power_state_interval', 60, group='conductor')
+        CONF.set_override('sync_power_state_max_rate', 0.05,
+                          group='conductor')
+        synced = self._drain_nodes(sync_mock)
+
+        with mock.patch.object(self.service, 'iter_nodes',
+                               return_value=[self._node_info(i)
+                                             for i in range(9)]):
+            self.service._sync_power_states(self.context)
+
+        self.assertEqual([[0], [1], [2]], synced)
+
+    def test__sync_power_states_max_rate_rotates(
+            self, sync_mock, spawn_mock, waiter_mock):
+        CONF.set_override('sync_power_state_workers', 1, group='conductor')
+        CONF.set_override('sync_power_state_interval', 60, group='conductor')
+        CONF.set_override('sync_power_state_max_rate', 0.05,
+                          group='conductor')
+        synced = self._drain_nodes(sync_mock)
+
+        runs = []
+        with mock.patch.object(self.service, 'iter_nodes',
+                               side_effect=lambda **kw: [
+                                   self._node_info(i) for i in range(8)]):
+            for _i in range(4):
+                self.service._sync_power_states(self.context)
+                runs.append([n[0] for n in synced])
+                del synced[:]
+
+        # Three nodes per run, every node is synced in turn
+        self.assertEqual([[0, 1, 2], [3, 4, 5], [6, 7, 0], [1, 2, 3]], runs)
+
+    def test__sync_power_states_max_rate_failing_first(
+            self, sync_mock, spawn_mock, waiter_mock):
+        CONF.set_override('sync_power_state_workers', 1, group='conductor')
+        CONF.set_override('sync_power_state_interval', 60, group='conductor')
+        CONF.set_override('sync_power_state_max_rate', 0.05,
+                          group='conductor')
+        synced = self._drain_nodes(sync_mock)
+        self.service.power_state_sync_count['node-5'] = 1
+        self.service.power_state_sync_count['node-7'] = 2
+
+        def _iter_nodes(fields, filters):
+            uuids = filters.get('uuid_in') or ['node-%d' % i
+                                               for i in range(8)]
+            return [self._node_info(uuid) for uuid in sorted(uuids)]
 
+        with mock.patch.object(self.service, 'iter_nodes',
+                               side_effect=_iter_nodes):
             self.service._sync_power_states(self.context)
+            self.assertEqual([['node-7'], ['node-5'], ['node-0']], synced)
+            del synced[:]
+            self.service._sync_power_states(self.context)
+            self.assertEqual([['node-7'], ['node-5'], ['node-1']], synced)
 
-            expected_calls = [mock.call([2]), mock.call([0]), mock.call([1])]
-            queue_mock.return_value.put.assert_has_calls(expected_calls)
+    def test__sync_power_states_skips_nodes_not_due(
+            self, sync_mock, spawn_mock, waiter_mock):
+        CONF.set_override('sync_power_state_workers', 1, group='conductor')
+        CONF.set_override('sync_power_state_interval', 60, group='conductor')
+        CONF.set_override('sync_power_state_max_interval', 600,
+                          group='conductor')
+        synced = self._drain_nodes(sync_mock)
+        scheduler = self.service._power_sync_scheduler
+        for i in range(2):
+            scheduler.start_run()
+            scheduler.record(1, stable=True)
+            scheduler.record(2, stable=False)
+
+        with mock.patch.object(self.service, 'iter_nodes',
+                               return_value=[self._node_info(i)
+                                             for i in range(4)]):
+            self.service._sync_power_states(self.context)
+
+        self.assertEqual([[0], [2], [3]], synced)
+
+
+class PowerSyncSchedulerTestCase(tests_base.TestCase):
+
+    def setUp(self):
+        super(PowerSyncSchedulerTestCase, self).setUp()
+        self.config(sync_power_state_interval=60,
+                    sync_power_state_max_interval=300, group='conductor')
+        self.scheduler = manager._PowerSyncScheduler()
+
+    def _due_runs(self, node_uuid, runs, stable=True):
+        due = []
+        for i in range(runs):
+            self.scheduler.start_run()
+            if self.scheduler.is_due(node_uuid):
+                due.append(i)
+                self.scheduler.record(node_uuid, stable=stable)
+            self.scheduler.end_run()
+        return due
+
+    def test_backoff(self):
+        # Every run, then every 2 runs, then capped at 5 runs
+        self.assertEqual([0, 1, 3, 7, 12, 17],
+                         self._due_runs('node', 18))
+
+    def test_unstable(self):
+        self.assertEqual(list(range(5)),
+                         self._due_runs('node', 5, stable=False))
+
+    def test_reset_on_change(self):
+        self._due_runs('node', 8)
+        self.scheduler.start_run()
+        self.scheduler.record('node', stable=False)
+        self.scheduler.start_run()
+        self.assertTrue(self.scheduler.is_due('node'))
+
+    def test_reset(self):
+        self._due_runs('node', 8)
+        self.scheduler.start_run()
+        self.assertFalse(self.scheduler.is_due('node'))
+        self.scheduler.reset('node')
+        self.assertTrue(self.scheduler.is_due('node'))
+
+    def test_disabled(self):
+        self.config(sync_power_state_max_interval=0, group='conductor')
+        self.assertEqual(list(range(5)), self._due_runs('node', 5))
+
+    def test_pick(self):
+        self.scheduler.start_run()
+        nodes = [['node-%d' % i] for i in range(3)]
+        self.assertEqual(nodes, list(self.scheduler.pick(nodes)))
+
+    def test_pick_limit(self):
+        nodes = [['node-%d' % i] for i in range(5)]
+        picked = []
+        for _i in range(5):
+            self.scheduler.start_run()
+            picked.append([n[0] for n in self.scheduler.pick(nodes, 2)])
+            self.scheduler.end_run()
+        self.assertEqual([['node-0', 'node-1'], ['node-2', 'node-3'],
+                          ['node-4', 'node-0'], ['node-1', 'node-2'],
+                          ['node-3', 'node-0']], picked)
+
+    def test_end_run_forgets_unseen_nodes(self):
+        self._due_runs('node', 2)
+        self.scheduler.start_run()
+        self.assertFalse(self.scheduler.is_due('node'))
+        self.scheduler.end_run()
+
+        self.scheduler.start_run()
+        self.scheduler.end_run()
+        self.scheduler.start_run()
+        self.assertTrue(self.scheduler.is_due('node'))
 
 
 @mock.patch.object(task_manager, 'acquire')
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
 class ManagerSyncLocalStateTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
 
     def setUp(self):
         super(ManagerSyncLocalStateTestCase, self).setUp()
+        self.config(hash_ring_db_filtering=False)
 
         self.service = manager.ConductorManager('hostname', 'test-topic')
 
@@ -6188,11 +6836,12 @@ class NodeInspectHardware(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
 
 @mock.patch.object(task_manager, 'acquire')
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_iter')
 class ManagerCheckInspectWaitTimeoutsTestCase(mgr_utils.CommonMixIn,
                                               db_base.DbTestCase):
     def setUp(self):
         super(ManagerCheckInspectWaitTimeoutsTestCase, self).setUp()
+        self.config(hash_ring_db_filtering=False)
         self.config(inspect_wait_timeout=300, group='conductor')
         self.service = manager.ConductorManager('hostname', 'test-topic')
         self.service.dbapi = self.dbapi
@@ -6847,6 +7496,8 @@ class DoNodeTakeOverTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
              mock.call(task, 'console_restore',
                        obj_fields.NotificationStatus.ERROR)])
 
+    @mock.patch.object(manager.ConductorManager, '_start_consoles',
+                       autospec=True)
     @mock.patch.object(notification_utils, 'emit_console_notification')
     @mock.patch('ironic.drivers.modules.fake.FakeConsole.start_console')
     @mock.patch('ironic.drivers.modules.fake.FakeDeploy.take_over')
@@ -6854,7 +7505,10 @@ class DoNodeTakeOverTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
     def test__do_takeover_with_console_port_cleaned(self, mock_prepare,
                                                     mock_take_over,
                                                     mock_start_console,
-                                                    mock_notify):
+                                                    mock_notify,
+                                                    mock_start_consoles):
+        # NOTE(yrobla): the consoles are restored in a worker on start up,
+        # which could otherwise race with the node created below.
         self._start_service()
         node = obj_utils.create_test_node(self.context, driver='fake-hardware',
                                           console_enabled=True)
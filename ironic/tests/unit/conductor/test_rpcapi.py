@@ -20,10 +20,13 @@ Unit Tests for :py:class:`ironic.conductor.rpcapi.ConductorAPI`.
 
 import copy
 
+import eventlet
+import futurist
 import mock
 from oslo_config import cfg
 import oslo_messaging as messaging
 from oslo_messaging import _utils as messaging_utils
+from oslo_utils import uuidutils
 
 from ironic.common import boot_devices
 from ironic.common import exception
@@ -61,6 +64,27 @@ class ConductorRPCAPITestCase(tests_base.TestCase):
         conductor_rpcapi.ConductorAPI()
         self.assertEqual('3', mock_get_client.call_args[1]['version_cap'])
 
+    @mock.patch.object(conductor_rpcapi, '_EXECUTOR', None)
+    @mock.patch('eventlet.patcher.is_monkey_patched', autospec=True)
+    def test_get_executor_green(self, mock_patched):
+        mock_patched.return_value = True
+        CONF.set_override('rpc_concurrency', 4)
+        executor = conductor_rpcapi._get_executor()
+        self.addCleanup(executor.shutdown)
+        self.assertIsInstance(executor, futurist.GreenThreadPoolExecutor)
+        self.assertEqual(4, executor._max_workers)
+        self.assertIs(executor, conductor_rpcapi._get_executor())
+        mock_patched.assert_called_once_with('thread')
+
+    @mock.patch.object(conductor_rpcapi, '_EXECUTOR', None)
+    @mock.patch('eventlet.patcher.is_monkey_patched', autospec=True)
+    def test_get_executor_native(self, mock_patched):
+        mock_patched.return_value = False
+        executor = conductor_rpcapi._get_executor()
+        self.addCleanup(executor.shutdown)
+        self.assertIsInstance(executor, futurist.ThreadPoolExecutor)
+        self.assertEqual(CONF.rpc_concurrency, executor._max_workers)
+
 
 class RPCAPITestCase(db_base.DbTestCase):
 
@@ -74,6 +98,47 @@ class RPCAPITestCase(db_base.DbTestCase):
     def test_serialized_instance_has_uuid(self):
         self.assertIn('uuid', self.fake_node)
 
+    def test_spawn(self):
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi, 'get_boot_device',
+                               autospec=True) as mock_gbd:
+            mock_gbd.return_value = {'boot_device': boot_devices.PXE}
+            future = rpcapi.spawn(self.context, rpcapi.get_boot_device,
+                                  self.fake_node['uuid'], topic='fake-topic')
+            self.assertEqual({'boot_device': boot_devices.PXE},
+                             future.result())
+        mock_gbd.assert_called_once_with(self.context, self.fake_node['uuid'],
+                                         topic='fake-topic')
+
+    def test_spawn_concurrent(self):
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        started = eventlet.event.Event()
+
+        def _first(context):
+            started.wait()
+            return 'first'
+
+        def _second(context):
+            started.send()
+            return 'second'
+
+        # The first call can only finish when the second one runs.
+        futures = [rpcapi.spawn(self.context, _first),
+                   rpcapi.spawn(self.context, _second)]
+        self.assertEqual(['first', 'second'],
+                         [future.result(timeout=10) for future in futures])
+
+    def test_spawn_error(self):
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi, 'validate_driver_interfaces',
+                               autospec=True) as mock_validate:
+            mock_validate.side_effect = exception.NoFreeConductorWorker()
+            future = rpcapi.spawn(self.context,
+                                  rpcapi.validate_driver_interfaces,
+                                  self.fake_node['uuid'])
+            self.assertRaises(exception.NoFreeConductorWorker,
+                              future.result)
+
     def test_get_topic_for_known_driver(self):
         CONF.set_override('host', 'fake-host')
         c = self.dbapi.register_conductor({'hostname': 'fake-host',
@@ -86,6 +151,48 @@ class RPCAPITestCase(db_base.DbTestCase):
         self.assertEqual(expected_topic,
                          rpcapi.get_topic_for(self.fake_node_obj))
 
+    def test_get_conductors_for(self):
+        CONF.set_override('host', 'fake-host')
+        c = self.dbapi.register_conductor({'hostname': 'fake-host',
+                                           'drivers': []})
+        self.dbapi.register_conductor_hardware_interfaces(
+            c.id, 'fake-driver', 'deploy', ['iscsi', 'direct'], 'iscsi')
+        other_node = objects.Node(self.context, driver='other-driver',
+                                  conductor_group='',
+                                  uuid=uuidutils.generate_uuid())
+
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi.ring_manager, 'get_ring',
+                               wraps=rpcapi.ring_manager.get_ring
+                               ) as mock_get_ring:
+            result = rpcapi.get_conductors_for(
+                [self.fake_node_obj, other_node, self.fake_node_obj])
+
+        self.assertEqual({self.fake_node_obj.uuid: 'fake-host',
+                          other_node.uuid: None}, result)
+        self.assertEqual(2, mock_get_ring.call_count)
+
+    def test_get_conductors_for_no_conductors(self):
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        self.assertEqual({self.fake_node_obj.uuid: None},
+                         rpcapi.get_conductors_for([self.fake_node_obj]))
+
+    def test_get_topics_for(self):
+        CONF.set_override('host', 'fake-host')
+        c = self.dbapi.register_conductor({'hostname': 'fake-host',
+                                           'drivers': []})
+        self.dbapi.register_conductor_hardware_interfaces(
+            c.id, 'fake-driver', 'deploy', ['iscsi', 'direct'], 'iscsi')
+        other_node = objects.Node(self.context, driver='other-driver',
+                                  conductor_group='',
+                                  uuid=uuidutils.generate_uuid())
+
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        self.assertEqual({self.fake_node_obj.uuid: 'fake-topic.fake-host',
+                          other_node.uuid: None},
+                         rpcapi.get_topics_for([self.fake_node_obj,
+                                                other_node]))
+
     def test_get_topic_for_unknown_driver(self):
         CONF.set_override('host', 'fake-host')
         c = self.dbapi.register_conductor({'hostname': 'fake-host',
@@ -252,6 +359,67 @@ class RPCAPITestCase(db_base.DbTestCase):
                           version='1.1',
                           node_obj=self.fake_node)
 
+    def test_update_node_changes_only(self):
+        self.config(rpc_send_changes_only=True)
+        self.fake_node_obj.obj_reset_changes()
+        self.fake_node_obj.extra = {'answer': 42}
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi.client, 'prepare',
+                               autospec=True) as mock_prepare:
+            rpcapi.update_node(self.context, self.fake_node_obj)
+
+        mock_prepare.assert_called_with(topic='fake-topic', version='1.51')
+        mock_call = mock_prepare.return_value.call
+        mock_call.assert_called_once_with(self.context, 'update_node',
+                                          node_obj=mock.ANY,
+                                          reset_interfaces=False)
+        node_obj = mock_call.call_args[1]['node_obj']
+        self.assertEqual({'extra'}, node_obj.obj_what_changed())
+        self.assertEqual(self.fake_node_obj.uuid, node_obj.uuid)
+        self.assertEqual({'answer': 42}, node_obj.extra)
+        self.assertFalse(node_obj.obj_attr_is_set('driver_info'))
+
+    def test_update_node_changes_only_pinned(self):
+        self.config(rpc_send_changes_only=True)
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi.client, 'can_send_version',
+                               autospec=True) as mock_can_send_version, \
+                mock.patch.object(rpcapi.client, 'prepare',
+                                  autospec=True) as mock_prepare:
+            mock_can_send_version.return_value = False
+            rpcapi.update_node(self.context, self.fake_node_obj)
+
+        mock_can_send_version.assert_called_once_with('1.51')
+        mock_prepare.assert_called_once_with(topic='fake-topic',
+                                             version='1.1')
+        mock_prepare.return_value.call.assert_called_once_with(
+            self.context, 'update_node', node_obj=self.fake_node_obj,
+            reset_interfaces=False)
+
+    def test_update_node_expected_digest(self):
+        self._test_rpcapi('update_node',
+                          'call',
+                          version='1.52',
+                          node_obj=self.fake_node,
+                          expected_digest='abcd')
+
+    def test_update_node_expected_digest_pinned(self):
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi.client, 'can_send_version',
+                               autospec=True) as mock_can_send_version, \
+                mock.patch.object(rpcapi.client, 'prepare',
+                                  autospec=True) as mock_prepare:
+            mock_can_send_version.return_value = False
+            rpcapi.update_node(self.context, self.fake_node_obj,
+                               expected_digest='abcd')
+
+        mock_can_send_version.assert_called_once_with('1.52')
+        mock_prepare.assert_called_once_with(topic='fake-topic',
+                                             version='1.1')
+        mock_prepare.return_value.call.assert_called_once_with(
+            self.context, 'update_node', node_obj=self.fake_node_obj,
+            reset_interfaces=False)
+
     def test_change_node_power_state(self):
         self._test_rpcapi('change_node_power_state',
                           'call',
@@ -259,6 +427,66 @@ class RPCAPITestCase(db_base.DbTestCase):
                           node_id=self.fake_node['uuid'],
                           new_state=states.POWER_ON)
 
+    def test_change_nodes_power_state(self):
+        self._test_rpcapi('change_nodes_power_state',
+                          'call',
+                          version='1.50',
+                          node_ids=[self.fake_node['uuid']],
+                          new_state=states.POWER_ON,
+                          timeout=None)
+
+    @mock.patch.object(conductor_rpcapi.ConductorAPI,
+                       'change_node_power_state', autospec=True)
+    def test_change_nodes_power_state_old_conductor(self, mock_change):
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        mock_change.side_effect = [None, exception.NodeLocked(node='node2',
+                                                              host='host')]
+        with mock.patch.object(rpcapi.client, 'can_send_version',
+                               autospec=True) as mock_can_send_version:
+            mock_can_send_version.return_value = False
+            result = rpcapi.change_nodes_power_state(
+                self.context, ['node1', 'node2'], states.POWER_ON,
+                topic='fake-topic.host', timeout=10)
+
+        mock_can_send_version.assert_called_once_with('1.50')
+        self.assertEqual({'node1': None,
+                          'node2': {'code': 409, 'message': mock.ANY}},
+                         result)
+        mock_change.assert_has_calls([
+            mock.call(rpcapi, self.context, 'node1', states.POWER_ON,
+                      topic='fake-topic.host', timeout=10),
+            mock.call(rpcapi, self.context, 'node2', states.POWER_ON,
+                      topic='fake-topic.host', timeout=10)])
+
+    def test_change_nodes_power_state_old_conductor_json_rpc(self):
+        self.config(rpc_transport='json-rpc')
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi.client, 'can_send_version',
+                               autospec=True) as mock_can_send_version, \
+                mock.patch.object(rpcapi.client, 'prepare',
+                                  autospec=True) as mock_prepare:
+            mock_can_send_version.return_value = False
+            mock_batch = mock_prepare.return_value.batch.return_value
+            mock_batch.send.return_value = [
+                None, exception.NodeLocked(node='node2', host='host')]
+            result = rpcapi.change_nodes_power_state(
+                self.context, ['node1', 'node2'], states.POWER_ON,
+                topic='fake-topic.host', timeout=10)
+
+        self.assertEqual({'node1': None,
+                          'node2': {'code': 409, 'message': mock.ANY}},
+                         result)
+        mock_prepare.assert_called_once_with(topic='fake-topic.host',
+                                             version='1.39')
+        mock_batch.call.assert_has_calls([
+            mock.call(self.context, 'change_node_power_state',
+                      node_id='node1', new_state=states.POWER_ON,
+                      timeout=10),
+            mock.call(self.context, 'change_node_power_state',
+                      node_id='node2', new_state=states.POWER_ON,
+                      timeout=10)])
+        mock_batch.send.assert_called_once_with()
+
     def test_vendor_passthru(self):
         self._test_rpcapi('vendor_passthru',
                           'call',
@@ -291,6 +519,72 @@ class RPCAPITestCase(db_base.DbTestCase):
                           version='1.6',
                           node_id=self.fake_node['uuid'])
 
+    def test_do_nodes_provisioning_action(self):
+        self._test_rpcapi('do_nodes_provisioning_action',
+                          'call',
+                          version='1.50',
+                          node_ids=[self.fake_node['uuid']],
+                          target=states.DELETED)
+
+    def test_do_nodes_provisioning_action_old_conductor(self):
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi.client, 'can_send_version',
+                               autospec=True) as mock_can_send_version, \
+                mock.patch.object(rpcapi, 'do_node_deploy',
+                                  autospec=True) as mock_deploy, \
+                mock.patch.object(rpcapi, 'do_node_tear_down',
+                                  autospec=True) as mock_tear_down, \
+                mock.patch.object(rpcapi, 'inspect_hardware',
+                                  autospec=True) as mock_inspect, \
+                mock.patch.object(rpcapi, 'do_provisioning_action',
+                                  autospec=True) as mock_action:
+            mock_can_send_version.return_value = False
+            for target in (states.ACTIVE, states.DELETED,
+                           states.VERBS['inspect'], states.VERBS['manage']):
+                result = rpcapi.do_nodes_provisioning_action(
+                    self.context, ['node1'], target, topic='fake-topic.host')
+                self.assertEqual({'node1': None}, result)
+
+        mock_deploy.assert_called_once_with(self.context, 'node1', False,
+                                            None, topic='fake-topic.host')
+        mock_tear_down.assert_called_once_with(self.context, 'node1',
+                                               topic='fake-topic.host')
+        mock_inspect.assert_called_once_with(self.context, 'node1',
+                                             topic='fake-topic.host')
+        mock_action.assert_called_once_with(self.context, 'node1',
+                                            states.VERBS['manage'],
+                                            topic='fake-topic.host')
+
+    def test_do_nodes_provisioning_action_old_conductor_json_rpc(self):
+        self.config(rpc_transport='json-rpc')
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        calls = [
+            (states.ACTIVE, 'do_node_deploy', '1.22',
+             {'rebuild': False, 'configdrive': None}),
+            (states.DELETED, 'do_node_tear_down', '1.6', {}),
+            (states.VERBS['inspect'], 'inspect_hardware', '1.24', {}),
+            (states.VERBS['manage'], 'do_provisioning_action', '1.23',
+             {'action': states.VERBS['manage']}),
+        ]
+        for target, method, version, kwargs in calls:
+            with mock.patch.object(rpcapi.client, 'can_send_version',
+                                   autospec=True) as mock_can_send_version, \
+                    mock.patch.object(rpcapi.client, 'prepare',
+                                      autospec=True) as mock_prepare:
+                mock_can_send_version.return_value = False
+                mock_batch = mock_prepare.return_value.batch.return_value
+                mock_batch.send.return_value = [None, None]
+                result = rpcapi.do_nodes_provisioning_action(
+                    self.context, ['node1', 'node2'], target,
+                    topic='fake-topic.host')
+
+            self.assertEqual({'node1': None, 'node2': None}, result)
+            mock_prepare.assert_called_once_with(topic='fake-topic.host',
+                                                 version=version)
+            mock_batch.call.assert_has_calls([
+                mock.call(self.context, method, node_id='node1', **kwargs),
+                mock.call(self.context, method, node_id='node2', **kwargs)])
+
     def test_validate_driver_interfaces(self):
         self._test_rpcapi('validate_driver_interfaces',
                           'call',
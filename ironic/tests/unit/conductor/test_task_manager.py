@@ -71,7 +71,8 @@ class TaskManagerTestCase(db_base.DbTestCase):
 
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
+                                             'fake-node-id',
+                                             constraints=None)
         get_ports_mock.assert_called_once_with(self.context, self.node.id)
         get_portgroups_mock.assert_called_once_with(self.context, self.node.id)
         get_volconn_mock.assert_called_once_with(self.context, self.node.id)
@@ -113,6 +114,11 @@ class TaskManagerTestCase(db_base.DbTestCase):
         build_driver_mock.return_value = mock.sentinel.driver1
 
         with task_manager.TaskManager(self.context, 'node-id1') as task:
+            # load the resources of the first task
+            self.assertEqual(mock.sentinel.ports1, task.ports)
+            self.assertEqual(mock.sentinel.portgroups1, task.portgroups)
+            self.assertEqual(mock.sentinel.volconn1, task.volume_connectors)
+            self.assertEqual(mock.sentinel.voltgt1, task.volume_targets)
             reserve_mock.return_value = node2
             get_ports_mock.return_value = mock.sentinel.ports2
             get_portgroups_mock.return_value = mock.sentinel.portgroups2
@@ -145,8 +151,10 @@ class TaskManagerTestCase(db_base.DbTestCase):
         self.assertEqual([mock.call(self.context, 'node-id1'),
                           mock.call(self.context, 'node-id2')],
                          node_get_mock.call_args_list)
-        self.assertEqual([mock.call(self.context, self.host, 'node-id1'),
-                          mock.call(self.context, self.host, 'node-id2')],
+        self.assertEqual([mock.call(self.context, self.host, 'node-id1',
+                                    constraints=None),
+                          mock.call(self.context, self.host, 'node-id2',
+                                    constraints=None)],
                          reserve_mock.call_args_list)
         self.assertEqual([mock.call(self.context, self.node.id),
                           mock.call(self.context, node2.id)],
@@ -173,7 +181,7 @@ class TaskManagerTestCase(db_base.DbTestCase):
             self.assertFalse(task.shared)
 
         expected_calls = [mock.call(self.context, self.host,
-                                    'fake-node-id')] * 2
+                                    'fake-node-id', constraints=None)] * 2
         reserve_mock.assert_has_calls(expected_calls)
         self.assertEqual(2, reserve_mock.call_count)
 
@@ -197,7 +205,8 @@ class TaskManagerTestCase(db_base.DbTestCase):
                           retry=False)
 
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
+                                             'fake-node-id',
+                                             constraints=None)
 
     def test_excl_lock_reserve_exception(
             self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
@@ -215,7 +224,8 @@ class TaskManagerTestCase(db_base.DbTestCase):
                           'fake-node-id')
         node_get_mock.assert_called_with(self.context, 'fake-node-id')
         reserve_mock.assert_called_with(self.context, self.host,
-                                        'fake-node-id')
+                                        'fake-node-id',
+                                        constraints=None)
         self.assertEqual(retry_attempts, reserve_mock.call_count)
         self.assertFalse(get_ports_mock.called)
         self.assertFalse(get_portgroups_mock.called)
@@ -231,16 +241,16 @@ class TaskManagerTestCase(db_base.DbTestCase):
         reserve_mock.return_value = self.node
         get_ports_mock.side_effect = exception.IronicException('foo')
 
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id')
+        with task_manager.TaskManager(self.context, 'fake-node-id') as task:
+            self.assertRaises(exception.IronicException,
+                              getattr, task, 'ports')
 
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
+                                             'fake-node-id',
+                                             constraints=None)
         get_ports_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(build_driver_mock.called)
+        build_driver_mock.assert_called_once_with(task)
         release_mock.assert_called_once_with(self.context, self.host,
                                              self.node.id)
 
@@ -251,16 +261,16 @@ class TaskManagerTestCase(db_base.DbTestCase):
         reserve_mock.return_value = self.node
         get_portgroups_mock.side_effect = exception.IronicException('foo')
 
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id')
+        with task_manager.TaskManager(self.context, 'fake-node-id') as task:
+            self.assertRaises(exception.IronicException,
+                              getattr, task, 'portgroups')
 
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
+                                             'fake-node-id',
+                                             constraints=None)
         get_portgroups_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(build_driver_mock.called)
+        build_driver_mock.assert_called_once_with(task)
         release_mock.assert_called_once_with(self.context, self.host,
                                              self.node.id)
 
@@ -271,13 +281,13 @@ class TaskManagerTestCase(db_base.DbTestCase):
         reserve_mock.return_value = self.node
         get_volconn_mock.side_effect = exception.IronicException('foo')
 
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id')
+        with task_manager.TaskManager(self.context, 'fake-node-id') as task:
+            self.assertRaises(exception.IronicException,
+                              getattr, task, 'volume_connectors')
 
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
+                                             'fake-node-id',
+                                             constraints=None)
         get_volconn_mock.assert_called_once_with(self.context, self.node.id)
         self.assertFalse(get_voltgt_mock.called)
         release_mock.assert_called_once_with(self.context, self.host,
@@ -291,15 +301,15 @@ class TaskManagerTestCase(db_base.DbTestCase):
         reserve_mock.return_value = self.node
         get_voltgt_mock.side_effect = exception.IronicException('foo')
 
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id')
+        with task_manager.TaskManager(self.context, 'fake-node-id') as task:
+            self.assertRaises(exception.IronicException,
+                              getattr, task, 'volume_targets')
 
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
+                                             'fake-node-id',
+                                             constraints=None)
         get_voltgt_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(build_driver_mock.called)
+        build_driver_mock.assert_called_once_with(task)
         release_mock.assert_called_once_with(self.context, self.host,
                                              self.node.id)
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
@@ -319,9 +329,10 @@ class TaskManagerTestCase(db_base.DbTestCase):
 
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
-        get_ports_mock.assert_called_once_with(self.context, self.node.id)
-        get_portgroups_mock.assert_called_once_with(self.context, self.node.id)
+                                             'fake-node-id',
+                                             constraints=None)
+        self.assertFalse(get_ports_mock.called)
+        self.assertFalse(get_portgroups_mock.called)
         build_driver_mock.assert_called_once_with(mock.ANY)
         release_mock.assert_called_once_with(self.context, self.host,
                                              self.node.id)
@@ -353,6 +364,31 @@ class TaskManagerTestCase(db_base.DbTestCase):
         get_volconn_mock.assert_called_once_with(self.context, self.node.id)
         get_voltgt_mock.assert_called_once_with(self.context, self.node.id)
 
+    @mock.patch.object(task_manager.METRICS, 'send_counter', autospec=True)
+    def test_shared_lock_lazy_resources(
+            self, send_counter_mock, get_voltgt_mock, get_volconn_mock,
+            get_portgroups_mock, get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        node_get_mock.return_value = self.node
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True) as task:
+            self.assertFalse(get_ports_mock.called)
+            self.assertFalse(get_portgroups_mock.called)
+            self.assertFalse(get_volconn_mock.called)
+            self.assertFalse(get_voltgt_mock.called)
+            self.assertFalse(send_counter_mock.called)
+
+            self.assertEqual(get_ports_mock.return_value, task.ports)
+            self.assertEqual(get_ports_mock.return_value, task.ports)
+
+        get_ports_mock.assert_called_once_with(self.context, self.node.id)
+        self.assertFalse(get_portgroups_mock.called)
+        self.assertFalse(get_volconn_mock.called)
+        self.assertFalse(get_voltgt_mock.called)
+        send_counter_mock.assert_called_once_with(
+            'TaskManager.ports.loaded', 1)
+        self.assertIsNone(task.ports)
+
     def test_shared_lock_node_get_exception(
             self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
             get_ports_mock, build_driver_mock,
@@ -381,17 +417,16 @@ class TaskManagerTestCase(db_base.DbTestCase):
         node_get_mock.return_value = self.node
         get_ports_mock.side_effect = exception.IronicException('foo')
 
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id',
-                          shared=True)
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True) as task:
+            self.assertRaises(exception.IronicException,
+                              getattr, task, 'ports')
 
         self.assertFalse(reserve_mock.called)
         self.assertFalse(release_mock.called)
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
         get_ports_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(build_driver_mock.called)
+        build_driver_mock.assert_called_once_with(task)
 
     def test_shared_lock_get_portgroups_exception(
             self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
@@ -400,17 +435,16 @@ class TaskManagerTestCase(db_base.DbTestCase):
         node_get_mock.return_value = self.node
         get_portgroups_mock.side_effect = exception.IronicException('foo')
 
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id',
-                          shared=True)
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True) as task:
+            self.assertRaises(exception.IronicException,
+                              getattr, task, 'portgroups')
 
         self.assertFalse(reserve_mock.called)
         self.assertFalse(release_mock.called)
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
         get_portgroups_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(build_driver_mock.called)
+        build_driver_mock.assert_called_once_with(task)
 
     def test_shared_lock_get_volconn_exception(
             self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
@@ -419,11 +453,10 @@ class TaskManagerTestCase(db_base.DbTestCase):
         node_get_mock.return_value = self.node
         get_volconn_mock.side_effect = exception.IronicException('foo')
 
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id',
-                          shared=True)
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True) as task:
+            self.assertRaises(exception.IronicException,
+                              getattr, task, 'volume_connectors')
 
         self.assertFalse(reserve_mock.called)
         self.assertFalse(release_mock.called)
@@ -438,17 +471,16 @@ class TaskManagerTestCase(db_base.DbTestCase):
         node_get_mock.return_value = self.node
         get_voltgt_mock.side_effect = exception.IronicException('foo')
 
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id',
-                          shared=True)
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True) as task:
+            self.assertRaises(exception.IronicException,
+                              getattr, task, 'volume_targets')
 
         self.assertFalse(reserve_mock.called)
         self.assertFalse(release_mock.called)
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
         get_voltgt_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(build_driver_mock.called)
+        build_driver_mock.assert_called_once_with(task)
 
     def test_shared_lock_build_driver_exception(
             self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
@@ -467,10 +499,10 @@ class TaskManagerTestCase(db_base.DbTestCase):
         self.assertFalse(reserve_mock.called)
         self.assertFalse(release_mock.called)
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
-        get_ports_mock.assert_called_once_with(self.context, self.node.id)
-        get_portgroups_mock.assert_called_once_with(self.context, self.node.id)
-        get_volconn_mock.assert_called_once_with(self.context, self.node.id)
-        get_voltgt_mock.assert_called_once_with(self.context, self.node.id)
+        self.assertFalse(get_ports_mock.called)
+        self.assertFalse(get_portgroups_mock.called)
+        self.assertFalse(get_volconn_mock.called)
+        self.assertFalse(get_voltgt_mock.called)
         build_driver_mock.assert_called_once_with(mock.ANY)
 
     def test_upgrade_lock(
@@ -504,7 +536,8 @@ class TaskManagerTestCase(db_base.DbTestCase):
 
         # make sure reserve() was called only once
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
+                                             'fake-node-id',
+                                             constraints=None)
         release_mock.assert_called_once_with(self.context, self.host,
                                              self.node.id)
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
@@ -536,6 +569,80 @@ class TaskManagerTestCase(db_base.DbTestCase):
             task1.process_event('provide')
             self.assertEqual(states.CLEANING, task1.node.provision_state)
 
+    def test_upgrade_lock_with_constraints(
+            self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
+            get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        node_get_mock.return_value = self.node
+        reserve_mock.return_value = self.node
+        constraints = {'maintenance': False}
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True) as task:
+            task.upgrade_lock(constraints=constraints)
+            self.assertFalse(task.shared)
+
+        reserve_mock.assert_called_once_with(self.context, self.host,
+                                             'fake-node-id',
+                                             constraints=constraints)
+
+    def test_excl_lock_with_constraints(
+            self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
+            get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        node_get_mock.return_value = self.node
+        reserve_mock.return_value = self.node
+        constraints = {'provision_state_in': [states.AVAILABLE],
+                       'maintenance': False}
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      constraints=constraints) as task:
+            self.assertFalse(task.shared)
+            self.assertEqual(self.node, task.node)
+
+        reserve_mock.assert_called_once_with(self.context, self.host,
+                                             'fake-node-id',
+                                             constraints=constraints)
+        # The node is only fetched by the reservation
+        self.assertFalse(node_get_mock.called)
+
+    def test_excl_lock_constraints_not_met(
+            self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
+            get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        reserve_mock.side_effect = exception.NodeConstraintsNotMet(
+            node='fake-node-id', constraints={'maintenance': True})
+
+        self.assertRaises(exception.NodeConstraintsNotMet,
+                          task_manager.TaskManager,
+                          self.context, 'fake-node-id',
+                          constraints={'maintenance': True})
+
+        # Not retried
+        reserve_mock.assert_called_once_with(self.context, self.host,
+                                             'fake-node-id',
+                                             constraints={'maintenance': True})
+        self.assertFalse(node_get_mock.called)
+        self.assertFalse(get_ports_mock.called)
+        self.assertFalse(build_driver_mock.called)
+        self.assertFalse(release_mock.called)
+
+    def test_shared_lock_constraints_not_met(
+            self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
+            get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        node_get_mock.return_value = self.node
+
+        for constraints in ({'provision_state_not_in': [states.AVAILABLE]},
+                            {'provision_state_in': [states.DEPLOYWAIT]},
+                            {'reservation': 'fake-host'}):
+            self.assertRaises(exception.NodeConstraintsNotMet,
+                              task_manager.TaskManager,
+                              self.context, 'fake-node-id', shared=True,
+                              constraints=constraints)
+
+        self.assertFalse(reserve_mock.called)
+        self.assertFalse(get_ports_mock.called)
+        self.assertFalse(build_driver_mock.called)
+
     @mock.patch.object(task_manager.TaskManager,
                        '_notify_provision_state_change', autospec=True)
     def test_spawn_after(
@@ -672,16 +779,16 @@ class TaskManagerTestCase(db_base.DbTestCase):
         on_error_handler.assert_called_once_with(expected_exception,
                                                  'fake-argument')
 
-    @mock.patch.object(states.machine, 'copy')
+    @mock.patch.object(states.machine, 'cursor')
     def test_init_prepares_fsm(
-            self, copy_mock, get_volconn_mock, get_voltgt_mock,
+            self, cursor_mock, get_volconn_mock, get_voltgt_mock,
             get_portgroups_mock, get_ports_mock,
             build_driver_mock, reserve_mock, release_mock, node_get_mock):
-        m = mock.Mock(spec=fsm.FSM)
+        m = mock.Mock(spec=fsm.FSMCursor)
         reserve_mock.return_value = self.node
-        copy_mock.return_value = m
+        cursor_mock.return_value = m
         t = task_manager.TaskManager('fake', 'fake')
-        copy_mock.assert_called_once_with()
+        cursor_mock.assert_called_once_with()
         self.assertIs(m, t.fsm)
         m.initialize.assert_called_once_with(
             start_state=self.node.provision_state,
@@ -691,7 +798,7 @@ class TaskManagerTestCase(db_base.DbTestCase):
 class TaskManagerStateModelTestCases(tests_base.TestCase):
     def setUp(self):
         super(TaskManagerStateModelTestCases, self).setUp()
-        self.fsm = mock.Mock(spec=fsm.FSM)
+        self.fsm = mock.Mock(spec=fsm.FSMCursor)
         self.node = mock.Mock(spec=objects.Node)
         self.task = mock.Mock(spec=task_manager.TaskManager)
         self.task.fsm = self.fsm
@@ -13,6 +13,7 @@ import time
 
 import mock
 from oslo_config import cfg
+import oslo_messaging as messaging
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
 
@@ -2052,3 +2053,33 @@ class AgentTokenUtilsTestCase(tests_base.TestCase):
             conductor_utils.is_agent_token_supported('6.2.1'))
         self.assertFalse(
             conductor_utils.is_agent_token_supported('6.0.0'))
+
+
+class CallForEachNodeTestCase(tests_base.TestCase):
+
+    def test_call_for_each_node(self):
+        # NOTE(yrobla): ExpectedException wraps the exception being handled
+        # when it is created, as done by @messaging.expected_exceptions.
+        try:
+            raise exception.NodeInMaintenance(op='op', node='node3')
+        except exception.NodeInMaintenance:
+            expected = messaging.ExpectedException()
+        func = mock.Mock(side_effect=[
+            None, exception.NodeLocked(node='node2', host='host'), expected])
+
+        result = conductor_utils.call_for_each_node(
+            ['node1', 'node2', 'node3'], func, 'arg', kwarg='kwarg')
+
+        self.assertEqual({'node1': None,
+                          'node2': {'code': 409, 'message': mock.ANY},
+                          'node3': {'code': 400, 'message': mock.ANY}},
+                         result)
+        self.assertIn('host', result['node2']['message'])
+        func.assert_has_calls([mock.call('node1', 'arg', kwarg='kwarg'),
+                               mock.call('node2', 'arg', kwarg='kwarg'),
+                               mock.call('node3', 'arg', kwarg='kwarg')])
+
+    def test_call_for_each_node_unexpected_error(self):
+        func = mock.Mock(side_effect=RuntimeError('boom'))
+        self.assertRaises(RuntimeError, conductor_utils.call_for_each_node,
+                          ['node1'], func)
@@ -990,6 +990,29 @@ class MigrationCheckersMixin(object):
         self.assertFalse(node['retired'])
         self.assertIsNone(node['retired_reason'])
 
+    def _pre_upgrade_a1f4b6c2d8e3(self, engine):
+        data = {
+            'node_uuid': uuidutils.generate_uuid(),
+        }
+
+        nodes = db_utils.get_table(engine, 'nodes')
+        nodes.insert().execute({'uuid': data['node_uuid']})
+
+        return data
+
+    def _check_a1f4b6c2d8e3(self, engine, data):
+        nodes = db_utils.get_table(engine, 'nodes')
+        col_names = [column.name for column in nodes.c]
+        self.assertIn('hash_bucket', col_names)
+        self.assertIsInstance(nodes.c.hash_bucket.type,
+                              sqlalchemy.types.Integer)
+        indexes = [index.name for index in nodes.indexes]
+        self.assertIn('node_hash_bucket_idx', indexes)
+
+        node = nodes.select(
+            nodes.c.uuid == data['node_uuid']).execute().first()
+        self.assertIsNone(node['hash_bucket'])
+
     def test_upgrade_and_version(self):
         with patch_with_engine(self.engine):
             self.migration_api.upgrade('head')
@@ -56,6 +56,17 @@ class AllocationsTestCase(base.DbTestCase):
         self.assertRaises(exception.AllocationNotFound,
                           self.dbapi.get_allocation_by_id, 99)
 
+    def test_get_allocation_uuids(self):
+        other = db_utils.create_test_allocation(uuid=uuidutils.generate_uuid(),
+                                                name='host2')
+        res = self.dbapi.get_allocation_uuids(
+            [self.allocation.id, other.id, 99])
+        self.assertEqual({self.allocation.id: self.allocation.uuid,
+                          other.id: other.uuid}, res)
+
+    def test_get_allocation_uuids_empty(self):
+        self.assertEqual({}, self.dbapi.get_allocation_uuids([]))
+
     def test_get_allocation_by_uuid(self):
         res = self.dbapi.get_allocation_by_uuid(self.allocation.uuid)
         self.assertEqual(self.allocation.id, res.id)
@@ -269,6 +280,82 @@ class AllocationsTestCase(base.DbTestCase):
         self.assertRaises(exception.AllocationNotFound,
                           self.dbapi.take_over_allocation, 999, 0, 1)
 
+    def _create_claimable_node(self, **kw):
+        kw.setdefault('power_state', 'power off')
+        kw.setdefault('resource_class', 'baremetal')
+        return db_utils.create_test_node(id=kw.pop('id', 100),
+                                         uuid=uuidutils.generate_uuid(),
+                                         name=None, **kw)
+
+    def test_claim_node(self):
+        node = self._create_claimable_node()
+        db_utils.create_test_node_traits(['tr1', 'tr2'], node_id=node.id)
+        allocation = db_utils.create_test_allocation(
+            id=43, uuid=uuidutils.generate_uuid(), traits=['tr1'])
+
+        res = self.dbapi.claim_node_for_allocation(allocation.id, node.id)
+        self.assertEqual(node.id, res.node_id)
+        self.assertEqual('active', res.state)
+
+        allocation = self.dbapi.get_allocation_by_id(allocation.id)
+        self.assertEqual(node.id, allocation.node_id)
+        self.assertEqual('active', allocation.state)
+        node = self.dbapi.get_node_by_id(node.id)
+        self.assertEqual(allocation.id, node.allocation_id)
+        self.assertEqual(allocation.uuid, node.instance_uuid)
+        self.assertEqual(['tr1'], node.instance_info['traits'])
+
+    def test_claim_node_not_suitable(self):
+        allocation = db_utils.create_test_allocation(
+            id=43, uuid=uuidutils.generate_uuid(), owner='12345',
+            traits=['tr1'])
+        for i, kw in enumerate([{'resource_class': 'x-small'},
+                                {'provision_state': 'active'},
+                                {'power_state': None},
+                                {'maintenance': True},
+                                {'reservation': 'example.com'},
+                                {'instance_uuid': uuidutils.generate_uuid()},
+                                {'owner': '54321'},
+                                {'traits': []}]):
+            traits = kw.pop('traits', ['tr1'])
+            kw.setdefault('owner', '12345')
+            node = self._create_claimable_node(id=100 + i, **kw)
+            db_utils.create_test_node_traits(traits, node_id=node.id)
+
+            self.assertIsNone(
+                self.dbapi.claim_node_for_allocation(allocation.id, node.id))
+            node = self.dbapi.get_node_by_id(node.id)
+            self.assertIsNone(node.allocation_id)
+
+        allocation = self.dbapi.get_allocation_by_id(allocation.id)
+        self.assertIsNone(allocation.node_id)
+        self.assertEqual('allocating', allocation.state)
+
+    def test_claim_node_already_claimed(self):
+        node = self._create_claimable_node()
+        allocation = db_utils.create_test_allocation(
+            id=43, uuid=uuidutils.generate_uuid())
+        self.assertIsNotNone(self.dbapi.claim_node_for_allocation(
+            self.allocation.id, node.id))
+        self.assertIsNone(self.dbapi.claim_node_for_allocation(
+            allocation.id, node.id))
+
+        node = self.dbapi.get_node_by_id(node.id)
+        self.assertEqual(self.allocation.id, node.allocation_id)
+
+    def test_claim_node_instance_associated(self):
+        db_utils.create_test_node(id=99, uuid=uuidutils.generate_uuid(),
+                                  name=None, provision_state='active',
+                                  instance_uuid=self.allocation.uuid)
+        node = self._create_claimable_node()
+        self.assertRaises(exception.InstanceAssociated,
+                          self.dbapi.claim_node_for_allocation,
+                          self.allocation.id, node.id)
+
+    def test_claim_node_allocation_not_found(self):
+        self.assertRaises(exception.AllocationNotFound,
+                          self.dbapi.claim_node_for_allocation, 999, 1)
+
     def test_create_allocation_duplicated_name(self):
         self.assertRaises(exception.AllocationDuplicateName,
                           db_utils.create_test_allocation,
@@ -19,6 +19,7 @@ from testtools import matchers
 
 from ironic.common import context
 from ironic.common import exception
+from ironic.common import hash_ring
 from ironic.common import release_mappings
 from ironic.db import api as db_api
 from ironic.tests.unit.db import base
@@ -237,3 +238,50 @@ class UpdateToLatestVersionsTestCase(base.DbTestCase):
         for uuid in nodes:
             node = self.dbapi.get_node_by_uuid(uuid)
             self.assertEqual(self.node_ver, node.version)
+
+
+class BackfillNodeHashBucketsTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(BackfillNodeHashBucketsTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.dbapi = db_api.get_instance()
+
+    def _create_nodes(self, num_nodes):
+        nodes = []
+        for i in range(num_nodes):
+            node = utils.create_test_node(uuid=uuidutils.generate_uuid())
+            self.dbapi.update_node(node.id, {'hash_bucket': None})
+            nodes.append(node.uuid)
+        return nodes
+
+    def _get_hash_bucket(self, node_uuid):
+        return self.dbapi.get_nodeinfo_list(
+            columns=['hash_bucket'], filters={'uuid': node_uuid})[0][0]
+
+    def test_empty_db(self):
+        self.assertEqual(
+            (0, 0), self.dbapi.backfill_node_hash_buckets(self.context, 10))
+
+    def test_hash_bucket_exists(self):
+        utils.create_test_node()
+        self.assertEqual(
+            (0, 0), self.dbapi.backfill_node_hash_buckets(self.context, 10))
+
+    def test_max_count_zero(self):
+        nodes = self._create_nodes(3)
+        self.assertEqual(
+            (3, 3), self.dbapi.backfill_node_hash_buckets(self.context, 0))
+        for node_uuid in nodes:
+            self.assertEqual(hash_ring.get_hash_bucket(node_uuid),
+                             self._get_hash_bucket(node_uuid))
+
+    def test_max_count(self):
+        nodes = self._create_nodes(5)
+        self.assertEqual(
+            (5, 2), self.dbapi.backfill_node_hash_buckets(self.context, 2))
+        self.assertEqual(
+            (3, 3), self.dbapi.backfill_node_hash_buckets(self.context, 10))
+        for node_uuid in nodes:
+            self.assertEqual(hash_ring.get_hash_bucket(node_uuid),
+                             self._get_hash_bucket(node_uuid))
@@ -318,6 +318,44 @@ class DbConductorTestCase(base.DbTestCase):
         result = self.dbapi.get_active_hardware_type_dict()
         self.assertEqual(expected, result)
 
+    @mock.patch.object(timeutils, 'utcnow', autospec=True)
+    def test_get_active_hardware_type_fingerprint(self, mock_utcnow):
+        self.config(heartbeat_timeout=60, group='conductor')
+        time_ = datetime.datetime(2000, 1, 1, 0, 0)
+        mock_utcnow.return_value = time_
+        empty = self.dbapi.get_active_hardware_type_fingerprint()
+
+        self._create_test_cdr(id=1, hostname='host1',
+                              hardware_types=['hardware-type'])
+        one = self.dbapi.get_active_hardware_type_fingerprint()
+        self.assertNotEqual(empty, one)
+
+        # Heartbeats do not change the fingerprint
+        mock_utcnow.return_value = time_ + datetime.timedelta(seconds=30)
+        self.dbapi.touch_conductor('host1')
+        self.assertEqual(one,
+                         self.dbapi.get_active_hardware_type_fingerprint())
+
+        # Neither does an inactive conductor
+        mock_utcnow.return_value = time_
+        self._create_test_cdr(id=2, hostname='host2',
+                              hardware_types=['hardware-type'])
+        mock_utcnow.return_value = time_ + datetime.timedelta(seconds=75)
+        self.assertEqual(one,
+                         self.dbapi.get_active_hardware_type_fingerprint())
+
+        # Until it comes back
+        self.dbapi.touch_conductor('host2')
+        two = self.dbapi.get_active_hardware_type_fingerprint()
+        self.assertNotEqual(one, two)
+
+        # Registering hardware types again changes the fingerprint
+        self.dbapi.unregister_conductor_hardware_interfaces(1)
+        self.dbapi.register_conductor_hardware_interfaces(
+            1, 'hardware-type', 'power', ['ipmi', 'fake'], 'ipmi')
+        self.assertNotEqual(two,
+                            self.dbapi.get_active_hardware_type_fingerprint())
+
     @mock.patch.object(timeutils, 'utcnow', autospec=True)
     def test_get_offline_conductors(self, mock_utcnow):
         self.config(heartbeat_timeout=60, group='conductor')
@@ -22,7 +22,10 @@ from oslo_utils import timeutils
 from oslo_utils import uuidutils
 
 from ironic.common import exception
+from ironic.common import hash_ring
 from ironic.common import states
+from ironic.db.sqlalchemy import api as sqlalchemy_api
+from ironic import objects
 from ironic.tests.unit.db import base
 from ironic.tests.unit.db import utils
 
@@ -33,6 +36,8 @@ class DbNodeTestCase(base.DbTestCase):
         node = utils.create_test_node()
         self.assertEqual([], node.tags)
         self.assertEqual([], node.traits)
+        self.assertEqual(hash_ring.get_hash_bucket(node.uuid),
+                         node.hash_bucket)
 
     def test_create_node_with_tags(self):
         self.assertRaises(exception.InvalidParameterValue,
@@ -290,6 +295,120 @@ class DbNodeTestCase(base.DbTestCase):
                                                     'World!'})
         self.assertEqual([node2.id], [r[0] for r in res])
 
+    def test_get_nodeinfo_iter(self):
+        node_ids = [utils.create_test_node(
+                    uuid=uuidutils.generate_uuid()).id for i in range(5)]
+
+        with mock.patch.object(sqlalchemy_api, '_paginate_query',
+                               wraps=sqlalchemy_api._paginate_query) as mock_f:
+            res = self.dbapi.get_nodeinfo_iter(chunk_size=2)
+            self.assertEqual(node_ids[:1], list(next(res)))
+            # Only the first chunk has been fetched
+            self.assertEqual(1, mock_f.call_count)
+            self.assertEqual(node_ids[1:], [r[0] for r in res])
+            self.assertEqual(3, mock_f.call_count)
+
+    def test_get_nodeinfo_iter_with_filters_and_sort(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       driver='driver-one', name='b')
+        utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                               driver='driver-two', name='c')
+        node3 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       driver='driver-one', name='a')
+        node4 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       driver='driver-one', name='d')
+
+        res = self.dbapi.get_nodeinfo_iter(columns=['uuid'],
+                                           filters={'driver': 'driver-one'},
+                                           sort_key='name', sort_dir='desc',
+                                           chunk_size=1)
+        self.assertEqual([(node4.uuid,), (node1.uuid,), (node3.uuid,)],
+                         list(res))
+
+    def test_get_nodeinfo_iter_default_chunk_size(self):
+        self.config(node_chunk_size=2, group='database')
+        node_ids = [utils.create_test_node(
+                    uuid=uuidutils.generate_uuid()).id for i in range(4)]
+
+        with mock.patch.object(sqlalchemy_api, '_paginate_query',
+                               wraps=sqlalchemy_api._paginate_query) as mock_f:
+            res = list(self.dbapi.get_nodeinfo_iter(columns=['id']))
+            self.assertEqual(node_ids, [r.id for r in res])
+            self.assertEqual(3, mock_f.call_count)
+
+    def test_get_nodeinfo_list_hash_buckets(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       driver='driver-one')
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       driver='driver-one',
+                                       conductor_group='group1')
+        node3 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       driver='driver-two')
+        node4 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       driver='driver-one')
+        self.dbapi.update_node(node4.id, {'hash_bucket': None})
+        bucket1 = hash_ring.get_hash_bucket(node1.uuid)
+
+        res = self.dbapi.get_nodeinfo_list(
+            filters={'hash_buckets': {('', 'driver-one'):
+                                      [(bucket1, bucket1)]}})
+        self.assertEqual(sorted([node1.id, node4.id]),
+                         sorted([r[0] for r in res]))
+
+        res = self.dbapi.get_nodeinfo_list(
+            filters={'hash_buckets': {(None, 'driver-one'):
+                                      [(0, 2 ** 16 - 1)]}})
+        self.assertEqual(sorted([node1.id, node2.id, node4.id]),
+                         sorted([r[0] for r in res]))
+
+        res = self.dbapi.get_nodeinfo_list(
+            filters={'hash_buckets': {('group1', 'driver-one'): [],
+                                      ('', 'driver-two'):
+                                      [(0, 2 ** 16 - 1)]}})
+        self.assertEqual([node3.id], [r[0] for r in res])
+
+        res = self.dbapi.get_nodeinfo_list(filters={'hash_buckets': {}})
+        self.assertEqual([], res)
+
+    def test_get_nodeinfo_list_traits(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node3 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        utils.create_test_node_traits(['CUSTOM_1', 'CUSTOM_2'],
+                                      node_id=node1.id)
+        utils.create_test_node_traits(['CUSTOM_1'], node_id=node2.id)
+        utils.create_test_node_traits(['CUSTOM_2', 'CUSTOM_3'],
+                                      node_id=node3.id)
+
+        res = self.dbapi.get_nodeinfo_list(filters={'traits': ['CUSTOM_1']})
+        self.assertEqual(sorted([node1.id, node2.id]),
+                         sorted([r[0] for r in res]))
+
+        res = self.dbapi.get_nodeinfo_list(
+            filters={'traits': ['CUSTOM_1', 'CUSTOM_2']})
+        self.assertEqual([node1.id], [r[0] for r in res])
+
+        res = self.dbapi.get_nodeinfo_list(
+            filters={'traits': ['CUSTOM_1', 'CUSTOM_3']})
+        self.assertEqual([], res)
+
+        res = self.dbapi.get_nodeinfo_list(filters={'traits': []})
+        self.assertEqual(sorted([node1.id, node2.id, node3.id]),
+                         sorted([r[0] for r in res]))
+
+    def test_get_node_list_traits(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        utils.create_test_node_traits(['CUSTOM_1', 'CUSTOM_2'],
+                                      node_id=node1.id)
+        utils.create_test_node_traits(['CUSTOM_2'], node_id=node2.id)
+
+        res = self.dbapi.get_node_list(
+            filters={'traits': ['CUSTOM_2', 'CUSTOM_1']})
+        self.assertEqual([node1.uuid], [r.uuid for r in res])
+        self.assertEqual(['CUSTOM_1', 'CUSTOM_2'],
+                         sorted(t.trait for t in res[0].traits))
+
     def test_get_node_list(self):
         uuids = []
         for i in range(1, 6):
@@ -302,6 +421,49 @@ class DbNodeTestCase(base.DbTestCase):
             self.assertEqual([], r.tags)
             self.assertEqual([], r.traits)
 
+    def test_get_node_list_marker_without_id(self):
+        nodes = [utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                        resource_class=rc)
+                 for rc in ('rc-b', 'rc-a', 'rc-b', 'rc-c')]
+        marker = objects.Node(self.context, uuid=nodes[0].uuid,
+                              resource_class='rc-b')
+        res = self.dbapi.get_node_list(marker=marker,
+                                       sort_key='resource_class')
+        self.assertEqual([nodes[2].uuid, nodes[3].uuid],
+                         [r.uuid for r in res])
+
+    def test_get_node_list_fields(self):
+        node = utils.create_test_node(name='node-1')
+        res = self.dbapi.get_node_list(fields=['uuid', 'name', 'spongebob'])
+        self.assertEqual([node.uuid], [r.uuid for r in res])
+        self.assertEqual('node-1', res[0].name)
+        self.assertEqual(node.id, res[0].id)
+        self.assertNotIn('driver_info', res[0].__dict__)
+        self.assertNotIn('traits', res[0].__dict__)
+
+    def test_get_node_list_fields_traits(self):
+        node = utils.create_test_node()
+        self.dbapi.set_node_traits(node.id, ['CUSTOM_1'], '1.0')
+        res = self.dbapi.get_node_list(fields=['uuid', 'traits'])
+        self.assertEqual(['CUSTOM_1'], [t.trait for t in res[0].traits])
+        self.assertNotIn('driver_info', res[0].__dict__)
+
+    def test_get_node_by_uuid_fields(self):
+        node = utils.create_test_node(name='node-1')
+        self.dbapi.set_node_traits(node.id, ['CUSTOM_1'], '1.0')
+        res = self.dbapi.get_node_by_uuid(node.uuid,
+                                          fields=['updated_at', 'traits'])
+        self.assertEqual(node.id, res.id)
+        self.assertEqual(['CUSTOM_1'], [t.trait for t in res.traits])
+        self.assertNotIn('driver_info', res.__dict__)
+
+    def test_get_node_by_name_fields(self):
+        node = utils.create_test_node(name='node-1')
+        res = self.dbapi.get_node_by_name('node-1', fields=['uuid'])
+        self.assertEqual(node.uuid, res.uuid)
+        self.assertNotIn('driver_info', res.__dict__)
+        self.assertNotIn('traits', res.__dict__)
+
     def test_get_node_list_with_filters(self):
         ch1 = utils.create_test_chassis(uuid=uuidutils.generate_uuid())
         ch2 = utils.create_test_chassis(uuid=uuidutils.generate_uuid())
@@ -757,6 +919,52 @@ class DbNodeTestCase(base.DbTestCase):
                                 'another', uuid)
         self.assertIn(r, str(exc))
 
+    def test_reserve_node_with_constraints(self):
+        node = utils.create_test_node(provision_state=states.ACTIVE)
+
+        res = self.dbapi.reserve_node(
+            'fake-reservation', node.uuid,
+            constraints={'maintenance': False,
+                         'provision_state_in': [states.ACTIVE],
+                         'provision_state_not_in': [states.DEPLOYWAIT],
+                         'target_power_state': None})
+        self.assertEqual('fake-reservation', res.reservation)
+
+    def test_reserve_node_constraints_not_met(self):
+        node = utils.create_test_node(provision_state=states.DEPLOYWAIT)
+
+        self.assertRaises(exception.NodeConstraintsNotMet,
+                          self.dbapi.reserve_node, 'fake-reservation',
+                          node.uuid,
+                          constraints={'provision_state_not_in':
+                                       [states.DEPLOYWAIT]})
+        res = self.dbapi.get_node_by_uuid(node.uuid)
+        self.assertIsNone(res.reservation)
+
+    def test_reserve_node_constraints_reserved_node(self):
+        node = utils.create_test_node()
+        self.dbapi.reserve_node('fake-reservation', node.uuid)
+
+        self.assertRaises(exception.NodeLocked,
+                          self.dbapi.reserve_node, 'another', node.uuid,
+                          constraints={'maintenance': False})
+
+    def test_reserve_node_constraints_not_met_reserved_node(self):
+        node = utils.create_test_node(provision_state=states.DEPLOYWAIT)
+        self.dbapi.reserve_node('fake-reservation', node.uuid)
+
+        self.assertRaises(exception.NodeConstraintsNotMet,
+                          self.dbapi.reserve_node, 'another', node.uuid,
+                          constraints={'provision_state_not_in':
+                                       [states.DEPLOYWAIT]})
+
+    def test_reserve_node_invalid_constraints(self):
+        node = utils.create_test_node()
+
+        self.assertRaises(ValueError,
+                          self.dbapi.reserve_node, 'fake-reservation',
+                          node.uuid, constraints={'foo_in': ['bar']})
+
     def test_reservation_non_existent_node(self):
         node = utils.create_test_node()
         self.dbapi.destroy_node(node.id)
@@ -91,6 +91,12 @@ class DbportgroupTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         self.assertCountEqual(uuids, res_uuids)
 
+    def test_get_portgroup_list_fields(self):
+        res = self.dbapi.get_portgroup_list(fields=['uuid', 'name'])
+        self.assertEqual([self.portgroup.uuid], [r.uuid for r in res])
+        self.assertEqual(self.portgroup.name, res[0].name)
+        self.assertNotIn('extra', res[0].__dict__)
+
     def test_get_portgroup_list_sorted(self):
         uuids = self._create_test_portgroup_range(6)
 
@@ -68,6 +68,12 @@ class DbPortTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         self.assertCountEqual(uuids, res_uuids)
 
+    def test_get_port_list_fields(self):
+        res = self.dbapi.get_port_list(fields=['uuid', 'address'])
+        self.assertEqual([self.port.uuid], [r.uuid for r in res])
+        self.assertEqual(self.port.address, res[0].address)
+        self.assertNotIn('extra', res[0].__dict__)
+
     def test_get_port_list_sorted(self):
         uuids = []
         for i in range(1, 6):
@@ -19,6 +19,8 @@ Test class for iRMC periodic tasks
 import mock
 from oslo_utils import uuidutils
 
+from ironic.common import exception
+from ironic.common import states
 from ironic.conductor import task_manager
 from ironic.drivers.modules.irmc import common as irmc_common
 from ironic.drivers.modules.irmc import raid as irmc_raid
@@ -90,6 +92,9 @@ class iRMCPeriodicTaskTestCase(test_common.BaseIRMCTest):
         # Set none target_raid_config input
         task.node.target_raid_config = None
         task.node.save()
+        # The node is not in CLEANWAIT
+        task.upgrade_lock.side_effect = exception.NodeConstraintsNotMet(
+            node=self.node.uuid, constraints={})
         task.driver.raid._query_raid_config_fgi_status(mock_manager,
                                                        self.context)
         self.assertEqual(0, report_mock.call_count)
@@ -127,6 +132,9 @@ class iRMCPeriodicTaskTestCase(test_common.BaseIRMCTest):
             __enter__=mock.MagicMock(return_value=task))
         node_list = [(self.node.uuid, 'irmc', '', raid_config)]
         mock_manager.iter_nodes.return_value = node_list
+        # The node is not in CLEANWAIT
+        task.upgrade_lock.side_effect = exception.NodeConstraintsNotMet(
+            node=self.node.uuid, constraints={})
         task.driver.raid._query_raid_config_fgi_status(mock_manager,
                                                        self.context)
         self.assertEqual(0, report_mock.call_count)
@@ -145,8 +153,12 @@ class iRMCPeriodicTaskTestCase(test_common.BaseIRMCTest):
         # Set provision state value
         task.node.provision_state = 'cleaning'
         task.node.save()
+        task.upgrade_lock.side_effect = exception.NodeConstraintsNotMet(
+            node=self.node.uuid, constraints={})
         task.driver.raid._query_raid_config_fgi_status(mock_manager,
                                                        self.context)
+        task.upgrade_lock.assert_called_once_with(
+            constraints={'provision_state': states.CLEANWAIT})
         self.assertEqual(0, report_mock.call_count)
 
     @mock.patch('ironic.drivers.modules.irmc.raid.IRMCRAID._set_clean_failed')
@@ -354,7 +354,7 @@ class IPMIToolPrivateMethodTestCaseMeta(type):
             @mock.patch.object(utils, 'execute', autospec=True)
             def exec_ipmitool_exception_retry(
                     self, mock_exec, mock_support):
-                ipmi.LAST_CMD_TIME = {}
+                ipmi._BMC_RATE_LIMITER.clear()
                 mock_support.return_value = False
                 mock_exec.side_effect = [
                     processutils.ProcessExecutionError(
@@ -377,7 +377,7 @@ class IPMIToolPrivateMethodTestCaseMeta(type):
             @mock.patch.object(utils, 'execute', autospec=True)
             def exec_ipmitool_exception_retries_exceeded(
                     self, mock_exec, mock_support):
-                ipmi.LAST_CMD_TIME = {}
+                ipmi._BMC_RATE_LIMITER.clear()
                 mock_support.return_value = False
 
                 mock_exec.side_effect = [processutils.ProcessExecutionError(
@@ -399,7 +399,7 @@ class IPMIToolPrivateMethodTestCaseMeta(type):
             @mock.patch.object(utils, 'execute', autospec=True)
             def exec_ipmitool_exception_non_retryable_failure(
                     self, mock_exec, mock_support):
-                ipmi.LAST_CMD_TIME = {}
+                ipmi._BMC_RATE_LIMITER.clear()
                 mock_support.return_value = False
                 additional_msg = "RAKP 2 HMAC is invalid"
 
@@ -452,6 +452,7 @@ class Base(db_base.DbTestCase):
 
     def setUp(self):
         super(Base, self).setUp()
+        ipmi._BMC_RATE_LIMITER.clear()
         self.config(enabled_power_interfaces=['fake', 'ipmitool'],
                     enabled_management_interfaces=['fake', 'ipmitool'],
                     enabled_vendor_interfaces=['fake', 'ipmitool',
@@ -850,7 +851,7 @@ class IPMIToolPrivateMethodTestCase(
     @mock.patch.object(utils, 'execute', autospec=True)
     def test__exec_ipmitool_first_call_to_address(self, mock_exec,
                                                   mock_support):
-        ipmi.LAST_CMD_TIME = {}
+        ipmi._BMC_RATE_LIMITER.clear()
         args = [
             'ipmitool',
             '-I', 'lanplus',
@@ -876,7 +877,7 @@ class IPMIToolPrivateMethodTestCase(
     @mock.patch.object(utils, 'execute', autospec=True)
     def test__exec_ipmitool_second_call_to_address_sleep(
             self, mock_exec, mock_support):
-        ipmi.LAST_CMD_TIME = {}
+        ipmi._BMC_RATE_LIMITER.clear()
         args = [[
             'ipmitool',
             '-I', 'lanplus',
@@ -915,7 +916,7 @@ class IPMIToolPrivateMethodTestCase(
     @mock.patch.object(utils, 'execute', autospec=True)
     def test__exec_ipmitool_second_call_to_address_no_sleep(
             self, mock_exec, mock_support):
-        ipmi.LAST_CMD_TIME = {}
+        ipmi._BMC_RATE_LIMITER.clear()
         args = [[
             'ipmitool',
             '-I', 'lanplus',
@@ -944,8 +945,9 @@ class IPMIToolPrivateMethodTestCase(
         ipmi._exec_ipmitool(self.info, 'A B C')
         mock_exec.assert_called_with(*args[0])
         # act like enough time has passed
-        ipmi.LAST_CMD_TIME[self.info['address']] = (
-            time.time() - CONF.ipmi.min_command_interval)
+        bmc = (self.info['address'], self.info['dest_port'])
+        queue = ipmi._BMC_RATE_LIMITER._queues[bmc]
+        queue.ready_at = queue.idle_at = time.time()
         ipmi._exec_ipmitool(self.info, 'D E F')
         self.assertFalse(self.mock_sleep.called)
         self.assertEqual(expected, mock_support.call_args_list)
@@ -956,7 +958,7 @@ class IPMIToolPrivateMethodTestCase(
     @mock.patch.object(utils, 'execute', autospec=True)
     def test__exec_ipmitool_two_calls_to_diff_address(
             self, mock_exec, mock_support):
-        ipmi.LAST_CMD_TIME = {}
+        ipmi._BMC_RATE_LIMITER.clear()
         args = [[
             'ipmitool',
             '-I', 'lanplus',
@@ -1280,7 +1282,7 @@ class IPMIToolPrivateMethodTestCase(
     @mock.patch.object(utils, 'execute', autospec=True)
     def test__exec_ipmitool_with_port(self, mock_exec, mock_support):
         self.info['dest_port'] = '1623'
-        ipmi.LAST_CMD_TIME = {}
+        ipmi._BMC_RATE_LIMITER.clear()
         args = [
             'ipmitool',
             '-I', 'lanplus',
@@ -1330,7 +1332,8 @@ class IPMIToolPrivateMethodTestCase(
         state = ipmi._power_status(self.info)
 
         mock_exec.assert_called_once_with(self.info, "power status",
-                                          kill_on_timeout=True)
+                                          kill_on_timeout=True,
+                                          reuse_session=True)
         self.assertEqual(states.POWER_ON, state)
 
     @mock.patch.object(ipmi, '_exec_ipmitool', autospec=True)
@@ -1340,7 +1343,8 @@ class IPMIToolPrivateMethodTestCase(
         state = ipmi._power_status(self.info)
 
         mock_exec.assert_called_once_with(self.info, "power status",
-                                          kill_on_timeout=True)
+                                          kill_on_timeout=True,
+                                          reuse_session=True)
         self.assertEqual(states.POWER_OFF, state)
 
     @mock.patch.object(ipmi, '_exec_ipmitool', autospec=True)
@@ -1350,7 +1354,8 @@ class IPMIToolPrivateMethodTestCase(
         state = ipmi._power_status(self.info)
 
         mock_exec.assert_called_once_with(self.info, "power status",
-                                          kill_on_timeout=True)
+                                          kill_on_timeout=True,
+                                          reuse_session=True)
         self.assertEqual(states.ERROR, state)
 
     @mock.patch.object(ipmi, '_exec_ipmitool', autospec=True)
@@ -1360,7 +1365,8 @@ class IPMIToolPrivateMethodTestCase(
                           ipmi._power_status,
                           self.info)
         mock_exec.assert_called_once_with(self.info, "power status",
-                                          kill_on_timeout=True)
+                                          kill_on_timeout=True,
+                                          reuse_session=True)
 
     @mock.patch.object(ipmi, '_exec_ipmitool', autospec=True)
     @mock.patch('oslo_utils.eventletutils.EventletEvent.wait', autospec=True)
@@ -1375,8 +1381,10 @@ class IPMIToolPrivateMethodTestCase(
         mock_exec.side_effect = side_effect
 
         expected = [mock.call(self.info, "power on"),
-                    mock.call(self.info, "power status", kill_on_timeout=True),
-                    mock.call(self.info, "power status", kill_on_timeout=True)]
+                    mock.call(self.info, "power status", kill_on_timeout=True,
+                              reuse_session=True),
+                    mock.call(self.info, "power status", kill_on_timeout=True,
+                              reuse_session=True)]
 
         with task_manager.acquire(self.context, self.node.uuid) as task:
             self.assertRaises(exception.PowerStateFailure,
@@ -1396,7 +1404,8 @@ class IPMIToolPrivateMethodTestCase(
         mock_exec.side_effect = side_effect
 
         expected = [mock.call(self.info, "power soft"),
-                    mock.call(self.info, "power status", kill_on_timeout=True)]
+                    mock.call(self.info, "power status", kill_on_timeout=True,
+                              reuse_session=True)]
 
         with task_manager.acquire(self.context, self.node.uuid) as task:
             state = ipmi._soft_power_off(task, self.info)
@@ -1416,8 +1425,10 @@ class IPMIToolPrivateMethodTestCase(
         mock_exec.side_effect = side_effect
 
         expected = [mock.call(self.info, "power soft"),
-                    mock.call(self.info, "power status", kill_on_timeout=True),
-                    mock.call(self.info, "power status", kill_on_timeout=True)]
+                    mock.call(self.info, "power status", kill_on_timeout=True,
+                              reuse_session=True),
+                    mock.call(self.info, "power status", kill_on_timeout=True,
+                              reuse_session=True)]
 
         with task_manager.acquire(self.context, self.node.uuid) as task:
             self.assertRaises(exception.PowerStateFailure,
@@ -1442,6 +1453,406 @@ class IPMIToolPrivateMethodTestCase(
         self.assertFalse(mock_status.called)
 
 
+class BMCRateLimiterTestCase(base.TestCase):
+
+    def setUp(self):
+        super(BMCRateLimiterTestCase, self).setUp()
+        self.config(min_command_interval=5, group='ipmi')
+        self.limiter = ipmi._BMCRateLimiter()
+        self.mock_sleep = self.useFixture(
+            fixtures.MockPatchObject(time, 'sleep', autospec=True)).mock
+
+    def test_command_first_call(self):
+        with self.limiter.command('1.2.3.4', 10):
+            pass
+        self.assertFalse(self.mock_sleep.called)
+
+    def test_command_waits_interval(self):
+        with self.limiter.command('1.2.3.4', 10):
+            pass
+        with self.limiter.command('1.2.3.4', 10):
+            pass
+        self.assertEqual(1, self.mock_sleep.call_count)
+        self.assertAlmostEqual(5, self.mock_sleep.call_args[0][0], delta=1)
+
+    def test_command_different_addresses(self):
+        with self.limiter.command('1.2.3.4', 10):
+            pass
+        with self.limiter.command('4.3.2.1', 10):
+            pass
+        self.assertFalse(self.mock_sleep.called)
+
+    def test_command_different_ports(self):
+        with self.limiter.command('1.2.3.4', 10, port=623):
+            pass
+        with self.limiter.command('1.2.3.4', 10, port=624):
+            pass
+        self.assertFalse(self.mock_sleep.called)
+
+    def test_command_not_serialized(self):
+        with self.limiter.command('1.2.3.4', 10):
+            # The next command is only paced, it can start while this one
+            # is running.
+            with self.limiter.command('1.2.3.4', 10):
+                pass
+        self.assertEqual(1, self.mock_sleep.call_count)
+        self.assertAlmostEqual(5, self.mock_sleep.call_args[0][0], delta=1)
+
+    def test_command_interval_after_end(self):
+        with mock.patch.object(time, 'time', autospec=True) as mock_time:
+            mock_time.return_value = 100
+            with self.limiter.command('1.2.3.4', 10):
+                mock_time.return_value = 200
+            with self.limiter.command('1.2.3.4', 10):
+                pass
+        self.mock_sleep.assert_called_once_with(5)
+
+    def test_command_interval_after_failure(self):
+        def fail():
+            with self.limiter.command('1.2.3.4', 10):
+                raise processutils.ProcessExecutionError()
+
+        self.assertRaises(processutils.ProcessExecutionError, fail)
+        with self.limiter.command('1.2.3.4', 10):
+            pass
+        self.assertTrue(self.mock_sleep.called)
+
+    def test_command_queue_timeout(self):
+        with self.limiter.command('1.2.3.4', 10):
+            pass
+
+        def wait():
+            with self.limiter.command('1.2.3.4', 1):
+                pass
+
+        self.assertRaises(processutils.ProcessExecutionError, wait)
+        self.assertFalse(self.mock_sleep.called)
+        queue = self.limiter._queues[('1.2.3.4', None)]
+        self.assertEqual(0, queue.waiting)
+
+    def test_command_scheduled_in_order(self):
+        with mock.patch.object(time, 'time', autospec=True) as mock_time:
+            mock_time.return_value = 100
+            first = self.limiter.command('1.2.3.4', 20)
+            second = self.limiter.command('1.2.3.4', 20)
+            third = self.limiter.command('1.2.3.4', 20)
+            first.__enter__()
+            second.__enter__()
+            third.__enter__()
+            # No lock is held by the commands waiting for their start time
+            self.assertFalse(self.limiter._lock.locked())
+            self.assertEqual(3, self.limiter._queues[('1.2.3.4',
+                                                      None)].waiting)
+            for command in (first, second, third):
+                command.__exit__(None, None, None)
+        self.assertEqual([mock.call(5), mock.call(10)],
+                         self.mock_sleep.call_args_list)
+
+    def test_command_waits_for_end(self):
+        with mock.patch.object(time, 'time', autospec=True) as mock_time:
+            mock_time.return_value = 100
+            with self.limiter.command('1.2.3.4', 20):
+                queue = self.limiter._queues[('1.2.3.4', None)]
+                # The running command ends while the next one is waiting
+                self.mock_sleep.side_effect = lambda wait: setattr(
+                    queue, 'idle_at', 108)
+                with self.limiter.command('1.2.3.4', 20):
+                    pass
+        self.assertEqual([mock.call(5), mock.call(3)],
+                         self.mock_sleep.call_args_list)
+
+    @mock.patch.object(ipmi.METRICS, 'send_timer', autospec=True)
+    @mock.patch.object(ipmi.METRICS, 'send_gauge', autospec=True)
+    def test_command_metrics(self, mock_gauge, mock_timer):
+        with self.limiter.command('1.2.3.4', 10):
+            pass
+        mock_gauge.assert_called_once_with('BMCRateLimiter.queue_depth', 1)
+        mock_timer.assert_called_once_with('BMCRateLimiter.wait_time',
+                                           mock.ANY)
+
+    def test_expire(self):
+        with self.limiter.command('1.2.3.4', 10):
+            pass
+        queue = self.limiter._queues[('1.2.3.4', None)]
+        queue.ready_at = queue.idle_at = time.time() - 1
+        with self.limiter.command('4.3.2.1', 10):
+            pass
+        self.limiter._expired_at = 0
+        with self.limiter.command('5.6.7.8', 10):
+            pass
+        self.assertEqual({('4.3.2.1', None), ('5.6.7.8', None)},
+                         set(self.limiter._queues))
+
+
+class _FakeShellProcess(object):
+    """Emulates the output of ``ipmitool shell`` for the given commands."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.returncode = None
+        self.output = []
+        self.stdin = mock.Mock(spec=['write', 'flush', 'close'])
+        self.stdin.write.side_effect = self._write
+        self.stdout = mock.Mock(spec=['readline'])
+        self.stdout.readline.side_effect = self._readline
+
+    def _write(self, data):
+        for line in data.splitlines():
+            if line.startswith('echo '):
+                self.output.append('ipmitool> %s\n' % line[5:])
+            else:
+                self.output.extend(self.responses.get(line, []))
+
+    def _readline(self):
+        return self.output.pop(0) if self.output else ''
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+
+    def wait(self):
+        return self.returncode
+
+
+@mock.patch.object(ipmi, '_make_password_file', _make_password_file_stub)
+@mock.patch.object(subprocess, 'Popen', autospec=True)
+class IPMIToolShellTestCase(Base):
+
+    def setUp(self):
+        super(IPMIToolShellTestCase, self).setUp()
+        self.args = ['ipmitool', '-I', 'lanplus', '-H', self.info['address']]
+        self.addCleanup(ipmi._IPMITOOL_SHELLS.clear)
+        ipmi._IPMITOOL_SHELLS.clear()
+
+    def test_execute(self, mock_popen):
+        process = _FakeShellProcess(
+            {'power status': ['ipmitool> Chassis Power is on\n']})
+        mock_popen.return_value = process
+
+        shell = ipmi._IPMIToolShell(self.args, 'password')
+
+        mock_popen.assert_called_once_with(
+            self.args + ['-f', awesome_password_filename, 'shell'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, universal_newlines=True)
+        self.assertEqual(('Chassis Power is on\n', ''),
+                         shell.execute('power status'))
+        self.assertTrue(shell.alive)
+
+    def test_execute_error(self, mock_popen):
+        error = 'Error: Node busy\n'
+        process = _FakeShellProcess({'power status': [error]})
+        mock_popen.return_value = process
+
+        shell = ipmi._IPMIToolShell(self.args, 'password')
+
+        exc = self.assertRaises(processutils.ProcessExecutionError,
+                                shell.execute, 'power status')
+        self.assertIn('Node busy', str(exc))
+        self.assertTrue(ipmi._is_retryable_ipmitool_error(exc))
+        self.assertTrue(shell.alive)
+
+    def test_execute_exited(self, mock_popen):
+        process = _FakeShellProcess({})
+        mock_popen.return_value = process
+        shell = ipmi._IPMIToolShell(self.args, 'password')
+        process.stdout.readline.side_effect = lambda: ''
+
+        self.assertRaises(processutils.ProcessExecutionError,
+                          shell.execute, 'power status')
+        self.assertFalse(shell.alive)
+        self.assertEqual(-9, process.returncode)
+
+    def test_start_failure(self, mock_popen):
+        mock_popen.side_effect = OSError('No such file or directory')
+        self.assertRaises(processutils.ProcessExecutionError,
+                          ipmi._IPMIToolShell, self.args, 'password')
+
+    def test_get_ipmitool_shell_reused(self, mock_popen):
+        mock_popen.side_effect = lambda *a, **kw: _FakeShellProcess({})
+
+        shell = ipmi._get_ipmitool_shell(self.args, 'password')
+
+        self.assertIs(shell, ipmi._get_ipmitool_shell(self.args, 'password'))
+        self.assertIsNot(shell, ipmi._get_ipmitool_shell(self.args, 'other'))
+        self.assertEqual(2, mock_popen.call_count)
+
+    def test_get_ipmitool_shell_restarted(self, mock_popen):
+        mock_popen.side_effect = lambda *a, **kw: _FakeShellProcess({})
+
+        shell = ipmi._get_ipmitool_shell(self.args, 'password')
+        shell.close()
+
+        new_shell = ipmi._get_ipmitool_shell(self.args, 'password')
+        self.assertIsNot(shell, new_shell)
+        self.assertTrue(new_shell.alive)
+
+    def test_execute_closed(self, mock_popen):
+        mock_popen.return_value = _FakeShellProcess({})
+        shell = ipmi._IPMIToolShell(self.args, 'password')
+        shell.close()
+
+        self.assertRaises(processutils.ProcessExecutionError,
+                          shell.execute, 'power status')
+
+    def test_evict_ipmitool_shell(self, mock_popen):
+        mock_popen.side_effect = lambda *a, **kw: _FakeShellProcess({})
+        shell = ipmi._get_ipmitool_shell(self.args, 'password')
+
+        ipmi._evict_ipmitool_shell(self.args, 'password', shell)
+
+        self.assertFalse(shell.alive)
+        self.assertEqual({}, ipmi._IPMITOOL_SHELLS)
+        self.assertIsNot(shell,
+                         ipmi._get_ipmitool_shell(self.args, 'password'))
+
+    def test_close_idle_sessions(self, mock_popen):
+        self.config(session_idle_timeout=60, group='ipmi')
+        mock_popen.side_effect = lambda *a, **kw: _FakeShellProcess({})
+        idle = ipmi._get_ipmitool_shell(self.args, 'password')
+        used = ipmi._get_ipmitool_shell(self.args, 'other')
+        idle.last_used = time.time() - 120
+
+        ipmi.IPMIPower()._close_idle_sessions(mock.Mock(), self.context)
+
+        self.assertFalse(idle.alive)
+        self.assertTrue(used.alive)
+        self.assertEqual([used], list(ipmi._IPMITOOL_SHELLS.values()))
+
+    def test_get_ipmitool_shell_idle_closed(self, mock_popen):
+        self.config(session_idle_timeout=60, group='ipmi')
+        mock_popen.side_effect = lambda *a, **kw: _FakeShellProcess({})
+        idle = ipmi._get_ipmitool_shell(self.args, 'password')
+        busy = ipmi._get_ipmitool_shell(self.args + ['-p', '624'], 'password')
+        idle.last_used = busy.last_used = time.time() - 120
+        busy.lock.acquire()
+        self.addCleanup(busy.lock.release)
+
+        ipmi._get_ipmitool_shell(self.args, 'other')
+
+        self.assertFalse(idle.alive)
+        self.assertTrue(busy.alive)
+        self.assertEqual(2, len(ipmi._IPMITOOL_SHELLS))
+
+
+@mock.patch.object(ipmi, '_is_option_supported', autospec=True)
+@mock.patch.object(ipmi, '_get_ipmitool_shell', autospec=True)
+@mock.patch.object(utils, 'execute', autospec=True)
+class IPMIToolExecSessionTestCase(Base):
+
+    def setUp(self):
+        super(IPMIToolExecSessionTestCase, self).setUp()
+        self.config(use_persistent_sessions=True, group='ipmi')
+        mock_sleep_fixture = self.useFixture(
+            fixtures.MockPatchObject(time, 'sleep', autospec=True))
+        self.mock_sleep = mock_sleep_fixture.mock
+        ipmi._BMC_RATE_LIMITER.clear()
+        self.args = [
+            'ipmitool',
+            '-I', 'lanplus',
+            '-H', self.info['address'],
+            '-L', self.info['priv_level'],
+            '-U', self.info['username'],
+        ]
+
+    def test_reuse_session(self, mock_exec, mock_get_shell, mock_support):
+        mock_support.return_value = False
+        shell = mock_get_shell.return_value
+        shell.lock = mock.MagicMock()
+        shell.execute.return_value = ('Chassis Power is on\n', '')
+
+        result = ipmi._exec_ipmitool(self.info, 'power status',
+                                     reuse_session=True)
+
+        self.assertEqual(('Chassis Power is on\n', ''), result)
+        mock_get_shell.assert_called_once_with(self.args,
+                                               self.info['password'])
+        shell.execute.assert_called_once_with('power status')
+        self.assertIn((self.info['address'], self.info['dest_port']),
+                      ipmi._BMC_RATE_LIMITER._queues)
+        self.assertFalse(mock_exec.called)
+        self.assertFalse(self.mock_sleep.called)
+
+    def test_reuse_session_waits_interval(self, mock_exec, mock_get_shell,
+                                          mock_support):
+        mock_support.return_value = False
+        shell = mock_get_shell.return_value
+        shell.lock = mock.MagicMock()
+        shell.execute.return_value = ('', '')
+
+        ipmi._exec_ipmitool(self.info, 'power status', reuse_session=True)
+        self.assertFalse(self.mock_sleep.called)
+        ipmi._exec_ipmitool(self.info, 'power status', reuse_session=True)
+
+        self.assertTrue(self.mock_sleep.called)
+
+    def test_reuse_session_retry(self, mock_exec, mock_get_shell,
+                                 mock_support):
+        mock_support.return_value = False
+        shell = mock_get_shell.return_value
+        shell.lock = mock.MagicMock()
+        shell.execute.side_effect = [
+            processutils.ProcessExecutionError(
+                stderr='insufficient resources for session'),
+            ('Chassis Power is on\n', '')]
+
+        result = ipmi._exec_ipmitool(self.info, 'power status',
+                                     reuse_session=True)
+
+        self.assertEqual(('Chassis Power is on\n', ''), result)
+        self.assertEqual(2, shell.execute.call_count)
+
+    def test_reuse_session_not_retryable(self, mock_exec, mock_get_shell,
+                                         mock_support):
+        mock_support.return_value = False
+        shell = mock_get_shell.return_value
+        shell.lock = mock.MagicMock()
+        shell.execute.side_effect = processutils.ProcessExecutionError(
+            stderr='Error: Invalid command')
+
+        self.assertRaises(processutils.ProcessExecutionError,
+                          ipmi._exec_ipmitool, self.info, 'power status',
+                          reuse_session=True)
+        # Retried once with a new session
+        self.assertEqual([mock.call('power status')] * 2,
+                         shell.execute.call_args_list)
+        self.assertEqual(2, shell.close.call_count)
+
+    def test_reuse_session_new_session(self, mock_exec, mock_get_shell,
+                                       mock_support):
+        mock_support.return_value = False
+        expired, new = mock.Mock(), mock.Mock()
+        expired.lock = new.lock = mock.MagicMock()
+        expired.execute.side_effect = processutils.ProcessExecutionError(
+            stderr='Error: Unable to establish IPMI v2 / RMCP+ session')
+        new.execute.return_value = ('Chassis Power is on\n', '')
+        mock_get_shell.side_effect = [expired, new]
+        key = (tuple(self.args), self.info['password'])
+        ipmi._IPMITOOL_SHELLS[key] = expired
+        self.addCleanup(ipmi._IPMITOOL_SHELLS.clear)
+
+        result = ipmi._exec_ipmitool(self.info, 'power status',
+                                     reuse_session=True)
+
+        self.assertEqual(('Chassis Power is on\n', ''), result)
+        expired.close.assert_called_once_with()
+        self.assertNotIn(key, ipmi._IPMITOOL_SHELLS)
+        self.assertFalse(new.close.called)
+
+    def test_reuse_session_disabled(self, mock_exec, mock_get_shell,
+                                    mock_support):
+        self.config(use_persistent_sessions=False, group='ipmi')
+        mock_support.return_value = False
+        mock_exec.return_value = ('', '')
+
+        ipmi._exec_ipmitool(self.info, 'power status', reuse_session=True)
+
+        self.assertTrue(mock_exec.called)
+        self.assertFalse(mock_get_shell.called)
+
+
 class IPMIToolDriverTestCase(Base):
 
     @mock.patch.object(ipmi, "_parse_driver_info", autospec=True)
@@ -1468,9 +1879,12 @@ class IPMIToolDriverTestCase(Base):
         returns = iter([["Chassis Power is off\n", None],
                         ["Chassis Power is on\n", None],
                         ["\n", None]])
-        expected = [mock.call(self.info, "power status", kill_on_timeout=True),
-                    mock.call(self.info, "power status", kill_on_timeout=True),
-                    mock.call(self.info, "power status", kill_on_timeout=True)]
+        expected = [mock.call(self.info, "power status", kill_on_timeout=True,
+                              reuse_session=True),
+                    mock.call(self.info, "power status", kill_on_timeout=True,
+                              reuse_session=True),
+                    mock.call(self.info, "power status", kill_on_timeout=True,
+                              reuse_session=True)]
         mock_exec.side_effect = returns
 
         with task_manager.acquire(self.context, self.node.uuid) as task:
@@ -1493,7 +1907,8 @@ class IPMIToolDriverTestCase(Base):
                               self.power.get_power_state,
                               task)
         mock_exec.assert_called_once_with(self.info, "power status",
-                                          kill_on_timeout=True)
+                                          kill_on_timeout=True,
+                                          reuse_session=True)
 
     @mock.patch.object(ipmi, '_power_on', autospec=True)
     @mock.patch.object(ipmi, '_power_off', autospec=True)
@@ -2571,6 +2986,7 @@ class IPMIToolShellinaboxTestCase(db_base.DbTestCase):
 
     def setUp(self):
         super(IPMIToolShellinaboxTestCase, self).setUp()
+        ipmi._BMC_RATE_LIMITER.clear()
         self.config(enabled_console_interfaces=[self.console_interface,
                                                 'no-console'])
         self.node = obj_utils.create_test_node(
@@ -2719,6 +3135,27 @@ class IPMIToolShellinaboxTestCase(db_base.DbTestCase):
                               driver_info,
                               console_utils.start_shellinabox_console)
 
+    @mock.patch.object(ironic_utils, 'unlink_without_raise', autospec=True)
+    @mock.patch.object(ipmi._BMC_RATE_LIMITER, 'command', autospec=True)
+    @mock.patch.object(console_utils, 'start_shellinabox_console',
+                       autospec=True)
+    def test__start_console_rate_limited(self, mock_start, mock_command,
+                                         mock_unlink):
+        mock_command.side_effect = processutils.ProcessExecutionError()
+
+        with task_manager.acquire(self.context,
+                                  self.node.uuid) as task:
+            driver_info = ipmi._parse_driver_info(task.node)
+            self.assertRaises(exception.ConsoleSubprocessFailed,
+                              self.console._start_console,
+                              driver_info,
+                              console_utils.start_shellinabox_console)
+        mock_command.assert_called_once_with(driver_info['address'],
+                                             CONF.ipmi.command_retry_timeout,
+                                             port=driver_info['dest_port'])
+        self.assertFalse(mock_start.called)
+        self.assertTrue(mock_unlink.called)
+
     @mock.patch.object(console_utils, 'start_shellinabox_console',
                        autospec=True)
     def test__start_console_fail_nodir(self, mock_start):
@@ -1115,8 +1115,9 @@ class PXEBootRetryTestCase(db_base.DbTestCase):
         self.node.save()
         with task_manager.acquire(self.context, self.node.uuid,
                                   shared=True) as task:
-            task.driver.boot._check_boot_status(task)
-            self.assertFalse(task.shared)
+            self.assertRaises(exception.NodeConstraintsNotMet,
+                              task.driver.boot._check_boot_status, task)
+            self.assertTrue(task.shared)
         self.assertFalse(mock_power.called)
         self.assertFalse(mock_boot_dev.called)
 
@@ -1125,8 +1126,9 @@ class PXEBootRetryTestCase(db_base.DbTestCase):
         self.node.save()
         with task_manager.acquire(self.context, self.node.uuid,
                                   shared=True) as task:
-            task.driver.boot._check_boot_status(task)
-            self.assertFalse(task.shared)
+            self.assertRaises(exception.NodeConstraintsNotMet,
+                              task.driver.boot._check_boot_status, task)
+            self.assertTrue(task.shared)
         self.assertFalse(mock_power.called)
         self.assertFalse(mock_boot_dev.called)
 
@@ -20,6 +20,7 @@ import time
 
 import mock
 from oslo_config import cfg
+from oslo_utils import uuidutils
 from pysnmp import error as snmp_error
 from pysnmp import hlapi as pysnmp
 
@@ -140,6 +141,35 @@ class SNMPClientTestCase(base.TestCase):
         self.assertEqual(var_bind[1], val)
         self.assertEqual(1, mock_getcmd.call_count)
 
+    @mock.patch.object(pysnmp, 'getCmd', autospec=True)
+    @mock.patch.object(snmp.SNMPClient, '_get_transport', autospec=True)
+    @mock.patch.object(snmp.SNMPClient, '_get_context', autospec=True)
+    @mock.patch.object(snmp.SNMPClient, '_get_auth', autospec=True)
+    def test_get_many(self, mock_auth, mock_context, mock_transport,
+                      mock_getcmd):
+        oid2 = (1, 3, 6, 1, 1, 2, 0)
+        var_binds = [(self.oid, self.value), (oid2, 'value2')]
+        mock_getcmd.return_value = iter([("", None, 0, var_binds)])
+        client = snmp.SNMPClient(self.address, self.port, snmp.SNMP_V3)
+        vals = client.get_many([self.oid, oid2])
+        self.assertEqual([self.value, 'value2'], vals)
+        self.assertEqual(1, mock_getcmd.call_count)
+        # Both objects are requested at once
+        self.assertEqual(6, len(mock_getcmd.call_args[0]))
+
+    @mock.patch.object(pysnmp, 'getCmd', autospec=True)
+    @mock.patch.object(snmp.SNMPClient, '_get_transport', autospec=True)
+    @mock.patch.object(snmp.SNMPClient, '_get_context', autospec=True)
+    @mock.patch.object(snmp.SNMPClient, '_get_auth', autospec=True)
+    def test_get_many_err_engine(self, mock_auth, mock_context,
+                                 mock_transport, mock_getcmd):
+        var_bind = (self.oid, self.value)
+        mock_getcmd.return_value = iter([("engine error", None, 0,
+                                          [var_bind])])
+        client = snmp.SNMPClient(self.address, self.port, snmp.SNMP_V3)
+        self.assertRaises(exception.SNMPFailure, client.get_many, [self.oid])
+        self.assertEqual(1, mock_getcmd.call_count)
+
     @mock.patch.object(pysnmp, 'nextCmd', autospec=True)
     @mock.patch.object(snmp.SNMPClient, '_get_transport', autospec=True)
     @mock.patch.object(snmp.SNMPClient, '_get_context', autospec=True)
@@ -1636,6 +1666,82 @@ class SNMPDeviceDriverTestCase(db_base.DbTestCase):
         self.assertEqual(states.POWER_ON, pstate)
 
 
+@mock.patch.object(snmp, '_get_client', autospec=True)
+class SNMPGetPowerStatesTestCase(db_base.DbTestCase):
+    """Tests for requesting the power states of several nodes at once."""
+
+    def setUp(self):
+        super(SNMPGetPowerStatesTestCase, self).setUp()
+        self.power = snmp.SNMPPower()
+        self.tasks = []
+        # Outlets 1 and 2 of PDU 1.2.3.4, outlet 1 of PDU 5.6.7.8
+        for address, outlet in (('1.2.3.4', '1'), ('1.2.3.4', '2'),
+                                ('5.6.7.8', '1')):
+            node = obj_utils.get_test_node(
+                self.context, uuid=uuidutils.generate_uuid(),
+                power_interface='snmp',
+                driver_info=db_utils.get_test_snmp_info(
+                    snmp_address=address, snmp_outlet=outlet))
+            self.tasks.append(mock.Mock(spec_set=['node'], node=node))
+        self.uuids = [task.node.uuid for task in self.tasks]
+
+    def test_get_power_states(self, mock_get_client):
+        driver_class = snmp.SNMPDriverTeltronix
+        mock_client = mock_get_client.return_value
+        mock_client.get_many.side_effect = [
+            [driver_class.value_power_on, driver_class.value_power_off],
+            [driver_class.value_power_on],
+        ]
+
+        result = self.power.get_power_states(self.tasks)
+
+        self.assertEqual({self.uuids[0]: states.POWER_ON,
+                          self.uuids[1]: states.POWER_OFF,
+                          self.uuids[2]: states.POWER_ON}, result)
+        oid = snmp.SNMPDriverBase.oid_enterprise + driver_class.oid_device
+        mock_client.get_many.assert_has_calls([
+            mock.call([oid + (1,), oid + (2,)]),
+            mock.call([oid + (1,)])])
+        self.assertFalse(mock_client.get.called)
+
+    def test_get_power_states_snmp_failure(self, mock_get_client):
+        driver_class = snmp.SNMPDriverTeltronix
+        mock_client = mock_get_client.return_value
+        error = exception.SNMPFailure(operation='GET', error='boom')
+        mock_client.get_many.side_effect = [
+            error, [driver_class.value_power_off]]
+
+        result = self.power.get_power_states(self.tasks)
+
+        self.assertEqual({self.uuids[0]: error,
+                          self.uuids[1]: error,
+                          self.uuids[2]: states.POWER_OFF}, result)
+
+    def test_get_power_states_invalid_driver_info(self, mock_get_client):
+        driver_class = snmp.SNMPDriverTeltronix
+        mock_client = mock_get_client.return_value
+        mock_client.get_many.return_value = [driver_class.value_power_on]
+        del self.tasks[0].node.driver_info['snmp_outlet']
+
+        result = self.power.get_power_states(self.tasks)
+
+        self.assertIsInstance(result[self.uuids[0]],
+                              exception.MissingParameterValue)
+        self.assertEqual(states.POWER_ON, result[self.uuids[1]])
+        self.assertEqual(states.POWER_ON, result[self.uuids[2]])
+
+    @mock.patch.object(snmp, '_MAX_OIDS_PER_GET', 1)
+    def test_get_power_states_chunked(self, mock_get_client):
+        driver_class = snmp.SNMPDriverTeltronix
+        mock_client = mock_get_client.return_value
+        mock_client.get_many.return_value = [driver_class.value_power_on]
+
+        result = self.power.get_power_states(self.tasks)
+
+        self.assertEqual(dict.fromkeys(self.uuids, states.POWER_ON), result)
+        self.assertEqual(3, mock_client.get_many.call_count)
+
+
 @mock.patch.object(snmp, '_get_driver', autospec=True)
 class SNMPDriverTestCase(db_base.DbTestCase):
     """SNMP power driver interface tests.
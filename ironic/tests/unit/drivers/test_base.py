@@ -755,6 +755,31 @@ class TestBootInterface(base.TestCase):
                           boot.validate_rescue, task_mock)
 
 
+class TestPowerInterface(base.TestCase):
+
+    def test_get_power_states_default_impl(self):
+        power = fake.FakePower()
+        tasks = [mock.Mock(spec_set=['node']) for _i in range(3)]
+        for i, task in enumerate(tasks):
+            task.node.uuid = 'node-%d' % i
+        error = exception.IronicException('boom')
+
+        def _get_power_state(task):
+            if task is tasks[1]:
+                raise error
+            return states.POWER_ON
+
+        with mock.patch.object(power, 'get_power_state', autospec=True,
+                               side_effect=_get_power_state):
+            result = power.get_power_states(tasks)
+
+        self.assertEqual({'node-0': states.POWER_ON, 'node-1': error,
+                          'node-2': states.POWER_ON}, result)
+
+    def test_get_power_states_default_impl_empty(self):
+        self.assertEqual({}, fake.FakePower().get_power_states([]))
+
+
 class TestManagementInterface(base.TestCase):
 
     def test_inject_nmi_default_impl(self):
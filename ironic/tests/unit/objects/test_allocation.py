@@ -39,6 +39,19 @@ class TestAllocationObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
             mock_get_allocation.assert_called_once_with(allocation_id)
             self.assertEqual(self.context, allocation._context)
 
+    def test_get_uuids_by_ids(self):
+        allocation_id = self.fake_allocation['id']
+        expected = {allocation_id: self.fake_allocation['uuid']}
+        with mock.patch.object(self.dbapi, 'get_allocation_uuids',
+                               autospec=True) as mock_get_uuids:
+            mock_get_uuids.return_value = expected
+
+            result = objects.Allocation.get_uuids_by_ids(self.context,
+                                                         [allocation_id])
+
+            mock_get_uuids.assert_called_once_with([allocation_id])
+            self.assertEqual(expected, result)
+
     def test_get_by_uuid(self):
         uuid = self.fake_allocation['uuid']
         with mock.patch.object(self.dbapi, 'get_allocation_by_uuid',
@@ -101,6 +114,32 @@ class TestAllocationObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                 res_updated_at = (p.updated_at).replace(tzinfo=None)
                 self.assertEqual(test_time, res_updated_at)
 
+    def test_claim_node(self):
+        allocation = objects.Allocation(self.context, **self.fake_allocation)
+        with mock.patch.object(self.dbapi, 'claim_node_for_allocation',
+                               autospec=True) as mock_claim:
+            mock_claim.return_value = db_utils.get_test_allocation(
+                node_id=1, state='active')
+            self.assertTrue(allocation.claim_node(1))
+
+            mock_claim.assert_called_once_with(self.fake_allocation['uuid'],
+                                               1)
+            self.assertEqual(1, allocation.node_id)
+            self.assertEqual('active', allocation.state)
+            self.assertEqual(self.context, allocation._context)
+
+    def test_claim_node_not_suitable(self):
+        allocation = objects.Allocation(self.context, **self.fake_allocation)
+        with mock.patch.object(self.dbapi, 'claim_node_for_allocation',
+                               autospec=True) as mock_claim:
+            mock_claim.return_value = None
+            self.assertFalse(allocation.claim_node(1))
+
+            mock_claim.assert_called_once_with(self.fake_allocation['uuid'],
+                                               1)
+            self.assertIsNone(allocation.node_id)
+            self.assertEqual('allocating', allocation.state)
+
     def test_refresh(self):
         uuid = self.fake_allocation['uuid']
         returns = [self.fake_allocation,
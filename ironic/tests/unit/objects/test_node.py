@@ -70,6 +70,23 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
         # Ensure the node can be serialised.
         jsonutils.dumps(d)
 
+    def test_content_digest(self):
+        digest = self.node.content_digest()
+        self.node.reservation = 'host'
+        self.node.updated_at = datetime.datetime(2020, 1, 1)
+        self.assertEqual(digest, self.node.content_digest())
+        self.node.driver_info['ipmi_password'] = 'fake'
+        self.assertNotEqual(digest, self.node.content_digest())
+
+    def test_content_digest_traits(self):
+        digest = self.node.content_digest()
+        self.fake_node['traits'] = ['CUSTOM_2', 'CUSTOM_1']
+        node = obj_utils.get_test_node(self.ctxt, **self.fake_node)
+        self.assertNotEqual(digest, node.content_digest())
+        self.fake_node['traits'] = ['CUSTOM_1', 'CUSTOM_2']
+        self.assertEqual(node.content_digest(), obj_utils.get_test_node(
+            self.ctxt, **self.fake_node).content_digest())
+
     def test_get_by_id(self):
         node_id = self.fake_node['id']
         with mock.patch.object(self.dbapi, 'get_node_by_id',
@@ -89,9 +106,25 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
 
             node = objects.Node.get(self.context, uuid)
 
-            mock_get_node.assert_called_once_with(uuid)
+            mock_get_node.assert_called_once_with(uuid, fields=None)
             self.assertEqual(self.context, node._context)
 
+    def test_get_by_uuid_fields(self):
+        uuid = self.fake_node['uuid']
+        with mock.patch.object(self.dbapi, 'get_node_by_uuid',
+                               autospec=True) as mock_get_node:
+            mock_get_node.return_value = self.fake_node
+
+            node = objects.Node.get_by_uuid(self.context, uuid,
+                                            fields={'uuid', 'owner'})
+
+            mock_get_node.assert_called_once_with(
+                uuid, fields={'uuid', 'owner'})
+            self.assertEqual(self.fake_node['id'], node.id)
+            self.assertTrue(node.obj_attr_is_set('owner'))
+            self.assertFalse(node.obj_attr_is_set('driver_info'))
+            self.assertFalse(node.obj_attr_is_set('traits'))
+
     def test_get_bad_id_and_uuid(self):
         self.assertRaises(exception.InvalidIdentity,
                           objects.Node.get, self.context, 'not-a-uuid')
@@ -105,7 +138,7 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
 
             node = objects.Node.get_by_name(self.context, node_name)
 
-            mock_get_node.assert_called_once_with(node_name)
+            mock_get_node.assert_called_once_with(node_name, fields=None)
             self.assertEqual(self.context, node._context)
 
     def test_get_by_name_node_not_found(self):
@@ -167,7 +200,7 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                 n.driver = "fake-driver"
                 n.save()
 
-                mock_get_node.assert_called_once_with(uuid)
+                mock_get_node.assert_called_once_with(uuid, fields=None)
                 mock_update_node.assert_called_once_with(
                     uuid, {'properties': {"fake": "property"},
                            'driver': 'fake-driver',
@@ -215,7 +248,7 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                         uuid)],
                     log_mock.mock_calls)
 
-                mock_get_node.assert_called_once_with(uuid)
+                mock_get_node.assert_called_once_with(uuid, fields=None)
                 mock_update_node.assert_called_once_with(
                     uuid,
                     {
@@ -256,7 +289,7 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                 n.driver_internal_info = {}
                 n.save()
 
-                mock_get_node.assert_called_once_with(uuid)
+                mock_get_node.assert_called_once_with(uuid, fields=None)
                 mock_update_node.assert_called_once_with(
                     uuid, {'properties': {"fake": "property"},
                            'driver': 'fake-driver',
@@ -330,7 +363,8 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
         uuid = self.fake_node['uuid']
         returns = [dict(self.fake_node, properties={"fake": "first"}),
                    dict(self.fake_node, properties={"fake": "second"})]
-        expected = [mock.call(uuid), mock.call(uuid)]
+        expected = [mock.call(uuid, fields=None),
+                    mock.call(uuid, fields=None)]
         with mock.patch.object(self.dbapi, 'get_node_by_uuid',
                                side_effect=returns,
                                autospec=True) as mock_get_node:
@@ -362,6 +396,22 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
             self.assertIsInstance(nodes[0], objects.Node)
             self.assertEqual(self.context, nodes[0]._context)
 
+    def test_list_fields(self):
+        with mock.patch.object(self.dbapi, 'get_node_list',
+                               autospec=True) as mock_get_list:
+            mock_get_list.return_value = [self.fake_node]
+            nodes = objects.Node.list(self.context,
+                                      fields={'uuid', 'name', 'spongebob'})
+            mock_get_list.assert_called_once_with(
+                filters=None, limit=None, marker=None, sort_key=None,
+                sort_dir=None, fields={'uuid', 'name', 'spongebob'})
+            self.assertThat(nodes, matchers.HasLength(1))
+            self.assertEqual(self.fake_node['uuid'], nodes[0].uuid)
+            self.assertEqual(self.fake_node['id'], nodes[0].id)
+            self.assertTrue(nodes[0].obj_attr_is_set('name'))
+            self.assertFalse(nodes[0].obj_attr_is_set('driver_info'))
+            self.assertFalse(nodes[0].obj_attr_is_set('traits'))
+
     def test_reserve(self):
         with mock.patch.object(self.dbapi, 'reserve_node',
                                autospec=True) as mock_reserve:
@@ -370,7 +420,8 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
             fake_tag = 'fake-tag'
             node = objects.Node.reserve(self.context, fake_tag, node_id)
             self.assertIsInstance(node, objects.Node)
-            mock_reserve.assert_called_once_with(fake_tag, node_id)
+            mock_reserve.assert_called_once_with(fake_tag, node_id,
+                                                 constraints=None)
             self.assertEqual(self.context, node._context)
 
     def test_reserve_node_not_found(self):
@@ -442,7 +493,7 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                                'cpus': '-1', 'cpu_arch': 'x86_64'}
             self.assertRaisesRegex(exception.InvalidParameterValue,
                                    ".*local_gb=5G, cpus=-1$", node.save)
-            mock_get_node.assert_called_once_with(uuid)
+            mock_get_node.assert_called_once_with(uuid, fields=None)
 
     def test__validate_property_values_success(self):
         uuid = self.fake_node['uuid']
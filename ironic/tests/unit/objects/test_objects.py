@@ -612,6 +612,26 @@ class _TestObject(object):
         self.assertEqual(2, obj.foo)
         self.assertEqual('current.bar', obj.bar)
 
+    def test_obj_changes_only(self):
+        obj = MyObj(self.context, foo=1, bar='bar', missing='missing')
+        obj.obj_reset_changes()
+        obj.bar = 'new bar'
+        result = obj.obj_changes_only(fields=('foo',))
+        self.assertIsInstance(result, MyObj)
+        self.assertEqual(1, result.foo)
+        self.assertEqual('new bar', result.bar)
+        self.assertFalse(result.obj_attr_is_set('missing'))
+        self.assertEqual({'bar'}, result.obj_what_changed())
+
+    def test_obj_fill_unset(self):
+        obj = MyObj(self.context, bar='new bar')
+        loaded_obj = MyObj(self.context, foo=1, bar='bar')
+        obj.obj_fill_unset(loaded_obj)
+        self.assertEqual(1, obj.foo)
+        self.assertEqual('new bar', obj.bar)
+        self.assertFalse(obj.obj_attr_is_set('missing'))
+        self.assertEqual({'bar'}, obj.obj_what_changed())
+
     def test_obj_constructor(self):
         obj = MyObj(self.context, foo=123, bar='abc')
         self.assertEqual(123, obj.foo)
@@ -147,6 +147,17 @@ class TestPortObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
             self.assertIsInstance(ports[0], objects.Port)
             self.assertEqual(self.context, ports[0]._context)
 
+    def test_list_fields(self):
+        with mock.patch.object(self.dbapi, 'get_port_list',
+                               autospec=True) as mock_get_list:
+            mock_get_list.return_value = [self.fake_port]
+            ports = objects.Port.list(self.context, fields=['uuid', 'address'])
+            mock_get_list.assert_called_once_with(
+                limit=None, marker=None, sort_key=None, sort_dir=None,
+                owner=None, fields=['uuid', 'address'])
+            self.assertEqual(self.fake_port['address'], ports[0].address)
+            self.assertFalse(ports[0].obj_attr_is_set('extra'))
+
     @mock.patch.object(obj_base.IronicObject, 'supports_version',
                        spec_set=types.FunctionType)
     def test_supports_physical_network_supported(self, mock_sv):
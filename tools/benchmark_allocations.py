@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the allocation throughput with and without batching.
+
+Creates a number of available nodes and the same number of allocations in a
+fresh database, then processes the allocations either each in its own
+greenthread, like separate API requests would, or in batches sharing the
+lists of candidate nodes. Prints the throughput of both modes.
+"""
+
+import eventlet
+eventlet.monkey_patch(os=False)
+
+import argparse  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+
+from oslo_db.sqlalchemy import enginefacade  # noqa: E402
+from oslo_log import log as logging  # noqa: E402
+from oslo_utils import uuidutils  # noqa: E402
+import osprofiler.opts as profiler_opts  # noqa: E402
+
+top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                       os.pardir))
+sys.path.insert(0, top_dir)
+
+from ironic.common import context as ironic_context  # noqa: E402
+from ironic.common import states  # noqa: E402
+from ironic.conductor import allocations  # noqa: E402
+from ironic.conf import CONF  # noqa: E402
+from ironic.db import api as dbapi  # noqa: E402
+from ironic.db.sqlalchemy import models  # noqa: E402
+from ironic import objects  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connection',
+                        help='Database connection URL. Its nodes and '
+                             'allocations are removed! Defaults to a '
+                             'temporary SQLite file.')
+    parser.add_argument('--allocations', type=int, default=200,
+                        help='Number of nodes and allocations.')
+    parser.add_argument('--batch-size', type=int, default=50,
+                        help='Number of allocations processed together.')
+    return parser.parse_args()
+
+
+def prepare(context, count):
+    engine = enginefacade.writer.get_engine()
+    models.Base.metadata.create_all(engine)
+    # NOTE(yrobla): nodes and allocations reference each other, so unlink
+    # them before removing the results of the previous run.
+    with engine.begin() as conn:
+        conn.execute(models.Node.__table__.update().values(
+            allocation_id=None, instance_uuid=None))
+        conn.execute(models.Allocation.__table__.delete())
+        conn.execute(models.Node.__table__.delete())
+    db = dbapi.get_instance()
+    for _i in range(count):
+        db.create_node({'uuid': uuidutils.generate_uuid(),
+                        'driver': 'fake-hardware',
+                        'resource_class': 'baremetal',
+                        'provision_state': states.AVAILABLE,
+                        'power_state': states.POWER_OFF,
+                        'version': objects.Node.VERSION})
+    result = []
+    for _i in range(count):
+        allocation = objects.Allocation(context,
+                                        uuid=uuidutils.generate_uuid(),
+                                        resource_class='baremetal',
+                                        state=states.ALLOCATING)
+        allocation.create()
+        result.append(allocation)
+    return result
+
+
+def run_single(context, items, batch_size):
+    pool = eventlet.GreenPool(batch_size)
+    for allocation in items:
+        pool.spawn_n(allocations.do_allocate, context, allocation)
+    pool.waitall()
+
+
+def run_batch(context, items, batch_size):
+    for start in range(0, len(items), batch_size):
+        allocations.do_allocate_batch(context,
+                                      items[start:start + batch_size])
+
+
+def main():
+    args = parse_args()
+    logging.register_options(CONF)
+    CONF([], project='ironic')
+    profiler_opts.set_defaults(CONF)
+    connection = args.connection
+    if not connection:
+        tmpdir = tempfile.mkdtemp()
+        connection = 'sqlite:///%s' % os.path.join(tmpdir, 'ironic.sqlite')
+    CONF.set_override('connection', connection, group='database')
+    objects.register_all()
+    context = ironic_context.get_admin_context()
+
+    print('%-8s %10s %10s %8s' % ('mode', 'seconds', 'alloc/s', 'failed'))
+    for name, func in (('single', run_single), ('batch', run_batch)):
+        items = prepare(context, args.allocations)
+        start = time.time()
+        func(context, items, args.batch_size)
+        elapsed = time.time() - start
+        failed = len(objects.Allocation.list(
+            context, filters={'state': states.ERROR}))
+        print('%-8s %10.3f %10.1f %8d' % (
+            name, elapsed, len(items) / elapsed, failed))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare power status latency with and without persistent ipmitool shells.
+
+Runs ``power status`` against a BMC (for example one emulated by virtualbmc)
+first by starting an ``ipmitool`` process per request, then through a
+persistent ``ipmitool shell``, and prints latency percentiles for both.
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+from oslo_log import log as logging
+
+top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                       os.pardir))
+sys.path.insert(0, top_dir)
+
+from ironic.conf import CONF  # noqa: E402
+from ironic.drivers.modules import ipmitool  # noqa: E402
+
+
+class UnpacedRateLimiter(ipmitool._BMCRateLimiter):
+    """Rate limiter sending the commands right away."""
+
+    @contextlib.contextmanager
+    def command(self, address, timeout, port=None):
+        yield
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--address', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=623)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--requests', type=int, default=50,
+                        help='Number of requests for each mode.')
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def run(driver_info, count, persistent):
+    CONF.set_override('use_persistent_sessions', persistent, group='ipmi')
+    CONF.set_override('min_command_interval', 1, group='ipmi')
+    latencies = []
+    for _i in range(count):
+        start = time.time()
+        ipmitool._power_status(driver_info)
+        latencies.append(time.time() - start)
+    return latencies
+
+
+def main():
+    args = parse_args()
+    logging.register_options(CONF)
+    CONF([], project='ironic')
+    driver_info = {
+        'uuid': 'benchmark',
+        'address': args.address,
+        'dest_port': args.port,
+        'username': args.username,
+        'password': args.password,
+        'protocol_version': '2.0',
+        'priv_level': 'ADMINISTRATOR',
+        'local_address': None,
+        'transit_channel': None,
+        'transit_address': None,
+        'target_channel': None,
+        'target_address': None,
+        'cipher_suite': None,
+        'hex_kg_key': None,
+    }
+    # NOTE(yrobla): do not let the pacing between commands dominate the
+    # measurement.
+    ipmitool._BMC_RATE_LIMITER = UnpacedRateLimiter()
+
+    print('%-12s %8s %8s %8s %8s' % ('mode', 'p50', 'p90', 'p99', 'total'))
+    for name, persistent in (('fork', False), ('persistent', True)):
+        latencies = run(driver_info, args.requests, persistent)
+        print('%-12s %8.3f %8.3f %8.3f %8.3f' % (
+            name, percentile(latencies, 50), percentile(latencies, 90),
+            percentile(latencies, 99), sum(latencies)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
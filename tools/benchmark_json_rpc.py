@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare JSON RPC call latency with and without the pooled client session.
+
+Starts a local JSON RPC server echoing a node-like payload, then calls it
+from concurrent greenthreads, first with a default HTTP session masking every
+request and response like the client used to, then with the pooled session
+masking only when debug logging is enabled, and finally with the pooled
+session and MessagePack encoding. Prints latency percentiles and throughput
+for each.
+"""
+
+import eventlet
+eventlet.monkey_patch(os=False)
+
+import argparse  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+
+from oslo_log import log  # noqa: E402
+
+top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                       os.pardir))
+sys.path.insert(0, top_dir)
+
+from ironic.common import context as ironic_context  # noqa: E402
+from ironic.common.json_rpc import client  # noqa: E402
+from ironic.common.json_rpc import server  # noqa: E402
+from ironic.common import keystone  # noqa: E402
+from ironic.conf import CONF  # noqa: E402
+from ironic.objects import base as objects_base  # noqa: E402
+
+
+class EchoManager(object):
+
+    def echo(self, context, node):
+        return node
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=18089)
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='Number of requests for each mode.')
+    parser.add_argument('--concurrency', type=int, default=20,
+                        help='Number of concurrent callers.')
+    parser.add_argument('--payload-keys', type=int, default=200,
+                        help='Number of keys in the driver_info and '
+                             'instance_info of the payload.')
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def legacy_session():
+    session = keystone.get_session('json_rpc')
+    session.headers = {'Content-Type': 'application/json'}
+    return session
+
+
+def run(cctx, context, node, count, concurrency):
+    latencies = []
+
+    def _call():
+        start = time.time()
+        cctx.call(context, 'echo', node=node)
+        latencies.append(time.time() - start)
+
+    pool = eventlet.GreenPool(concurrency)
+    start = time.time()
+    for _i in range(count):
+        pool.spawn_n(_call)
+    pool.waitall()
+    return latencies, time.time() - start
+
+
+def main():
+    args = parse_args()
+    log.register_options(CONF)
+    CONF([], project='ironic')
+    CONF.set_override('auth_strategy', 'noauth', group='json_rpc')
+    CONF.set_override('host_ip', '127.0.0.1', group='json_rpc')
+    CONF.set_override('port', args.port, group='json_rpc')
+
+    serializer = objects_base.IronicObjectSerializer(is_server=True)
+    service = server.WSGIService(EchoManager(), serializer)
+    service.start()
+
+    context = ironic_context.get_admin_context()
+    node = {'uuid': 'benchmark',
+            'driver_info': {'key%d' % i: 'value' * 10
+                            for i in range(args.payload_keys)},
+            'instance_info': {'key%d' % i: 'value' * 10
+                              for i in range(args.payload_keys)}}
+    cctx = client.Client(serializer).prepare('ironic.127.0.0.1')
+
+    print('%-8s %8s %8s %8s %10s' % ('mode', 'p50', 'p90', 'p99', 'calls/s'))
+    for name in ('legacy', 'pooled', 'msgpack'):
+        if name == 'legacy':
+            client._SESSION = legacy_session()
+            # NOTE(yrobla): the legacy client masked the payloads even when
+            # debug logging was disabled. Nothing is printed, since no
+            # handlers are configured.
+            client.LOG.logger.setLevel(logging.DEBUG)
+        else:
+            CONF.set_override('connection_pool_size', args.concurrency,
+                              group='json_rpc')
+            CONF.set_override('payload_encoding', name
+                              if name == 'msgpack' else 'json',
+                              group='json_rpc')
+            client._SESSION = None
+            client.LOG.logger.setLevel(logging.INFO)
+        latencies, elapsed = run(cctx, context, node, args.requests,
+                                 args.concurrency)
+        print('%-8s %8.4f %8.4f %8.4f %10.1f' % (
+            name, percentile(latencies, 50), percentile(latencies, 90),
+            percentile(latencies, 99), len(latencies) / elapsed))
+
+    service.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())